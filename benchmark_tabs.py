@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+So sánh chạy tác vụ nhẹ (tìm kiếm Google) theo 2 cách:
+  - browsers: mỗi tác vụ một trình duyệt (chạy song song --concurrency trình duyệt)
+  - tabs: một trình duyệt, --concurrency tab (TabExecutor)
+
+Đo thời gian, thông lượng (tác vụ/phút) và RSS đỉnh của các tiến trình trình duyệt.
+Cả hai cách đều đi qua cùng cấu hình RateLimiter (mỗi lần đo một bộ giới hạn mới)
+nên thông lượng so sánh được với nhau.
+
+Ví dụ:
+    python benchmark_tabs.py --keywords "python,selenium,brave,pyqt5" --concurrency 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from modules.config import BRAVE_PATH
+from modules.browser_reaper import BrowserReaper, PID_DIR
+from modules.rate_limiter import RateLimiter
+from modules.tab_executor import TabExecutor, GOOGLE_RESULTS_JS, google_search_task
+
+
+def create_driver(headless=True):
+    """Tạo driver tối giản (Brave nếu có, không thì Chrome)"""
+    options = Options()
+    if os.path.exists(BRAVE_PATH):
+        options.binary_location = BRAVE_PATH
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1280,900")
+    return webdriver.Chrome(options=options)
+
+
+# PID trình duyệt của benchmark ghi riêng, không lẫn với ứng dụng / job_worker
+BENCHMARK_PID_DIR = os.path.join(os.path.dirname(PID_DIR), "benchmark_pids")
+
+
+def create_reaper(max_idle):
+    return BrowserReaper(max_rss_mb=0, max_idle=max_idle, pid_dir=BENCHMARK_PID_DIR)
+
+
+def create_limiter():
+    """Bộ giới hạn tốc độ riêng cho mỗi lần đo (trạng thái bucket không chuyển sang chế độ sau)"""
+    return RateLimiter(shared_db=None)
+
+
+class RssSampler:
+    """Lấy mẫu tổng RSS của mọi trình duyệt đã đăng ký, giữ giá trị đỉnh"""
+
+    def __init__(self, reaper, interval=0.25):
+        self.reaper = reaper
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            total = sum(item["rss_mb"] for item in self.reaper.stats())
+            self.peak = max(self.peak, total)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_browsers(keywords, concurrency, max_results, headless):
+    """Mỗi từ khoá một trình duyệt riêng"""
+    reaper = create_reaper(concurrency)
+    limiter = create_limiter()
+
+    def one(keyword):
+        driver = create_driver(headless)
+        reaper.register(driver, owner=keyword)
+        try:
+            task = google_search_task(keyword, max_results)
+            limiter.acquire(task.url, log=print)
+            driver.get(task.url)
+            return driver.execute_script(GOOGLE_RESULTS_JS, max_results) or []
+        finally:
+            reaper.quit(driver)
+
+    with RssSampler(reaper) as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, keywords))
+    return sum(1 for rows in results if rows), sampler.peak
+
+
+def run_tabs(keywords, concurrency, max_results, headless):
+    """Một trình duyệt, nhiều tab"""
+    reaper = create_reaper(1)
+    driver = create_driver(headless)
+    reaper.register(driver, owner="tabs")
+    try:
+        with RssSampler(reaper) as sampler:
+            executor = TabExecutor(driver, tabs_per_browser=concurrency, log=print)
+            executor.limiter = create_limiter()
+            results = executor.run([google_search_task(k, max_results) for k in keywords])
+    finally:
+        reaper.quit(driver)
+    return sum(1 for rows in results.values() if rows and not isinstance(rows, Exception)), sampler.peak
+
+
+def parse_arguments():
+    """Phân tích đối số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Benchmark tab/trình duyệt cho tác vụ nhẹ")
+    parser.add_argument("--keywords", "-k", default="python,selenium,brave browser,pyqt5,automation,shopee,google trends,proxy",
+                        help="Danh sách từ khoá, phân tách bằng dấu phẩy")
+    parser.add_argument("--concurrency", "-c", type=int, default=4,
+                        help="Số trình duyệt (browsers) hoặc số tab (tabs) chạy song song")
+    parser.add_argument("--max-results", "-n", type=int, default=10,
+                        help="Số kết quả mỗi từ khoá")
+    parser.add_argument("--mode", "-m", choices=["both", "browsers", "tabs"], default="both",
+                        help="Cách chạy cần đo")
+    parser.add_argument("--show", action="store_true",
+                        help="Hiển thị trình duyệt (mặc định headless)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    keywords = [k.strip() for k in args.keywords.split(",") if k.strip()]
+    modes = ["browsers", "tabs"] if args.mode == "both" else [args.mode]
+    runners = {"browsers": run_browsers, "tabs": run_tabs}
+
+    print(f"=== BENCHMARK: {len(keywords)} từ khoá, concurrency={args.concurrency} ===")
+    rows = []
+    for mode in modes:
+        started = time.time()
+        ok, peak_mb = runners[mode](keywords, args.concurrency, args.max_results, not args.show)
+        seconds = time.time() - started
+        rows.append((mode, ok, seconds, ok / seconds * 60 if seconds else 0, peak_mb))
+
+    print(f"\n{'Chế độ':<10}{'OK':>5}{'Thời gian (s)':>16}{'Tác vụ/phút':>14}{'RSS đỉnh (MB)':>16}")
+    for mode, ok, seconds, throughput, peak_mb in rows:
+        print(f"{mode:<10}{ok:>5}{seconds:>16.1f}{throughput:>14.1f}{peak_mb:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
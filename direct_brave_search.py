@@ -7,6 +7,8 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 
+from modules.browser_identity import get_browser_identity
+
 def direct_brave_search():
     """Khởi động Brave trực tiếp và tìm kiếm Google"""
     print("=== KHỞI ĐỘNG BRAVE BROWSER VÀ TÌM KIẾM GOOGLE ===")
@@ -71,14 +73,11 @@ def direct_brave_search():
         # Lấy tiêu đề trang
         print(f"Tiêu đề trang: {driver.title}")
         
-        # Kiểm tra xem có sử dụng Brave không
+        # Kiểm tra xem có sử dụng Brave không (thông tin được cache theo binary)
         print("Kiểm tra thông tin trình duyệt...")
-        driver.get("chrome://version")
-        time.sleep(3)
-        
-        page_source = driver.page_source.lower()
-        if "brave" in page_source:
-            print("✅ Xác nhận đang sử dụng Brave Browser!")
+        identity = get_browser_identity(brave_path)
+        if identity and identity["product"] == "Brave":
+            print(f"✅ Xác nhận đang sử dụng Brave Browser {identity['version']}")
         else:
             print("⚠️ Có thể không sử dụng Brave Browser!")
         
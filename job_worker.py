@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Tiến trình worker lấy job từ hàng đợi SQLite (modules/job_queue.py) và chạy.
+
+Có thể chạy nhiều tiến trình trên một hoặc nhiều máy cùng trỏ vào một file
+hàng đợi (thư mục chia sẻ, dùng rollback journal thay cho WAL) để tăng thông lượng.
+
+Ví dụ:
+    python job_worker.py                          # chạy tới khi bị dừng (Ctrl+C)
+    python job_worker.py --tasks google,shopee -c 2
+    python job_worker.py --queue //server/share/job_queue.db --once
+    python job_worker.py --enqueue google --keyword "brave browser"
+    python job_worker.py --stats
+    python job_worker.py --metrics-port 9464       # mở endpoint /metrics cho Prometheus
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from modules.job_queue import JobQueue, LeaseKeeper, DEFAULT_QUEUE_DB, STATUS_DONE, default_owner
+from modules.automation_worker import EnhancedAutomationWorker
+from modules.metrics import start_metrics_server
+
+# Tham số khởi tạo EnhancedAutomationWorker; các khoá khác trong payload được gán làm thuộc tính
+WORKER_ARGS = ("keyword", "email", "password", "max_results", "headless", "proxy", "delay", "pages", "chrome_config")
+
+_stop = threading.Event()
+
+
+def run_job(queue, job):
+    """
+    Chạy một job bằng EnhancedAutomationWorker (đồng bộ, trong thread hiện tại).
+    Trả về trạng thái mới của job, None nếu lease đã mất.
+    """
+    payload = dict(job.payload)
+    # Brave khoá profile đang mở: mỗi job chạy trên bản sao profile riêng (--concurrency > 1)
+    payload.setdefault("clone_profile", True)
+    worker = EnhancedAutomationWorker(
+        task=job.task,
+        **{key: payload.pop(key) for key in WORKER_ARGS if key in payload}
+    )
+    for key, value in payload.items():
+        setattr(worker, key, value)
+
+    outcome = {"result": None, "error": None}
+    worker.log_signal.connect(lambda message: print(f"[job {job.id}] {message}"))
+    worker.result_signal.connect(lambda result: outcome.update(result=result))
+    worker.error_signal.connect(lambda error: outcome.update(error=error))
+
+    print(f"▶️ {job} ({job.owner})")
+    started = time.time()
+    with LeaseKeeper(queue, job, on_lost=worker.stop) as keeper:
+        worker.run()
+
+    seconds = time.time() - started
+    status = None
+    if keeper.lost:
+        pass
+    elif outcome["error"] or worker.failed:
+        error = outcome["error"] or "worker failed"
+        status = queue.fail(job, error)
+        if status:
+            print(f"❌ [job {job.id}] Lỗi sau {seconds:.1f}s -> {status}: {error}")
+    # Lease có thể hết hạn giữa lần heartbeat cuối và lúc báo kết quả: ack / fail trả về False / None
+    elif queue.ack(job, outcome["result"]):
+        status = STATUS_DONE
+        print(f"✅ [job {job.id}] Xong sau {seconds:.1f}s")
+
+    if status is None:
+        print(f"⚠️ [job {job.id}] Mất lease, job đã được worker khác lấy lại")
+    return status
+
+
+def worker_loop(queue, tasks, poll, once):
+    """Lease -> chạy -> ack/fail cho tới khi dừng (hoặc hàng đợi trống nếu once)"""
+    owner = default_owner()
+    while not _stop.is_set():
+        job = queue.lease(owner, tasks)
+        if job is None:
+            if once:
+                return
+            _stop.wait(poll)
+            continue
+        try:
+            run_job(queue, job)
+        except Exception as e:
+            queue.fail(job, e)
+            print(f"❌ [job {job.id}] {e}")
+
+
+def parse_arguments():
+    """Phân tích đối số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Worker chạy job từ hàng đợi tự động hoá")
+    parser.add_argument("--queue", "-q", default=DEFAULT_QUEUE_DB,
+                        help="Đường dẫn file hàng đợi SQLite (có thể ở thư mục chia sẻ)")
+    parser.add_argument("--tasks", "-t", default="",
+                        help="Chỉ nhận các task này, phân tách bằng dấu phẩy (mặc định: tất cả)")
+    parser.add_argument("--concurrency", "-c", type=int, default=1,
+                        help="Số job chạy song song trong tiến trình này")
+    parser.add_argument("--poll", type=float, default=2.0,
+                        help="Số giây chờ khi hàng đợi trống")
+    parser.add_argument("--once", action="store_true",
+                        help="Thoát khi hàng đợi trống")
+    parser.add_argument("--stats", action="store_true",
+                        help="In thống kê hàng đợi và các job dead-letter rồi thoát")
+    parser.add_argument("--requeue-dead", action="store_true",
+                        help="Đưa mọi job dead-letter về hàng đợi rồi thoát")
+    parser.add_argument("--enqueue", metavar="TASK",
+                        help="Thêm một job (google, facebook, shopee) rồi thoát")
+    parser.add_argument("--keyword", "-k", default="",
+                        help="Từ khoá cho job --enqueue")
+    parser.add_argument("--headless", action="store_true",
+                        help="Job --enqueue chạy headless")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Mở endpoint /metrics (Prometheus) trên 127.0.0.1 ở cổng này")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    queue = JobQueue(args.queue)
+
+    if args.enqueue:
+        job_id = queue.enqueue(args.enqueue, {"keyword": args.keyword, "headless": args.headless})
+        print(f"✅ Đã thêm job {job_id} ({args.enqueue})")
+        return
+    if args.requeue_dead:
+        print(f"✅ Đã đưa lại {queue.requeue_dead()} job vào hàng đợi")
+        return
+    if args.stats:
+        print(f"Hàng đợi: {args.queue}")
+        for status, count in queue.stats().items():
+            print(f"  {status:<8}{count:>6}")
+        for job in queue.dead_letters(20):
+            print(f"  ☠️ job {job['id']} ({job['task']}, {job['attempts']} lần): {job['last_error']}")
+        return
+
+    tasks = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    signal.signal(signal.SIGINT, lambda *_: _stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: _stop.set())
+
+    print(f"=== JOB WORKER {default_owner()} | hàng đợi: {args.queue} | concurrency={args.concurrency} ===")
+    if args.metrics_port:
+        server = start_metrics_server(port=args.metrics_port, queue_db=args.queue)
+        print(f"📈 Số liệu: http://{server.host}:{server.port}/metrics")
+    threads = [
+        threading.Thread(target=worker_loop, args=(queue, tasks, args.poll, args.once), daemon=True)
+        for _ in range(max(1, args.concurrency))
+    ]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(0.5)
+    print("=== DỪNG WORKER ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -51,6 +51,7 @@ try:
     # Import module chính
     from modules.main_window import MainWindow
     from modules.automation_worker_fixed import EnhancedAutomationWorker
+    from modules.browser_reaper import get_browser_reaper
     logger.info("Đã import thành công các module cần thiết")
 except ImportError as e:
     logger.error(f"Lỗi khi import module: {e}")
@@ -75,6 +76,11 @@ def main():
         from PyQt5.QtGui import QIcon
         app.setWindowIcon(QIcon(icon_path))
     
+    # Dọn trình duyệt mồ côi từ lần chạy trước và bắt đầu theo dõi trình duyệt mới
+    reaper = get_browser_reaper()
+    reaper.reap_orphans()
+    reaper.start()
+    
     # Tạo cửa sổ chính
     main_window = MainWindow()
     main_window.show() 
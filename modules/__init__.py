@@ -2,13 +2,25 @@
 Package chứa các module và tiện ích cho ứng dụng.
 """
 
-# Khai báo các module quan trọng để có thể import trực tiếp
-from .automation_worker_fixed import EnhancedAutomationWorker
-from .app_ui import MainWindow
+from importlib import import_module
+
+# Khai báo các module quan trọng để có thể import trực tiếp. Nạp khi được dùng tới
+# để import module thuần (modules.job_queue, modules.url_index...) không kéo theo PyQt5 / selenium
+_EXPORTS = {
+    'EnhancedAutomationWorker': '.automation_worker_fixed',
+    'MainWindow': '.app_ui',
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'automation_worker_fixed',
     'automation_worker',
     'app_ui',
     'utils'
-] 
\ No newline at end of file
+]
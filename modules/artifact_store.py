@@ -0,0 +1,218 @@
+# modules/artifact_store.py
+
+"""
+Lưu screenshot / DOM snapshot bất đồng bộ.
+
+Worker chỉ đưa dữ liệu thô vào hàng đợi; một thread nền sẽ:
+  - nén ảnh (WebP/JPEG, chất lượng cấu hình được, thu nhỏ nếu quá lớn)
+  - bỏ qua ảnh trùng nội dung (so theo hash)
+  - dọn thư mục theo dung lượng tối đa và tuổi tối đa
+"""
+
+import os
+import time
+import queue
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from concurrent.futures import Future
+
+from PIL import Image
+
+from .config import (
+    ARTIFACT_FORMAT, ARTIFACT_QUALITY, ARTIFACT_MAX_DIMENSION,
+    ARTIFACT_MAX_TOTAL_MB, ARTIFACT_MAX_AGE_DAYS
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Số lần ghi giữa 2 lần dọn thư mục
+RETENTION_EVERY = 20
+
+_STOP = object()
+
+
+class ArtifactStore:
+    """
+    Hàng đợi ghi artifact cho một thư mục.
+    submit_image()/submit_text() không bao giờ chặn worker; trả về Future chứa đường dẫn file.
+    """
+
+    def __init__(self, directory, fmt=ARTIFACT_FORMAT, quality=ARTIFACT_QUALITY,
+                 max_dimension=ARTIFACT_MAX_DIMENSION, max_total_mb=ARTIFACT_MAX_TOTAL_MB,
+                 max_age_days=ARTIFACT_MAX_AGE_DAYS, max_queue=64):
+        self.directory = directory
+        self.fmt = fmt.lower()
+        self.quality = quality
+        self.max_dimension = max_dimension
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._hashes = None  # hash ngắn -> đường dẫn file đã ghi
+        self._writes = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()  # stats được cộng từ thread gọi submit lẫn thread ghi
+
+        self.stats = {"written": 0, "deduplicated": 0, "dropped": 0, "removed": 0}
+
+    # ---------------- API ----------------
+    def submit_image(self, prefix, png_bytes, fmt=None):
+        """Đưa ảnh PNG (bytes) vào hàng đợi; fmt="png" để giữ nguyên không nén"""
+        return self._submit(("image", prefix, png_bytes, (fmt or self.fmt).lower()))
+
+    def submit_text(self, prefix, text, ext="html"):
+        """Đưa DOM snapshot / text vào hàng đợi"""
+        return self._submit(("text", prefix, text.encode("utf-8"), ext))
+
+    def flush(self, timeout=None):
+        """Chờ hàng đợi ghi xong (dùng khi đóng ứng dụng)"""
+        if self._thread is None:
+            return
+        deadline = time.time() + timeout if timeout else None
+        while self._queue.unfinished_tasks:
+            if deadline and time.time() > deadline:
+                break
+            time.sleep(0.05)
+
+    def get_stats(self):
+        """Bản sao thống kê ghi / trùng / bỏ / xoá"""
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def close(self):
+        """Ghi nốt hàng đợi rồi dừng thread nền"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    # ---------------- NỘI BỘ ----------------
+    def _submit(self, job):
+        future = Future()
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((job, future))
+        except queue.Full:
+            # Không bao giờ chặn task đang chạy: bỏ artifact này
+            self._count("dropped")
+            future.set_result(None)
+        return future
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ArtifactStore", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_hashes()
+        self.enforce_retention()
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                job, future = item
+                try:
+                    future.set_result(self._write(*job))
+                except Exception as e:
+                    logging.error(f"Lỗi ghi artifact: {e}")
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def _load_hashes(self):
+        # Tên file có dạng <prefix>_<timestamp>_<hash>.<ext>
+        self._hashes = {}
+        for name in os.listdir(self.directory):
+            stem = os.path.splitext(name)[0]
+            digest = stem.rsplit("_", 1)[-1]
+            if len(digest) == 12:
+                self._hashes[digest] = os.path.join(self.directory, name)
+
+    def _write(self, kind, prefix, data, fmt):
+        digest = hashlib.sha1(data).hexdigest()[:12]
+        existing = self._hashes.get(digest)
+        if existing and os.path.exists(existing):
+            self._count("deduplicated")
+            return existing
+
+        if kind == "image" and fmt != "png":
+            data, fmt = self._encode(data, fmt)
+
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{prefix}_{timestamp}_{digest}.{fmt}")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        self._hashes[digest] = path
+        self._count("written")
+        self._writes += 1
+        if self._writes % RETENTION_EVERY == 0:
+            self.enforce_retention()
+        return path
+
+    def _encode(self, png_bytes, fmt):
+        image = Image.open(BytesIO(png_bytes))
+        if self.max_dimension and max(image.size) > self.max_dimension:
+            image.thumbnail((self.max_dimension, self.max_dimension))
+        if fmt in ("jpg", "jpeg"):
+            image = image.convert("RGB")
+            fmt = "jpg"
+        out = BytesIO()
+        image.save(out, format="JPEG" if fmt == "jpg" else fmt.upper(), quality=self.quality)
+        return out.getvalue(), fmt
+
+    def enforce_retention(self):
+        """Xoá file quá tuổi, sau đó xoá file cũ nhất cho tới khi dưới dung lượng tối đa"""
+        try:
+            entries = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.isfile(path):
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        except OSError:
+            return
+
+        entries.sort()
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self._count("removed")
+            except OSError:
+                pass
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_artifact_store(folder="screenshots", **kwargs):
+    """Trả về ArtifactStore dùng chung cho thư mục (tương đối với thư mục gốc dự án)"""
+    with _stores_lock:
+        if folder not in _stores:
+            _stores[folder] = ArtifactStore(os.path.join(BASE_DIR, folder), **kwargs)
+        return _stores[folder]
+
+
+def close_all_stores():
+    """Ghi nốt và dừng mọi ArtifactStore (gọi khi thoát ứng dụng)"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.close()
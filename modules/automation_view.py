@@ -5,6 +5,7 @@ This module implements the automation view for the Selenium Automation Hub.
 
 import sys
 import time
+import random
 from datetime import datetime
 import os
 
@@ -12,13 +13,15 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QTabWidget, QLineEdit, 
                              QCheckBox, QHBoxLayout, QPushButton, QProgressBar,
                              QTextEdit, QTableWidget, QTableWidgetItem, QFormLayout,
-    QApplication, QHeaderView, QFileDialog
+    QApplication, QHeaderView, QFileDialog, QComboBox, QMessageBox
 )
 from PyQt5.QtGui import QFont, QIcon, QColor, QTextCursor, QBrush
 from PyQt5.QtCore import Qt, pyqtSignal, QThread, QSettings, QDateTime
 
 from modules.config import DEFAULT_THEME
 from modules.automation_worker import EnhancedAutomationWorker
+from modules.job_queue import get_job_queue
+from modules.proxy_store import get_proxy_store
 
 class AutomationView(QWidget):
     log_signal = pyqtSignal(str)
@@ -27,6 +30,7 @@ class AutomationView(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.worker = None
+        self.workers = []  # Mọi worker đang chạy (worker mới không ghi đè worker cũ)
         self.settings = QSettings("MyApp", "AutomationWidget")
         self.active_proxies = []  # Danh sách proxy hoạt động
         self.start_time = 0  # Track when task begins
@@ -134,6 +138,10 @@ class AutomationView(QWidget):
         self.use_proxies_cb.setChecked(False)
         self.use_proxies_cb.setEnabled(False)  # Will be enabled if proxies are available
         proxy_layout.addWidget(self.use_proxies_cb)
+        # Chỉ dùng proxy ở một quốc gia (kết quả Google / Shopee theo vùng)
+        self.proxy_country = QComboBox()
+        self.proxy_country.addItem("Mọi quốc gia", None)
+        proxy_layout.addWidget(self.proxy_country)
         proxy_layout.addStretch()
         form_layout.addRow("Proxy:", proxy_layout)
 
@@ -263,16 +271,38 @@ class AutomationView(QWidget):
         self.export_btn = QPushButton("Xuất CSV")
         self.export_btn.setIcon(QIcon("resources/icons/export.png"))
         
+        self.enqueue_btn = QPushButton("Đưa vào hàng đợi")
+        self.enqueue_btn.setToolTip("Thêm tác vụ vào hàng đợi để các tiến trình job_worker.py xử lý")
+        
         btn_layout.addWidget(self.start_btn)
         btn_layout.addWidget(self.stop_btn)
         btn_layout.addWidget(self.reset_btn)
         btn_layout.addWidget(self.export_btn)
+        btn_layout.addWidget(self.enqueue_btn)
         btn_layout.addStretch()
         
+        self.bypass_cache_cb = QCheckBox("Bỏ qua cache")
+        self.bypass_cache_cb.setToolTip("Luôn mở trình duyệt và lấy kết quả mới, không dùng kết quả đã cache")
+        self.bypass_cache_cb.setChecked(self.settings.value("bypass_cache", False, type=bool))
+        btn_layout.addWidget(self.bypass_cache_cb)
+        
+        self.only_new_cb = QCheckBox("Chỉ kết quả mới")
+        self.only_new_cb.setToolTip("Chỉ hiển thị URL/sản phẩm chưa thấy hoặc đã thay đổi so với các lần chạy trước")
+        self.only_new_cb.setChecked(self.settings.value("only_new_results", False, type=bool))
+        btn_layout.addWidget(self.only_new_cb)
+        
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("Selenium", "selenium")
+        self.engine_combo.addItem("CDP (async)", "cdp")
+        self.engine_combo.setToolTip("CDP: điều khiển trình duyệt trực tiếp qua DevTools, không cần chromedriver (Google/Shopee)")
+        self.engine_combo.setCurrentIndex(max(0, self.engine_combo.findData(self.settings.value("engine", "selenium"))))
+        btn_layout.addWidget(self.engine_combo)
+        
         self.start_btn.clicked.connect(self.start_automation)
         self.stop_btn.clicked.connect(self.stop_automation)
         self.reset_btn.clicked.connect(self.reset_automation)
         self.export_btn.clicked.connect(self.export_results)
+        self.enqueue_btn.clicked.connect(self.enqueue_automation)
         
         layout.addLayout(btn_layout)
 
@@ -341,17 +371,64 @@ class AutomationView(QWidget):
         if hasattr(self, 'use_proxies_cb'):
             self.use_proxies_cb.setEnabled(len(proxies) > 0)
             self.use_proxies_cb.setChecked(len(proxies) > 0)
+
+        # Danh sách quốc gia có proxy (giữ lựa chọn hiện tại)
+        if hasattr(self, 'proxy_country'):
+            selected = self.proxy_country.currentData()
+            self.proxy_country.clear()
+            self.proxy_country.addItem("Mọi quốc gia", None)
+            for country, count in get_proxy_store().countries().items():
+                self.proxy_country.addItem(f"{country} ({count})", country)
+            index = self.proxy_country.findData(selected)
+            self.proxy_country.setCurrentIndex(max(index, 0))
         
         self.log_message(f"Đã cập nhật danh sách proxy: {len(proxies)} proxy có sẵn")
 
+    def proxy_pool(self):
+        """Proxy hoạt động dùng cho task (lọc theo quốc gia đã chọn qua chỉ mục của kho proxy)"""
+        country = self.proxy_country.currentData() if hasattr(self, 'proxy_country') else None
+        if country:
+            return get_proxy_store().active(country)
+        return self.active_proxies
+
+    def choose_proxy(self):
+        """
+        (proxy, danh sách proxy để xoay vòng, vùng proxy) cho task sắp chạy.
+        Đã bật proxy và chọn quốc gia mà không còn proxy hoạt động ở đó thì cảnh báo
+        và trả None: không chạy task bằng IP của máy.
+        """
+        if not (hasattr(self, 'use_proxies_cb') and self.use_proxies_cb.isChecked()):
+            return None, [], ""
+        pool = self.proxy_pool()
+        country = self.proxy_country.currentData() if hasattr(self, 'proxy_country') else None
+        if not pool:
+            if country:
+                message = f"Không có proxy hoạt động ở {country}. Task không được chạy để tránh dùng IP của máy."
+                self.log_message(f"❌ {message}", "error")
+                QMessageBox.warning(self, "Không có proxy", message)
+                return None
+            return None, [], ""
+        proxy = random.choice(pool)
+        # Vùng dùng cho khoá cache: quốc gia đã chọn, không thì quốc gia của proxy được chọn
+        region = country or (get_proxy_store().get(proxy) or {}).get("country") or ""
+        return proxy, pool, region
+
     def start_automation(self):
         """
         Khởi động tiến trình automation
         """
-        if self.worker and self.worker.isRunning():
+        if any(worker.isRunning() for worker in self.workers):
             self.log_message("❌ Tiến trình đang chạy, không thể khởi động mới", "error")
             return
             
+        # Kiểm tra proxy
+        choice = self.choose_proxy()
+        if choice is None:
+            return
+        proxy, proxies, proxy_region = choice
+        if proxy:
+            self.log_message(f"Đang sử dụng proxy: {proxy}", "info")
+        
         # Clear previous results
         self.results_table.setRowCount(0)
         self.log_console.clear()
@@ -367,13 +444,6 @@ class AutomationView(QWidget):
         brave_path = self.settings.value("brave_path", "")
         brave_profile = self.settings.value("brave_profile", "")
         
-        # Kiểm tra proxy
-        proxy = None
-        if hasattr(self, 'use_proxies_cb') and self.use_proxies_cb.isChecked() and self.active_proxies:
-            import random
-            proxy = random.choice(self.active_proxies)
-            self.log_message(f"Đang sử dụng proxy: {proxy}", "info")
-        
         self.log_message("Đang khởi động automation...", "info")
         self.start_time = time.time()
         
@@ -445,25 +515,88 @@ class AutomationView(QWidget):
             self.reset_automation()
             return
 
+        # Cache kết quả: người dùng có thể bỏ qua để lấy dữ liệu mới
+        self.settings.setValue("bypass_cache", self.bypass_cache_cb.isChecked())
+        self.worker.use_cache = not self.bypass_cache_cb.isChecked()
+        self.settings.setValue("only_new_results", self.only_new_cb.isChecked())
+        self.worker.only_new_results = self.only_new_cb.isChecked()
+        self.settings.setValue("engine", self.engine_combo.currentData())
+        self.worker.engine = self.engine_combo.currentData()
+        
         self.worker.log_signal.connect(lambda m: self.log_message(m, "info"))
         self.worker.progress_signal.connect(self.progress.setValue)
         self.worker.finished_signal.connect(lambda status=True: self.on_worker_finished())
         self.worker.result_signal.connect(self.on_results)
         self.worker.error_signal.connect(lambda e: self.log_message(f"Lỗi: {e}", "error"))
         
-        # Cập nhật danh sách proxy cho worker
-        if hasattr(self, 'active_proxies') and self.active_proxies:
-            self.worker.proxies = self.active_proxies
+        # Cập nhật danh sách proxy và vùng proxy (khoá cache) cho worker
+        self.worker.proxies = proxies
+        self.worker.proxy_region = proxy_region
             
+        self.track_worker(self.worker)
         self.worker.start()
 
     def stop_automation(self):
-        if self.worker and self.worker.isRunning():
-            self.worker.stop()
-            self.log_message("Đã yêu cầu dừng automation.", "warning")
+        running = [worker for worker in self.workers if worker.isRunning()]
+        if running:
+            for worker in running:
+                worker.stop()
+            self.log_message(f"Đã yêu cầu dừng {len(running)} tiến trình automation.", "warning")
         else:
             self.log_message("Không có tiến trình nào đang chạy.")
 
+    def track_worker(self, worker):
+        """Giữ tham chiếu worker tới khi thread kết thúc"""
+        self.workers.append(worker)
+        worker.finished.connect(lambda w=worker: self.workers.remove(w) if w in self.workers else None)
+
+    def enqueue_automation(self):
+        """Đưa tác vụ của tab hiện tại vào hàng đợi bền vững thay vì chạy trong ứng dụng"""
+        current_tab = self.tabs.currentIndex()
+        chrome_config = {
+            "chrome_path": self.settings.value("brave_path", ""),
+            "profile_path": self.settings.value("brave_profile", "")
+        }
+        if current_tab == 0:
+            task = "google"
+            payload = {
+                "keyword": self.google_keyword.text().strip() or "selenium python automation",
+                "headless": self.google_headless.isChecked(),
+                "max_results": int(self.google_max_results.text() or 10)
+            }
+        elif current_tab == 2:
+            task = "shopee"
+            payload = {
+                "keyword": self.sp_keyword.text().strip() or "điện thoại",
+                "headless": self.sp_headless.isChecked(),
+                "pages": int(self.sp_pages.text().strip() or 2)
+            }
+        else:
+            # Facebook cần đăng nhập thủ công trên máy đang mở ứng dụng
+            self.log_message("Tab này không hỗ trợ chạy qua hàng đợi.", "error")
+            return
+
+        choice = self.choose_proxy()
+        if choice is None:
+            return
+        proxy, proxies, proxy_region = choice
+        payload.update({
+            "proxy": proxy,
+            "proxies": proxies,
+            "proxy_region": proxy_region,
+            "chrome_config": chrome_config,
+            "use_cache": not self.bypass_cache_cb.isChecked(),
+            "only_new_results": self.only_new_cb.isChecked(),
+            "engine": self.engine_combo.currentData()
+        })
+        queue = get_job_queue()
+        job_id = queue.enqueue(task, payload)
+        stats = queue.stats()
+        self.log_message(
+            f"📥 Đã thêm job {job_id} ({task}) vào hàng đợi - đang chờ: {stats['queued']}, đang chạy: {stats['leased']}",
+            "info"
+        )
+
     def on_worker_finished(self):
         """Handle worker thread finished"""
         self.log_message("✅ Task completed")
@@ -690,10 +823,11 @@ class AutomationView(QWidget):
         brave_profile = r"C:\Users\admin\AppData\Local\BraveSoftware\Brave-Browser\User Data\Default"
         
         # Determine if we should use a proxy
-        proxy = None
-        if hasattr(self, 'active_proxies') and self.active_proxies and hasattr(self, 'use_proxies_cb') and self.use_proxies_cb.isChecked():
-            import random
-            proxy = random.choice(self.active_proxies)
+        choice = self.choose_proxy()
+        if choice is None:
+            return None
+        proxy, proxies, proxy_region = choice
+        if proxy:
             self.log_message(f"Sử dụng proxy: {proxy}")
         
         # Set headless mode based on current tab or default to False
@@ -711,6 +845,7 @@ class AutomationView(QWidget):
             delay=1.5,  # Reasonable default
             chrome_config={"chrome_path": brave_path, "profile_path": brave_profile}
         )
+        self.track_worker(self.worker)
         
         # Set specific properties based on task
         if task == "google":
@@ -748,9 +883,13 @@ class AutomationView(QWidget):
             self.worker.custom_script = kwargs.get('custom_script', '')
             self.worker.custom_script_args = kwargs.get('custom_script_args', {})
             
-        # Set proxy list for rotation if needed
-        if hasattr(self, 'active_proxies') and self.active_proxies:
-            self.worker.proxies = self.active_proxies
+        # Set proxy list for rotation and the proxy region used in cache keys
+        self.worker.proxies = proxies
+        self.worker.proxy_region = proxy_region
+            
+        self.worker.use_cache = not self.bypass_cache_cb.isChecked()
+        self.worker.only_new_results = self.only_new_cb.isChecked()
+        self.worker.engine = self.engine_combo.currentData()
             
         # Connect common signals
         self.worker.log_signal.connect(self.log_message)
@@ -1,12 +1,30 @@
 import os
 import time
 from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+
+from .result_cache import get_result_cache, make_cache_key
+from .url_index import STATUS_SEEN, content_fingerprint, get_url_index
+from .artifact_store import get_artifact_store
+from .browser_reaper import get_browser_reaper
+from .driver_factory import get_driver_factory
+from .cdp_engine import get_cdp_engine
+from .proxy_relay import get_proxy_relay, bind_slot_to_driver
+from .profile_manager import get_profile_manager, bind_profile_to_driver
+from .proxy_store import get_proxy_store
+from .config import (
+    AUTOMATION_ENGINE, CDP_TASK_TIMEOUT, PROXY_RELAY_ENABLED, CAPTCHA_AUTO_SOLVE, PROFILE_CLONE_ENABLED,
+    BROWSER_LOCALE
+)
+from .retry_policy import ACTION_RECYCLE_DRIVER, RetryPolicy, load_with_policy
+from .captcha_probe import solve_detected_captcha
+from .metrics import TASKS_STARTED, TASKS_COMPLETED, TASKS_FAILED, PHASE_SECONDS
 
 class EnhancedAutomationWorker(QThread):
     """Enhanced worker class for automation tasks"""
@@ -31,14 +49,49 @@ class EnhancedAutomationWorker(QThread):
         self.chrome_config = chrome_config or {}
         self.running = False
         self.driver = None
+        self.use_cache = True
+        self.locale = BROWSER_LOCALE  # language the browser is started with (--lang)
+        self.proxy_region = ""  # country of the proxy pool, set by the view / job payload
+        self.results = None
+        self.only_new_results = False
+        self.novelty = None
+        self.retry_policy = RetryPolicy()
+        self.engine = AUTOMATION_ENGINE  # "selenium" or "cdp"
+        self.relay_slot = None  # local relay port in front of self.proxy
+        self.clone_profile = PROFILE_CLONE_ENABLED  # run on a per-browser copy of profile_path
+        self.profile_slot = None  # (ProfileTemplateManager, slot) until bound to the driver
+        self.captcha_resolver = None  # created on first captcha (False: 2Captcha not configured)
+        self.failed = False
+        # Direct connection: set in the worker thread before run() records the outcome
+        self.error_signal.connect(self.mark_failed, Qt.DirectConnection)
+        
+    def mark_failed(self, *_):
+        self.failed = True
         
     def run(self):
         """Main execution method"""
         self.running = True
+        self.failed = False
+        started = time.perf_counter()
+        TASKS_STARTED.labels(self.task).inc()
         self.progress_signal.emit(0)
         
         try:
-            if self.task == "google":
+            cache_key = None
+            if self.use_cache and not self.only_new_results and self.task in ("google", "shopee") and self.keyword:
+                limit = self.max_results if self.task == "google" else self.pages
+                cache_key = make_cache_key(self.task, self.keyword, self.locale, limit, self.cache_region())
+                cached = get_result_cache().get(cache_key)
+                if cached is not None:
+                    self.log_signal.emit(f"Using cached {self.task} results")
+                    self.result_signal.emit(cached)
+                    self.progress_signal.emit(100)
+                    return
+                    
+            if self.engine == "cdp" and self.task in ("google", "shopee"):
+                with PHASE_SECONDS.labels(self.task, "cdp").time():
+                    self.cdp_task()
+            elif self.task == "google":
                 self.google_search()
             elif self.task == "facebook":
                 self.facebook_login()
@@ -47,40 +100,54 @@ class EnhancedAutomationWorker(QThread):
             else:
                 raise ValueError(f"Unknown task: {self.task}")
                 
+            if cache_key and self.results:
+                get_result_cache().put(cache_key, self.results)
+                
         except Exception as e:
             self.log_signal.emit(f"Error: {str(e)}")
             self.error_signal.emit(str(e))
             
         finally:
             self.running = False
+            (TASKS_FAILED if self.failed else TASKS_COMPLETED).labels(self.task).inc()
+            PHASE_SECONDS.labels(self.task, "total").observe(time.perf_counter() - started)
             if self.driver:
-                try:
-                    self.driver.quit()
-                except:
-                    pass
+                get_browser_reaper().quit(self.driver)
             self.finished_signal.emit(True)
             
     def stop(self):
         """Stop the worker thread"""
         self.running = False
         if self.driver:
-            try:
-                self.driver.quit()
-            except:
-                pass
+            get_browser_reaper().quit(self.driver)
                 
+    def cache_region(self):
+        """Proxy region for cache keys: the selected region, else the current proxy's country from the proxy store"""
+        if self.proxy_region or not self.proxy:
+            return self.proxy_region
+        return (get_proxy_store().get(self.proxy) or {}).get("country") or ""
+
     def setup_driver(self):
         """Setup Chrome/Brave driver with basic options"""
         options = webdriver.ChromeOptions()
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument("--disable-notifications")
+        options.add_argument(f"--lang={self.locale},{self.locale.split('-')[0]}")
         
         if self.headless:
             options.add_argument("--headless=new")
             
         if self.proxy:
-            options.add_argument(f'--proxy-server={self.proxy}')
+            proxy_server = self.proxy
+            if PROXY_RELAY_ENABLED and not get_driver_factory().has_nodes():
+                # Local relay port: supports user:pass and SOCKS upstreams
+                try:
+                    self.relay_slot = get_proxy_relay().open_slot(self.proxy, task=self.task)
+                    proxy_server = self.relay_slot.proxy_server
+                except Exception as e:
+                    self.log_signal.emit(f"Proxy relay unavailable, using proxy directly: {str(e)}")
+            options.add_argument(f'--proxy-server={proxy_server}')
             
         # Add Chrome binary location if specified
         if self.chrome_config.get("chrome_path"):
@@ -88,15 +155,123 @@ class EnhancedAutomationWorker(QThread):
             
         # Add user profile if specified
         if self.chrome_config.get("profile_path"):
-            options.add_argument(f"--user-data-dir={os.path.dirname(self.chrome_config['profile_path'])}")
-            options.add_argument(f"--profile-directory={os.path.basename(self.chrome_config['profile_path'])}")
+            user_data_dir = os.path.dirname(self.chrome_config["profile_path"])
+            profile_directory = os.path.basename(self.chrome_config["profile_path"])
+            if self.clone_profile and os.path.exists(user_data_dir):
+                # Chromium locks a profile: every concurrent browser needs its own copy
+                try:
+                    manager = get_profile_manager(user_data_dir, profile_directory)
+                    slot, user_data_dir = manager.acquire_slot()
+                    self.profile_slot = (manager, slot)
+                except Exception as e:
+                    self.log_signal.emit(f"Profile copy unavailable: {str(e)}")
+                    self.error_signal.emit(f"Profile copy error: {str(e)}")
+                    self.release_setup_slots()
+                    return False
+            options.add_argument(f"--user-data-dir={user_data_dir}")
+            options.add_argument(f"--profile-directory={profile_directory}")
+            
+        # Performance log (Network) for HTTP status checks in RetryPolicy
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
         
         try:
-            self.driver = webdriver.Chrome(options=options)
+            # Remote node from WEBDRIVER_NODES when configured, otherwise local Chrome/Brave
+            with PHASE_SECONDS.labels(self.task, "setup_driver").time():
+                self.driver = get_driver_factory().create(options, log=self.log_signal.emit, stealth=False)
+            if self.relay_slot:
+                # Relay port is closed together with the browser
+                bind_slot_to_driver(self.driver, self.relay_slot)
+            if self.profile_slot:
+                # Profile copy is released together with the browser
+                bind_profile_to_driver(self.driver, *self.profile_slot)
+                self.profile_slot = None
+            get_browser_reaper().register(self.driver, owner=self.task or "")
             return True
         except Exception as e:
             self.log_signal.emit(f"Driver setup error: {str(e)}")
+            self.error_signal.emit(f"Driver setup error: {str(e)}")
+            self.release_setup_slots()
             return False
+
+    def release_setup_slots(self):
+        """Close the relay port and release the profile copy opened by a failed setup_driver"""
+        if self.relay_slot:
+            self.relay_slot.close()
+            self.relay_slot = None
+        if self.profile_slot:
+            self.profile_slot[0].release_slot(self.profile_slot[1])
+            self.profile_slot = None
+            
+    def load_page(self, url):
+        """Load url with classified retries (retry in place or recycle the driver)"""
+        def recycle():
+            get_browser_reaper().quit(self.driver)
+            return self.setup_driver()
+            
+        with PHASE_SECONDS.labels(self.task, "navigate").time():
+            return load_with_policy(
+                lambda: self.driver,
+                url,
+                self.retry_policy,
+                actions={ACTION_RECYCLE_DRIVER: recycle},
+                should_continue=lambda: self.running,
+                log=self.log_signal.emit,
+                proxy_getter=lambda: self.proxy,
+                on_captcha=self.solve_captcha
+            )
+
+    def solve_captcha(self, info):
+        """Try to solve a captcha found by the page probe; False lets the retry policy move on"""
+        if not CAPTCHA_AUTO_SOLVE:
+            return False
+        if self.captcha_resolver is None:
+            from .captcha_resolver import create_auto_resolver
+            self.captcha_resolver = create_auto_resolver() or False
+            if self.captcha_resolver:
+                self.captcha_resolver.status_signal.connect(self.log_signal.emit)
+        return solve_detected_captcha(self.driver, info, self.captcha_resolver or None, log=self.log_signal.emit)
+            
+    def cdp_task(self):
+        """Run google/shopee on the shared asyncio CDP engine (no chromedriver)"""
+        engine = get_cdp_engine()
+        self.progress_signal.emit(30)
+        future = engine.submit(engine.run_task(
+            self.task,
+            self.keyword,
+            max_results=self.max_results,
+            pages=self.pages,
+            proxy=self.proxy,
+            headless=self.headless,
+            binary=self.chrome_config.get("chrome_path")
+        ))
+        # Poll so stop() and the timeout can cancel a hung CDP session
+        deadline = time.time() + CDP_TASK_TIMEOUT
+        while True:
+            try:
+                rows = future.result(timeout=0.5)
+                break
+            except FutureTimeoutError:
+                if not self.running:
+                    future.cancel()
+                    self.log_signal.emit("CDP task stopped")
+                    return
+                if time.time() > deadline:
+                    future.cancel()
+                    raise TimeoutError(f"CDP task timed out after {CDP_TASK_TIMEOUT}s")
+        if self.task == "google":
+            rows = [(row["Tiêu đề"], row["URL"]) for row in rows]
+        self.results = rows
+        self.result_signal.emit(rows)
+        self.progress_signal.emit(100)
+            
+    def capture_screenshot(self, prefix):
+        """Queue a screenshot; encoding and disk writes happen on the ArtifactStore thread"""
+        try:
+            return get_artifact_store("screenshots").submit_image(prefix, self.driver.get_screenshot_as_png())
+        except Exception as e:
+            self.log_signal.emit(f"Screenshot error: {str(e)}")
+            return None
             
     def google_search(self):
         """Perform Google search"""
@@ -104,7 +279,8 @@ class EnhancedAutomationWorker(QThread):
             return
             
         try:
-            self.driver.get("https://www.google.com")
+            if not self.load_page("https://www.google.com"):
+                raise Exception("Could not load Google")
             self.progress_signal.emit(30)
             
             # Find and fill search box
@@ -122,15 +298,21 @@ class EnhancedAutomationWorker(QThread):
             # Get results
             results = []
             elements = self.driver.find_elements(By.CSS_SELECTOR, "div.g")
+            url_index = get_url_index("google")
+            run = url_index.begin_run()
             
             for i, element in enumerate(elements[:self.max_results]):
                 try:
                     title = element.find_element(By.CSS_SELECTOR, "h3").text
                     link = element.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
+                    if url_index.add(link, content_fingerprint(title), run) == STATUS_SEEN and self.only_new_results:
+                        continue
                     results.append((title, link))
                 except:
                     continue
                     
+            self.report_novelty(url_index, run)
+            self.results = results
             self.result_signal.emit(results)
             self.progress_signal.emit(100)
             
@@ -143,7 +325,8 @@ class EnhancedAutomationWorker(QThread):
             return
             
         try:
-            self.driver.get("https://www.facebook.com")
+            if not self.load_page("https://www.facebook.com"):
+                raise Exception("Could not load Facebook")
             self.progress_signal.emit(30)
             
             # Find login elements
@@ -153,6 +336,7 @@ class EnhancedAutomationWorker(QThread):
             # Enter credentials
             email_field.send_keys(self.email)
             pass_field.send_keys(self.password)
+            self.capture_screenshot("facebook_before_login")
             
             self.progress_signal.emit(50)
             
@@ -164,6 +348,7 @@ class EnhancedAutomationWorker(QThread):
             time.sleep(3)
             
             # Check login status
+            self.capture_screenshot("facebook_after_login")
             result = {"status": "success", "url": self.driver.current_url}
             self.result_signal.emit(result)
             self.progress_signal.emit(100)
@@ -179,7 +364,8 @@ class EnhancedAutomationWorker(QThread):
         try:
             # Go to search page
             search_url = f"https://shopee.vn/search?keyword={self.keyword}"
-            self.driver.get(search_url)
+            if not self.load_page(search_url):
+                raise Exception("Could not load Shopee")
             self.progress_signal.emit(30)
             
             # Wait for products
@@ -197,18 +383,34 @@ class EnhancedAutomationWorker(QThread):
             # Get products
             results = []
             elements = self.driver.find_elements(By.CSS_SELECTOR, ".shopee-search-item-result__item")
+            url_index = get_url_index("shopee")
+            run = url_index.begin_run()
             
             for element in elements[:self.max_results]:
                 try:
+                    link = element.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
                     name = element.find_element(By.CSS_SELECTOR, "div._36CEnF").text
                     price = element.find_element(By.CSS_SELECTOR, "span._29R_un").text
-                    link = element.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
+                    # A product already seen with the same name and price is not emitted again
+                    if url_index.add(link, content_fingerprint(name, price), run) == STATUS_SEEN and self.only_new_results:
+                        continue
                     results.append((name, price, link))
                 except:
                     continue
                     
+            self.report_novelty(url_index, run)
+            self.results = results
             self.result_signal.emit(results)
             self.progress_signal.emit(100)
             
         except Exception as e:
             self.error_signal.emit(f"Scraping error: {str(e)}")
+            
+    def report_novelty(self, url_index, run):
+        """Save the URL index and log the share of new results in this run"""
+        url_index.save()
+        self.novelty = run.as_dict()
+        self.log_signal.emit(
+            f"New: {self.novelty['new']}, changed: {self.novelty['changed']}, "
+            f"seen: {self.novelty['seen']} (novelty {self.novelty['novelty_ratio'] * 100:.0f}%)"
+        )
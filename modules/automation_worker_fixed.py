@@ -2,8 +2,7 @@ import time
 import os
 import urllib.parse
 import random
-import subprocess
-import shutil
+import concurrent.futures
 from datetime import datetime
 
 from PyQt5.QtCore import QThread, pyqtSignal
@@ -22,6 +21,31 @@ from webdriver_manager.chrome import ChromeDriverManager
 # Thêm thư viện cho việc xác định phiên bản Chromium
 from packaging import version
 
+from .result_cache import CACHEABLE_TASKS, get_result_cache, make_cache_key
+from .url_index import STATUS_SEEN, content_fingerprint, get_url_index
+from .browser_identity import get_browser_identity, update_identity_from_driver
+from .artifact_store import get_artifact_store
+from .profile_manager import get_profile_manager, bind_profile_to_driver
+from .browser_reaper import get_browser_reaper
+from .driver_factory import get_driver_factory
+from .rate_limiter import get_rate_limiter
+from .tab_executor import TabExecutor, google_search_task
+from .cdp_engine import get_cdp_engine
+from .proxy_relay import get_proxy_relay, bind_slot_to_driver
+from .traffic_meter import get_traffic_meter
+from .proxy_store import get_proxy_store
+from .config import (
+    PROFILE_CLONE_ENABLED, TABS_PER_BROWSER, AUTOMATION_ENGINE, PROXY_RELAY_ENABLED, TRAFFIC_BALANCE_ENABLED,
+    CAPTCHA_AUTO_SOLVE, CDP_TASK_TIMEOUT, BROWSER_LOCALE
+)
+from .retry_policy import ACTION_RECYCLE_DRIVER, ACTION_ROTATE_PROXY, RetryPolicy, load_with_policy
+from .captcha_probe import probe_captcha, solve_detected_captcha, get_captcha_stats
+from .metrics import TASKS_STARTED, TASKS_COMPLETED, TASKS_FAILED, PHASE_SECONDS
+from .trend_content import fetch_google_trends, generate_content
+
+# Tác vụ chưa có cách làm tự động (Facebook bỏ mục xu hướng công khai; chưa có luồng đăng bài)
+UNSUPPORTED_TASKS = ("facebook_trends", "post_content", "schedule_post")
+
 # Google URL mặc định
 GOOGLE_URL = "https://www.google.com"
 
@@ -120,6 +144,7 @@ class EnhancedAutomationWorker(QThread):
         password=None,      # Add password parameter for Facebook login
         max_results=10,     # Add max_results parameter for Google search
         pages=2,            # Add pages parameter for Shopee scraping
+        use_cache=True,     # Dùng lại kết quả đã cache (bỏ qua khi user chọn "Bỏ qua cache")
         parent=None
     ):
         super().__init__(parent)
@@ -137,6 +162,24 @@ class EnhancedAutomationWorker(QThread):
         self.password = password
         self.max_results = max_results
         self.pages = pages
+        self.use_cache = use_cache
+        self.locale = BROWSER_LOCALE  # Ngôn ngữ trình duyệt (--lang)
+        self.proxy_region = ""  # Quốc gia của nhóm proxy (giao diện / payload job gán)
+        self.only_new_results = False  # Chỉ trả về URL mới / đã đổi so với các lần chạy trước
+        self.novelty = None
+        self.retry_policy = RetryPolicy()
+        # Dùng bản sao profile riêng cho mỗi trình duyệt (cho phép chạy song song)
+        self.clone_profile = self.chrome_config.get("clone_profile", PROFILE_CLONE_ENABLED)
+        self.profile_slot = None
+        # Tác vụ google_batch: nhiều từ khoá chạy song song trong các tab của 1 trình duyệt
+        self.keywords = []
+        self.tabs_per_browser = TABS_PER_BROWSER
+        # "selenium" (mặc định) hoặc "cdp" (asyncio qua DevTools, không cần chromedriver)
+        self.engine = AUTOMATION_ENGINE
+        # Cổng relay cục bộ đứng trước self.proxy: đổi proxy chỉ cần đổi upstream
+        self.relay_slot = None
+        # CaptchaResolver tự động (tạo khi gặp captcha lần đầu; False: chưa cấu hình 2Captcha)
+        self.captcha_resolver = None
 
         self._running = True
         self.driver = None
@@ -148,12 +191,72 @@ class EnhancedAutomationWorker(QThread):
 
     def run(self):
         """Main execution method"""
+        started = time.perf_counter()
+        completed = False
+        TASKS_STARTED.labels(self.task).inc()
         try:
             self.log(f"🚀 Starting {self.task} task")
             self.progress_signal.emit(10)
             
+            # Kiểm tra cache trước khi khởi động trình duyệt
+            cache_key = self.get_cache_key()
+            if cache_key:
+                cached = get_result_cache().get(cache_key)
+                if cached is not None:
+                    self.log(f"⚡ Dùng kết quả đã cache cho {self.task} (không mở trình duyệt)")
+                    self.emit_cached_result(cached)
+                    completed = True
+                    return
+            
+            # Engine CDP: chạy trong event loop dùng chung, không tạo chromedriver
+            if self.engine == "cdp" and self.task in ("google", "shopee"):
+                with PHASE_SECONDS.labels(self.task, "cdp").time():
+                    result = self.run_cdp_task()
+                self.progress_signal.emit(90)
+                if result:
+                    if cache_key:
+                        get_result_cache().put(cache_key, result)
+                    self.results = result
+                    completed = True
+                    self.log(f"✅ {self.task} task completed successfully! (CDP)")
+                    self.result_signal.emit(result)
+                else:
+                    self.error_signal.emit(f"{self.task} task failed")
+                return
+            
+            if self.task in UNSUPPORTED_TASKS:
+                self.error_signal.emit(f"{self.task} chưa được hỗ trợ")
+                return
+            
+            # Xu hướng (RSS) và tạo nội dung không cần trình duyệt
+            if self.task in ("google_trends", "content_creation"):
+                with PHASE_SECONDS.labels(self.task, "execute").time():
+                    if self.task == "google_trends":
+                        result = fetch_google_trends(
+                            getattr(self, "country", "vietnam"),
+                            getattr(self, "category", None),
+                            getattr(self, "timeframe", "now 1-d")
+                        )
+                    else:
+                        result = generate_content(
+                            getattr(self, "trend", None),
+                            getattr(self, "content_type", "article"),
+                            getattr(self, "word_count", 500)
+                        )
+                if not result:
+                    self.error_signal.emit(f"{self.task} không có kết quả")
+                    return
+                if cache_key:
+                    get_result_cache().put(cache_key, result)
+                self.results = result
+                completed = True
+                self.log(f"✅ {self.task} task completed successfully!")
+                (self.trends_signal if self.task == "google_trends" else self.content_signal).emit(result)
+                return
+            
             # Setup driver
-            self.driver = self.setup_driver()
+            with PHASE_SECONDS.labels(self.task, "setup_driver").time():
+                self.driver = self.setup_driver()
             if not self.driver:
                 self.error_signal.emit("Failed to initialize browser")
                 return
@@ -163,34 +266,19 @@ class EnhancedAutomationWorker(QThread):
             # Execute task based on type
             success = False
             result = None
+            execute_started = time.perf_counter()
             
             if self.task == "facebook":
                 success = self.facebook_login()
             elif self.task == "google":
                 success = self.google_search(self.keyword)
+                result = self.results if success else None
+            elif self.task == "google_batch":
+                result = self.google_batch_search(self.keywords)
+                success = bool(result)
             elif self.task == "shopee":
                 result = self.shopee_scrape(self.driver)
                 success = bool(result)
-            elif self.task == "google_trends":
-                result = self.get_google_trends(self.country, self.category, self.timeframe)
-                if result:
-                    self.trends_signal.emit(result)
-            elif self.task == "facebook_trends":
-                result = self.get_facebook_trending_topics()
-                if result:
-                    self.trends_signal.emit(result)
-            elif self.task == "content_creation":
-                result = self.generate_content_from_trend(self.trend, self.content_type, self.word_count)
-                if result:
-                    self.content_signal.emit(result)
-            elif self.task == "post_content":
-                result = self.facebook_post_content(self.content, self.post_type, self.page_id, self.group_id)
-                if result is not None:
-                    self.post_result_signal.emit(result)
-            elif self.task == "schedule_post":
-                result = self.facebook_schedule_post(self.content, self.schedule_time, self.post_type, self.page_id, self.group_id)
-                if result is not None:
-                    self.post_result_signal.emit(result)
             elif self.task == "custom":
                 # Handle custom script execution
                 if self.custom_script:
@@ -203,9 +291,14 @@ class EnhancedAutomationWorker(QThread):
                 else:
                     self.log("❌ No custom script provided")
                     
+            PHASE_SECONDS.labels(self.task, "execute").observe(time.perf_counter() - execute_started)
             self.progress_signal.emit(90)
             
+            if cache_key and result:
+                get_result_cache().put(cache_key, result)
+            
             if success:
+                completed = True
                 self.log(f"✅ {self.task} task completed successfully!")
                 if result:
                     self.result_signal.emit(result)
@@ -218,17 +311,91 @@ class EnhancedAutomationWorker(QThread):
             self.log(f"Detailed error: {traceback.format_exc()}")
             
         finally:
+            (TASKS_COMPLETED if completed else TASKS_FAILED).labels(self.task).inc()
+            PHASE_SECONDS.labels(self.task, "total").observe(time.perf_counter() - started)
             self.progress_signal.emit(100)
             if not self.keep_browser_open and self.driver:
                 try:
-                    self.driver.quit()
+                    get_browser_reaper().quit(self.driver)
                     self.log("✅ Browser closed")
                 except Exception as e:
                     self.log(f"⚠️ Error closing browser: {str(e)}")
+                self.release_profile_slot()
+            elif self.driver:
+                # Giữ trình duyệt mở: reaper sẽ đóng nếu vượt số trình duyệt rảnh / RSS tối đa
+                get_browser_reaper().mark_idle(self.driver)
             
             # Signal completion without arguments
             self.finished_signal.emit()
 
+    def run_cdp_task(self):
+        """Gửi tác vụ google/shopee sang CDPEngine và chờ kết quả (vẫn dừng được bằng stop())"""
+        engine = get_cdp_engine()
+        future = engine.submit(engine.run_task(
+            self.task,
+            self.keyword,
+            max_results=self.max_results,
+            pages=self.pages,
+            proxy=self.proxy,
+            headless=self.headless
+        ))
+        self.log(f"⚡ Đang chạy {self.task} bằng CDP engine...")
+        deadline = time.time() + CDP_TASK_TIMEOUT
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                if not self._running:
+                    future.cancel()
+                    self.log("⚠️ Đã dừng tác vụ CDP")
+                    return None
+                if time.time() > deadline:
+                    future.cancel()
+                    self.log(f"❌ Tác vụ CDP quá {CDP_TASK_TIMEOUT}s, đã huỷ")
+                    return None
+            except Exception as e:
+                self.log(f"❌ Lỗi CDP engine: {str(e)}")
+                return None
+
+    def get_cache_key(self):
+        """Tạo khoá cache cho task hiện tại, None nếu task không dùng cache"""
+        if not self.use_cache or self.only_new_results or self.task not in CACHEABLE_TASKS:
+            return None
+            
+        if self.task == "google_trends":
+            query = f"{getattr(self, 'country', '')}/{getattr(self, 'category', '')}/{getattr(self, 'timeframe', '')}"
+            limit = 0
+        elif self.task == "facebook_trends":
+            query = ""
+            limit = 0
+        elif self.task == "shopee":
+            query = self.keyword
+            limit = self.pages
+        else:
+            query = self.keyword
+            limit = self.max_results
+            
+        if self.task in ("google", "shopee") and not query:
+            return None
+            
+        return make_cache_key(self.task, query, self.locale, limit, self.cache_region())
+
+    def cache_region(self):
+        """Vùng proxy cho khoá cache: vùng đã chọn, không có thì quốc gia của proxy đang dùng (theo kho proxy)"""
+        if self.proxy_region or not self.proxy:
+            return self.proxy_region
+        return (get_proxy_store().get(self.proxy) or {}).get("country") or ""
+
+    def emit_cached_result(self, result):
+        """Phát kết quả lấy từ cache qua đúng signal của task"""
+        self.results = result
+        self.progress_signal.emit(90)
+        if self.task in ("google_trends", "facebook_trends"):
+            self.trends_signal.emit(result)
+        else:
+            self.result_signal.emit(result)
+        self.log(f"✅ {self.task} task completed (cache)")
+
     def stop(self):
         """User bấm "Dừng" => dừng Worker, đóng browser."""
         self.log("⚠️ Đã yêu cầu dừng worker...")
@@ -260,6 +427,17 @@ class EnhancedAutomationWorker(QThread):
             
         self.log(f"🔍 Testing proxy: {proxy}")
         
+        if PROXY_RELAY_ENABLED:
+            # Kiểm tra nhanh: mở tunnel tới google.com:443 qua proxy (hỗ trợ user:pass, SOCKS),
+            # không cần khởi động trình duyệt
+            try:
+                seconds = get_proxy_relay().check(proxy, timeout=timeout)
+                self.log(f"✅ Proxy {proxy} is working (tunnel {seconds * 1000:.0f}ms)")
+                return True
+            except Exception as e:
+                self.log(f"❌ Proxy {proxy} failed: {str(e) or type(e).__name__}")
+                return False
+        
         # Create a minimal browser config for testing
         chrome_options = Options()
         chrome_options.add_argument("--headless=new")
@@ -293,6 +471,7 @@ class EnhancedAutomationWorker(QThread):
             # Try each test URL until one works
             for url in test_urls:
                 try:
+                    get_rate_limiter().acquire(url, proxy)
                     driver.get(url)
                     # Check if page loaded properly
                     page_source = driver.page_source.lower()
@@ -347,20 +526,19 @@ class EnhancedAutomationWorker(QThread):
         if self.proxy in self.proxies:
             current_index = self.proxies.index(self.proxy)
             
-        # Try up to all available proxies
-        attempts = 0
-        max_attempts = len(self.proxies)
+        # Candidates in rotation order (with wraparound), skipping the current proxy
+        candidates = [
+            self.proxies[(current_index + offset) % len(self.proxies)]
+            for offset in range(1, len(self.proxies) + 1)
+        ]
+        candidates = [proxy for proxy in candidates if proxy != self.proxy]
         
-        while attempts < max_attempts:
-            # Get next proxy in the list (with wraparound)
-            next_index = (current_index + 1) % len(self.proxies)
-            next_proxy = self.proxies[next_index]
-            
-            # Skip if it's the same as current (shouldn't happen with len > 1)
-            if next_proxy == self.proxy:
-                next_index = (next_index + 1) % len(self.proxies)
-                next_proxy = self.proxies[next_index]
-                
+        # Cân bằng lưu lượng: thử proxy đã dùng ít byte nhất trước (bằng nhau thì giữ thứ tự xoay vòng)
+        if TRAFFIC_BALANCE_ENABLED:
+            candidates = get_traffic_meter().least_used(candidates)
+        
+        max_attempts = len(candidates)
+        for attempts, next_proxy in enumerate(candidates, 1):
             self.log(f"🔄 Rotating proxy from {self.proxy} to {next_proxy}")
             
             # Verify the new proxy works
@@ -368,11 +546,8 @@ class EnhancedAutomationWorker(QThread):
                 self.proxy = next_proxy
                 self.log(f"✅ Successfully rotated to proxy: {self.proxy}")
                 return True
-            else:
-                # If proxy doesn't work, try next one
-                current_index = next_index
-                attempts += 1
-                self.log(f"⚠️ Proxy {next_proxy} failed verification, trying next (attempt {attempts}/{max_attempts})")
+            # If proxy doesn't work, try next one
+            self.log(f"⚠️ Proxy {next_proxy} failed verification, trying next (attempt {attempts}/{max_attempts})")
                 
         self.log("❌ Failed to find a working proxy after trying all available options")
         return False
@@ -451,11 +626,19 @@ class EnhancedAutomationWorker(QThread):
                         self.log(f"✅ Đã tìm thấy Brave tại: {brave_path}")
                         break
                 
-            if not os.path.exists(brave_path):
+            remote_nodes = get_driver_factory().has_nodes()
+            if not os.path.exists(brave_path) and not remote_nodes:
                 self.log("❌ Không tìm thấy Brave Browser. Vui lòng cài đặt Brave từ https://brave.com")
                 return None
             
             self.log(f"✅ Đã xác nhận Brave tại: {brave_path}")
+            
+            # Nhận diện trình duyệt (cache theo đường dẫn + mtime, không cần mở chrome://version)
+            identity = get_browser_identity(brave_path, self.log)
+            if identity:
+                self.log(f"🌐 Thông tin trình duyệt: {identity['product']} {identity['version']}")
+                if identity["product"] != "Brave":
+                    self.log("⚠️ Binary không phải Brave, có thể đang sử dụng Chrome!")
                 
             # Cấu hình options cho Brave
             chrome_options = Options()
@@ -493,7 +676,7 @@ class EnhancedAutomationWorker(QThread):
             chrome_options.add_argument("--disable-brave-rewards")
             
             # Thiết lập ngôn ngữ
-            chrome_options.add_argument("--lang=vi-VN,vi")
+            chrome_options.add_argument(f"--lang={self.locale},{self.locale.split('-')[0]}")
             
             # Thiết lập headless nếu cần
             if self.headless:
@@ -513,6 +696,9 @@ class EnhancedAutomationWorker(QThread):
                 self.log(f"📂 Sử dụng profile tùy chỉnh: {profile_path}")
             
             # Kiểm tra profile tồn tại
+            if os.path.exists(user_data_dir) and self.clone_profile:
+                user_data_dir = self.acquire_profile_slot(user_data_dir, profile_directory) or user_data_dir
+                
             if os.path.exists(user_data_dir):
                 chrome_options.add_argument(f"--user-data-dir={user_data_dir}")
                 chrome_options.add_argument(f"--profile-directory={profile_directory}")
@@ -520,11 +706,18 @@ class EnhancedAutomationWorker(QThread):
             else:
                 self.log(f"⚠️ Không tìm thấy thư mục profile: {user_data_dir}")
             
-            # Thêm proxy nếu có
+            # Thêm proxy nếu có (trình duyệt cục bộ đi qua relay để đổi proxy không cần khởi động lại)
             if self.proxy:
-                chrome_options.add_argument(f'--proxy-server={self.proxy}')
+                proxy_server = self.proxy
+                if PROXY_RELAY_ENABLED and not remote_nodes:
+                    proxy_server = self.open_relay_slot() or self.proxy
+                chrome_options.add_argument(f'--proxy-server={proxy_server}')
                 self.log(f"🔄 Sử dụng proxy: {self.proxy}")
             
+            # Bật performance log (chỉ sự kiện Network) để RetryPolicy đọc HTTP status
+            chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+            
             # Tải ChromeDriver phù hợp
             self.log("🔄 Đang tải ChromeDriver phù hợp với Brave...")
             
@@ -536,118 +729,31 @@ class EnhancedAutomationWorker(QThread):
                 try:
                     # Sử dụng ChromeDriverManager để tải driver phù hợp với Chromium 134
                     driver_version = "134.0.6998"  # Dựa trên version Chromium của Brave
-                    service = Service(ChromeDriverManager(version=driver_version).install())
-                    
-                    # Tạo driver, chỉ định rõ binary là Brave thông qua options
-                    driver = webdriver.Chrome(service=service, options=chrome_options)
-                    
-                    # Ghi đè các thuộc tính automation để tránh phát hiện
-                    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                        'source': '''
-                            // Ghi đè thuộc tính navigator.webdriver
-                            Object.defineProperty(navigator, 'webdriver', {
-                                get: () => undefined
-                            });
-                            
-                            // Xóa thuộc tính cdriver
-                            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
-                            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
-                            delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
-                            
-                            // Giả mạo plugins như Brave
-                            const makePluginInfo = (name, filename) => {
-                                return {
-                                    name,
-                                    filename,
-                                    description: 'Portable Document Format',
-                                    length: 1,
-                                    item: () => null
-                                };
-                            };
-                            
-                            Object.defineProperty(navigator, 'plugins', {
-                                get: () => {
-                                    const plugins = [
-                                        makePluginInfo('PDF Viewer', 'internal-pdf-viewer'),
-                                        makePluginInfo('Brave PDF Plugin', 'internal-pdf-viewer'),
-                                        makePluginInfo('Brave PDF Viewer', 'mhjfbmdgcfjbbpaeojofohoefgiehjai'),
-                                        makePluginInfo('Native Client', 'internal-nacl-plugin')
-                                    ];
-                                    
-                                    // Thêm thuộc tính namedItem
-                                    plugins.namedItem = name => plugins.find(p => p.name === name);
-                                    
-                                    return plugins;
-                                }
-                            });
-                            
-                            // Sử dụng thông tin OS chính xác
-                            Object.defineProperty(navigator, 'platform', {
-                                get: () => 'Win32'
-                            });
-                            
-                            // Thiết lập ngôn ngữ
-                            Object.defineProperty(navigator, 'languages', {
-                                get: () => ['vi-VN', 'vi', 'en-US', 'en'],
-                            });
-                            
-                            // Thiết lập JavaScriptEngine giống Brave
-                            Object.defineProperty(navigator, 'appVersion', {
-                                get: () => '5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36'
-                            });
-                            
-                            // Ghi đè permissions API
-                            if (window.navigator.permissions) {
-                                const originalQuery = window.navigator.permissions.query;
-                                window.navigator.permissions.__proto__.query = parameters => {
-                                    if (parameters.name === 'notifications' || 
-                                        parameters.name === 'clipboard-read' || 
-                                        parameters.name === 'clipboard-write') {
-                                        return Promise.resolve({state: Notification.permission});
-                                    }
-                                    return originalQuery(parameters);
-                                };
-                            }
-                        '''
-                    })
-                    
-                    # Kiểm tra xem có đang thực sự sử dụng Brave
-                    self.log("🔍 Đang xác minh trình duyệt...")
+                    # Node từ xa (WEBDRIVER_NODES) nếu có, không thì Brave cục bộ; stealth script cài qua CDP
+                    driver = get_driver_factory().create(
+                        chrome_options,
+                        local_factory=lambda options: webdriver.Chrome(
+                            service=Service(ChromeDriverManager(version=driver_version).install()),
+                            options=options
+                        ),
+                        log=self.log
+                    )
                     
-                    # Mở trang chrome://version để xác nhận
-                    driver.get("chrome://version")
-                    time.sleep(2)
+                    # Cổng relay đóng cùng trình duyệt (kể cả khi reaper đóng)
+                    if self.relay_slot and not self.relay_slot.closed:
+                        bind_slot_to_driver(driver, self.relay_slot)
+                    # Slot profile cũng được trả khi driver.quit(), kể cả trình duyệt giữ mở bị reaper đóng
+                    if self.profile_slot:
+                        bind_profile_to_driver(driver, *self.profile_slot)
+                        self.profile_slot = None
                     
-                    # Lấy thông tin từ trang version
-                    page_source = driver.page_source.lower()
-                    browser_info = "Không xác định"
-                    
-                    if "brave" in page_source:
-                        self.log("✅ Xác nhận đang sử dụng Brave Browser!")
-                        browser_info = "Brave Browser"
-                    elif "chrome" in page_source:
-                        self.log("⚠️ Có thể đang sử dụng Chrome thay vì Brave!")
-                        browser_info = "Chrome Browser"
+                    # Bổ sung phiên bản Chromium từ capabilities (không điều hướng, chỉ với Brave cục bộ)
+                    if driver.webdriver_node is None:
+                        update_identity_from_driver(brave_path, driver)
                     
-                    # Ghi log chi tiết để kiểm tra
-                    self.log(f"🌐 Thông tin trình duyệt: {browser_info}")
-                    
-                    # Nếu đang sử dụng Chrome, thử cách khác để sử dụng Brave
-                    if browser_info == "Chrome Browser":
-                        self.log("🔄 Đang cố gắng khởi chạy Brave thay vì Chrome...")
-                        
-                        # Đóng trình duyệt hiện tại
-                        driver.quit()
-                        
-                        # Thử khởi động Brave trực tiếp bằng subprocess
-                        temp_html = os.path.join(os.getcwd(), "temp_brave_launcher.html")
-                        with open(temp_html, "w") as f:
-                            f.write("<html><body><h1>Brave Test</h1><p>This is a test page for Brave Browser.</p></body></html>")
-                        
-                        # Mở Brave với URL cụ thể
-                        subprocess.Popen([brave_path, f"file://{temp_html}"])
-                        
-                        self.log("⚠️ Không thể tích hợp hoàn toàn với Selenium. Sử dụng phương pháp thay thế với ChromeDriver.")
+                    # Theo dõi tiến trình để dọn khi vượt ngân sách / bị bỏ sót
+                    # (driver từ xa theo session id: reaper gọi quit() để trả slot node)
+                    get_browser_reaper().register(driver, owner=self.task or "")
                     
                     self.log("✅ Đã khởi động Brave Browser thành công!")
                     return driver
@@ -658,36 +764,48 @@ class EnhancedAutomationWorker(QThread):
                     
                     if retry_count >= max_retries:
                         self.log("❌ Không thể khởi động Brave sau nhiều lần thử")
+                        if self.relay_slot:
+                            self.relay_slot.close()
                         raise
                     
                     time.sleep(2)  # Chờ trước khi thử lại
             
         except Exception as e:
             self.log(f"❌ Lỗi cấu hình Brave Browser: {str(e)}")
+            self.release_profile_slot()
             return None
 
-    def get_brave_version(self, brave_path):
-        """Lấy phiên bản của Brave Browser"""
+    def acquire_profile_slot(self, user_data_dir, profile_directory):
+        """Tạo bản sao profile cho trình duyệt này, trả về user-data-dir của bản sao (None nếu lỗi)"""
         try:
-            # Sử dụng --version để lấy thông tin phiên bản
-            result = subprocess.run([brave_path, "--version"], 
-                                   stdout=subprocess.PIPE, 
-                                   stderr=subprocess.PIPE,
-                                   text=True,
-                                   timeout=5)
-            version_output = result.stdout.strip()
-            
-            # Format thường là: "Brave Browser 134.0.6998.94" hoặc tương tự
-            if "Brave" in version_output and "Chromium" in version_output:
-                # Trích xuất phiên bản từ đầu ra
-                chromium_version = version_output.split("Chromium:")[1].split()[0].strip()
-                return chromium_version
-            elif "Brave" in version_output:
-                # Trích xuất phiên bản từ đầu ra
-                brave_version = ''.join(c for c in version_output.split("Brave")[1] if c.isdigit() or c == '.')
-                return brave_version.strip()
-                
+            manager = get_profile_manager(user_data_dir, profile_directory)
+            slot, slot_dir = manager.acquire_slot()
+            self.profile_slot = (manager, slot)
+            stats = manager.last_stats
+            self.log(
+                f"📂 Profile slot {slot}: {stats.get('linked', 0)} hardlink, "
+                f"{stats.get('reflinked', 0)} reflink, {stats.get('copied', 0)} copy "
+                f"trong {stats.get('seconds', 0)}s"
+            )
+            return slot_dir
+        except Exception as e:
+            self.log(f"⚠️ Không thể nhân bản profile, dùng profile gốc: {str(e)}")
             return None
+
+    def release_profile_slot(self):
+        """Trả slot profile chưa gắn với driver nào (driver đã tạo thì slot được trả khi quit())"""
+        if self.profile_slot:
+            manager, slot = self.profile_slot
+            manager.release_slot(slot)
+            self.profile_slot = None
+
+    def get_brave_version(self, brave_path):
+        """Lấy phiên bản Chromium của Brave Browser (từ cache nhận diện trình duyệt)"""
+        try:
+            identity = get_browser_identity(brave_path, self.log)
+            if not identity:
+                return None
+            return identity.get("chromium_version") or identity.get("version") or None
         except Exception as e:
             self.log(f"⚠️ Lỗi khi lấy phiên bản Brave: {str(e)}")
             return None
@@ -719,48 +837,109 @@ class EnhancedAutomationWorker(QThread):
 
     def handle_timeouts_and_errors(self, driver, url, retries=3, delay=2):
         """
-        Advanced error handling for page loads and timeouts
+        Tải trang theo self.retry_policy (giữ tên cũ cho các task method;
+        retries/delay chỉ giữ để tương thích, số lần thử và backoff do policy quyết định)
         Returns True if successful, False if failed after retries
         """
-        attempt = 0
-        
-        while attempt < retries:
+        if driver is not self.driver:
+            self.driver = driver
+        return self.load_page(url)
+
+    def load_page(self, url, policy=None):
+        """
+        Tải url bằng driver hiện tại: lỗi được phân loại (proxy, DNS, timeout,
+        HTTP status, captcha) và xử lý bằng thử lại / đổi proxy / tạo lại driver
+        """
+        if self.driver and get_browser_reaper().should_recycle(self.driver):
+            self.log("♻️ Trình duyệt vượt giới hạn bộ nhớ")
+            self.recycle_driver()
+            
+        with PHASE_SECONDS.labels(self.task, "navigate").time():
+            return load_with_policy(
+                lambda: self.driver,
+                url,
+                policy or self.retry_policy,
+                actions={
+                    ACTION_ROTATE_PROXY: self.rotate_proxy_and_recycle,
+                    ACTION_RECYCLE_DRIVER: self.recycle_driver
+                },
+                should_continue=lambda: self._running,
+                log=self.log,
+                proxy_getter=lambda: self.proxy,
+                on_captcha=self.solve_captcha
+            )
+
+    def solve_captcha(self, info):
+        """Thử giải captcha probe vừa phát hiện; False nếu không giải được (để đổi proxy)"""
+        if not CAPTCHA_AUTO_SOLVE:
+            return False
+        if self.captcha_resolver is None:
+            # Import muộn: captcha_resolver kéo theo PIL + QtWidgets
+            from .captcha_resolver import create_auto_resolver
+            self.captcha_resolver = create_auto_resolver() or False
+            if self.captcha_resolver:
+                self.captcha_resolver.status_signal.connect(self.log)
+        return solve_detected_captcha(self.driver, info, self.captcha_resolver or None, log=self.log)
+
+    def handle_captcha(self, info):
+        """
+        Captcha xuất hiện giữa chừng (sau click / submit): giải, không được thì đổi proxy
+        và tải lại trang đích. True nếu có thể tiếp tục task.
+        """
+        url = info.get("url", "")
+        get_captcha_stats().record(url, self.proxy, info.get("kind"))
+        get_rate_limiter().report(url, self.proxy, "captcha")
+        if self.solve_captcha(info):
+            return True
+
+        self.log(f"🧩 Gặp captcha [{info.get('kind')}] với proxy {self.proxy}, đổi proxy...")
+        # Trang /sorry/ của Google giữ trang đích trong tham số continue
+        target = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get("continue", [url])[0]
+        return bool(self.proxy) and self.rotate_proxy_and_recycle() and self.load_page(target)
+
+    def recycle_driver(self):
+        """Đóng driver hiện tại và khởi tạo driver mới"""
+        self.log("♻️ Khởi tạo lại trình duyệt...")
+        if self.driver:
+            get_browser_reaper().quit(self.driver)
+        self.release_profile_slot()
+        self.driver = self.setup_driver()
+        return self.driver is not None
+
+    def open_relay_slot(self):
+        """Mở (hoặc dùng lại) cổng relay cục bộ trỏ tới self.proxy, trả về giá trị cho --proxy-server"""
+        try:
+            if self.relay_slot and not self.relay_slot.closed:
+                self.relay_slot.set_upstream(self.proxy)
+            else:
+                self.relay_slot = get_proxy_relay().open_slot(self.proxy, task=self.task)
+            self.log(f"🔀 Relay {self.relay_slot.address} -> {self.proxy}")
+            return self.relay_slot.proxy_server
+        except Exception as e:
+            self.log(f"⚠️ Không mở được relay, dùng proxy trực tiếp: {str(e)}")
+            self.relay_slot = None
+            return None
+
+    def rotate_proxy_and_recycle(self):
+        """Đổi sang proxy khác: qua relay chỉ cần đổi upstream, không thì phải tạo lại driver"""
+        if not self.rotate_proxy():
+            return False
+        if self.relay_slot and not self.relay_slot.closed:
             try:
-                # If this isn't the first attempt, reload the page
-                if attempt > 0:
-                    self.log(f"🔄 Retrying page load (attempt {attempt+1}/{retries}): {url}")
-                
-                # Try loading the page
-                driver.get(url)
-                
-                # Check if page loaded properly
-                if "ERR_" in driver.page_source or "This site can't be reached" in driver.page_source:
-                    raise Exception("Page failed to load: Network error")
-                    
-                # Page loaded successfully
+                self.relay_slot.set_upstream(self.proxy)
+                self.log(f"🔀 Relay {self.relay_slot.address} chuyển sang {self.proxy} (không khởi động lại trình duyệt)")
                 return True
-                
             except Exception as e:
-                attempt += 1
-                self.log(f"⚠️ Page load error: {str(e)}")
-                
-                # Try fixing common issues
-                if "ERR_PROXY_CONNECTION_FAILED" in str(e) or "proxy" in str(e).lower():
-                    self.log("🔄 Proxy issue detected, trying to rotate proxy...")
-                    if self.rotate_proxy():
-                        # Recreate the driver with new proxy if possible
-                        try:
-                            driver.quit()
-                        except:
-                            pass
-                            
-                        self.driver = self.setup_driver()
-                        driver = self.driver
-                
-                # Wait before retry
-                time.sleep(delay)
-                
-        return False
+                self.log(f"⚠️ Không đổi được upstream của relay: {str(e)}")
+        return self.recycle_driver()
+
+    def capture_screenshot(self, prefix):
+        """Chụp màn hình và giao cho ArtifactStore nén/ghi ở thread nền"""
+        try:
+            return get_artifact_store("screenshots").submit_image(prefix, self.driver.get_screenshot_as_png())
+        except Exception as e:
+            self.log(f"⚠️ Không thể chụp màn hình: {str(e)}")
+            return None
 
     def wait_for_element(self, driver, by, selector, timeout=10, retries=2):
         """
@@ -783,6 +962,14 @@ class EnhancedAutomationWorker(QThread):
             except Exception as e:
                 attempt += 1
                 
+                # Trang captcha: xử lý ngay thay vì chờ hết các lượt thử
+                captcha = probe_captcha(driver)
+                if captcha:
+                    if not self.handle_captcha(captcha):
+                        return None
+                    driver = self.driver
+                    continue
+                
                 # Last attempt failed
                 if attempt > retries:
                     self.log(f"❌ Element not found after {retries} retries: {selector}")
@@ -827,6 +1014,41 @@ class EnhancedAutomationWorker(QThread):
             self.log(f"❌ Error verifying schedule success: {str(e)}")
             return False
 
+    def google_batch_search(self, keywords=None):
+        """
+        Tìm kiếm nhiều từ khoá trong các tab của cùng một trình duyệt.
+        Trả về dict từ khoá -> danh sách kết quả.
+        """
+        if not keywords:
+            keywords = [k.strip() for k in self.keyword.replace("\n", ",").split(",") if k.strip()]
+        if not keywords:
+            self.log("❌ Vui lòng nhập từ khóa tìm kiếm")
+            return {}
+            
+        self.log(f"🗂️ Tìm kiếm {len(keywords)} từ khoá với {self.tabs_per_browser} tab/trình duyệt")
+        executor = TabExecutor(
+            self.driver,
+            tabs_per_browser=self.tabs_per_browser,
+            log=self.log,
+            should_continue=lambda: self._running,
+            proxy=self.proxy
+        )
+        outcomes = executor.run([google_search_task(k, self.max_results) for k in keywords])
+        
+        results = {}
+        for keyword, rows in outcomes.items():
+            if isinstance(rows, Exception):
+                continue
+            results[keyword] = rows
+            self.log(f"✅ {keyword}: {len(rows)} kết quả")
+            
+        self.log(
+            f"⏱️ {len(results)}/{len(keywords)} từ khoá trong {executor.stats['seconds']}s "
+            f"({executor.stats['switches']} lần chuyển tab)"
+        )
+        self.results = results
+        return results
+
     def google_search(self, query):
         """Tìm kiếm trên Google và trả về kết quả"""
         if not query:
@@ -867,8 +1089,11 @@ class EnhancedAutomationWorker(QThread):
             # Enter để tìm kiếm
             search_box.send_keys(Keys.RETURN)
             
-            # Đợi kết quả
-            time.sleep(3)
+            # Đợi khung kết quả; trang /sorry/ (captcha) được wait_for_element giải
+            # hoặc đổi proxy rồi tải lại trang kết quả
+            if not self.wait_for_element(self.driver, By.ID, "search", timeout=10):
+                self.log("❌ Không tải được trang kết quả Google (captcha hoặc lỗi trang)")
+                return False
             
             # Thu thập kết quả tìm kiếm
             results = []
@@ -884,15 +1109,23 @@ class EnhancedAutomationWorker(QThread):
             if not result_elements:
                 result_elements = self.driver.find_elements(By.CSS_SELECTOR, "div[jsmodel]")
                 
+            url_index = get_url_index("google")
+            run = url_index.begin_run()
+            
             for idx, result in enumerate(result_elements[:self.max_results]):
                 try:
+                    # Link là thẻ a
+                    link_element = result.find_element(By.CSS_SELECTOR, "a")
+                    link = link_element.get_attribute("href") if link_element else ""
+                    
                     # Tiêu đề là thẻ h3
                     title_element = result.find_element(By.CSS_SELECTOR, "h3")
                     title = title_element.text if title_element else "Không có tiêu đề"
                     
-                    # Link là thẻ a
-                    link_element = result.find_element(By.CSS_SELECTOR, "a")
-                    link = link_element.get_attribute("href") if link_element else ""
+                    # URL đã thấy với cùng tiêu đề: bỏ qua bước lấy mô tả
+                    status = url_index.add(link, content_fingerprint(title), run) if link else None
+                    if status == STATUS_SEEN and self.only_new_results:
+                        continue
                     
                     # Mô tả là div.VwiC3b hoặc span.st
                     try:
@@ -909,12 +1142,20 @@ class EnhancedAutomationWorker(QThread):
                     results.append({
                         "Tiêu đề": title,
                         "URL": link,
-                        "Mô tả": desc
+                        "Mô tả": desc,
+                        "Trạng thái": status or ""
                     })
                     
                 except Exception as e:
                     self.log(f"⚠️ Lỗi khi phân tích kết quả #{idx+1}: {str(e)}")
             
+            url_index.save()
+            self.novelty = run.as_dict()
+            self.log(
+                f"🆕 URL mới: {self.novelty['new']}, đã đổi: {self.novelty['changed']}, "
+                f"đã thấy: {self.novelty['seen']} (tỷ lệ mới {self.novelty['novelty_ratio'] * 100:.0f}%)"
+            )
+            
             # In kết quả
             self.log(f"✅ Đã tìm thấy {len(results)} kết quả cho: {query}")
             for i, result in enumerate(results):
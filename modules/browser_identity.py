@@ -0,0 +1,167 @@
+# modules/browser_identity.py
+
+"""
+Nhận diện trình duyệt (Brave/Chrome, phiên bản) một lần và cache lại.
+
+Binary không đổi giữa các lần chạy nên kết quả được lưu trong
+data/browser_identity.json theo (đường dẫn, mtime, size). Khi khởi tạo
+driver không cần mở chrome://version hay gọi subprocess nữa.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import subprocess
+
+IDENTITY_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "browser_identity.json"
+)
+
+VERSION_RE = re.compile(r"(\d+\.\d+\.\d+(?:\.\d+)?)")
+
+_lock = threading.Lock()
+
+
+def _load_cache():
+    try:
+        with open(IDENTITY_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(IDENTITY_FILE), exist_ok=True)
+        with open(IDENTITY_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+    except OSError:
+        pass
+
+
+def _binary_stamp(binary_path):
+    stat = os.stat(binary_path)
+    return int(stat.st_mtime), stat.st_size
+
+
+def _folder_version(binary_path):
+    """Phiên bản mới nhất theo tên thư mục <version>/ cạnh binary (thư mục Application trên Windows)"""
+    folder = os.path.dirname(binary_path)
+    try:
+        versions = [name for name in os.listdir(folder) if VERSION_RE.fullmatch(name)]
+    except OSError:
+        return ""
+    if not versions:
+        return ""
+    versions.sort(key=lambda v: [int(p) for p in v.split(".")])
+    return versions[-1]
+
+
+def _detect_version(binary_path):
+    """Lấy chuỗi phiên bản: Windows đọc thư mục phiên bản, nền tảng khác chạy --version"""
+    # brave.exe --version không in ra gì và có thể mở / gắn vào một cửa sổ trình duyệt
+    if os.name == "nt":
+        return _folder_version(binary_path)
+
+    try:
+        result = subprocess.run(
+            [binary_path, "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            timeout=5
+        )
+        output = result.stdout.strip()
+        if VERSION_RE.search(output):
+            return output
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return _folder_version(binary_path)
+
+
+def _parse_identity(binary_path, version_output):
+    lowered = (version_output + " " + binary_path).lower()
+    product = "Brave" if "brave" in lowered else ("Chromium" if "chromium" in lowered else "Chrome")
+
+    match = VERSION_RE.search(version_output)
+    browser_version = match.group(1) if match else ""
+
+    chromium_version = ""
+    if "chromium:" in version_output.lower():
+        tail = version_output[version_output.lower().index("chromium:"):]
+        match = VERSION_RE.search(tail)
+        chromium_version = match.group(1) if match else ""
+    elif product != "Brave":
+        chromium_version = browser_version
+
+    # Phiên bản Brave dạng <chromium_major>.1.xx.yy
+    major = (chromium_version or browser_version).split(".")[0] if (chromium_version or browser_version) else ""
+
+    return {
+        "product": product,
+        "version": browser_version,
+        "chromium_version": chromium_version,
+        "major": major
+    }
+
+
+def get_browser_identity(binary_path, log=None):
+    """
+    Trả về dict nhận diện trình duyệt (product, version, chromium_version, major,
+    path, mtime, size). Chỉ chạy --version khi binary mới hoặc đã được cập nhật.
+    """
+    if not binary_path or not os.path.exists(binary_path):
+        return None
+
+    key = os.path.normcase(os.path.abspath(binary_path))
+    mtime, size = _binary_stamp(binary_path)
+
+    with _lock:
+        cache = _load_cache()
+        identity = cache.get(key)
+        if identity and identity.get("mtime") == mtime and identity.get("size") == size:
+            return identity
+
+        if log:
+            log(f"🔍 Nhận diện trình duyệt: {binary_path}")
+        identity = _parse_identity(binary_path, _detect_version(binary_path))
+        identity.update({
+            "path": binary_path,
+            "mtime": mtime,
+            "size": size,
+            "detected_at": time.time()
+        })
+        cache[key] = identity
+        _save_cache(cache)
+        return identity
+
+
+def update_identity_from_driver(binary_path, driver):
+    """
+    Bổ sung phiên bản Chromium từ capabilities của driver đang chạy
+    (không cần điều hướng) nếu lần nhận diện trước chưa có.
+    """
+    if not binary_path or not os.path.exists(binary_path):
+        return None
+
+    key = os.path.normcase(os.path.abspath(binary_path))
+    with _lock:
+        cache = _load_cache()
+        identity = cache.get(key)
+        if not identity or identity.get("chromium_version"):
+            return identity
+        try:
+            chromium_version = driver.capabilities.get("browserVersion", "")
+        except Exception:
+            chromium_version = ""
+        if not chromium_version:
+            return identity
+        identity["chromium_version"] = chromium_version
+        identity["major"] = chromium_version.split(".")[0]
+        cache[key] = identity
+        _save_cache(cache)
+        return identity
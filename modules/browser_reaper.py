@@ -0,0 +1,398 @@
+# modules/browser_reaper.py
+
+"""
+Quản lý vòng đời tiến trình trình duyệt do ứng dụng tạo ra.
+
+- Theo dõi PID chromedriver + cây tiến trình Brave con (psutil)
+- Giới hạn RSS cho mỗi trình duyệt và số trình duyệt rảnh (idle) tối đa
+- Trình duyệt vượt ngân sách: đóng ngay nếu đang rảnh, đánh dấu cần tạo lại nếu đang chạy task
+- Mỗi tiến trình (GUI, job_worker...) ghi PID trình duyệt của mình ra
+  data/browser_pids/<pid tiến trình>.json; chỉ dọn trình duyệt của tiến trình
+  đã kết thúc (hoặc của chính mình) nên không giết nhầm trình duyệt đang được
+  tiến trình khác dùng
+- Phiên WebDriver trên node từ xa (driver_factory) cũng được theo dõi: chịu giới
+  hạn số trình duyệt rảnh, được quit() khi đóng ứng dụng, và nếu tiến trình chết
+  thì phiên sót lại được xoá bằng DELETE /session/<id> trên node
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import urllib.request
+
+import psutil
+
+from .config import BROWSER_MAX_RSS_MB, BROWSER_MAX_IDLE, BROWSER_REAPER_INTERVAL
+
+PID_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "browser_pids"
+)
+
+
+def _process_tree(pid):
+    """Trả về [tiến trình gốc] + mọi tiến trình con, bỏ qua tiến trình đã chết"""
+    try:
+        root = psutil.Process(pid)
+        return [root] + root.children(recursive=True)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return []
+
+
+def _same_process(pid, create_time):
+    """True nếu pid vẫn là tiến trình đã tạo lúc create_time (không phải PID bị dùng lại)"""
+    try:
+        return abs(psutil.Process(pid).create_time() - create_time) <= 1
+    except psutil.Error:
+        return False
+
+
+def delete_remote_session(url, session_id, timeout=5):
+    """Kết thúc phiên WebDriver trên node từ xa; True nếu node xác nhận"""
+    request = urllib.request.Request(f"{url.rstrip('/')}/session/{session_id}", method="DELETE")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout):
+            return True
+    except Exception:
+        return False
+
+
+def terminate_procs(procs, timeout=3):
+    """Kết thúc các tiến trình đã thu thập (terminate rồi kill nếu còn sống)"""
+    for proc in procs:
+        try:
+            proc.terminate()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return len(procs)
+
+
+def kill_tree(pid, timeout=3, create_time=None):
+    """
+    Kết thúc cả cây tiến trình. create_time: chỉ kết thúc nếu pid vẫn là tiến trình
+    tạo lúc đó (không giết nhầm cây tiến trình khác dùng lại PID)
+    """
+    procs = _process_tree(pid)
+    if procs and create_time is not None and not _same_process(pid, create_time):
+        return 0
+    return terminate_procs(procs, timeout)
+
+
+class BrowserReaper:
+    """Theo dõi và thu hồi các trình duyệt (chromedriver + Brave) đã khởi chạy"""
+
+    def __init__(self, max_rss_mb=BROWSER_MAX_RSS_MB, max_idle=BROWSER_MAX_IDLE,
+                 interval=BROWSER_REAPER_INTERVAL, pid_dir=None):
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_idle = max_idle
+        self.interval = interval
+        self.pid_dir = pid_dir or PID_DIR
+        self.pid_file = os.path.join(self.pid_dir, f"{os.getpid()}.json")
+        self._owner_create_time = psutil.Process().create_time()
+
+        self._entries = {}  # pid chromedriver (hoặc "remote:<session>") -> thông tin
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # ---------------- ĐĂNG KÝ ----------------
+    @staticmethod
+    def driver_pid(driver):
+        try:
+            return driver.service.process.pid
+        except AttributeError:
+            return None
+
+    @staticmethod
+    def remote_session(driver):
+        """(url node, session id) nếu driver chạy trên node từ xa, ngược lại None"""
+        node = getattr(driver, "webdriver_node", None)
+        session_id = getattr(driver, "session_id", None)
+        if node is None or not session_id:
+            return None
+        return node.url, session_id
+
+    def driver_key(self, driver):
+        """Khoá theo dõi: pid chromedriver cục bộ, hoặc "remote:<session>" cho phiên trên node"""
+        remote = self.remote_session(driver)
+        if remote:
+            return f"remote:{remote[1]}"
+        return self.driver_pid(driver)
+
+    def register(self, driver, owner=""):
+        """Ghi nhận trình duyệt mới tạo (đang bận)"""
+        remote = self.remote_session(driver)
+        key = self.driver_key(driver)
+        if not key:
+            return
+        create_time = None
+        if not remote:
+            try:
+                create_time = psutil.Process(key).create_time()
+            except psutil.Error:
+                return
+        with self._lock:
+            self._entries[key] = {
+                "driver": driver,
+                "owner": owner,
+                "create_time": create_time,
+                "remote": remote,
+                "busy": True,
+                "last_used": time.time(),
+                "recycle": False
+            }
+            self._save_pids()
+
+    def unregister(self, driver):
+        """Bỏ theo dõi trình duyệt đã được đóng ở nơi khác"""
+        key = self.driver_key(driver)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save_pids()
+
+    def mark_busy(self, driver):
+        self._update(driver, busy=True, last_used=time.time())
+
+    def mark_idle(self, driver):
+        """Task xong nhưng trình duyệt được giữ mở"""
+        self._update(driver, busy=False, last_used=time.time())
+        self.enforce()
+
+    def should_recycle(self, driver):
+        """True nếu trình duyệt vượt ngân sách bộ nhớ và nên được tạo lại"""
+        with self._lock:
+            entry = self._entries.get(self.driver_key(driver))
+            return bool(entry and entry["recycle"])
+
+    def quit(self, driver):
+        """Đóng driver và chắc chắn mọi tiến trình con đã kết thúc"""
+        # Lấy khoá trước quit(): driver từ xa bỏ webdriver_node khi đã trả slot của node
+        key = self.driver_key(driver)
+        # Thu thập cây tiến trình trước quit(): chromedriver thoát rồi thì Brave con
+        # thành mồ côi, không tìm lại được qua children() nữa
+        procs = self._local_tree(key, driver) if isinstance(key, int) else []
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        terminate_procs(procs)
+        if key:
+            with self._lock:
+                self._entries.pop(key, None)
+                self._save_pids()
+
+    def _local_tree(self, pid, driver):
+        """Cây tiến trình của chromedriver, chỉ khi pid vẫn đúng là chromedriver của driver"""
+        with self._lock:
+            entry = self._entries.get(pid)
+        if entry is not None:
+            same = _same_process(pid, entry["create_time"])
+        else:
+            # Chưa đăng ký: Popen chưa được wait() thì PID chưa thể bị tiến trình khác dùng lại
+            try:
+                same = driver.service.process.poll() is None
+            except AttributeError:
+                same = False
+        return _process_tree(pid) if same else []
+
+    def _update(self, driver, **values):
+        with self._lock:
+            entry = self._entries.get(self.driver_key(driver))
+            if entry:
+                entry.update(values)
+
+    # ---------------- NGÂN SÁCH ----------------
+    def rss(self, pid):
+        """Tổng RSS (bytes) của chromedriver và các tiến trình trình duyệt con"""
+        total = 0
+        for proc in _process_tree(pid):
+            try:
+                total += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return total
+
+    def _measure(self):
+        """
+        {khoá: RSS (bytes) hoặc None nếu tiến trình đã chết}, đọc psutil ngoài khoá.
+        Phiên từ xa không đo được RSS trên máy này nên luôn là 0.
+        """
+        with self._lock:
+            keys = list(self._entries)
+        return {
+            key: (self.rss(key) if psutil.pid_exists(key) else None) if isinstance(key, int) else 0
+            for key in keys
+        }
+
+    def enforce(self):
+        """Áp dụng giới hạn RSS và số trình duyệt rảnh, trả về số trình duyệt đã đóng"""
+        measured = self._measure()
+        closed = []
+        with self._lock:
+            for pid, rss in measured.items():
+                entry = self._entries.get(pid)
+                if entry is None:
+                    continue
+                if rss is None:
+                    self._entries.pop(pid)
+                    continue
+                if self.max_rss and rss > self.max_rss:
+                    if entry["busy"]:
+                        entry["recycle"] = True
+                    else:
+                        closed.append(entry["driver"])
+
+            idle = sorted(
+                (e for e in self._entries.values() if not e["busy"] and e["driver"] not in closed),
+                key=lambda e: e["last_used"]
+            )
+            if len(idle) > self.max_idle:
+                closed.extend(e["driver"] for e in idle[:len(idle) - self.max_idle])
+
+        for driver in closed:
+            logging.info(f"Đóng trình duyệt vượt ngân sách ({self.driver_key(driver)})")
+            self.quit(driver)
+        return len(closed)
+
+    def tracked(self):
+        """{pid chromedriver: owner} của các trình duyệt cục bộ đang theo dõi (không đọc RSS)"""
+        with self._lock:
+            return {pid: entry["owner"] for pid, entry in self._entries.items() if isinstance(pid, int)}
+
+    def remote_count(self):
+        """Số phiên WebDriver từ xa đang theo dõi"""
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry["remote"])
+
+    def stats(self):
+        """Thông tin các trình duyệt đang theo dõi"""
+        measured = self._measure()
+        with self._lock:
+            return [
+                {
+                    "pid": pid,
+                    "owner": entry["owner"],
+                    "busy": entry["busy"],
+                    "rss_mb": round((measured.get(pid) or 0) / 1024 / 1024, 1)
+                }
+                for pid, entry in self._entries.items()
+            ]
+
+    # ---------------- MỒ CÔI ----------------
+    def _save_pids(self):
+        data = {
+            "owner": os.getpid(),
+            "owner_create_time": self._owner_create_time,
+            "browsers": [
+                {"pid": key, "create_time": e["create_time"]}
+                for key, e in self._entries.items() if not e["remote"]
+            ],
+            "remote": [
+                {"url": e["remote"][0], "session": e["remote"][1]}
+                for e in self._entries.values() if e["remote"]
+            ]
+        }
+        try:
+            os.makedirs(self.pid_dir, exist_ok=True)
+            tmp_path = self.pid_file + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.pid_file)
+        except OSError:
+            pass
+
+    def reap_orphans(self):
+        """
+        Kết thúc các trình duyệt sót lại của tiến trình đã kết thúc (theo PID + thời điểm tạo)
+        và của chính tiến trình này mà không còn được theo dõi
+        """
+        try:
+            names = [name for name in os.listdir(self.pid_dir) if name.endswith(".json")]
+        except OSError:
+            names = []
+
+        killed = 0
+        with self._lock:
+            for name in names:
+                path = os.path.join(self.pid_dir, name)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                own = path == self.pid_file
+                if not own and _same_process(data.get("owner"), data.get("owner_create_time", 0)):
+                    # Tiến trình khác vẫn đang chạy: trình duyệt của nó không phải mồ côi
+                    continue
+                for record in data.get("browsers", []):
+                    pid = record.get("pid")
+                    if own and pid in self._entries:
+                        continue
+                    # So create_time để không giết nhầm tiến trình khác dùng lại PID
+                    killed += kill_tree(pid, create_time=record.get("create_time") or 0)
+                for record in data.get("remote", []):
+                    if own and f"remote:{record['session']}" in self._entries:
+                        continue
+                    # Phiên sót trên node: xoá để node không bị giữ chỗ mãi
+                    if delete_remote_session(record["url"], record["session"]):
+                        killed += 1
+                if not own:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._save_pids()
+        if killed:
+            logging.info(f"Đã dọn {killed} tiến trình trình duyệt mồ côi")
+        return killed
+
+    # ---------------- THREAD NỀN ----------------
+    def start(self):
+        """Chạy enforce() định kỳ ở thread nền"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="BrowserReaper", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception as e:
+                logging.error(f"Lỗi BrowserReaper: {e}")
+
+    def shutdown(self):
+        """Dừng thread nền và đóng mọi trình duyệt còn theo dõi"""
+        self._stop.set()
+        with self._lock:
+            drivers = [entry["driver"] for entry in self._entries.values()]
+        for driver in drivers:
+            self.quit(driver)
+        self.reap_orphans()
+        try:
+            os.remove(self.pid_file)
+        except OSError:
+            pass
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def get_browser_reaper():
+    """Trả về BrowserReaper dùng chung cho toàn ứng dụng"""
+    global _reaper
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = BrowserReaper()
+        return _reaper
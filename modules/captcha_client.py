@@ -0,0 +1,398 @@
+# modules/captcha_client.py
+
+"""
+Client 2Captcha bất đồng bộ (asyncio), dùng chung cho mọi worker.
+
+- Kết nối HTTP keep-alive dùng lại qua một pool nhỏ (client HTTP tối giản viết
+  bằng asyncio, không thêm thư viện ngoài)
+- Tách gửi (in.php) và lấy kết quả (res.php): mọi captcha đang chờ của mọi
+  worker được theo dõi trong MỘT vòng polling, mỗi lượt hỏi theo lô
+  (action=get&ids=id1,id2,...) thay vì mỗi captcha một vòng sleep riêng
+- Worker (thread thường) gọi solve_recaptcha() / solve_image(): chỉ chờ đúng
+  captcha của mình, nhiều captcha được giải song song
+- MockTwoCaptchaServer: server giả lập in.php / res.php chạy trên localhost để thử
+  client mà không tốn tiền (base_url=server.base_url)
+"""
+
+import ssl
+import time
+import json
+import random
+import asyncio
+import logging
+import threading
+import urllib.parse
+
+from .config import (
+    TWOCAPTCHA_URL, CAPTCHA_POLL_INTERVAL, CAPTCHA_FIRST_POLL_RECAPTCHA,
+    CAPTCHA_FIRST_POLL_IMAGE, CAPTCHA_POOL_SIZE, CAPTCHA_HTTP_TIMEOUT
+)
+
+BATCH_SIZE = 100  # số id tối đa mỗi lần res.php?action=get&ids=
+NOT_READY = "CAPCHA_NOT_READY"  # (chính tả theo API 2Captcha)
+
+
+class CaptchaError(Exception):
+    """2Captcha trả lỗi (ERROR_...) hoặc hết thời gian chờ"""
+
+
+class CaptchaAnswer(str):
+    """Kết quả giải (token / chữ) kèm id captcha để báo đúng / sai sau này"""
+
+    def __new__(cls, value, captcha_id):
+        answer = super().__new__(cls, value)
+        answer.captcha_id = captcha_id
+        return answer
+
+
+class _HTTPPool:
+    """Pool kết nối HTTP/1.1 keep-alive tới một host (chỉ dùng bên trong event loop)"""
+
+    def __init__(self, base_url, size=CAPTCHA_POOL_SIZE, timeout=CAPTCHA_HTTP_TIMEOUT):
+        parts = urllib.parse.urlsplit(base_url)
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.secure else 80)
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = []
+        self._limit = asyncio.Semaphore(size)
+        self.stats = {"connections": 0, "requests": 0}
+
+    async def _connect(self):
+        self.stats["connections"] += 1
+        return await asyncio.open_connection(
+            self.host, self.port,
+            ssl=ssl.create_default_context() if self.secure else None
+        )
+
+    async def request(self, method, path, params):
+        """Gửi request (GET: params trên query, POST: form), trả về (status, body text)"""
+        query = urllib.parse.urlencode(params)
+        body = b""
+        target = self.prefix + path
+        if method == "GET":
+            target += "?" + query
+        else:
+            body = query.encode()
+
+        async with self._limit:
+            for attempt in (0, 1):
+                reused = bool(self._idle)
+                reader, writer = self._idle.pop() if reused else await self._connect()
+                try:
+                    status, headers, data = await asyncio.wait_for(
+                        self._exchange(reader, writer, method, target, body), self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    writer.close()
+                    # Kết nối keep-alive có thể đã bị server đóng: thử lại một lần bằng kết nối mới
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                self.stats["requests"] += 1
+                framed = "content-length" in headers or "transfer-encoding" in headers
+                if headers.get("connection", "").lower() == "close" or not framed:
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                return status, data.decode("utf-8", "replace")
+
+    async def _exchange(self, reader, writer, method, target, body):
+        head = [
+            f"{method} {target} HTTP/1.1",
+            f"Host: {self.host}",
+            "Connection: keep-alive",
+            "User-Agent: selenium-automation-hub",
+        ]
+        if method != "GET":
+            head += ["Content-Type: application/x-www-form-urlencoded", f"Content-Length: {len(body)}"]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Server đóng kết nối")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await reader.read()
+        return status, headers, data
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+class _Pending:
+    """Một captcha đã gửi, đang chờ kết quả"""
+
+    def __init__(self, captcha_id, future, first_poll, deadline):
+        self.id = captcha_id
+        self.future = future
+        self.next_poll = time.monotonic() + first_poll
+        self.deadline = deadline
+
+
+class TwoCaptchaClient:
+    """Event loop nền: gửi captcha, một vòng polling theo lô cho mọi captcha đang chờ"""
+
+    def __init__(self, api_key, base_url=TWOCAPTCHA_URL, poll_interval=CAPTCHA_POLL_INTERVAL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.poll_interval = poll_interval
+        self.loop = asyncio.new_event_loop()
+        self._http = None
+        self._pending = {}
+        self._poller = None
+        self.stats = {"submitted": 0, "solved": 0, "failed": 0, "polls": 0}
+        self._thread = threading.Thread(target=self._run_loop, name="TwoCaptchaClient", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Gửi coroutine vào event loop, trả về concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = _HTTPPool(self.base_url)
+        return self._http
+
+    # ---------------- API (coroutine) ----------------
+    async def _call(self, method, path, params):
+        status, text = await self.http.request(method, path, dict(params, key=self.api_key))
+        if status != 200:
+            raise CaptchaError(f"HTTP {status} từ 2Captcha")
+        return text
+
+    async def send(self, params):
+        """in.php: gửi captcha, trả về id"""
+        text = await self._call("POST", "/in.php", dict(params, json=1))
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise CaptchaError(f"Phản hồi không hợp lệ: {text[:100]}")
+        if data.get("status") != 1:
+            raise CaptchaError(data.get("error_text") or data.get("request") or "Unknown error")
+        self.stats["submitted"] += 1
+        return data["request"]
+
+    async def solve(self, params, timeout, first_poll):
+        """Gửi captcha rồi chờ vòng polling chung trả kết quả (CaptchaAnswer)"""
+        captcha_id = await self.send(params)
+        future = self.loop.create_future()
+        self._pending[captcha_id] = _Pending(captcha_id, future, first_poll, time.monotonic() + timeout)
+        if self._poller is None or self._poller.done():
+            self._poller = self.loop.create_task(self._poll_loop())
+        return await future
+
+    async def _poll_loop(self):
+        """Một vòng duy nhất cho mọi captcha đang chờ; dừng khi không còn captcha nào"""
+        while self._pending:
+            now = time.monotonic()
+            for item in list(self._pending.values()):
+                if now >= item.deadline:
+                    self._finish(item, error=CaptchaError(f"Hết thời gian chờ 2Captcha (ID: {item.id})"))
+            due = [item for item in self._pending.values() if item.next_poll <= now]
+            for start in range(0, len(due), BATCH_SIZE):
+                await self._poll_batch(due[start:start + BATCH_SIZE])
+            if self._pending:
+                wake = min(min(item.next_poll, item.deadline) for item in self._pending.values())
+                await asyncio.sleep(max(0.05, wake - time.monotonic()))
+
+    async def _poll_batch(self, batch):
+        self.stats["polls"] += 1
+        try:
+            text = await self._call("GET", "/res.php", {"action": "get", "ids": ",".join(item.id for item in batch)})
+        except Exception as e:
+            # Lỗi bất kỳ (kể cả phản hồi HTTP hỏng) chỉ làm lô này "chưa xong", vòng polling vẫn chạy tiếp
+            logging.warning(f"Lỗi polling 2Captcha: {e}")
+            answers = [NOT_READY] * len(batch)
+        else:
+            answers = text.strip().split("|")
+            if len(answers) != len(batch):
+                # Lỗi chung cho cả lô (ERROR_WRONG_USER_KEY...) áp cho mọi captcha
+                answers = [text.strip()] * len(batch)
+
+        next_poll = time.monotonic() + self.poll_interval
+        for item, answer in zip(batch, answers):
+            if answer == NOT_READY:
+                item.next_poll = next_poll
+            elif answer.startswith("ERROR"):
+                self._finish(item, error=CaptchaError(answer))
+            else:
+                self._finish(item, result=answer)
+
+    def _finish(self, item, result=None, error=None):
+        self._pending.pop(item.id, None)
+        if item.future.done():
+            return
+        if error is not None:
+            self.stats["failed"] += 1
+            item.future.set_exception(error)
+        else:
+            self.stats["solved"] += 1
+            item.future.set_result(CaptchaAnswer(result, item.id))
+
+    async def report(self, captcha_id, good):
+        """Báo kết quả đúng / sai cho 2Captcha (hoàn tiền captcha sai)"""
+        await self._call("GET", "/res.php", {"action": "reportgood" if good else "reportbad", "id": captcha_id})
+
+    # ---------------- API (đồng bộ, gọi từ worker thread) ----------------
+    def _solve_sync(self, params, timeout, first_poll):
+        return self.submit(self.solve(params, timeout, first_poll)).result(timeout + CAPTCHA_HTTP_TIMEOUT)
+
+    def solve_recaptcha(self, sitekey, pageurl, timeout, **extra):
+        """Token reCAPTCHA v2 cho (sitekey, pageurl); lỗi / hết giờ thì raise CaptchaError"""
+        params = dict(extra, method="userrecaptcha", googlekey=sitekey, pageurl=pageurl)
+        return self._solve_sync(params, timeout, CAPTCHA_FIRST_POLL_RECAPTCHA)
+
+    def solve_image(self, image_b64, timeout, **extra):
+        """Chữ trong ảnh captcha (base64)"""
+        params = dict(extra, method="base64", body=image_b64)
+        return self._solve_sync(params, timeout, CAPTCHA_FIRST_POLL_IMAGE)
+
+    def report_sync(self, captcha_id, good, timeout=CAPTCHA_HTTP_TIMEOUT):
+        try:
+            self.submit(self.report(captcha_id, good)).result(timeout)
+        except Exception as e:
+            logging.warning(f"Không gửi được báo cáo 2Captcha: {e}")
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def shutdown(self, timeout=5):
+        """Huỷ captcha đang chờ, đóng kết nối và dừng event loop"""
+        async def stop():
+            for item in list(self._pending.values()):
+                self._finish(item, error=CaptchaError("Client đã dừng"))
+            if self._http is not None:
+                self._http.close()
+
+        try:
+            self.submit(stop()).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+class MockTwoCaptchaServer:
+    """
+    Server 2Captcha giả lập trên localhost (in.php / res.php, kể cả action=get&ids=).
+    Captcha "giải xong" sau solve_delay giây; answer(params) quyết định kết quả.
+    """
+
+    def __init__(self, solve_delay=1.0, answer=None, host="127.0.0.1"):
+        self.solve_delay = solve_delay
+        self.answer = answer or (lambda params: "TOKEN-" + params.get("googlekey", params.get("method", "")))
+        self.host = host
+        self.requests = []  # (path, params) theo thứ tự nhận
+        self._tasks = {}
+        self.loop = asyncio.new_event_loop()
+        self._server = None
+        threading.Thread(target=self.loop.run_forever, name="MockTwoCaptcha", daemon=True).start()
+        self.port = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result(5)
+        self.base_url = f"http://{host}:{self.port}"
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                body = (await reader.readexactly(length)).decode() if length else ""
+                path, _, query = target.partition("?")
+                params = dict(urllib.parse.parse_qsl(body if method == "POST" else query))
+                self.requests.append((path, params))
+                text = self._respond(path, params)
+                data = text.encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                    + f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, path, params):
+        if path.endswith("/in.php"):
+            captcha_id = str(random.randint(10 ** 9, 10 ** 10))
+            self._tasks[captcha_id] = (time.monotonic() + self.solve_delay, self.answer(params))
+            return json.dumps({"status": 1, "request": captcha_id})
+        if path.endswith("/res.php") and params.get("action") == "get":
+            ids = (params.get("ids") or params.get("id", "")).split(",")
+            results = []
+            for captcha_id in ids:
+                ready_at, answer = self._tasks.get(captcha_id, (0, "ERROR_WRONG_CAPTCHA_ID"))
+                results.append(answer if time.monotonic() >= ready_at else NOT_READY)
+            return "|".join(results)
+        return "OK_REPORT_RECORDED"
+
+    def close(self):
+        async def stop():
+            self._server.close()
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_captcha_client(api_key):
+    """Trả về TwoCaptchaClient dùng chung cho api_key (mọi worker chung một vòng polling)"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = TwoCaptchaClient(api_key)
+        return client
+
+
+def shutdown_captcha_clients():
+    """Dừng mọi client đã khởi tạo"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.shutdown()
@@ -0,0 +1,266 @@
+# modules/captcha_phash.py
+
+"""
+Cache đáp án captcha ảnh theo perceptual hash (dHash 64 bit).
+
+- Site nhỏ thường dùng lại một bộ ảnh captcha cố định: ảnh chụp element được băm
+  dHash (ít đổi khi ảnh bị nén / co giãn nhẹ), so với các ảnh đã gặp theo khoảng
+  cách Hamming qua BK-tree (mỗi domain một cây) nên không phải duyệt hết
+- Chỉ đáp án đã được xác nhận đúng (feedback(ok=True)) mới được trả lại ngay
+- Đáp án bị báo sai nhiều hơn đúng thì bị loại khỏi cache
+- Đáp án chưa từng được xác nhận đúng bị xoá sau CAPTCHA_PHASH_PENDING_TTL và
+  giới hạn CAPTCHA_PHASH_PENDING_MAX mục mỗi domain, để ảnh gặp một lần không làm phình cache
+- Lưu trong SQLite (data/captcha_answers.db), nạp lại vào BK-tree khi khởi động
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from io import BytesIO
+
+from .config import CAPTCHA_PHASH_MAX_DISTANCE, CAPTCHA_PHASH_PENDING_TTL, CAPTCHA_PHASH_PENDING_MAX
+
+DEFAULT_ANSWER_DB = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "captcha_answers.db"
+)
+
+
+def dhash(image_bytes, size=8):
+    """dHash: so sánh độ sáng các điểm ảnh kề nhau trên ảnh xám (size+1) x size; None nếu không đọc được ảnh"""
+    from PIL import Image
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    except (OSError, ValueError):
+        return None
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            offset = row * (size + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class CachedAnswer:
+    """Một đáp án đã biết cho một ảnh captcha"""
+
+    def __init__(self, row_id, site, image_hash, answer, successes=0, failures=0, created_at=None):
+        self.id = row_id
+        self.site = site
+        self.hash = image_hash
+        self.answer = answer
+        self.successes = successes
+        self.failures = failures
+        self.created_at = time.time() if created_at is None else created_at
+        self.evicted = False
+
+    @property
+    def confirmed(self):
+        return not self.evicted and self.successes > self.failures
+
+    @property
+    def pending(self):
+        """Chưa từng được xác nhận đúng"""
+        return not self.evicted and self.successes == 0
+
+
+class BKTree:
+    """Cây BK theo khoảng cách Hamming; mỗi nút giữ mọi mục có cùng hash"""
+
+    def __init__(self):
+        self.root = None  # [hash, [mục], {khoảng cách: nút con}]
+        self.size = 0
+        self.evicted = 0
+
+    def add(self, image_hash, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [image_hash, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(image_hash, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [image_hash, [item], {}]
+                return
+            node = child
+
+    def search(self, image_hash, max_distance):
+        """[(khoảng cách, mục)] trong phạm vi max_distance"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(image_hash, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1] if not item.evicted)
+            # Bất đẳng thức tam giác: chỉ nhánh con trong [d - max, d + max] có thể khớp
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+    def items(self):
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            yield from (item for item in node[1] if not item.evicted)
+            stack.extend(node[2].values())
+
+
+class PhashAnswerCache:
+    """BK-tree theo domain trong bộ nhớ + SQLite, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, db_path=None, max_distance=CAPTCHA_PHASH_MAX_DISTANCE,
+                 pending_ttl=CAPTCHA_PHASH_PENDING_TTL, pending_max=CAPTCHA_PHASH_PENDING_MAX):
+        self.db_path = db_path or DEFAULT_ANSWER_DB
+        self.max_distance = max_distance
+        self.pending_ttl = pending_ttl
+        self.pending_max = pending_max
+        self._lock = threading.Lock()
+        self._conn = None
+        self._trees = {}  # domain -> BKTree
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self._load()
+
+    # ---------------- SQLITE ----------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " site TEXT NOT NULL,"
+                " hash TEXT NOT NULL,"  # hex 16 ký tự (64 bit không vừa INTEGER có dấu)
+                " answer TEXT NOT NULL,"
+                " successes INTEGER NOT NULL DEFAULT 0,"
+                " failures INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM answers WHERE successes = 0 AND created_at < ?", (time.time() - self.pending_ttl,)
+            )
+            conn.commit()
+            rows = conn.execute(
+                "SELECT id, site, hash, answer, successes, failures, created_at FROM answers"
+            ).fetchall()
+            for row_id, site, image_hash, answer, successes, failures, created_at in rows:
+                item = CachedAnswer(row_id, site, int(image_hash, 16), answer, successes, failures, created_at)
+                self._trees.setdefault(site, BKTree()).add(item.hash, item)
+
+    # ---------------- TRA CỨU ----------------
+    def lookup(self, site, image_hash):
+        """(CachedAnswer đã xác nhận gần nhất, khoảng cách) hoặc (None, None)"""
+        with self._lock:
+            tree = self._trees.get(site)
+            matches = [
+                (distance, item) for distance, item in (tree.search(image_hash, self.max_distance) if tree else [])
+                if item.confirmed
+            ]
+            if not matches:
+                self.stats["misses"] += 1
+                return None, None
+            self.stats["hits"] += 1
+            distance, item = min(matches, key=lambda m: (m[0], m[1].failures - m[1].successes))
+            return item, distance
+
+    def remember(self, site, image_hash, answer):
+        """Ghi đáp án mới (chưa xác nhận); trùng ảnh + trùng đáp án thì dùng lại mục cũ"""
+        with self._lock:
+            tree = self._trees.setdefault(site, BKTree())
+            for _, item in tree.search(image_hash, 0):
+                if item.answer == answer:
+                    return item
+            now = time.time()
+            conn = self._connection()
+            self._expire_pending(conn, site, now)
+            cursor = conn.execute(
+                "INSERT INTO answers (site, hash, answer, created_at) VALUES (?, ?, ?, ?)",
+                (site, f"{image_hash:016x}", answer, now)
+            )
+            conn.commit()
+            item = CachedAnswer(cursor.lastrowid, site, image_hash, answer, created_at=now)
+            self._trees[site].add(image_hash, item)
+            return item
+
+    def _expire_pending(self, conn, site, now):
+        """Xoá đáp án chưa xác nhận đã quá hạn, và cái cũ nhất khi domain đã đủ pending_max mục"""
+        pending = sorted((item for item in self._trees[site].items() if item.pending), key=lambda i: i.created_at)
+        expired = [item for item in pending if now - item.created_at > self.pending_ttl]
+        fresh = pending[len(expired):]
+        expired += fresh[:max(0, len(fresh) - self.pending_max + 1)]
+        for item in expired:
+            self._evict(conn, item)
+
+    def feedback(self, item, ok):
+        """Ghi nhận đáp án đúng / sai; sai nhiều hơn đúng thì loại khỏi cache"""
+        with self._lock:
+            if item.evicted:
+                return
+            if ok:
+                item.successes += 1
+            else:
+                item.failures += 1
+            conn = self._connection()
+            if item.failures > item.successes:
+                self._evict(conn, item)
+            else:
+                conn.execute(
+                    "UPDATE answers SET successes = ?, failures = ? WHERE id = ?",
+                    (item.successes, item.failures, item.id)
+                )
+            conn.commit()
+
+    def _evict(self, conn, item):
+        item.evicted = True
+        self.stats["evicted"] += 1
+        conn.execute("DELETE FROM answers WHERE id = ?", (item.id,))
+        self._compact(item.site)
+
+    def _compact(self, site):
+        """Dựng lại cây khi quá nửa số mục đã bị loại"""
+        tree = self._trees[site]
+        tree.evicted += 1
+        if tree.evicted * 2 > tree.size:
+            fresh = BKTree()
+            for item in tree.items():
+                fresh.add(item.hash, item)
+            self._trees[site] = fresh
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Trả về PhashAnswerCache dùng chung"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhashAnswerCache()
+        return _cache
@@ -0,0 +1,171 @@
+# modules/captcha_prefetch.py
+
+"""
+Kho token reCAPTCHA giải sẵn cho các lượt chạy hàng loạt.
+
+- Mỗi (sitekey, pageurl) có một hàng token đã giải kèm thời điểm giải; token quá
+  CAPTCHA_TOKEN_TTL giây bị bỏ (token reCAPTCHA chỉ sống ~2 phút)
+- take() ghi nhận một lần gặp captcha và trả token sẵn có ngay (None nếu hết)
+- Thread nền tính tốc độ gặp captcha trong CAPTCHA_RATE_WINDOW giây gần nhất và
+  giữ số token (sẵn + đang giải) ≈ tốc độ x thời gian giải, không vượt quá số
+  token dùng kịp trước khi hết hạn; không gặp captcha nữa thì ngừng giải trước
+- Token được giải qua TwoCaptchaClient dùng chung (cùng vòng polling theo lô)
+"""
+
+import math
+import time
+import threading
+import urllib.parse
+from collections import deque
+
+from .config import (
+    CAPTCHA_TOKEN_TTL, CAPTCHA_PREFETCH_MAX, CAPTCHA_RATE_WINDOW,
+    CAPTCHA_PREFETCH_SOLVE_TIMEOUT, CAPTCHA_FIRST_POLL_RECAPTCHA
+)
+from .captcha_client import get_captcha_client
+
+REFILL_INTERVAL = 2  # giây giữa các lần kiểm tra / bổ sung kho
+DEFAULT_SOLVE_TIME = 30  # giây, ước lượng thời gian giải trước khi có số liệu
+
+
+def pool_key(sitekey, pageurl):
+    """Khoá kho: sitekey + trang (bỏ query / fragment, token gắn với trang chứ không với tham số)"""
+    parts = urllib.parse.urlsplit(pageurl or "")
+    return sitekey, urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+class _Entry:
+    """Token sẵn có + số liệu nhu cầu của một (sitekey, pageurl)"""
+
+    def __init__(self):
+        self.tokens = deque()  # (thời điểm giải, CaptchaAnswer), cũ trước
+        self.in_flight = 0
+        self.demand = deque()  # thời điểm gặp captcha
+
+
+class TokenPrefetchPool:
+    """Kho token theo (sitekey, pageurl), tự bổ sung ở thread nền"""
+
+    def __init__(self, client, ttl=CAPTCHA_TOKEN_TTL, max_size=CAPTCHA_PREFETCH_MAX, window=CAPTCHA_RATE_WINDOW):
+        self.client = client
+        self.ttl = ttl
+        self.max_size = max_size
+        self.window = window
+        self.solve_time = DEFAULT_SOLVE_TIME  # trung bình trượt thời gian giải
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "prefetched": 0, "failed": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._refill_loop, name="CaptchaPrefetch", daemon=True)
+        self._thread.start()
+
+    # ---------------- LẤY TOKEN ----------------
+    def take(self, sitekey, pageurl):
+        """Ghi nhận một lần gặp captcha; trả token còn hạn (cũ nhất trước) hoặc None"""
+        key = pool_key(sitekey, pageurl)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.demand.append(now)
+            self._purge(entry, now)
+            if entry.tokens:
+                self.stats["hits"] += 1
+                return entry.tokens.popleft()[1]
+            self.stats["misses"] += 1
+        return None
+
+    def observe(self, solve_seconds):
+        """Cập nhật thời gian giải trung bình (gọi sau mỗi lần giải trực tiếp)"""
+        with self._lock:
+            self.solve_time = 0.8 * self.solve_time + 0.2 * solve_seconds
+
+    def _purge(self, entry, now):
+        while entry.tokens and now - entry.tokens[0][0] > self.ttl:
+            entry.tokens.popleft()
+            self.stats["expired"] += 1
+        while entry.demand and now - entry.demand[0] > self.window:
+            entry.demand.popleft()
+
+    # ---------------- BỔ SUNG ----------------
+    def target(self, entry):
+        """Số token (sẵn + đang giải) cần giữ cho tốc độ gặp captcha hiện tại"""
+        if not entry.demand:
+            return 0
+        rate = len(entry.demand) / self.window  # captcha / giây
+        # Đủ cho nhu cầu trong lúc chờ giải, nhưng không nhiều hơn số dùng kịp trước khi hết hạn
+        # (captcha thưa tới mức token giải sẵn sẽ hết hạn trước khi dùng thì không giải trước)
+        wanted = math.ceil(rate * self.solve_time) + 1
+        usable = math.floor(rate * self.ttl)
+        return min(wanted, usable, self.max_size)
+
+    def _refill_loop(self):
+        while not self._stop.wait(REFILL_INTERVAL):
+            now = time.time()
+            requests = []
+            with self._lock:
+                for key, entry in list(self._entries.items()):
+                    self._purge(entry, now)
+                    if not entry.demand and not entry.tokens and not entry.in_flight:
+                        del self._entries[key]
+                        continue
+                    deficit = self.target(entry) - len(entry.tokens) - entry.in_flight
+                    for _ in range(max(0, deficit)):
+                        entry.in_flight += 1
+                        requests.append((key, entry))
+            for key, entry in requests:
+                self._prefetch(key, entry)
+
+    def _prefetch(self, key, entry):
+        sitekey, pageurl = key
+        started = time.time()
+        params = {"method": "userrecaptcha", "googlekey": sitekey, "pageurl": pageurl}
+        future = self.client.submit(
+            self.client.solve(params, CAPTCHA_PREFETCH_SOLVE_TIMEOUT, CAPTCHA_FIRST_POLL_RECAPTCHA)
+        )
+
+        def done(fut):
+            with self._lock:
+                entry.in_flight -= 1
+                if fut.cancelled() or fut.exception() is not None:
+                    self.stats["failed"] += 1
+                    return
+                now = time.time()
+                self.solve_time = 0.8 * self.solve_time + 0.2 * (now - started)
+                entry.tokens.append((now, fut.result()))
+                self.stats["prefetched"] += 1
+
+        future.add_done_callback(done)
+
+    def ready(self, sitekey, pageurl):
+        """Số token còn hạn đang sẵn cho (sitekey, pageurl)"""
+        with self._lock:
+            entry = self._entries.get(pool_key(sitekey, pageurl))
+            if entry is None:
+                return 0
+            self._purge(entry, time.time())
+            return len(entry.tokens)
+
+    def close(self):
+        self._stop.set()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_prefetch_pool(api_key):
+    """Trả về TokenPrefetchPool dùng chung cho api_key"""
+    with _pools_lock:
+        pool = _pools.get(api_key)
+        if pool is None:
+            pool = _pools[api_key] = TokenPrefetchPool(get_captcha_client(api_key))
+        return pool
+
+
+def shutdown_prefetch_pools():
+    """Dừng thread bổ sung của mọi kho"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,260 @@
+# modules/captcha_probe.py
+
+"""
+Phát hiện captcha sau mỗi lần điều hướng bằng một lệnh JS duy nhất.
+
+- CAPTCHA_DETECT_JS nhận diện: trang /sorry/ của Google, reCAPTCHA / hCaptcha
+  hiển thị (bỏ qua iframe ẩn / invisible), Cloudflare challenge, trang xác minh
+  của Shopee, checkpoint của Facebook, captcha ảnh (ảnh "captcha" + ô nhập trong
+  cùng form); kèm sitekey nếu có. Đoạn JS này được ghép vào PROBE_SCRIPT của
+  retry_policy nên mỗi lần tải trang vẫn chỉ một lệnh
+- solve_detected_captcha(): reCAPTCHA có sitekey và captcha ảnh thì gửi cho
+  CaptchaResolver (chỉ khi đã cấu hình dịch vụ tự động), điền đáp án / token, submit
+  (hoặc để callback của trang submit) rồi chờ trang mới để biết đúng / sai; loại
+  khác trả False để worker đổi proxy
+- CaptchaStats: tỷ lệ gặp captcha theo domain và theo proxy trong CAPTCHA_RATE_WINDOW giây
+"""
+
+import time
+import threading
+from collections import deque
+
+from .config import CAPTCHA_RATE_WINDOW, CAPTCHA_SUBMIT_WAIT, CAPTCHA_CALLBACK_WAIT
+from .rate_limiter import domain_of
+
+# Loại captcha
+KIND_RECAPTCHA = "recaptcha"
+KIND_HCAPTCHA = "hcaptcha"
+KIND_GOOGLE_SORRY = "google_sorry"
+KIND_CLOUDFLARE = "cloudflare"
+KIND_SHOPEE_VERIFY = "shopee_verify"
+KIND_CHECKPOINT = "checkpoint"
+KIND_IMAGE = "image"
+
+# Captcha ảnh: detectCaptcha() đánh dấu ảnh và ô nhập đáp án bằng thuộc tính này
+IMAGE_SELECTOR = '[data-captcha-probe="image"]'
+ANSWER_SELECTOR = '[data-captcha-probe="answer"]'
+RECAPTCHA_RESPONSE_SELECTOR = "#g-recaptcha-response"
+
+# Định nghĩa hàm detectCaptcha(): trả về {kind, sitekey} hoặc null
+CAPTCHA_DETECT_JS = """
+var detectCaptcha = function () {
+    var visible = function (el) {
+        return !!el && el.offsetWidth > 0 && el.offsetHeight > 0 && (el.src || '').indexOf('size=invisible') < 0;
+    };
+    var anyVisible = function (selector) {
+        return Array.prototype.some.call(document.querySelectorAll(selector), visible);
+    };
+    var path = location.pathname;
+    var kind = null;
+    if (path.indexOf('/sorry/') === 0) { kind = 'google_sorry'; }
+    else if (document.querySelector('#challenge-form, #cf-challenge-running, .cf-turnstile') ||
+             document.title.indexOf('Just a moment') === 0) { kind = 'cloudflare'; }
+    else if (/\\/verify\\/(traffic|captcha)/.test(path)) { kind = 'shopee_verify'; }
+    else if (path.indexOf('/checkpoint/') === 0) { kind = 'checkpoint'; }
+    else if (anyVisible('iframe[src*="hcaptcha"], .h-captcha')) { kind = 'hcaptcha'; }
+    else if (anyVisible('iframe[src*="recaptcha"], .g-recaptcha, #captcha-form')) { kind = 'recaptcha'; }
+    else {
+        var image = Array.prototype.find.call(document.querySelectorAll(
+            'img[src*="captcha" i], img[id*="captcha" i], img[class*="captcha" i], img[alt*="captcha" i]'
+        ), visible);
+        var answer = image && image.closest('form') && Array.prototype.find.call(
+            image.closest('form').querySelectorAll('input[type="text"], input:not([type])'), visible
+        );
+        if (answer) {
+            image.setAttribute('data-captcha-probe', 'image');
+            answer.setAttribute('data-captcha-probe', 'answer');
+            kind = 'image';
+        }
+    }
+    if (!kind) { return null; }
+    var sitekey = null;
+    var holder = document.querySelector('[data-sitekey]');
+    if (holder) { sitekey = holder.getAttribute('data-sitekey'); }
+    if (!sitekey) {
+        var frame = document.querySelector('iframe[src*="recaptcha"][src*="k="]');
+        var match = frame ? /[?&]k=([^&]+)/.exec(frame.src) : null;
+        if (match) { sitekey = match[1]; }
+    }
+    return {kind: kind, sitekey: sitekey, url: location.href};
+};
+"""
+
+CAPTCHA_PROBE_SCRIPT = CAPTCHA_DETECT_JS + "return detectCaptcha();"
+
+# Đánh dấu trang hiện tại trước khi giải (callback của trang có thể tự submit form)
+CAPTCHA_MARK_SCRIPT = "window.__captchaSubmitted = true;"
+
+# Điền đáp án (arguments[1], null: đã điền sẵn) vào ô arguments[0] rồi submit form chứa nó;
+# đánh dấu trang cũ để phân biệt với trang tải sau khi submit
+SUBMIT_ANSWER_SCRIPT = """
+var field = document.querySelector(arguments[0]);
+if (!field || !field.form) { return false; }
+if (arguments[1] !== null) {
+    field.value = arguments[1];
+    field.dispatchEvent(new Event('input', {bubbles: true}));
+    field.dispatchEvent(new Event('change', {bubbles: true}));
+}
+window.__captchaSubmitted = true;
+var button = field.form.querySelector('button[type="submit"], input[type="submit"]');
+if (button) { button.click(); } else { field.form.submit(); }
+return true;
+"""
+
+# Trạng thái sau khi submit: còn đang tải, đã sang trang mới hay chưa, còn captcha không
+CAPTCHA_RECHECK_SCRIPT = CAPTCHA_DETECT_JS + """
+if (document.readyState !== 'complete') { return {loading: true}; }
+return {navigated: !window.__captchaSubmitted, captcha: detectCaptcha()};
+"""
+
+
+def probe_captcha(driver):
+    """Một lệnh JS: {"kind", "sitekey", "url"} nếu trang hiện tại là captcha, None nếu không"""
+    try:
+        return driver.execute_script(CAPTCHA_PROBE_SCRIPT) or None
+    except Exception:
+        return None
+
+
+def wait_captcha_cleared(driver, timeout=CAPTCHA_SUBMIT_WAIT, poll=0.25):
+    """
+    Chờ trang sau khi submit đáp án. True: hết captcha (trang mới hoặc widget đã bị gỡ),
+    False: trang mới vẫn là captcha (đáp án sai), None: hết giờ mà trang không đổi.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            state = driver.execute_script(CAPTCHA_RECHECK_SCRIPT) or {}
+        except Exception:
+            state = {"loading": True}  # đang điều hướng
+        if not state.get("loading"):
+            if not state.get("captcha"):
+                return True
+            if state.get("navigated"):
+                return False
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(poll)
+
+
+def _solve_image_captcha(driver, info, resolver, log):
+    """Giải captcha ảnh, điền + submit đáp án, báo đúng / sai cho resolver (cache pHash + 2Captcha)"""
+    log(f"🧩 Phát hiện captcha ảnh trên {domain_of(info.get('url', ''))}, đang giải...")
+    answer = resolver.resolve_image_captcha(driver, IMAGE_SELECTOR)
+    if not answer:
+        return False
+    try:
+        submitted = driver.execute_script(SUBMIT_ANSWER_SCRIPT, ANSWER_SELECTOR, str(answer))
+    except Exception as e:
+        log(f"⚠️ Không điền được đáp án captcha: {e}")
+        return False
+    if not submitted:
+        return False
+    cleared = wait_captcha_cleared(driver)
+    # Trang không đổi thì chưa biết đáp án đúng hay sai: không báo
+    if cleared is not None:
+        resolver.report_image_result(cleared)
+    return bool(cleared)
+
+
+def solve_detected_captcha(driver, info, resolver, log=None):
+    """
+    Thử giải captcha probe đã phát hiện. True nếu trang đã hết captcha.
+    Chỉ reCAPTCHA có sitekey và captcha ảnh mới gửi cho resolver; Google /sorry/
+    (cần data-s), Cloudflare, hCaptcha... trả False để worker đổi proxy.
+    """
+    log = log or (lambda message: None)
+    if not info or resolver is None:
+        return False
+    if info.get("kind") == KIND_IMAGE:
+        return _solve_image_captcha(driver, info, resolver, log)
+    if info.get("kind") != KIND_RECAPTCHA or not info.get("sitekey"):
+        return False
+    log(f"🧩 Phát hiện reCAPTCHA trên {domain_of(info.get('url', ''))}, đang giải...")
+    try:
+        driver.execute_script(CAPTCHA_MARK_SCRIPT)
+    except Exception:
+        return False
+    if not resolver.resolve_recaptcha(driver, sitekey=info["sitekey"]):
+        return False
+    # Widget vẫn hiện tới khi form được gửi: chờ callback của trang tự submit,
+    # không thấy điều hướng thì submit form chứa ô token
+    cleared = wait_captcha_cleared(driver, timeout=CAPTCHA_CALLBACK_WAIT)
+    if cleared is None:
+        try:
+            submitted = driver.execute_script(SUBMIT_ANSWER_SCRIPT, RECAPTCHA_RESPONSE_SELECTOR, None)
+        except Exception:
+            submitted = False
+        if not submitted:
+            # Không có form: trang tự kiểm tra token ở thao tác sau, token đã điền coi như xong
+            log("🧩 Đã điền token reCAPTCHA (trang không có form để gửi)")
+            return True
+        cleared = wait_captcha_cleared(driver)
+    return bool(cleared)
+
+
+class CaptchaStats:
+    """Số trang đã tải / số lần gặp captcha theo domain và proxy trong cửa sổ trượt"""
+
+    def __init__(self, window=CAPTCHA_RATE_WINDOW):
+        self.window = window
+        self._events = deque()  # (thời điểm, domain, proxy, loại captcha hoặc None)
+        self._lock = threading.Lock()
+        self.totals = {"pages": 0, "captchas": 0}
+        self.by_kind = {}
+
+    def record(self, url, proxy=None, kind=None):
+        """Ghi một lần tải trang (kind: loại captcha nếu gặp)"""
+        now = time.time()
+        with self._lock:
+            self._events.append((now, domain_of(url or ""), proxy or "", kind))
+            self.totals["pages"] += 1
+            if kind:
+                self.totals["captchas"] += 1
+                self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+            self._purge(now)
+
+    def _purge(self, now):
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+
+    def rate(self, domain=None, proxy=None):
+        """(số captcha, số trang) trong cửa sổ, lọc theo domain và / hoặc proxy"""
+        with self._lock:
+            self._purge(time.time())
+            captchas = pages = 0
+            for _, event_domain, event_proxy, kind in self._events:
+                if (domain is None or event_domain == domain) and (proxy is None or event_proxy == proxy):
+                    pages += 1
+                    captchas += bool(kind)
+            return captchas, pages
+
+    def snapshot(self):
+        """{"domains": {domain: (captcha, trang)}, "proxies": {proxy: (captcha, trang)}}"""
+        domains, proxies = {}, {}
+        with self._lock:
+            self._purge(time.time())
+            for _, domain, proxy, kind in self._events:
+                for table, key in ((domains, domain), (proxies, proxy)):
+                    if not key:
+                        continue
+                    counter = table.setdefault(key, [0, 0])
+                    counter[0] += bool(kind)
+                    counter[1] += 1
+        return {
+            "domains": {key: tuple(value) for key, value in domains.items()},
+            "proxies": {key: tuple(value) for key, value in proxies.items()},
+        }
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_captcha_stats():
+    """Trả về CaptchaStats dùng chung"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = CaptchaStats()
+        return _stats
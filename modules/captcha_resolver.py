@@ -1,14 +1,45 @@
 import os
 import time
 import base64
-import requests
 import logging
-from PIL import Image
-from io import BytesIO
 from PyQt5.QtCore import QObject, pyqtSignal, Qt
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QFormLayout, QMessageBox, QGroupBox, QFileDialog, QComboBox, QHBoxLayout
 from PyQt5.QtGui import QPixmap, QFont
+from selenium.webdriver.common.by import By
 import json
+import urllib.parse
+
+from .artifact_store import get_artifact_store
+from .captcha_client import get_captcha_client, CaptchaError
+from .captcha_prefetch import get_prefetch_pool
+from .captcha_phash import dhash, get_answer_cache
+from .config import (
+    CAPTCHA_POLL_INTERVAL, CAPTCHA_PREFETCH_ENABLED, CAPTCHA_PHASH_ENABLED, CAPTCHA_SERVICE, CAPTCHA_API_KEY
+)
+
+CAPTCHA_SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "captcha_settings.json")
+
+
+def load_captcha_settings():
+    """Cài đặt dịch vụ giải captcha: data/captcha_settings.json (lưu từ dialog), không có thì lấy từ config"""
+    settings = {"service": CAPTCHA_SERVICE, "api_key": CAPTCHA_API_KEY}
+    try:
+        with open(CAPTCHA_SETTINGS_PATH, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return settings
+
+
+def create_auto_resolver():
+    """
+    CaptchaResolver cho worker giải tự động (không mở dialog),
+    None nếu chưa cấu hình 2Captcha (dịch vụ 'manual' / thiếu API key).
+    """
+    settings = load_captcha_settings()
+    if settings.get("service") not in ("2captcha", "auto") or not settings.get("api_key"):
+        return None
+    return CaptchaResolver(service="2captcha", api_key=settings["api_key"])
 
 class CaptchaResolver(QObject):
     status_signal = pyqtSignal(str)  # Signal để cập nhật trạng thái xử lý CAPTCHA
@@ -17,6 +48,7 @@ class CaptchaResolver(QObject):
         super().__init__()
         self.service = service  # "auto", "2captcha", "anticaptcha", "manual"
         self.api_key = api_key
+        self.last_image_answer = None  # (CachedAnswer, id 2Captcha) của captcha ảnh gần nhất
         
         # Tạo thư mục lưu ảnh captcha nếu chưa có
         self.captcha_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "captcha")
@@ -72,148 +104,133 @@ class CaptchaResolver(QObject):
         
         try:
             # Tìm element chứa captcha image
-            captcha_elem = driver.find_element_by_css_selector(element_selector)
+            captcha_elem = driver.find_element(By.CSS_SELECTOR, element_selector)
             
             # Chụp screenshot của element
             captcha_img = captcha_elem.screenshot_as_base64
-            img_data = base64.b64decode(captcha_img)
-            image = Image.open(BytesIO(img_data))
             
-            # Lưu ảnh captcha
-            timestamp = int(time.time())
-            image_path = os.path.join(self.captcha_dir, f"captcha_{timestamp}.png")
-            image.save(image_path)
+            image_bytes = base64.b64decode(captcha_img)
+            
+            # Ảnh đã gặp (site dùng lại bộ captcha cố định): trả đáp án đã xác nhận ngay
+            self.last_image_answer = None
+            site = urllib.parse.urlsplit(driver.current_url).netloc
+            image_hash = dhash(image_bytes) if CAPTCHA_PHASH_ENABLED else None
+            if image_hash is not None:
+                cached, distance = get_answer_cache().lookup(site, image_hash)
+                if cached:
+                    self.status_signal.emit(f"Dùng đáp án đã xác nhận cho ảnh CAPTCHA giống (lệch {distance} bit)")
+                    self.last_image_answer = (cached, None)
+                    return cached.answer
+            
+            # Lưu ảnh captcha ở thread nền (giữ PNG gốc), không chặn worker
+            saved = get_artifact_store("captcha").submit_image("captcha", image_bytes, fmt="png")
             
             if self.service == "2captcha" and self.api_key:
-                return self._solve_image_with_2captcha(image_path, wait_time)
+                result = self._solve_image_with_2captcha(None, wait_time, image_b64=captcha_img)
             elif self.service == "manual":
-                return self._solve_image_manually(image_path, wait_time)
+                result = self._solve_image_manually(self._saved_image_path(saved, image_bytes), wait_time)
             else:
                 # Auto - thử các phương pháp
+                result = None
                 if self.api_key:
-                    result = self._solve_image_with_2captcha(image_path, wait_time)
-                    if result:
-                        return result
-                
-                return self._solve_image_manually(image_path, wait_time)
+                    result = self._solve_image_with_2captcha(None, wait_time, image_b64=captcha_img)
+                if not result:
+                    result = self._solve_image_manually(self._saved_image_path(saved, image_bytes), wait_time)
+            
+            # Ghi đáp án (chưa xác nhận) để report_image_result() xác nhận / loại sau khi submit
+            if result and image_hash is not None:
+                entry = get_answer_cache().remember(site, image_hash, str(result))
+                self.last_image_answer = (entry, getattr(result, "captcha_id", None))
+            return result
                 
         except Exception as e:
             self.status_signal.emit(f"Lỗi khi xử lý Image CAPTCHA: {str(e)}")
             return None
     
+    def _saved_image_path(self, saved, image_bytes):
+        """Đường dẫn ảnh captcha đã lưu; hàng đợi bỏ ảnh / ghi lỗi thì ghi trực tiếp để dialog có ảnh"""
+        try:
+            path = saved.result(timeout=10)
+        except Exception:
+            path = None
+        if path:
+            return path
+        directory = get_artifact_store("captcha").directory
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"captcha_{time.strftime('%Y%m%d_%H%M%S')}_{time.time_ns() % 10**6:06d}.png")
+        with open(path, "wb") as f:
+            f.write(image_bytes)
+        return path
+    
+    def report_image_result(self, ok):
+        """
+        Báo đáp án captcha ảnh gần nhất đúng / sai (sau khi submit form):
+        đúng thì được dùng lại cho ảnh giống, sai thì bị loại khỏi cache và báo 2Captcha
+        """
+        if not self.last_image_answer:
+            return
+        entry, captcha_id = self.last_image_answer
+        self.last_image_answer = None
+        get_answer_cache().feedback(entry, ok)
+        if captcha_id and self.api_key:
+            get_captcha_client(self.api_key).report_sync(captcha_id, ok)
+    
     def _solve_with_2captcha(self, url, sitekey, driver, wait_time):
-        """Giải reCAPTCHA sử dụng 2Captcha API"""
+        """Giải reCAPTCHA sử dụng 2Captcha API (client dùng chung, polling theo lô với các worker khác)"""
         try:
-            self.status_signal.emit("Đang gửi CAPTCHA đến 2Captcha...")
-            
-            # API endpoint
-            api_url = "https://2captcha.com/in.php"
-            
-            # Request parameters
-            params = {
-                'key': self.api_key,
-                'method': 'userrecaptcha',
-                'googlekey': sitekey,
-                'pageurl': url,
-                'json': 1
-            }
-            
-            # Gửi request đến 2Captcha
-            response = requests.post(api_url, data=params)
-            data = response.json()
-            
-            if data.get('status') == 1:
-                # Lấy request ID
-                request_id = data.get('request')
-                
-                # Chờ kết quả
-                self.status_signal.emit(f"Đang đợi 2Captcha xử lý (ID: {request_id})...")
-                
-                # API endpoint cho kết quả
-                result_url = f"https://2captcha.com/res.php?key={self.api_key}&action=get&id={request_id}&json=1"
-                
-                # Polling cho đến khi có kết quả hoặc hết thời gian
-                for _ in range(wait_time):
-                    time.sleep(5)  # Wait 5 seconds between polls
-                    
-                    result_response = requests.get(result_url)
-                    result_data = result_response.json()
-                    
-                    if result_data.get('status') == 1:
-                        captcha_response = result_data.get('request')
-                        self.status_signal.emit("2Captcha đã giải thành công!")
-                        
-                        # Điền kết quả vào form
-                        script = f"""
-                        document.getElementById("g-recaptcha-response").innerHTML="{captcha_response}";
-                        if (typeof ___grecaptcha_cfg !== 'undefined') {{
-                            // Sử dụng callback của reCAPTCHA nếu có
-                            ___grecaptcha_cfg.clients[0].W.W.callback("{captcha_response}");
-                        }}
-                        """
-                        driver.execute_script(script)
-                        return True
-                
-                self.status_signal.emit("Hết thời gian chờ 2Captcha.")
-                return False
+            # Lượt chạy hàng loạt: lấy token đã giải sẵn cho trang này nếu có
+            pool = get_prefetch_pool(self.api_key) if CAPTCHA_PREFETCH_ENABLED else None
+            captcha_response = pool.take(sitekey, url) if pool else None
+            if captcha_response:
+                self.status_signal.emit(f"Dùng token 2Captcha giải sẵn (ID: {captcha_response.captcha_id})")
             else:
-                self.status_signal.emit(f"Lỗi từ 2Captcha: {data.get('error_text', 'Unknown error')}")
-                return False
+                self.status_signal.emit("Đang gửi CAPTCHA đến 2Captcha...")
+                started = time.time()
+                # wait_time giữ nghĩa cũ: số lượt hỏi kết quả
+                captcha_response = get_captcha_client(self.api_key).solve_recaptcha(
+                    sitekey, url, timeout=wait_time * CAPTCHA_POLL_INTERVAL
+                )
+                if pool:
+                    pool.observe(time.time() - started)
+                self.status_signal.emit(f"2Captcha đã giải thành công! (ID: {captcha_response.captcha_id})")
+            
+            # Điền kết quả vào form
+            script = f"""
+            document.getElementById("g-recaptcha-response").innerHTML="{captcha_response}";
+            if (typeof ___grecaptcha_cfg !== 'undefined') {{
+                // Sử dụng callback của reCAPTCHA nếu có
+                ___grecaptcha_cfg.clients[0].W.W.callback("{captcha_response}");
+            }}
+            """
+            driver.execute_script(script)
+            return True
+        except CaptchaError as e:
+            self.status_signal.emit(f"Lỗi từ 2Captcha: {str(e)}")
+            return False
         except Exception as e:
             self.status_signal.emit(f"Lỗi khi gọi 2Captcha API: {str(e)}")
             return False
     
-    def _solve_image_with_2captcha(self, image_path, wait_time):
-        """Giải Image CAPTCHA sử dụng 2Captcha API"""
+    def _solve_image_with_2captcha(self, image_path, wait_time, image_b64=None):
+        """Giải Image CAPTCHA sử dụng 2Captcha API (image_b64: ảnh đã ở dạng base64, không cần đọc file)"""
         try:
             self.status_signal.emit("Đang gửi CAPTCHA đến 2Captcha...")
             
-            # API endpoint
-            api_url = "https://2captcha.com/in.php"
-            
             # Mở file và encode base64
-            with open(image_path, 'rb') as img_file:
-                img_data = base64.b64encode(img_file.read()).decode('utf-8')
-            
-            # Request parameters
-            params = {
-                'key': self.api_key,
-                'method': 'base64',
-                'body': img_data,
-                'json': 1
-            }
-            
-            # Gửi request đến 2Captcha
-            response = requests.post(api_url, data=params)
-            data = response.json()
-            
-            if data.get('status') == 1:
-                # Lấy request ID
-                request_id = data.get('request')
-                
-                # Chờ kết quả
-                self.status_signal.emit(f"Đang đợi 2Captcha xử lý (ID: {request_id})...")
-                
-                # API endpoint cho kết quả
-                result_url = f"https://2captcha.com/res.php?key={self.api_key}&action=get&id={request_id}&json=1"
-                
-                # Polling cho đến khi có kết quả hoặc hết thời gian
-                for _ in range(wait_time):
-                    time.sleep(5)  # Wait 5 seconds between polls
-                    
-                    result_response = requests.get(result_url)
-                    result_data = result_response.json()
-                    
-                    if result_data.get('status') == 1:
-                        captcha_text = result_data.get('request')
-                        self.status_signal.emit("2Captcha đã giải thành công!")
-                        return captcha_text
-                
-                self.status_signal.emit("Hết thời gian chờ 2Captcha.")
-                return None
+            if image_b64:
+                img_data = image_b64
             else:
-                self.status_signal.emit(f"Lỗi từ 2Captcha: {data.get('error_text', 'Unknown error')}")
-                return None
+                with open(image_path, 'rb') as img_file:
+                    img_data = base64.b64encode(img_file.read()).decode('utf-8')
+            
+            captcha_text = get_captcha_client(self.api_key).solve_image(
+                img_data, timeout=wait_time * CAPTCHA_POLL_INTERVAL
+            )
+            self.status_signal.emit("2Captcha đã giải thành công!")
+            return captcha_text
+        except CaptchaError as e:
+            self.status_signal.emit(f"Lỗi từ 2Captcha: {str(e)}")
+            return None
         except Exception as e:
             self.status_signal.emit(f"Lỗi khi gọi 2Captcha API: {str(e)}")
             return None
@@ -0,0 +1,534 @@
+# modules/cdp_engine.py
+
+"""
+Engine tự động hoá bất đồng bộ (asyncio) điều khiển trình duyệt trực tiếp qua
+DevTools Protocol (CDP), không cần chromedriver.
+
+- Client websocket tối giản viết bằng asyncio (không thêm thư viện ngoài)
+- CDPBrowser: khởi chạy Brave/Chrome với --remote-debugging-port, mở nhiều tab
+- CDPPage: navigate / evaluate / wait_for_element
+- google_search / shopee_scrape phiên bản async
+- CDPEngine: một event loop nền dùng chung, điều khiển nhiều trình duyệt/tab cùng lúc;
+  worker gửi coroutine vào loop và nhận concurrent.futures.Future
+- Trình duyệt CDP được đăng ký với BrowserReaper (ngân sách RSS, dọn mồ côi,
+  thống kê tài nguyên theo trình duyệt) như trình duyệt chromedriver
+"""
+
+import os
+import re
+import json
+import base64
+import shutil
+import asyncio
+import logging
+import tempfile
+import threading
+import urllib.parse
+from types import SimpleNamespace
+
+from .config import BRAVE_PATH, BROWSER_LOCALE
+from .tab_executor import GOOGLE_RESULTS_JS
+from .rate_limiter import get_rate_limiter
+from .traffic_meter import get_traffic_meter
+from .browser_reaper import get_browser_reaper
+
+BROWSER_CANDIDATES = [
+    BRAVE_PATH,
+    r"C:\Program Files (x86)\BraveSoftware\Brave-Browser\Application\brave.exe",
+    "/Applications/Brave Browser.app/Contents/MacOS/Brave Browser",
+    "/usr/bin/brave-browser",
+]
+
+DEVTOOLS_RE = re.compile(r"DevTools listening on (ws://\S+)")
+
+SHOPEE_RESULTS_JS = """
+(function (limit) {
+    var rows = [];
+    document.querySelectorAll('.shopee-search-item-result__item').forEach(function (el) {
+        var name = el.querySelector('div._36CEnF');
+        var price = el.querySelector('span._29R_un');
+        var a = el.querySelector('a[href]');
+        if (name && price && a) { rows.push([name.innerText, price.innerText, a.href]); }
+    });
+    return rows.slice(0, limit);
+})(%d)
+"""
+
+
+def find_browser_binary(preferred=None):
+    """Tìm binary Brave (hoặc Chromium/Chrome) để khởi chạy"""
+    for path in [preferred] + BROWSER_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    for name in ("brave-browser", "brave", "chromium", "chromium-browser", "google-chrome"):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+class CDPError(Exception):
+    """Lỗi trả về từ DevTools"""
+
+
+# ---------------- WEBSOCKET ----------------
+class WebSocket:
+    """Client websocket (RFC 6455) tối giản: chỉ text frame, đủ cho CDP"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url):
+        parts = urllib.parse.urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        writer.write(
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {parts.hostname}:{parts.port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n".encode()
+        )
+        await writer.drain()
+        header = await reader.readuntil(b"\r\n\r\n")
+        if b" 101 " not in header.split(b"\r\n", 1)[0]:
+            writer.close()
+            raise CDPError(f"Websocket handshake thất bại: {header[:80]!r}")
+        return cls(reader, writer)
+
+    async def send(self, text, opcode=0x1):
+        payload = text.encode("utf-8") if isinstance(text, str) else text
+        length = len(payload)
+        header = bytearray([0x80 | opcode])
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 65536:
+            header.append(0x80 | 126)
+            header += length.to_bytes(2, "big")
+        else:
+            header.append(0x80 | 127)
+            header += length.to_bytes(8, "big")
+        mask = os.urandom(4)
+        header += mask
+        if length:
+            # XOR cả payload một lần bằng số nguyên lớn thay vì lặp từng byte
+            repeated = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(length, "big")
+        self.writer.write(bytes(header) + payload)
+        await self.writer.drain()
+
+    async def recv(self):
+        """Nhận một message text hoàn chỉnh; trả về None khi kết nối đóng"""
+        chunks = []
+        while True:
+            head = await self.reader.readexactly(2)
+            fin, opcode = head[0] & 0x80, head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = int.from_bytes(await self.reader.readexactly(2), "big")
+            elif length == 127:
+                length = int.from_bytes(await self.reader.readexactly(8), "big")
+            if head[1] & 0x80:
+                mask = await self.reader.readexactly(4)
+                data = bytearray(await self.reader.readexactly(length))
+                for i in range(length):
+                    data[i] ^= mask[i % 4]
+                data = bytes(data)
+            else:
+                data = await self.reader.readexactly(length)
+
+            if opcode == 0x8:
+                return None
+            if opcode == 0x9:
+                await self.send(data, opcode=0xA)
+                continue
+            if opcode == 0xA:
+                continue
+            chunks.append(data)
+            if fin:
+                return b"".join(chunks).decode("utf-8")
+
+    async def close(self):
+        try:
+            await self.send(b"", opcode=0x8)
+        except Exception:
+            pass
+        self.writer.close()
+
+
+# ---------------- CDP ----------------
+class CDPConnection:
+    """Kết nối CDP tới browser endpoint, dùng flatten session cho từng tab"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._next_id = 0
+        self._pending = {}
+        self._waiters = []  # (method, session_id, future)
+        self._listeners = {}  # (method, session_id) -> callback(params), gọi cho mọi sự kiện
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+
+    @classmethod
+    async def connect(cls, ws_url):
+        return cls(await WebSocket.connect(ws_url))
+
+    async def send(self, method, params=None, session_id=None, timeout=30):
+        self._next_id += 1
+        message = {"id": self._next_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        await self.ws.send(json.dumps(message))
+        return await asyncio.wait_for(future, timeout)
+
+    def wait_for_event(self, method, session_id=None):
+        """Đăng ký chờ sự kiện (gọi TRƯỚC lệnh gây ra sự kiện), trả về future"""
+        future = asyncio.get_running_loop().create_future()
+        # Bỏ các waiter đã huỷ / quá thời gian
+        self._waiters = [w for w in self._waiters if not w[2].done()]
+        self._waiters.append((method, session_id, future))
+        return future
+
+    def on(self, method, session_id, callback):
+        """Đăng ký callback(params) cho mọi sự kiện method của session (None để huỷ)"""
+        if callback is None:
+            self._listeners.pop((method, session_id), None)
+        else:
+            self._listeners[(method, session_id)] = callback
+
+    async def _read_loop(self):
+        try:
+            while True:
+                raw = await self.ws.recv()
+                if raw is None:
+                    break
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.pop(message["id"], None)
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(CDPError(message["error"].get("message", "CDP error")))
+                        else:
+                            future.set_result(message.get("result", {}))
+                    continue
+                method = message.get("method")
+                session_id = message.get("sessionId")
+                listener = self._listeners.get((method, session_id))
+                if listener:
+                    listener(message.get("params", {}))
+                for waiter in list(self._waiters):
+                    if waiter[0] == method and waiter[1] == session_id:
+                        self._waiters.remove(waiter)
+                        if not waiter[2].done():
+                            waiter[2].set_result(message.get("params", {}))
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for future in list(self._pending.values()) + [w[2] for w in self._waiters]:
+                if not future.done():
+                    future.set_exception(CDPError("Kết nối DevTools đã đóng"))
+
+    async def close(self):
+        self._reader_task.cancel()
+        await self.ws.close()
+
+
+class CDPPage:
+    """Một tab điều khiển qua CDP session"""
+
+    def __init__(self, conn, target_id, session_id):
+        self.conn = conn
+        self.target_id = target_id
+        self.session_id = session_id
+        self.proxy = None
+
+    async def send(self, method, params=None, timeout=30):
+        return await self.conn.send(method, params, self.session_id, timeout)
+
+    async def navigate(self, url, wait_event="Page.loadEventFired", timeout=30):
+        """Điều hướng và chờ sự kiện tải trang (loadEventFired hoặc domContentEventFired)"""
+        # Chờ lượt giới hạn tốc độ ở thread pool để không chặn event loop
+        await asyncio.get_running_loop().run_in_executor(None, get_rate_limiter().acquire, url, self.proxy)
+        loaded = self.conn.wait_for_event(wait_event, self.session_id)
+        result = await self.send("Page.navigate", {"url": url}, timeout)
+        if result.get("errorText"):
+            loaded.cancel()
+            raise CDPError(f"{result['errorText']}: {url}")
+        await asyncio.wait_for(loaded, timeout)
+
+    async def evaluate(self, expression, timeout=30):
+        """Chạy JS và trả về giá trị (returnByValue)"""
+        result = await self.send("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": True
+        }, timeout)
+        if result.get("exceptionDetails"):
+            raise CDPError(result["exceptionDetails"].get("text", "JS error"))
+        return result.get("result", {}).get("value")
+
+    async def wait_for_element(self, selector, timeout=10, interval=0.2):
+        """Chờ tới khi selector xuất hiện; trả về True/False"""
+        expression = f"!!document.querySelector({json.dumps(selector)})"
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            if await self.evaluate(expression):
+                return True
+            if asyncio.get_running_loop().time() > deadline:
+                return False
+            await asyncio.sleep(interval)
+
+    async def track_traffic(self, task=None):
+        """Cộng encodedDataLength của mọi response vào TrafficMeter theo self.proxy"""
+        if not self.proxy:
+            return
+        meter = get_traffic_meter()
+        await self.send("Network.enable")
+        self.conn.on(
+            "Network.loadingFinished", self.session_id,
+            lambda params: meter.record(self.proxy, task, bytes_down=int(params.get("encodedDataLength", 0)), requests=1)
+        )
+
+    async def close(self):
+        self.conn.on("Network.loadingFinished", self.session_id, None)
+        try:
+            await self.conn.send("Target.closeTarget", {"targetId": self.target_id})
+        except CDPError:
+            pass
+
+
+class CDPBrowser:
+    """Trình duyệt khởi chạy với --remote-debugging-port (không qua chromedriver)"""
+
+    def __init__(self, process, conn, user_data_dir, temp_profile):
+        self.process = process
+        self.conn = conn
+        self.user_data_dir = user_data_dir
+        self.temp_profile = temp_profile
+        self.reaper_handle = None
+
+    @classmethod
+    async def launch(cls, binary=None, headless=True, proxy=None, user_data_dir=None, timeout=20):
+        binary = find_browser_binary(binary)
+        if not binary:
+            raise CDPError("Không tìm thấy Brave/Chrome để khởi chạy")
+
+        temp_profile = user_data_dir is None
+        user_data_dir = user_data_dir or tempfile.mkdtemp(prefix="cdp_profile_")
+        args = [
+            binary,
+            "--remote-debugging-port=0",
+            f"--user-data-dir={user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--disable-notifications",
+            "--disable-blink-features=AutomationControlled",
+            f"--lang={BROWSER_LOCALE},{BROWSER_LOCALE.split('-')[0]}",
+            "about:blank"
+        ]
+        if headless:
+            args.insert(1, "--headless=new")
+        if proxy:
+            args.insert(1, f"--proxy-server={proxy}")
+
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+
+        # Trình duyệt in endpoint websocket ra stderr
+        async def read_endpoint():
+            while True:
+                line = await process.stderr.readline()
+                if not line:
+                    raise CDPError("Trình duyệt thoát trước khi mở DevTools")
+                match = DEVTOOLS_RE.search(line.decode("utf-8", "ignore"))
+                if match:
+                    return match.group(1)
+
+        try:
+            ws_url = await asyncio.wait_for(read_endpoint(), timeout)
+        except Exception:
+            process.kill()
+            raise
+        # Đọc bỏ stderr còn lại để pipe không bị đầy
+        asyncio.ensure_future(cls._drain(process.stderr))
+        conn = await CDPConnection.connect(ws_url)
+        return cls(process, conn, user_data_dir, temp_profile)
+
+    @staticmethod
+    async def _drain(stream):
+        try:
+            while await stream.readline():
+                pass
+        except Exception:
+            pass
+
+    async def new_page(self):
+        """Mở tab mới và gắn session CDP"""
+        target = await self.conn.send("Target.createTarget", {"url": "about:blank"})
+        attached = await self.conn.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        page = CDPPage(self.conn, target["targetId"], attached["sessionId"])
+        await page.send("Page.enable")
+        await page.send("Runtime.enable")
+        return page
+
+    async def close(self):
+        try:
+            await self.conn.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        await self.conn.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), 5)
+        except asyncio.TimeoutError:
+            self.process.kill()
+        if self.temp_profile:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+
+# ---------------- TÁC VỤ ASYNC ----------------
+async def google_search(page, keyword, max_results=10):
+    """Tìm kiếm Google, trả về danh sách dict (Tiêu đề, URL, Mô tả)"""
+    url = "https://www.google.com/search?" + urllib.parse.urlencode({"q": keyword, "num": max_results})
+    await page.navigate(url, wait_event="Page.domContentEventFired")
+    await page.wait_for_element("#search", timeout=10)
+    expression = f"(function () {{ {GOOGLE_RESULTS_JS} }}).apply(null, [{int(max_results)}])"
+    return await page.evaluate(expression) or []
+
+
+async def shopee_scrape(page, keyword, max_results=10, pages=1):
+    """Lấy sản phẩm Shopee, trả về danh sách (tên, giá, link)"""
+    url = "https://shopee.vn/search?" + urllib.parse.urlencode({"keyword": keyword})
+    await page.navigate(url)
+    if not await page.wait_for_element(".shopee-search-item-result__item", timeout=10):
+        return []
+    for _ in range(min(pages, 5)):
+        await page.evaluate("window.scrollBy(0, 800)")
+        await asyncio.sleep(1)
+    return [tuple(row) for row in (await page.evaluate(SHOPEE_RESULTS_JS % int(max_results)) or [])]
+
+
+async def wait_for_element(page, selector, timeout=10):
+    """Phiên bản async của wait_for_element cho CDPPage"""
+    return await page.wait_for_element(selector, timeout)
+
+
+# ---------------- ENGINE ----------------
+class _ReaperHandle:
+    """Đại diện trình duyệt CDP trong BrowserReaper (cùng giao diện driver: service.process.pid, quit())"""
+
+    def __init__(self, engine, key, browser):
+        self.engine = engine
+        self.key = key
+        self.browser = browser
+        self.service = SimpleNamespace(process=browser.process)
+
+    def quit(self):
+        # Gọi từ thread khác (reaper / GUI); không chặn chính event loop
+        if threading.current_thread() is self.engine._thread:
+            return
+        try:
+            self.engine.submit(self.engine._close_browser(self.key, self.browser)).result(10)
+        except Exception:
+            pass
+
+
+class CDPEngine:
+    """
+    Một event loop nền dùng chung cho mọi tác vụ CDP.
+    Trình duyệt được giữ lại theo (proxy, headless) và mỗi tác vụ chạy trong một tab riêng.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="CDPEngine", daemon=True)
+        self._browsers = {}
+        self._browser_locks = {}
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Gửi coroutine vào event loop, trả về concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def browser(self, proxy=None, headless=True, binary=None):
+        """Lấy (hoặc khởi chạy) trình duyệt dùng chung cho cấu hình này"""
+        key = (proxy or "", bool(headless))
+        lock = self._browser_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            browser = self._browsers.get(key)
+            if browser is None or browser.process.returncode is not None:
+                if browser is not None:
+                    get_browser_reaper().unregister(browser.reaper_handle)
+                browser = await CDPBrowser.launch(binary=binary, headless=headless, proxy=proxy)
+                browser.reaper_handle = _ReaperHandle(self, key, browser)
+                get_browser_reaper().register(browser.reaper_handle, owner=f"cdp {proxy}" if proxy else "cdp")
+                self._browsers[key] = browser
+            return browser
+
+    async def _close_browser(self, key, browser):
+        if self._browsers.get(key) is browser:
+            del self._browsers[key]
+        get_browser_reaper().unregister(browser.reaper_handle)
+        await browser.close()
+
+    async def run_task(self, task, keyword, max_results=10, pages=1, proxy=None, headless=True, binary=None):
+        """Chạy google / shopee trong một tab mới rồi đóng tab"""
+        browser = await self.browser(proxy, headless, binary)
+        page = await browser.new_page()
+        page.proxy = proxy
+        await page.track_traffic(task)
+        try:
+            if task == "google":
+                return await google_search(page, keyword, max_results)
+            if task == "shopee":
+                return await shopee_scrape(page, keyword, max_results, pages)
+            raise ValueError(f"CDP engine không hỗ trợ task: {task}")
+        finally:
+            await page.close()
+
+    async def _close_all(self):
+        for key, browser in list(self._browsers.items()):
+            try:
+                await self._close_browser(key, browser)
+            except Exception as e:
+                logging.error(f"Lỗi đóng trình duyệt CDP: {e}")
+
+    def shutdown(self, timeout=10):
+        """Đóng mọi trình duyệt và dừng event loop"""
+        try:
+            self.submit(self._close_all()).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_cdp_engine():
+    """Trả về CDPEngine dùng chung (khởi tạo khi cần)"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = CDPEngine()
+        return _engine
+
+
+def shutdown_cdp_engine():
+    """Dừng CDPEngine nếu đã được khởi tạo"""
+    global _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine:
+        engine.shutdown()
@@ -84,3 +84,125 @@ USER_AGENTS = [
 # --- Cấu hình đặc biệt dành cho Brave ---
 BRAVE_PATH = r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe"
 BRAVE_PROFILE_PATH = r"C:\Users\admin\AppData\Local\BraveSoftware\Brave-Browser\User Data\Default"
+BROWSER_LOCALE = "vi-VN"  # ngôn ngữ trình duyệt (--lang), cũng là phần locale của khoá cache kết quả
+
+# --- Cache kết quả tìm kiếm ---
+RESULT_CACHE_TTL = 900  # giây (15 phút)
+RESULT_CACHE_MEMORY_SIZE = 256  # số kết quả giữ trong bộ nhớ (LRU)
+
+# --- Lưu screenshot / artifact ---
+ARTIFACT_FORMAT = "webp"  # webp, jpg hoặc png
+ARTIFACT_QUALITY = 80
+ARTIFACT_MAX_DIMENSION = 1600  # px, ảnh lớn hơn sẽ được thu nhỏ
+ARTIFACT_MAX_TOTAL_MB = 200  # dung lượng tối đa mỗi thư mục
+ARTIFACT_MAX_AGE_DAYS = 14
+
+# --- Nhân bản profile cho nhiều trình duyệt song song ---
+PROFILE_CLONE_ENABLED = False  # True: mỗi trình duyệt dùng bản sao profile riêng thay vì User Data thật
+PROFILE_TEMPLATE_MAX_AGE = 6 * 3600  # giây, sau thời gian này chụp lại profile mẫu
+
+# --- Giới hạn tiến trình trình duyệt ---
+BROWSER_MAX_RSS_MB = 1500  # RSS tối đa của một trình duyệt (chromedriver + Brave)
+BROWSER_MAX_IDLE = 2  # số trình duyệt được giữ mở khi không chạy task
+BROWSER_REAPER_INTERVAL = 30  # giây giữa 2 lần kiểm tra
+
+# --- Chạy nhiều tab trong một trình duyệt ---
+TABS_PER_BROWSER = 4  # số tab tối đa mỗi trình duyệt cho tác vụ nhẹ (google_batch)
+
+# --- Engine điều khiển trình duyệt ---
+AUTOMATION_ENGINE = "selenium"  # "selenium" hoặc "cdp" (asyncio qua DevTools, không cần chromedriver)
+CDP_TASK_TIMEOUT = 120  # giây tối đa cho một tác vụ CDP (google/shopee)
+
+# --- Hàng đợi tác vụ (nhiều tiến trình / nhiều máy) ---
+JOB_QUEUE_PATH = ""  # để trống: data/job_queue.db; có thể trỏ tới thư mục chia sẻ
+JOB_QUEUE_JOURNAL_MODE = ""  # để trống: WAL trên ổ cục bộ, DELETE trên thư mục mạng
+JOB_LEASE_SECONDS = 120  # worker phải heartbeat trước khi lease hết hạn
+JOB_MAX_ATTEMPTS = 3  # hết lượt thử thì job vào dead-letter
+JOB_RETRY_DELAY = 30  # giây, nhân đôi sau mỗi lần lỗi
+
+# --- WebDriver từ xa (Selenium Grid / node) ---
+# Mỗi node: {"url": "http://192.168.1.20:4444", "max_sessions": 4, "binary": "/usr/bin/brave-browser",
+#            "user_data_dir": None, "name": "node-1"}
+WEBDRIVER_NODES = []  # để trống: chỉ chạy trình duyệt trên máy này
+WEBDRIVER_LOCAL_FALLBACK = True  # hết node trống thì chạy cục bộ
+WEBDRIVER_NODE_WAIT = 60  # giây chờ node có chỗ trống
+
+# --- Giới hạn tốc độ theo domain / proxy ---
+RATE_LIMITS = {  # domain -> (yêu cầu/giây, burst)
+    "google.com": (0.5, 3),
+    "google.com.vn": (0.5, 3),
+    "shopee.vn": (1.0, 4),
+    "facebook.com": (0.5, 2),
+}
+RATE_LIMIT_DEFAULT = (2.0, 5)  # domain không có trong RATE_LIMITS
+RATE_LIMIT_PER_PROXY = (1.0, 3)  # mỗi proxy, mọi domain
+RATE_LIMIT_MAX_PENALTY = 16  # captcha / 429 nhân đôi thời gian giữa các yêu cầu, tối đa 16 lần
+RATE_LIMIT_SHARED_DB = ""  # đặt đường dẫn SQLite để nhiều tiến trình dùng chung (vd: data/rate_limits.db)
+
+# --- Pipeline tác vụ (xu hướng -> nội dung) ---
+PIPELINE_MAX_WORKERS = 3  # số bước chạy song song (mỗi bước có thể mở 1 trình duyệt)
+PIPELINE_CACHE_TTL = 1800  # giây giữ kết quả trung gian (xu hướng, nội dung)
+
+# --- Kho proxy ---
+PROXY_IMPORT_BATCH_SIZE = 5000  # số proxy ghi vào SQLite mỗi lô khi nhập hàng loạt
+
+# --- Proxy chuyển tiếp cục bộ (đổi proxy không cần khởi động lại trình duyệt) ---
+PROXY_RELAY_ENABLED = True  # trình duyệt cục bộ đi qua 127.0.0.1:<cổng riêng>, relay chuyển tiếp tới proxy thật
+PROXY_RELAY_HOST = "127.0.0.1"
+PROXY_RELAY_POOL_SIZE = 2  # số kết nối dựng sẵn tới mỗi proxy upstream
+PROXY_RELAY_POOL_IDLE = 30  # giây, kết nối dựng sẵn rảnh lâu hơn thì bỏ
+
+# --- Đếm lưu lượng proxy ---
+TRAFFIC_FLUSH_INTERVAL = 30  # giây giữa các lần ghi bộ đếm xuống data/traffic.db
+TRAFFIC_BALANCE_ENABLED = True  # xoay proxy ưu tiên proxy đã dùng ít byte nhất
+
+# --- Theo dõi sức khoẻ proxy ở nền ---
+PROXY_HEALTH_ENABLED = True  # tự kiểm tra lại proxy theo lịch thích ứng khi mở trang Proxy
+PROXY_HEALTH_CONCURRENCY = 20  # số proxy được kiểm tra đồng thời tối đa
+PROXY_HEALTH_TIMEOUT = 8  # giây, timeout mỗi lần kiểm tra
+PROXY_HEALTH_HEALTHY_INTERVAL = 900  # giây, proxy ổn định
+PROXY_HEALTH_FLAPPING_INTERVAL = 60  # giây, proxy chập chờn (đổi trạng thái liên tục)
+PROXY_HEALTH_DEAD_BASE = 120  # giây, proxy chết: 120s, 240s, 480s... (backoff luỹ thừa)
+PROXY_HEALTH_DEAD_MAX = 6 * 3600  # giây, trần backoff cho proxy chết
+PROXY_HEALTH_HISTORY = 10  # số mẫu độ trễ giữ lại cho mỗi proxy
+PROXY_HEALTH_STARTUP_SPREAD = 120  # giây, rải lần kiểm tra đầu tiên để không dồn cục khi khởi động
+
+# --- Quốc gia / ASN của proxy (cơ sở dữ liệu dải IP cục bộ) ---
+# File trong data/, file nào có thì dùng; CSV / TSV tự biên dịch thành .bin, .mmdb cần gói maxminddb
+GEOIP_DATABASES = ["geoip.csv", "ip2asn-v4.tsv", "GeoLite2-Country.mmdb", "GeoLite2-ASN.mmdb"]
+GEOIP_CACHE_SIZE = 50000  # số IP giữ trong cache tra cứu
+
+# --- Client 2Captcha ---
+TWOCAPTCHA_URL = "https://2captcha.com"
+CAPTCHA_POLL_INTERVAL = 5  # giây giữa các lần hỏi kết quả (mọi captcha đang chờ hỏi chung một lô)
+CAPTCHA_FIRST_POLL_RECAPTCHA = 15  # giây, reCAPTCHA hiếm khi xong sớm hơn
+CAPTCHA_FIRST_POLL_IMAGE = 5  # giây, captcha ảnh
+CAPTCHA_POOL_SIZE = 4  # số kết nối keep-alive tới 2Captcha
+CAPTCHA_HTTP_TIMEOUT = 30  # giây, timeout mỗi request tới 2Captcha
+
+# --- Token reCAPTCHA giải sẵn ---
+CAPTCHA_PREFETCH_ENABLED = True  # giải trước token theo tốc độ gặp captcha (chỉ khi dùng 2Captcha)
+CAPTCHA_TOKEN_TTL = 110  # giây, token reCAPTCHA hết hạn sau ~120s
+CAPTCHA_PREFETCH_MAX = 5  # số token (sẵn + đang giải) tối đa cho mỗi sitekey + trang
+CAPTCHA_RATE_WINDOW = 600  # giây, cửa sổ tính tốc độ gặp captcha
+CAPTCHA_PREFETCH_SOLVE_TIMEOUT = 180  # giây, thời gian chờ tối đa cho một token giải trước
+
+# --- Cache đáp án captcha ảnh (perceptual hash) ---
+CAPTCHA_PHASH_ENABLED = True
+CAPTCHA_PHASH_MAX_DISTANCE = 6  # số bit khác nhau tối đa (trên 64) để coi là cùng một ảnh
+CAPTCHA_PHASH_PENDING_TTL = 24 * 3600  # giây, đáp án chưa từng được xác nhận đúng quá hạn này thì bị xoá
+CAPTCHA_PHASH_PENDING_MAX = 500  # số đáp án chưa xác nhận tối đa cho mỗi domain (xoá cái cũ nhất)
+
+# --- Phát hiện captcha sau mỗi lần điều hướng ---
+CAPTCHA_AUTO_SOLVE = True  # worker gửi reCAPTCHA / captcha ảnh cho 2Captcha (nếu đã cấu hình) trước khi đổi proxy
+CAPTCHA_SUBMIT_WAIT = 10  # giây chờ trang tải lại sau khi submit đáp án captcha
+CAPTCHA_CALLBACK_WAIT = 3  # giây chờ callback reCAPTCHA của trang tự submit trước khi tự gửi form
+
+# --- Theo dõi tài nguyên tiến trình (dashboard) ---
+RESOURCE_SAMPLE_INTERVAL = 2  # giây giữa các lần lấy mẫu CPU / RSS / handle ở thread nền
+RESOURCE_HISTORY = 300  # số mẫu giữ trong ring buffer (300 x 2s = 10 phút)
+
+# --- Endpoint số liệu kiểu Prometheus ---
+METRICS_ENABLED = False  # bật endpoint GET /metrics khi khởi động ứng dụng
+METRICS_HOST = "127.0.0.1"  # chỉ nghe cục bộ; đổi thành "0.0.0.0" nếu Prometheus scrape từ máy khác
+METRICS_PORT = 9464
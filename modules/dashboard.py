@@ -6,13 +6,16 @@ from PyQt5.QtWidgets import (
     QTabWidget, QListWidget, QListWidgetItem, QTextEdit, QTextBrowser, QSplitter, QMessageBox,
     QScrollArea, QCheckBox
 )
-from PyQt5.QtGui import QFont, QPixmap, QIcon, QBrush, QColor, QDesktopServices
-from PyQt5.QtCore import Qt, QSize, QTimer, pyqtSignal, QUrl
+from PyQt5.QtGui import QFont, QPixmap, QIcon, QBrush, QColor, QDesktopServices, QPainter, QPen, QPolygonF
+from PyQt5.QtCore import Qt, QSize, QTimer, pyqtSignal, QUrl, QPointF
 import os
 import time
-import psutil
 from datetime import datetime
 
+from .result_cache import get_result_cache
+from .scheduler_store import get_scheduler_store
+from .resource_monitor import get_resource_monitor, GROUP_APP, GROUP_BROWSERS, GROUP_OTHER
+
 class StatCard(QFrame):
     """
     Card hiển thị thông số thống kê (StatCard).
@@ -58,6 +61,36 @@ class StatCard(QFrame):
         """Cập nhật giá trị hiển thị trên card."""
         self.value_label.setText(str(new_value))
 
+class Sparkline(QWidget):
+    """Biểu đồ đường nhỏ cho một chuỗi số (vẽ lại khi set_values)"""
+
+    def __init__(self, color="#0d6efd", parent=None):
+        super().__init__(parent)
+        self.color = QColor(color)
+        self.values = []
+        self.setMinimumSize(120, 28)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def set_values(self, values):
+        self.values = list(values)
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self.values) < 2:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(self.color, 1.5))
+        width, height = self.width() - 2, self.height() - 2
+        top = max(self.values) or 1
+        step = width / (len(self.values) - 1)
+        painter.drawPolyline(QPolygonF([
+            QPointF(1 + i * step, 1 + height - value / top * height)
+            for i, value in enumerate(self.values)
+        ]))
+        painter.end()
+
+
 class TrendingTopicItem(QWidget):
     """
     Widget hiển thị thông tin về một chủ đề trending
@@ -597,8 +630,52 @@ class DashboardWidget(QWidget):
         # Add content widget to tabs
         self.content_widget = ContentWidget()
         
+        # Lịch sử chạy theo lịch: thời lượng vẽ bằng thanh ngang (tỉ lệ với lần chạy lâu nhất)
+        self.runs_tab = QWidget()
+        runs_layout = QVBoxLayout(self.runs_tab)
+        self.runs_table = QTableWidget(0, 5)
+        self.runs_table.setObjectName("runsTable")
+        self.runs_table.setHorizontalHeaderLabels(["Task", "Bắt đầu", "Thời lượng", "Trạng thái", "Lỗi"])
+        self.runs_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.runs_table.setAlternatingRowColors(True)
+        self.runs_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.runs_table.setSelectionBehavior(QTableWidget.SelectRows)
+        runs_layout.addWidget(self.runs_table)
+        self.runs_summary_label = QLabel("")
+        self.runs_summary_label.setFont(QFont("Segoe UI", 10))
+        runs_layout.addWidget(self.runs_summary_label)
+        
+        # Tài nguyên: CPU / RAM của ứng dụng + trình duyệt theo thời gian và theo từng trình duyệt
+        self.resources_tab = QWidget()
+        resources_layout = QVBoxLayout(self.resources_tab)
+        resources_grid = QGridLayout()
+        self.resource_sparklines = {}
+        for row, (group, title, color) in enumerate((
+            (GROUP_APP, "Ứng dụng", "#0d6efd"),
+            (GROUP_BROWSERS, "Trình duyệt", "#fd7e14"),
+            (GROUP_OTHER, "Tiến trình khác", "#6c757d"),
+        )):
+            cpu_line, rss_line = Sparkline(color), Sparkline(color)
+            value_label = QLabel("")
+            value_label.setFont(QFont("Segoe UI", 10))
+            resources_grid.addWidget(QLabel(title), row, 0)
+            resources_grid.addWidget(cpu_line, row, 1)
+            resources_grid.addWidget(rss_line, row, 2)
+            resources_grid.addWidget(value_label, row, 3)
+            self.resource_sparklines[group] = (cpu_line, rss_line, value_label)
+        resources_layout.addLayout(resources_grid)
+        self.browsers_table = QTableWidget(0, 6)
+        self.browsers_table.setObjectName("browsersTable")
+        self.browsers_table.setHorizontalHeaderLabels(["PID", "Task", "CPU", "RAM", "Handle", "Tiến trình"])
+        self.browsers_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.browsers_table.setAlternatingRowColors(True)
+        self.browsers_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        resources_layout.addWidget(self.browsers_table)
+        
         # Add tabs
         self.main_tabs.addTab(self.tasks_tab, "Các Task gần đây")
+        self.main_tabs.addTab(self.runs_tab, "Lịch sử lịch chạy")
+        self.main_tabs.addTab(self.resources_tab, "Tài nguyên")
         self.main_tabs.addTab(self.trending_widget, "Xu hướng & Trending")
         self.main_tabs.addTab(self.content_widget, "Nội dung")
         
@@ -622,9 +699,14 @@ class DashboardWidget(QWidget):
         self.memory_progress.setValue(45)
         self.memory_progress.setFormat("Memory: %p%")
         
+        self.cache_label = QLabel("Cache: 0 hit / 0 miss")
+        self.cache_label.setObjectName("cacheLabel")
+        self.cache_label.setFont(QFont("Segoe UI", 10))
+        
         status_layout.addWidget(self.status_label)
         status_layout.addWidget(self.cpu_progress)
         status_layout.addWidget(self.memory_progress)
+        status_layout.addWidget(self.cache_label)
         main_layout.addLayout(status_layout)
         
         # Add sample data
@@ -672,25 +754,83 @@ class DashboardWidget(QWidget):
 
     def update_system_stats(self):
         """
-        Cập nhật thống kê hệ thống (CPU, Memory) từ thông tin thực tế
+        Cập nhật CPU / Memory và tab Tài nguyên từ mẫu của ResourceMonitor
+        (psutil chỉ được gọi ở thread nền, ở đây chỉ đọc ring buffer và vẽ)
         """
-        try:
-            # Cập nhật CPU
-            cpu_percent = psutil.cpu_percent()
-            self.cpu_progress.setValue(int(cpu_percent))
+        monitor = get_resource_monitor()
+        snapshot = monitor.snapshot()
+        host = snapshot["host"]
+        if host:
+            self.cpu_progress.setValue(int(host["cpu"]))
+            self.memory_progress.setValue(int(host["memory"]))
+        
+        for group, (cpu_line, rss_line, value_label) in self.resource_sparklines.items():
+            cpu_line.set_values(monitor.history(group, "cpu"))
+            rss_line.set_values(monitor.history(group, "rss_mb"))
+            latest = snapshot["groups"][group]
+            if latest:
+                value_label.setText(
+                    f"CPU {latest['cpu']:.1f}% · RAM {latest['rss_mb']:.0f} MB · "
+                    f"{int(latest['handles'])} handle · {int(latest['procs'])} tiến trình"
+                )
+        
+        browsers = snapshot["browsers"]
+        self.browsers_table.setRowCount(len(browsers))
+        for row, browser in enumerate(browsers):
+            values = [
+                str(browser["pid"]),
+                browser["owner"],
+                f"{browser['cpu']:.1f}%",
+                f"{browser['rss_mb']:.0f} MB",
+                str(int(browser["handles"])),
+                str(int(browser["procs"])),
+            ]
+            for column, value in enumerate(values):
+                self.browsers_table.setItem(row, column, QTableWidgetItem(value))
+            
+        self.update_cache_stats()
+
+    def update_cache_stats(self):
+        """Hiển thị số lần hit/miss của cache kết quả tìm kiếm"""
+        stats = get_result_cache().get_stats()
+        self.cache_label.setText(
+            f"Cache: {stats['hits']} hit / {stats['misses']} miss ({stats['hit_rate']}%)"
+        )
+
+    def update_run_history(self, limit=50):
+        """Hiển thị các lần chạy theo lịch gần nhất và thời lượng trung bình theo task"""
+        store = get_scheduler_store()
+        runs = store.recent_runs(limit=limit)
+        longest = max((run["duration"] or 0 for run in runs), default=0) or 1
+        
+        self.runs_table.setRowCount(len(runs))
+        for row, run in enumerate(runs):
+            self.runs_table.setItem(row, 0, QTableWidgetItem(run["task_name"] or run["task_id"]))
+            started = datetime.fromtimestamp(run["started_at"]).strftime("%d/%m %H:%M:%S")
+            self.runs_table.setItem(row, 1, QTableWidgetItem(started))
             
-            # Cập nhật Memory
-            memory = psutil.virtual_memory()
-            self.memory_progress.setValue(int(memory.percent))
-        except:
-            # Fallback nếu không thể lấy thông tin hệ thống thực
-            import random
-            self.cpu_progress.setValue(random.randint(20, 80))
-            self.memory_progress.setValue(random.randint(30, 70))
+            bar = QProgressBar()
+            bar.setRange(0, 1000)
+            bar.setValue(int((run["duration"] or 0) / longest * 1000))
+            bar.setFormat(f"{run['duration']:.1f}s" if run["duration"] is not None else "đang chạy")
+            self.runs_table.setCellWidget(row, 2, bar)
+            
+            status_item = QTableWidgetItem(run["status"])
+            color = {"Completed": "#4cd137", "Failed": "#e84118"}.get(run["status"], "#fbc531")
+            status_item.setForeground(QBrush(QColor(color)))
+            self.runs_table.setItem(row, 3, status_item)
+            self.runs_table.setItem(row, 4, QTableWidgetItem(run["error"] or ""))
+        
+        summary = [
+            f"{item['task_name'] or item['task_id']}: {item['run_count']} lần, TB {item['avg_duration'] or 0:.1f}s, lỗi {item['failures']}"
+            for item in store.duration_stats()[:5]
+        ]
+        self.runs_summary_label.setText(" | ".join(summary) or "Chưa có lần chạy theo lịch nào")
 
     def refresh_data(self):
         """Cập nhật số liệu và làm mới danh sách task."""
         self.update_system_stats()
+        self.update_run_history()
         # Nếu có logic lấy dữ liệu thực, thêm vào đây
 
     def run_new_task(self):
@@ -0,0 +1,290 @@
+# modules/driver_factory.py
+
+"""
+Tạo WebDriver cục bộ hoặc trên máy khác (Selenium Grid hub / node, selenium
+standalone server, chromedriver chạy với --allowed-ips).
+
+- Danh sách node lấy từ WEBDRIVER_NODES (config.py), mỗi node có giới hạn số
+  phiên chạy đồng thời (max_sessions) và binary Brave riêng trên máy đó
+- Chọn node theo độ trễ /status (EWMA) nhân với mức tải hiện tại
+- Options của Brave được chuyển sang node: bỏ đường dẫn chỉ có trên máy GUI
+  (binary, user-data-dir), thay bằng cấu hình của node
+- Script chống phát hiện automation được cài qua CDP cho cả driver cục bộ và từ xa
+- Hết node trống thì chờ (WEBDRIVER_NODE_WAIT) rồi chạy cục bộ nếu được phép
+- driver.quit() của phiên từ xa trả chỗ trên node; worker đăng ký phiên với
+  BrowserReaper nên phiên giữ mở / bị bỏ sót vẫn được quit() và trả chỗ
+"""
+
+import copy
+import json
+import time
+import logging
+import threading
+import urllib.request
+
+from selenium import webdriver
+
+from .config import WEBDRIVER_NODES, WEBDRIVER_LOCAL_FALLBACK, WEBDRIVER_NODE_WAIT
+
+# Script chống phát hiện automation (cài trước khi trang chạy script của nó)
+STEALTH_SCRIPT = '''
+    // Ghi đè thuộc tính navigator.webdriver
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // Xóa thuộc tính cdriver
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Array;
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Promise;
+    delete window.cdc_adoQpoasnfa76pfcZLmcfl_Symbol;
+
+    // Giả mạo plugins như Brave
+    const makePluginInfo = (name, filename) => {
+        return {
+            name,
+            filename,
+            description: 'Portable Document Format',
+            length: 1,
+            item: () => null
+        };
+    };
+
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => {
+            const plugins = [
+                makePluginInfo('PDF Viewer', 'internal-pdf-viewer'),
+                makePluginInfo('Brave PDF Plugin', 'internal-pdf-viewer'),
+                makePluginInfo('Brave PDF Viewer', 'mhjfbmdgcfjbbpaeojofohoefgiehjai'),
+                makePluginInfo('Native Client', 'internal-nacl-plugin')
+            ];
+
+            // Thêm thuộc tính namedItem
+            plugins.namedItem = name => plugins.find(p => p.name === name);
+
+            return plugins;
+        }
+    });
+
+    // Sử dụng thông tin OS chính xác
+    Object.defineProperty(navigator, 'platform', {
+        get: () => 'Win32'
+    });
+
+    // Thiết lập ngôn ngữ
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['vi-VN', 'vi', 'en-US', 'en'],
+    });
+
+    // Thiết lập JavaScriptEngine giống Brave
+    Object.defineProperty(navigator, 'appVersion', {
+        get: () => '5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36'
+    });
+
+    // Ghi đè permissions API
+    if (window.navigator.permissions) {
+        const originalQuery = window.navigator.permissions.query;
+        window.navigator.permissions.__proto__.query = parameters => {
+            if (parameters.name === 'notifications' ||
+                parameters.name === 'clipboard-read' ||
+                parameters.name === 'clipboard-write') {
+                return Promise.resolve({state: Notification.permission});
+            }
+            return originalQuery(parameters);
+        };
+    }
+'''
+
+# Tham số dòng lệnh trỏ tới đường dẫn trên máy GUI, không dùng được trên node khác
+LOCAL_ONLY_ARGS = ("--user-data-dir=", "--profile-directory=")
+
+
+def execute_cdp(driver, cmd, params=None):
+    """Gọi lệnh CDP trên driver cục bộ hoặc Remote (endpoint goog/cdp/execute của chromedriver)"""
+    if hasattr(driver, "execute_cdp_cmd"):
+        return driver.execute_cdp_cmd(cmd, params or {})
+    driver.command_executor.add_command("executeCdpCommand", "POST", "/session/$sessionId/goog/cdp/execute")
+    return driver.execute("executeCdpCommand", {"cmd": cmd, "params": params or {}})["value"]
+
+
+def apply_stealth(driver, script=STEALTH_SCRIPT):
+    """Cài script chống phát hiện cho mọi document mới của driver"""
+    try:
+        execute_cdp(driver, "Page.addScriptToEvaluateOnNewDocument", {"source": script})
+        return True
+    except Exception as e:
+        logging.warning(f"Không cài được stealth script: {e}")
+        return False
+
+
+class WebDriverNode:
+    """Một endpoint WebDriver từ xa và số phiên đang chạy trên đó"""
+
+    def __init__(self, url, max_sessions=2, binary=None, user_data_dir=None, name=None):
+        self.url = url.rstrip("/")
+        self.max_sessions = max(1, int(max_sessions))
+        self.binary = binary
+        self.user_data_dir = user_data_dir
+        self.name = name or self.url
+        self.active = 0
+        self.latency = None  # EWMA giây của /status
+        self.ready = True
+        self.failures = 0
+        self.checked_at = 0.0
+
+    def probe(self, timeout=3.0):
+        """Gọi /status, cập nhật latency + ready"""
+        started = time.time()
+        try:
+            with urllib.request.urlopen(f"{self.url}/status", timeout=timeout) as response:
+                value = json.loads(response.read().decode("utf-8")).get("value", {})
+            self.ready = bool(value.get("ready", True))
+            elapsed = time.time() - started
+            self.latency = elapsed if self.latency is None else self.latency * 0.7 + elapsed * 0.3
+        except Exception:
+            self.ready = False
+        self.checked_at = time.time()
+        return self.ready
+
+    def score(self):
+        """Càng nhỏ càng ưu tiên: độ trễ nhân hệ số tải"""
+        return (self.latency or 1.0) * (1 + self.active / self.max_sessions) * (1 + self.failures)
+
+    def to_options(self, options):
+        """Bản sao options đã bỏ đường dẫn cục bộ và thay bằng cấu hình của node"""
+        mapped = copy.deepcopy(options)
+        mapped.arguments[:] = [arg for arg in mapped.arguments if not arg.startswith(LOCAL_ONLY_ARGS)]
+        mapped.binary_location = self.binary or ""
+        if self.user_data_dir:
+            profile = next((arg for arg in options.arguments if arg.startswith("--profile-directory=")), None)
+            mapped.add_argument(f"--user-data-dir={self.user_data_dir}")
+            if profile:
+                mapped.add_argument(profile)
+        return mapped
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "url": self.url,
+            "active": self.active,
+            "max_sessions": self.max_sessions,
+            "ready": self.ready,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None
+        }
+
+
+class DriverFactory:
+    """Cấp WebDriver: ưu tiên node từ xa (nếu có cấu hình), sau đó tới trình duyệt cục bộ"""
+
+    def __init__(self, nodes=None, local_fallback=WEBDRIVER_LOCAL_FALLBACK,
+                 node_wait=WEBDRIVER_NODE_WAIT, probe_interval=15):
+        self.nodes = [
+            node if isinstance(node, WebDriverNode) else WebDriverNode(**node)
+            for node in (WEBDRIVER_NODES if nodes is None else nodes)
+        ]
+        self.local_fallback = local_fallback
+        self.node_wait = node_wait
+        self.probe_interval = probe_interval
+        self._cond = threading.Condition()
+
+    def has_nodes(self):
+        return bool(self.nodes)
+
+    # ---------------- CHỌN NODE ----------------
+    def _refresh(self):
+        now = time.time()
+        for node in self.nodes:
+            if now - node.checked_at > self.probe_interval:
+                node.probe()
+
+    def acquire_node(self, timeout=None):
+        """Giữ 1 phiên trên node tốt nhất còn chỗ; None nếu hết thời gian chờ"""
+        deadline = time.time() + (self.node_wait if timeout is None else timeout)
+        while True:
+            # Probe mạng ngoài lock để không chặn release_node()
+            self._refresh()
+            with self._cond:
+                free = [n for n in self.nodes if n.ready and n.active < n.max_sessions]
+                if free:
+                    node = min(free, key=lambda n: n.score())
+                    node.active += 1
+                    return node
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(remaining, self.probe_interval))
+
+    def release_node(self, node):
+        with self._cond:
+            node.active = max(0, node.active - 1)
+            self._cond.notify()
+
+    # ---------------- TẠO DRIVER ----------------
+    def create(self, options, local_factory=None, log=None, stealth=True):
+        """
+        Tạo driver từ options của Brave.
+        local_factory(options) tạo driver cục bộ (vd: webdriver.Chrome với Service riêng).
+        """
+        log = log or (lambda message: None)
+        driver = None
+
+        if self.nodes:
+            node = self.acquire_node()
+            if node:
+                driver = self._create_remote(node, options, log)
+            else:
+                log("⚠️ Không có node WebDriver nào còn chỗ trống")
+
+        if driver is None:
+            if self.nodes and not self.local_fallback:
+                raise RuntimeError("Không tạo được WebDriver trên node nào")
+            driver = local_factory(options) if local_factory else webdriver.Chrome(options=options)
+            driver.webdriver_node = None
+
+        if stealth:
+            apply_stealth(driver)
+        return driver
+
+    def _create_remote(self, node, options, log):
+        started = time.time()
+        try:
+            driver = webdriver.Remote(command_executor=node.url, options=node.to_options(options))
+        except Exception as e:
+            node.failures += 1
+            node.checked_at = 0.0  # probe lại ở lần chọn sau
+            self.release_node(node)
+            log(f"⚠️ Node {node.name} lỗi tạo phiên: {str(e)}")
+            return None
+
+        node.failures = 0
+        driver.webdriver_node = node
+        original_quit = driver.quit
+
+        def quit_and_release():
+            # reaper.quit() -> driver.quit(): trả slot của node đúng 1 lần
+            try:
+                original_quit()
+            finally:
+                if getattr(driver, "webdriver_node", None):
+                    driver.webdriver_node = None
+                    self.release_node(node)
+
+        driver.quit = quit_and_release
+        log(f"🌐 Phiên WebDriver trên node {node.name} ({node.active}/{node.max_sessions}, {time.time() - started:.1f}s)")
+        return driver
+
+    def stats(self):
+        with self._cond:
+            return [node.stats() for node in self.nodes]
+
+
+_factory = None
+_factory_lock = threading.Lock()
+
+
+def get_driver_factory():
+    """Trả về DriverFactory dùng chung (node lấy từ WEBDRIVER_NODES)"""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            _factory = DriverFactory()
+        return _factory
@@ -0,0 +1,312 @@
+# modules/geoip.py
+
+"""
+Tra quốc gia / ASN của proxy từ cơ sở dữ liệu dải IP cục bộ (không gọi API).
+
+- Nguồn CSV / TSV (mỗi dòng một dải): start,end,... hoặc network/CIDR,...; các cột
+  còn lại tự nhận diện: mã 2 chữ cái là quốc gia, số / "AS123" là ASN, còn lại là
+  tên nhà mạng (đọc được ip2asn-v4.tsv, IP2Location LITE, file tự xuất...)
+- CSV được biên dịch một lần thành file nhị phân đã sắp xếp (.bin cạnh file gốc,
+  tự biên dịch lại khi CSV mới hơn); file .bin được mmap và tra bằng tìm kiếm nhị
+  phân nên không phải nạp cả bảng vào bộ nhớ
+- File .mmdb (MaxMind GeoLite2) dùng được nếu đã cài gói 'maxminddb'
+- Kết quả tra được cache theo IP; hiện chỉ hỗ trợ IPv4
+"""
+
+import os
+import csv
+import json
+import mmap
+import socket
+import struct
+import bisect
+import threading
+import ipaddress
+
+from .config import DATA_DIR, GEOIP_DATABASES, GEOIP_CACHE_SIZE
+from .proxy_store import parse_proxy_line
+
+try:
+    import maxminddb
+except ImportError:
+    maxminddb = None
+
+MAGIC = b"GEOIPv4\x00"
+HEADER = struct.Struct("<8sIQ")  # magic, số dải, vị trí bảng tên ASN
+RECORD = struct.Struct("<II2sI")  # ip đầu, ip cuối, quốc gia, ASN
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), DATA_DIR)
+
+
+class GeoIPError(Exception):
+    """File cơ sở dữ liệu IP không đọc được"""
+
+
+def _ip_to_int(value):
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return int(ipaddress.IPv4Address(value))
+
+
+def _parse_range_row(fields):
+    """(start, end, country, asn, as_name) từ một dòng CSV, None nếu không phải dải IPv4"""
+    fields = [f.strip() for f in fields]
+    if not fields or not fields[0]:
+        return None
+    try:
+        if "/" in fields[0]:
+            network = ipaddress.IPv4Network(fields[0], strict=False)
+            start, end, rest = int(network.network_address), int(network.broadcast_address), fields[1:]
+        else:
+            start, end, rest = _ip_to_int(fields[0]), _ip_to_int(fields[1]), fields[2:]
+    except (ValueError, IndexError):
+        return None
+
+    country, asn, as_name = "", 0, ""
+    for field in rest:
+        upper = field.upper()
+        if not country and len(field) == 2 and field.isalpha():
+            country = upper
+        elif not asn and (field.isdigit() or (upper.startswith("AS") and upper[2:].isdigit())):
+            asn = int(field.lstrip("ASas"))
+        elif not as_name and field and field != "-" and not field.isdigit():
+            as_name = field
+    if country in ("", "ZZ", "--"):
+        country = ""
+    return start, end, country, asn, as_name
+
+
+def build_database(source_path, output_path=None):
+    """
+    Biên dịch CSV / TSV dải IP thành file nhị phân đã sắp xếp để mmap.
+    Trả về (đường dẫn file .bin, số dải).
+    """
+    output_path = output_path or os.path.splitext(source_path)[0] + ".bin"
+    ranges = []
+    names = {}
+    with open(source_path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        sample = f.readline()
+        f.seek(0)
+        delimiter = "\t" if "\t" in sample else ","
+        for fields in csv.reader(f, delimiter=delimiter):
+            parsed = _parse_range_row(fields)
+            if parsed is None:
+                continue
+            start, end, country, asn, as_name = parsed
+            if not country and not asn:
+                continue
+            ranges.append((start, end, country.encode("ascii", "replace")[:2].ljust(2), asn))
+            if asn and as_name:
+                names.setdefault(str(asn), as_name)
+    ranges.sort()
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        names_offset = HEADER.size + RECORD.size * len(ranges)
+        out.write(HEADER.pack(MAGIC, len(ranges), names_offset))
+        for record in ranges:
+            out.write(RECORD.pack(*record))
+        out.write(json.dumps(names, ensure_ascii=False).encode("utf-8"))
+    os.replace(tmp_path, output_path)
+    return output_path, len(ranges)
+
+
+class _Starts:
+    """Dãy ip đầu của các dải, đọc thẳng từ mmap (cho bisect)"""
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return struct.unpack_from("<I", self.buffer, HEADER.size + i * RECORD.size)[0]
+
+
+class RangeDatabase:
+    """File .bin do build_database() tạo, tra bằng tìm kiếm nhị phân trên mmap"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count, names_offset = HEADER.unpack_from(self._mmap, 0)
+        except (ValueError, OSError, struct.error) as e:
+            self._file.close()
+            raise GeoIPError(f"Không đọc được {path}: {e}")
+        if magic != MAGIC:
+            self.close()
+            raise GeoIPError(f"{path} không phải file dải IP đã biên dịch")
+        self.names = json.loads(self._mmap[names_offset:].decode("utf-8") or "{}")
+        self._starts = _Starts(self._mmap, self.count)
+
+    def lookup(self, ip_int):
+        i = bisect.bisect_right(self._starts, ip_int) - 1
+        if i < 0:
+            return None
+        start, end, country, asn = RECORD.unpack_from(self._mmap, HEADER.size + i * RECORD.size)
+        if ip_int > end:
+            return None
+        return {
+            "country": country.decode("ascii").strip(),
+            "asn": asn or None,
+            "as_name": self.names.get(str(asn), "")
+        }
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class MmdbDatabase:
+    """File MaxMind .mmdb (Country / City / ASN), cần gói 'maxminddb'"""
+
+    def __init__(self, path):
+        try:
+            self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+        except (ValueError, OSError) as e:
+            raise GeoIPError(f"Không đọc được {path}: {e}")
+
+    def lookup(self, ip_int):
+        record = self._reader.get(str(ipaddress.IPv4Address(ip_int)))
+        if not record:
+            return None
+        country = (record.get("country") or record.get("registered_country") or {}).get("iso_code", "")
+        return {
+            "country": country,
+            "asn": record.get("autonomous_system_number"),
+            "as_name": record.get("autonomous_system_organization", "")
+        }
+
+    def close(self):
+        self._reader.close()
+
+
+def open_database(path):
+    """Mở một nguồn: .mmdb qua maxminddb, .bin trực tiếp, CSV / TSV thì biên dịch (nếu cần) rồi mở .bin"""
+    if path.endswith(".mmdb"):
+        if maxminddb is None:
+            raise GeoIPError("Cần cài 'maxminddb' để đọc file .mmdb")
+        return MmdbDatabase(path)
+    if not path.endswith(".bin"):
+        compiled = os.path.splitext(path)[0] + ".bin"
+        if not os.path.exists(compiled) or os.path.getmtime(compiled) < os.path.getmtime(path):
+            build_database(path, compiled)
+        path = compiled
+    return RangeDatabase(path)
+
+
+class GeoIP:
+    """
+    Tra cứu gộp nhiều nguồn (ví dụ file quốc gia + file ASN riêng): trường nào
+    nguồn trước chưa có thì lấy từ nguồn sau. Kết quả cache theo IP.
+    """
+
+    def __init__(self, paths=None, cache_size=GEOIP_CACHE_SIZE):
+        self.databases = []
+        self.errors = []
+        for path in paths if paths is not None else GEOIP_DATABASES:
+            path = path if os.path.isabs(path) else os.path.join(DATA_PATH, path)
+            if not os.path.exists(path):
+                continue
+            try:
+                self.databases.append(open_database(path))
+            except (GeoIPError, OSError) as e:
+                self.errors.append(str(e))
+        self.cache_size = cache_size
+        self._cache = {}
+        self._hosts = {}  # hostname -> IP đã phân giải
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return bool(self.databases)
+
+    def lookup(self, ip):
+        """{"country", "asn", "as_name"} của một IPv4, None nếu không có trong dữ liệu"""
+        with self._lock:
+            if ip in self._cache:
+                return self._cache[ip]
+        try:
+            ip_int = int(ipaddress.IPv4Address(ip))
+        except ValueError:
+            return None
+
+        result = None
+        for database in self.databases:
+            found = database.lookup(ip_int)
+            if not found:
+                continue
+            if result is None:
+                result = dict(found)
+            else:
+                for key, value in found.items():
+                    result[key] = result.get(key) or value
+        with self._lock:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[ip] = result
+        return result
+
+    def lookup_proxy(self, proxy):
+        """Tra theo chuỗi proxy (host là tên miền thì phân giải DNS một lần)"""
+        parts = parse_proxy_line(proxy)
+        if parts is None:
+            return None
+        host = parts["host"]
+        if not all(part.isdigit() for part in host.split(".")):
+            if host not in self._hosts:
+                try:
+                    self._hosts[host] = socket.gethostbyname(host)
+                except OSError:
+                    self._hosts[host] = None
+            host = self._hosts[host]
+        return self.lookup(host) if host else None
+
+    def close(self):
+        for database in self.databases:
+            database.close()
+        self.databases = []
+
+
+def enrich_store(store, geo=None, force=False):
+    """
+    Ghi country / asn / as_name vào các proxy chưa tra (hoặc tất cả khi force).
+    Proxy không tìm thấy được ghi country = "" để lần sau không tra lại.
+    Trả về số proxy đã cập nhật.
+    """
+    geo = geo or get_geoip()
+    if not geo.available:
+        return 0
+    updated = 0
+    for row in list(store.rows):
+        if not force and row.get("country") is not None:
+            continue
+        info = geo.lookup_proxy(row["proxy"]) or {}
+        store.update(
+            row["proxy"],
+            country=info.get("country") or "",
+            asn=info.get("asn"),
+            as_name=info.get("as_name") or ""
+        )
+        updated += 1
+    if updated:
+        store.flush()
+    return updated
+
+
+_geoip = None
+_geoip_lock = threading.Lock()
+
+
+def get_geoip():
+    """Trả về GeoIP dùng chung (mở các file trong GEOIP_DATABASES có trong data/)"""
+    global _geoip
+    with _geoip_lock:
+        if _geoip is None:
+            _geoip = GeoIP()
+        return _geoip
@@ -0,0 +1,344 @@
+# modules/job_queue.py
+
+"""
+Hàng đợi tác vụ bền vững dùng SQLite cho nhiều tiến trình / nhiều máy.
+
+Vòng đời một job:
+  queued -> leased (worker giữ lease, gia hạn bằng heartbeat)
+         -> done (ack)
+         -> queued lại sau retry_delay (fail, còn lượt thử)
+         -> dead (fail, hết lượt thử) - có thể đưa lại hàng đợi bằng requeue_dead()
+Lease hết hạn (worker chết / mất mạng) thì job tự được lease lại bởi worker khác.
+
+File hàng đợi đặt ở JOB_QUEUE_PATH (biến môi trường AUTOMATION_JOB_QUEUE ghi đè
+đường dẫn). Trên ổ cục bộ dùng WAL. WAL cần bộ nhớ chia sẻ nên không chạy được
+qua thư mục mạng (SMB/NFS): đường dẫn mạng dùng rollback journal (DELETE) và
+dựa vào khoá file của máy chủ chia sẻ. Máy giữ file cũng phải mở qua đường dẫn
+mạng (hoặc đặt JOB_QUEUE_JOURNAL_MODE = "DELETE"), vì chế độ WAL được ghi vào
+chính file và sẽ làm hỏng truy cập từ các máy khác.
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+
+from .config import JOB_QUEUE_PATH, JOB_QUEUE_JOURNAL_MODE, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY
+
+STATUS_QUEUED = "queued"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+
+DEFAULT_QUEUE_DB = os.environ.get("AUTOMATION_JOB_QUEUE") or JOB_QUEUE_PATH or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "job_queue.db"
+)
+
+
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p")
+
+
+def is_network_path(path):
+    """Đường dẫn UNC, ổ mạng đã map (Windows) hoặc nằm trên mount NFS/SMB (Linux)"""
+    path = os.path.abspath(path)
+    if path.startswith(("\\\\", "//")):
+        return True
+    if os.name == "nt":
+        try:
+            import ctypes
+            root = os.path.splitdrive(path)[0] + "\\"
+            return ctypes.windll.kernel32.GetDriveTypeW(root) == 4  # DRIVE_REMOTE
+        except (ImportError, AttributeError, OSError):
+            return False
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return False
+    # Mount point dài nhất chứa đường dẫn
+    best, fstype = "", ""
+    for mount_point, kind in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) > len(best):
+            best, fstype = mount_point, kind
+    return fstype in NETWORK_FILESYSTEMS
+
+
+def journal_mode(path):
+    """WAL trên ổ cục bộ, DELETE (rollback journal) trên thư mục mạng"""
+    if JOB_QUEUE_JOURNAL_MODE:
+        return JOB_QUEUE_JOURNAL_MODE.upper()
+    return "DELETE" if is_network_path(path) else "WAL"
+
+
+def default_owner():
+    """Định danh worker: host:pid:thread"""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class Job:
+    """Một job đã được lease"""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.task = row["task"]
+        self.payload = json.loads(row["payload"] or "{}")
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.owner = row["lease_owner"]
+        self.lease_expires = row["lease_expires"]
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.task}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class JobQueue:
+    """
+    Hàng đợi job trên SQLite. Mỗi thao tác là một transaction ngắn
+    (BEGIN IMMEDIATE) nên an toàn khi nhiều tiến trình cùng truy cập.
+    """
+
+    def __init__(self, db_path=None, lease_seconds=JOB_LEASE_SECONDS,
+                 max_attempts=JOB_MAX_ATTEMPTS, retry_delay=JOB_RETRY_DELAY):
+        self.db_path = db_path or DEFAULT_QUEUE_DB
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+
+    # ---------------- SQLITE ----------------
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            # isolation_level=None: tự quản lý BEGIN/COMMIT
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            mode = journal_mode(self.db_path)
+            conn.execute(f"PRAGMA journal_mode={mode}")
+            # NORMAL chỉ an toàn khi dùng WAL
+            conn.execute("PRAGMA synchronous=NORMAL" if mode == "WAL" else "PRAGMA synchronous=FULL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " task TEXT NOT NULL,"
+                " payload TEXT,"
+                " status TEXT NOT NULL,"
+                " priority INTEGER NOT NULL DEFAULT 0,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " max_attempts INTEGER NOT NULL,"
+                " available_at REAL NOT NULL,"
+                " lease_owner TEXT,"
+                " lease_expires REAL,"
+                " last_error TEXT,"
+                " result TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, available_at, priority)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = fn(conn)
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ---------------- PRODUCER ----------------
+    def enqueue(self, task, payload=None, priority=0, delay=0, max_attempts=None):
+        """Thêm job, trả về id. priority lớn hơn được lấy trước"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (task, payload, status, priority, max_attempts, available_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (task, json.dumps(payload or {}, ensure_ascii=False), STATUS_QUEUED, priority,
+             max_attempts or self.max_attempts, now + delay, now, now)
+        )
+        return cursor.lastrowid
+
+    # ---------------- WORKER ----------------
+    def lease(self, owner=None, tasks=None, lease_seconds=None):
+        """
+        Lấy 1 job sẵn sàng (queued đã tới giờ, hoặc leased nhưng lease đã hết hạn).
+        Trả về Job hoặc None nếu hàng đợi trống.
+        """
+        owner = owner or default_owner()
+        lease_seconds = lease_seconds or self.lease_seconds
+
+        def take(conn):
+            now = time.time()
+            sql = (
+                "SELECT id FROM jobs WHERE"
+                " ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?))"
+            )
+            params = [STATUS_QUEUED, now, STATUS_LEASED, now]
+            if tasks:
+                sql += f" AND task IN ({','.join('?' * len(tasks))})"
+                params.extend(tasks)
+            sql += " ORDER BY priority DESC, available_at, id LIMIT 1"
+            row = conn.execute(sql, params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (STATUS_LEASED, owner, now + lease_seconds, now, row["id"])
+            )
+            return Job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+        return self._transaction(take)
+
+    def heartbeat(self, job, lease_seconds=None):
+        """Gia hạn lease; False nếu job đã bị worker khác lấy (lease đã mất)"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ?"
+            " WHERE id = ? AND status = ? AND lease_owner = ?",
+            (now + (lease_seconds or self.lease_seconds), now, job.id, STATUS_LEASED, job.owner)
+        )
+        return cursor.rowcount == 1
+
+    def ack(self, job, result=None):
+        """Đánh dấu job hoàn thành; False nếu lease đã mất"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?"
+            " WHERE id = ? AND status = ? AND lease_owner = ?",
+            (STATUS_DONE, json.dumps(result, ensure_ascii=False, default=str), now,
+             job.id, STATUS_LEASED, job.owner)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job, error, retry_delay=None):
+        """
+        Báo job lỗi: đưa lại hàng đợi sau retry_delay * 2^(lần thử - 1),
+        hoặc chuyển sang dead-letter nếu đã hết lượt. Trả về trạng thái mới.
+        """
+        def update(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?",
+                (job.id, STATUS_LEASED, job.owner)
+            ).fetchone()
+            if row is None:
+                return None
+            if row["attempts"] >= row["max_attempts"]:
+                status, available_at = STATUS_DEAD, now
+            else:
+                base = self.retry_delay if retry_delay is None else retry_delay
+                status, available_at = STATUS_QUEUED, now + base * (2 ** (row["attempts"] - 1))
+            conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, last_error = ?,"
+                " lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (status, available_at, str(error)[:2000], now, job.id)
+            )
+            return status
+
+        return self._transaction(update)
+
+    # ---------------- QUẢN TRỊ ----------------
+    def dead_letters(self, limit=100):
+        """Danh sách job đã hết lượt thử"""
+        rows = self._connection().execute(
+            "SELECT id, task, payload, attempts, last_error, updated_at FROM jobs"
+            " WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+            (STATUS_DEAD, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def requeue_dead(self, job_id=None):
+        """Đưa job dead (một job hoặc tất cả) về hàng đợi với số lần thử reset"""
+        now = time.time()
+        sql = "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE status = ?"
+        params = [STATUS_QUEUED, now, now, STATUS_DEAD]
+        if job_id is not None:
+            sql += " AND id = ?"
+            params.append(job_id)
+        return self._connection().execute(sql, params).rowcount
+
+    def result(self, job_id):
+        """Trạng thái + kết quả của một job"""
+        row = self._connection().execute(
+            "SELECT status, result, last_error, attempts FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data = dict(row)
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        return data
+
+    def stats(self):
+        """Số job theo trạng thái"""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {STATUS_QUEUED: 0, STATUS_LEASED: 0, STATUS_DONE: 0, STATUS_DEAD: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def purge_done(self, older_than=7 * 24 * 3600):
+        """Xoá job đã xong quá older_than giây"""
+        return self._connection().execute(
+            "DELETE FROM jobs WHERE status = ? AND updated_at < ?",
+            (STATUS_DONE, time.time() - older_than)
+        ).rowcount
+
+
+class LeaseKeeper:
+    """
+    Thread nền gia hạn lease định kỳ (lease_seconds / 3).
+    Khi mất lease thì gọi on_lost() (vd: dừng worker đang chạy job).
+    """
+
+    def __init__(self, queue, job, on_lost=None, interval=None):
+        self.queue = queue
+        self.job = job
+        self.on_lost = on_lost or (lambda: None)
+        self.interval = interval or max(1, queue.lease_seconds / 3)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"LeaseKeeper-{job.id}", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                alive = self.queue.heartbeat(self.job)
+            except sqlite3.Error:
+                continue
+            if not alive:
+                self.lost = True
+                self.on_lost()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(db_path=None):
+    """Trả về JobQueue dùng chung cho một file hàng đợi"""
+    key = os.path.abspath(db_path or DEFAULT_QUEUE_DB)
+    with _queues_lock:
+        if key not in _queues:
+            _queues[key] = JobQueue(key)
+        return _queues[key]
@@ -15,7 +15,6 @@ from PyQt5.QtGui import QIcon, QPalette, QColor, QFont, QPixmap
 import subprocess
 import importlib
 import traceback
-import psutil
 from datetime import timedelta
 import logging
 
@@ -24,6 +23,18 @@ from .splash_screen import SplashScreen
 from .settings_dialog import SettingsDialog
 from .dashboard import DashboardWidget
 from .automation_view import AutomationView
+from .artifact_store import close_all_stores
+from .browser_reaper import get_browser_reaper
+from .cdp_engine import shutdown_cdp_engine
+from .proxy_relay import shutdown_proxy_relay
+from .proxy_health import shutdown_proxy_health_monitor
+from .resource_monitor import shutdown_resource_monitor
+from .metrics import start_metrics_server, shutdown_metrics_server
+from .captcha_client import shutdown_captcha_clients
+from .captcha_prefetch import shutdown_prefetch_pools
+from .traffic_meter import get_traffic_meter
+from .scheduler_store import get_scheduler_store
+from .pipeline import Pipeline, PipelineThread, TREND_SOURCES, trends_node, content_node, trend_content_pipeline
 
 # Điều chỉnh tên các module dựa trên tên file thực tế
 try:
@@ -70,7 +81,7 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 # Import config, utils
-from .config import APP_TITLE, APP_ICON, APP_WIDTH, APP_HEIGHT, THEMES, DEFAULT_THEME, APP_VERSION
+from .config import APP_TITLE, APP_ICON, APP_WIDTH, APP_HEIGHT, THEMES, DEFAULT_THEME, APP_VERSION, METRICS_ENABLED
 from .utils import setup_logging
 
 class MainWindow(QMainWindow):
@@ -82,6 +93,8 @@ class MainWindow(QMainWindow):
         # Khởi tạo QSettings để lưu trạng thái theme
         self.settings = QSettings("MyCompany", "MyApp")
         self.current_theme = self.settings.value("theme", "Light")
+        # Các pipeline đang chạy (giữ tham chiếu tới khi xong)
+        self.pipeline_threads = []
         
         self.init_logging()
         self.init_ui()
@@ -92,6 +105,12 @@ class MainWindow(QMainWindow):
         self.connect_signals()
 
         self.log("Ứng dụng khởi động.")
+        if METRICS_ENABLED:
+            try:
+                server = start_metrics_server()
+                self.log(f"Endpoint số liệu: http://{server.host}:{server.port}/metrics")
+            except OSError as e:
+                self.log(f"Không mở được endpoint số liệu: {e}")
         # Cập nhật theme mặc định nếu cần
         self.current_theme = DEFAULT_THEME
         self.load_icons()
@@ -208,6 +227,11 @@ class MainWindow(QMainWindow):
         captcha_resolver_action.triggered.connect(self.open_captcha_resolver)
         tools_menu.addAction(captcha_resolver_action)
         
+        # Pipeline xu hướng -> nội dung
+        trend_pipeline_action = QAction(QIcon("resources/icons/pipeline.png"), "Pipeline: Xu hướng → Nội dung", self)
+        trend_pipeline_action.triggered.connect(self.run_trend_pipeline)
+        tools_menu.addAction(trend_pipeline_action)
+        
         # Menu Cài đặt
         settings_menu = menubar.addMenu("Cài đặt")
         
@@ -359,6 +383,21 @@ class MainWindow(QMainWindow):
             self.log(f"Chuyển sang trang {index}")
 
     def closeEvent(self, event):
+        # Ghi nốt screenshot/artifact còn trong hàng đợi
+        close_all_stores()
+        # Đóng mọi trình duyệt do ứng dụng mở (kể cả chromedriver sót lại)
+        for thread in self.pipeline_threads:
+            thread.stop()
+        get_browser_reaper().shutdown()
+        shutdown_cdp_engine()
+        shutdown_proxy_health_monitor()
+        shutdown_resource_monitor()
+        shutdown_metrics_server()
+        shutdown_prefetch_pools()
+        shutdown_captcha_clients()
+        shutdown_proxy_relay()
+        # Ghi nốt bộ đếm lưu lượng proxy
+        get_traffic_meter().close()
         event.accept()
 
     def open_script_builder(self):
@@ -406,19 +445,32 @@ class MainWindow(QMainWindow):
 
     def on_scheduled_task_ready(self, task_id, script_path):
         self.log(f"Task đã đến lịch chạy: {task_id}")
+        store = get_scheduler_store()
+        run_id = store.start_run(task_id)
         try:
             from importlib.machinery import SourceFileLoader
             module = SourceFileLoader("script", script_path).load_module()
             if hasattr(module, "run"):
                 self.log(f"Bắt đầu chạy script: {script_path}")
+                
+                def run_and_record():
+                    # Ghi thời lượng + trạng thái lần chạy vào lịch sử
+                    try:
+                        module.run(self)
+                        store.finish_run(run_id, "Completed")
+                    except Exception as e:
+                        store.finish_run(run_id, "Failed", str(e))
+                        
                 import threading
-                thread = threading.Thread(target=module.run, args=(self,))
+                thread = threading.Thread(target=run_and_record)
                 thread.daemon = True
                 thread.start()
             else:
                 self.log(f"Lỗi: Script không có hàm run(): {script_path}")
+                store.finish_run(run_id, "Failed", "Script không có hàm run()")
         except Exception as e:
             self.log(f"Lỗi khi chạy script theo lịch: {str(e)}")
+            store.finish_run(run_id, "Failed", str(e))
 
     def connect_signals(self):
         """Connect all UI signals and worker signals"""
@@ -624,12 +676,8 @@ class MainWindow(QMainWindow):
         self.log("Refreshing dashboard data...")
         if hasattr(self.dashboard_page, 'update_stats'):
             self.dashboard_page.update_stats()
-        try:
-            if hasattr(self.dashboard_page, 'cpu_progress') and hasattr(self.dashboard_page, 'memory_progress'):
-                self.dashboard_page.cpu_progress.setValue(int(psutil.cpu_percent()))
-                self.dashboard_page.memory_progress.setValue(int(psutil.virtual_memory().percent))
-        except Exception as e:
-            self.log(f"Error updating system stats: {str(e)}")
+        if hasattr(self.dashboard_page, 'update_system_stats'):
+            self.dashboard_page.update_system_stats()
         self.log("Dashboard refreshed")
 
     def on_task_completed(self, result):
@@ -719,89 +767,72 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.log(f"❌ Error handling scheduled task: {str(e)}")
 
+    def run_pipeline(self, pipeline, on_node=None):
+        """
+        Chạy pipeline trong thread riêng. Mỗi lần chạy là một PipelineThread mới
+        nên handler không bị kết nối chồng lên worker cũ.
+        """
+        thread = PipelineThread(pipeline)
+        thread.log_signal.connect(self.log)
+        if on_node:
+            thread.node_signal.connect(on_node)
+        thread.finished_signal.connect(lambda result: self.on_pipeline_finished(thread, result))
+        self.pipeline_threads.append(thread)
+        thread.start()
+        return thread
+
+    def on_pipeline_finished(self, thread, result):
+        """Pipeline xong: bỏ tham chiếu và báo lỗi nếu có bước bắt buộc thất bại"""
+        if thread in self.pipeline_threads:
+            self.pipeline_threads.remove(thread)
+        if not result.ok:
+            failed = [r.name for r in result.results.values() if not r.ok and not result.pipeline.nodes[r.name].optional]
+            self.log(f"❌ Pipeline {result.pipeline.name} lỗi ở bước: {', '.join(failed)}")
+
+    def on_pipeline_node(self, node_result):
+        """Đưa kết quả từng bước của pipeline lên dashboard"""
+        if not node_result.ok:
+            return
+        if node_result.name.endswith("_trends"):
+            self.dashboard_page.add_trending_topics(node_result.output, node_result.name[:-len("_trends")])
+        elif node_result.name == "content":
+            self.dashboard_page.display_content(node_result.output)
+
+    def run_trend_pipeline(self):
+        """Lấy xu hướng Google Trends -> chọn xu hướng -> tạo nội dung (không mở trình duyệt)"""
+        self.log("Đang chạy pipeline xu hướng → nội dung...")
+        self.run_pipeline(trend_content_pipeline(), self.on_pipeline_node)
+
     def on_get_trends_requested(self, source):
         """
         Handle request to get trends from dashboard
         """
+        if source not in TREND_SOURCES:
+            self.log(f"⚠️ Chưa hỗ trợ lấy xu hướng từ {source}")
+            return
         self.log(f"Đang lấy xu hướng từ {source}...")
-        
-        # Remember current page
-        current_page = self.stacked_widget.currentIndex()
-        
-        if source == "google":
-            if hasattr(self, 'automation_page'):
-                self.automation_page.run_google_trends("vietnam")
-                
-                # Connect signals if not already connected
-                if hasattr(self.automation_page.worker, 'trends_signal'):
-                    self.automation_page.worker.trends_signal.connect(
-                        lambda trends: self.dashboard_page.add_trending_topics(trends, "google")
-                    )
-        elif source == "facebook":
-            if hasattr(self, 'automation_page'):
-                self.automation_page.run_facebook_trends()
-                
-                # Connect signals if not already connected
-                if hasattr(self.automation_page.worker, 'trends_signal'):
-                    self.automation_page.worker.trends_signal.connect(
-                        lambda trends: self.dashboard_page.add_trending_topics(trends, "facebook")
-                    )
-                    
+        self.run_pipeline(Pipeline(f"{source}_trends", [trends_node(source)]), self.on_pipeline_node)
+
     def on_create_content_requested(self, trend_data, content_type):
         """
         Handle request to create content from a trend
         """
         self.log(f"Đang tạo nội dung từ xu hướng: {trend_data.get('keyword', 'Unknown')}")
-        
-        # Use automation page to create content
-        if hasattr(self, 'automation_page'):
-            self.automation_page.run_content_creation(trend_data, content_type)
-            
-            # Connect signals if not already connected
-            if hasattr(self.automation_page.worker, 'content_signal'):
-                self.automation_page.worker.content_signal.connect(self.dashboard_page.display_content)
-        
+        pipeline = Pipeline("content", [content_node(trend=trend_data, content_type=content_type)])
+        self.run_pipeline(pipeline, self.on_pipeline_node)
+
     def on_post_content_requested(self, content_data, post_type):
         """
         Handle request to post content
         """
-        if post_type == "now":
-            self.log(f"Đang đăng nội dung...")
-            if hasattr(self, 'automation_page'):
-                self.automation_page.run_post_content(content_data)
-                
-                # Connect signals if not already connected
-                if hasattr(self.automation_page.worker, 'post_result_signal'):
-                    self.automation_page.worker.post_result_signal.connect(
-                        lambda success: self.show_post_result(success)
-                    )
-        elif post_type == "schedule":
-            self.log(f"Đang lập lịch đăng bài...")
-            # Get schedule time (24 hours from now)
-            schedule_time = datetime.now() + timedelta(hours=24)
-            
-            if hasattr(self, 'automation_page'):
-                self.automation_page.run_schedule_post(content_data, schedule_time)
-                
-                # Connect signals if not already connected
-                if hasattr(self.automation_page.worker, 'post_result_signal'):
-                    self.automation_page.worker.post_result_signal.connect(
-                        lambda success: self.show_schedule_result(success)
-                    )
-    
-    def show_post_result(self, success):
-        """Show dialog with post result"""
-        if success:
-            QMessageBox.information(self, "Đăng bài thành công", "Bài viết đã được đăng thành công!")
-        else:
-            QMessageBox.warning(self, "Đăng bài thất bại", "Không thể đăng bài viết. Vui lòng thử lại sau.")
-            
-    def show_schedule_result(self, success):
-        """Show dialog with schedule result"""
-        if success:
-            QMessageBox.information(self, "Lên lịch thành công", "Đã lên lịch đăng bài thành công!")
-        else:
-            QMessageBox.warning(self, "Lên lịch thất bại", "Không thể lên lịch đăng bài. Vui lòng thử lại sau.")
+        # Chưa có tác vụ tự động đăng / lên lịch bài trên Facebook: báo rõ thay vì mở trình duyệt rồi lỗi
+        action = "lên lịch đăng" if post_type == "schedule" else "đăng"
+        self.log(f"⚠️ Chưa hỗ trợ tự động {action} bài Facebook")
+        QMessageBox.information(
+            self, "Chưa hỗ trợ",
+            f"Ứng dụng chưa hỗ trợ tự động {action} bài lên Facebook.\n"
+            "Hãy sao chép nội dung và đăng thủ công."
+        )
 
     def load_settings(self):
         """Load and apply user settings"""
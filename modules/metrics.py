@@ -0,0 +1,480 @@
+# modules/metrics.py
+
+"""
+Số liệu dạng Prometheus cho từng instance (counter / gauge / histogram) + endpoint HTTP cục bộ.
+
+- Counter / histogram ghi vào ô riêng của từng thread (dict theo thread id), không
+  cần khoá nên gọi được từ hot path; chỉ lúc scrape mới cộng các ô lại
+- Số liệu lấy từ module khác (trình duyệt đang mở, sức khoẻ proxy, captcha, hàng
+  đợi job) là callback, chỉ được đọc khi có request /metrics; callback chỉ đọc
+  singleton đã có, không khởi tạo reaper / monitor chỉ vì bị scrape
+- Counter xuất HELP / TYPE theo tên có hậu tố _total (giống prometheus_client)
+- Endpoint bật bằng METRICS_ENABLED (hoặc job_worker.py --metrics-port), mặc định chỉ
+  nghe trên 127.0.0.1; chạy trên event loop asyncio riêng ở thread nền
+"""
+
+import os
+import math
+import time
+import bisect
+import asyncio
+import logging
+import threading
+
+from .config import METRICS_HOST, METRICS_PORT
+
+# Giây; đủ rộng cho cả thao tác nhanh (điều hướng) lẫn cả task (vài phút)
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Cells:
+    """Mỗi thread một list giá trị riêng: thread chỉ ghi ô của mình, khi đọc thì cộng tất cả"""
+
+    __slots__ = ("_cells", "_size")
+
+    def __init__(self, size):
+        self._cells = {}
+        self._size = size
+
+    def cell(self):
+        ident = threading.get_ident()
+        cell = self._cells.get(ident)
+        if cell is None:
+            # Gán khoá dict là nguyên tử dưới GIL; ô của thread đã kết thúc vẫn giữ số đã cộng
+            cell = self._cells[ident] = [0.0] * self._size
+        return cell
+
+    def total(self):
+        result = [0.0] * self._size
+        for cell in list(self._cells.values()):
+            for i, value in enumerate(cell):
+                result[i] += value
+        return result
+
+
+# ---------------- METRIC ----------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._default = None if self.labelnames else self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Metric con theo giá trị nhãn (giữ lại để lần sau tra dict là xong)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} cần nhãn {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self):
+        if self._default is not None:
+            return [((), self._default)]
+        return list(self._children.items())
+
+    def samples(self):
+        """[(hậu tố tên, nhãn thêm, giá trị nhãn, giá trị)]"""
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._cells.total()[0]
+
+
+class Counter(_Metric):
+    """Bộ đếm chỉ tăng"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def samples(self):
+        return [("_total", None, values, child.value) for values, child in self._items()]
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class Gauge(_Metric):
+    """Giá trị tăng / giảm tuỳ ý"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def samples(self):
+        return [("", None, values, child.value) for values, child in self._items()]
+
+
+class _Timer:
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_cells")
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # [số mẫu theo bucket..., bucket +Inf, tổng, số mẫu]
+        self._cells = _Cells(len(buckets) + 3)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect.bisect_left(self._buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def time(self):
+        """with histogram.labels(...).time(): ... ghi thời gian chạy khối lệnh"""
+        return _Timer(self)
+
+    def totals(self):
+        return self._cells.total()
+
+
+class Histogram(_Metric):
+    """Phân bố giá trị theo bucket cố định (tích luỹ khi xuất)"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def samples(self):
+        result = []
+        for values, child in self._items():
+            totals = child.totals()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), totals):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                result.append(("_bucket", f'le="{le}"', values, cumulative))
+            result.append(("_sum", None, values, totals[-2]))
+            result.append(("_count", None, values, totals[-1]))
+        return result
+
+
+class CallbackMetric(_Metric):
+    """
+    Số liệu đọc lúc scrape: fn() trả về một số, hoặc {bộ giá trị nhãn: số}.
+    Lỗi trong fn() chỉ làm thiếu metric đó trong lần scrape này.
+    """
+
+    def __init__(self, name, documentation, kind, fn, labelnames=()):
+        self.kind = kind
+        self.fn = fn
+        super().__init__(name, documentation, labelnames)
+        self._default = None
+
+    def _new_child(self):
+        return None
+
+    def samples(self):
+        suffix = "_total" if self.kind == "counter" else ""
+        value = self.fn()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            return [(suffix, None, (), value)]
+        return [(suffix, None, tuple(labels), count) for labels, count in value.items()]
+
+
+# ---------------- REGISTRY ----------------
+class MetricsRegistry:
+    """Danh sách metric của instance, xuất ra định dạng text của Prometheus"""
+
+    def __init__(self, prefix="hub_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def callback(self, name, documentation, kind, fn, labelnames=()):
+        return self._get_or_create(CallbackMetric, name, documentation, kind, fn, labelnames)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logging.warning(f"Không đọc được metric {metric.name}: {e}")
+                continue
+            family = metric.name + "_total" if metric.kind == "counter" else metric.name
+            lines.append(f"# HELP {family} {metric.documentation}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            for suffix, extra, values, value in samples:
+                lines.append(f"{metric.name}{suffix}{_label_text(metric.labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Số liệu ghi trực tiếp từ worker / scheduler
+TASKS_STARTED = REGISTRY.counter("tasks_started", "Số task đã bắt đầu", ("task",))
+TASKS_COMPLETED = REGISTRY.counter("tasks_completed", "Số task hoàn thành (kể cả lấy từ cache)", ("task",))
+TASKS_FAILED = REGISTRY.counter("tasks_failed", "Số task thất bại", ("task",))
+PHASE_SECONDS = REGISTRY.histogram(
+    "phase_seconds", "Thời gian từng giai đoạn của task (giây)", ("task", "phase")
+)
+SCHEDULER_LAG = REGISTRY.histogram(
+    "scheduler_lag_seconds", "Độ trễ giữa giờ hẹn và lúc task theo lịch được kích hoạt (giây)",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 900, 3600)
+)
+
+
+# ---------------- SỐ LIỆU TỪ MODULE KHÁC ----------------
+def _active_browsers():
+    from . import browser_reaper
+    reaper = browser_reaper._reaper
+    if reaper is None:
+        return None
+    # Trình duyệt cục bộ (theo PID) + phiên WebDriver từ xa
+    return len(reaper.tracked()) + reaper.remote_count()
+
+
+def _proxy_health():
+    from . import proxy_health
+    monitor = proxy_health._monitor
+    if monitor is None:
+        return None
+    return {(state,): count for state, count in monitor.summary().items()}
+
+
+def _proxy_checks():
+    from . import proxy_health
+    monitor = proxy_health._monitor
+    if monitor is None:
+        return None
+    stats = monitor.stats
+    return {("ok",): stats["checks"] - stats["failures"], ("failed",): stats["failures"]}
+
+
+def _pages_loaded():
+    from .captcha_probe import get_captcha_stats
+    return get_captcha_stats().totals["pages"]
+
+
+def _captchas():
+    from .captcha_probe import get_captcha_stats
+    return {(kind,): count for kind, count in dict(get_captcha_stats().by_kind).items()}
+
+
+def _captcha_rate():
+    from .captcha_probe import get_captcha_stats
+    captchas, pages = get_captcha_stats().rate()
+    return captchas / pages if pages else 0
+
+
+def _queue_jobs(queue_db=None):
+    from .job_queue import get_job_queue, DEFAULT_QUEUE_DB
+    queue_db = queue_db or DEFAULT_QUEUE_DB
+    # Không tạo file hàng đợi chỉ vì bị scrape
+    if not os.path.exists(queue_db):
+        return None
+    return {(status,): count for status, count in get_job_queue(queue_db).stats().items()}
+
+
+def register_app_metrics(registry=REGISTRY, queue_db=None):
+    """Đăng ký các metric đọc lúc scrape (gọi một lần khi bật endpoint)"""
+    registry.callback("browsers_active", "Số trình duyệt đang mở", "gauge", _active_browsers)
+    registry.callback("proxies", "Số proxy theo tình trạng (theo dõi sức khoẻ nền)", "gauge", _proxy_health, ("state",))
+    registry.callback("proxy_checks", "Số lần kiểm tra proxy ở nền", "counter", _proxy_checks, ("result",))
+    registry.callback("pages_loaded", "Số lần tải trang qua RetryPolicy", "counter", _pages_loaded)
+    registry.callback("captchas", "Số lần gặp captcha theo loại", "counter", _captchas, ("kind",))
+    registry.callback(
+        "captcha_rate", "Tỷ lệ trang gặp captcha trong cửa sổ CAPTCHA_RATE_WINDOW", "gauge", _captcha_rate
+    )
+    registry.callback(
+        "queue_jobs", "Số job trong hàng đợi theo trạng thái", "gauge", lambda: _queue_jobs(queue_db), ("status",)
+    )
+
+
+# ---------------- ENDPOINT HTTP ----------------
+class MetricsServer:
+    """Endpoint GET /metrics trên event loop asyncio riêng (thread nền)"""
+
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = threading.Thread(target=self._run_loop, name="MetricsServer", daemon=True)
+        self._thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        except Exception:
+            # Lỗi bind (cổng đã dùng...) được ném ra cho nơi gọi
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            raise
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            method, path = (request.split(b"\r\n", 1)[0].decode("latin-1").split(" ") + ["", ""])[:2]
+            if method != "GET":
+                status, body = "405 Method Not Allowed", "GET only\n"
+            elif path.split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render()
+            else:
+                status, body = "404 Not Found", "see /metrics\n"
+            data = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def shutdown(self, timeout=5):
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT, queue_db=None):
+    """Bật endpoint /metrics (một lần cho mỗi tiến trình), trả về MetricsServer"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            register_app_metrics(REGISTRY, queue_db)
+            _server = MetricsServer(REGISTRY, host, port)
+        return _server
+
+
+def shutdown_metrics_server():
+    """Tắt endpoint nếu đang chạy"""
+    global _server
+    with _server_lock:
+        server, _server = _server, None
+    if server:
+        server.shutdown()
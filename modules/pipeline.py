@@ -0,0 +1,338 @@
+# modules/pipeline.py
+
+"""
+Pipeline tác vụ dạng DAG: xu hướng -> tạo nội dung.
+
+- Mỗi bước (PipelineNode) là một hàm Python; inputs ánh xạ tham số của bước
+  tới kết quả của bước phía trước, output_type kiểm tra kiểu kết quả
+- Các bước xu hướng (RSS) và tạo nội dung là hàm trong trend_content nên không
+  khởi động Brave
+- PipelineRunner chạy song song các nhánh độc lập, bước sau chạy khi mọi bước
+  nó phụ thuộc đã xong
+- Bước có cache_ttl được cache qua ResultCache (khoá = tên bước + hash tham số
+  và đầu vào), chạy lại pipeline không phải tải lại xu hướng / tạo lại nội dung
+- Kết quả gồm thời gian từng bước và critical path (chuỗi phụ thuộc dài nhất)
+"""
+
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from .config import PIPELINE_MAX_WORKERS, PIPELINE_CACHE_TTL
+from .result_cache import get_result_cache, normalize_keyword
+from .trend_content import fetch_google_trends, generate_content
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class PipelineError(Exception):
+    """Định nghĩa pipeline không hợp lệ hoặc bước trả về sai kiểu"""
+
+
+class PipelineNode:
+    """
+    Một bước của pipeline.
+    func: hàm func(**inputs, **params) trả về kết quả
+    inputs: {tên tham số: tên bước phía trước}
+    optional: bước lỗi không chặn các bước phía sau (đầu vào nhận None)
+    """
+
+    def __init__(self, name, func, inputs=None, params=None, output_type=None, cache_ttl=None, optional=False):
+        if not callable(func):
+            raise PipelineError(f"Bước {name}: func phải là hàm")
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs or {})
+        self.params = dict(params or {})
+        self.output_type = output_type
+        self.cache_ttl = cache_ttl
+        self.optional = optional
+
+    @property
+    def dependencies(self):
+        return sorted(set(self.inputs.values()))
+
+    def cache_key(self, inputs):
+        """Khoá cache: tên bước + hash của tham số và đầu vào"""
+        payload = json.dumps({"params": self.params, "inputs": inputs}, sort_keys=True,
+                             ensure_ascii=False, default=str)
+        digest = hashlib.sha1(normalize_keyword(payload).encode("utf-8")).hexdigest()
+        return f"pipeline|{self.name}|{digest}"
+
+    def __repr__(self):
+        return f"PipelineNode({self.name}, {self.func.__name__})"
+
+
+class Pipeline:
+    """DAG các bước; kiểm tra tên trùng, đầu vào không tồn tại và chu trình"""
+
+    def __init__(self, name, nodes):
+        self.name = name
+        self.nodes = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise PipelineError(f"Bước trùng tên: {node.name}")
+            self.nodes[node.name] = node
+        for node in self.nodes.values():
+            missing = [dep for dep in node.dependencies if dep not in self.nodes]
+            if missing:
+                raise PipelineError(f"Bước {node.name} phụ thuộc bước không tồn tại: {', '.join(missing)}")
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        """Thứ tự Kahn; còn bước chưa xếp được nghĩa là có chu trình"""
+        remaining = {name: set(node.dependencies) for name, node in self.nodes.items()}
+        order = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise PipelineError(f"Pipeline {self.name} có chu trình: {', '.join(sorted(remaining))}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+
+class NodeResult:
+    """Kết quả + thời gian chạy của một bước"""
+
+    def __init__(self, name, status, output=None, error=None, started=None, finished=None, cached=False):
+        self.name = name
+        self.status = status
+        self.output = output
+        self.error = error
+        self.started = started
+        self.finished = finished
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.status == STATUS_DONE
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def __repr__(self):
+        return f"NodeResult({self.name}, {self.status}, {self.duration:.1f}s)"
+
+
+class PipelineResult:
+    """Kết quả cả pipeline: output từng bước, thời gian, critical path"""
+
+    def __init__(self, pipeline, results, wall_time):
+        self.pipeline = pipeline
+        self.results = results
+        self.wall_time = wall_time
+        self.critical_path, self.critical_time = self._critical_path()
+
+    @property
+    def outputs(self):
+        return {name: result.output for name, result in self.results.items() if result.ok}
+
+    @property
+    def ok(self):
+        """Mọi bước bắt buộc đều xong"""
+        return all(
+            result.ok or self.pipeline.nodes[name].optional
+            for name, result in self.results.items()
+        )
+
+    def _critical_path(self):
+        """Chuỗi phụ thuộc có tổng thời gian lớn nhất (quyết định thời gian tối thiểu của pipeline)"""
+        total, previous = {}, {}
+        for name in self.pipeline.order:
+            deps = self.pipeline.nodes[name].dependencies
+            slowest = max(deps, key=lambda dep: total[dep], default=None)
+            previous[name] = slowest
+            total[name] = self.results[name].duration + (total[slowest] if slowest else 0.0)
+        if not total:
+            return [], 0.0
+        name = max(total, key=total.get)
+        path = []
+        while name:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total[path[0]]
+
+    def summary(self):
+        """Các dòng tóm tắt để ghi log"""
+        lines = [f"📊 Pipeline {self.pipeline.name}: {self.wall_time:.1f}s"]
+        for name in self.pipeline.order:
+            result = self.results[name]
+            note = " (cache)" if result.cached else (f" - {result.error}" if result.error else "")
+            lines.append(f"  {name:<18}{result.status:<9}{result.duration:>7.1f}s{note}")
+        busy = sum(result.duration for result in self.results.values())
+        lines.append(
+            f"  Critical path: {' -> '.join(self.critical_path)} ({self.critical_time:.1f}s),"
+            f" tổng thời gian các bước {busy:.1f}s"
+        )
+        return lines
+
+
+class PipelineRunner:
+    """Chạy pipeline: các bước sẵn sàng được đưa vào thread pool ngay khi đầu vào đủ"""
+
+    def __init__(self, max_workers=PIPELINE_MAX_WORKERS, cache=None, log=None):
+        self.max_workers = max(1, int(max_workers))
+        self.cache = cache
+        self.log = log or (lambda message: None)
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Không chạy thêm bước mới (bước đang chạy được chạy tới hết)"""
+        self._stop.set()
+
+    def run(self, pipeline, on_node=None):
+        """Chạy pipeline tới hết; on_node(NodeResult) được gọi khi mỗi bước kết thúc"""
+        self._stop.clear()
+        on_node = on_node or (lambda result: None)
+        cache = self.cache or get_result_cache()
+        results = {}
+        pending = list(pipeline.order)
+        started = time.time()
+        self.log(f"▶️ Bắt đầu pipeline {pipeline.name} ({len(pending)} bước)")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pipeline") as pool:
+            futures = {}
+            while pending or futures:
+                for name in list(pending):
+                    node = pipeline.nodes[name]
+                    if any(dep not in results for dep in node.dependencies):
+                        continue
+                    pending.remove(name)
+                    blocked = [
+                        dep for dep in node.dependencies
+                        if not results[dep].ok and not pipeline.nodes[dep].optional
+                    ]
+                    if blocked or self._stop.is_set():
+                        reason = f"bước {', '.join(blocked)} lỗi" if blocked else "đã dừng"
+                        results[name] = NodeResult(name, STATUS_SKIPPED, error=reason)
+                        on_node(results[name])
+                        continue
+                    inputs = {param: results[source].output for param, source in node.inputs.items()}
+                    futures[pool.submit(self._run_node, node, inputs, cache)] = name
+
+                if not futures:
+                    # Các bước vừa bị bỏ qua có thể mở khoá bước khác: xét lại ngay
+                    continue
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    results[name] = future.result()
+                    on_node(results[name])
+
+        result = PipelineResult(pipeline, results, time.time() - started)
+        for line in result.summary():
+            self.log(line)
+        return result
+
+    def _run_node(self, node, inputs, cache):
+        key = node.cache_key(inputs) if node.cache_ttl else None
+        if key:
+            cached = cache.get(key)
+            if cached is not None:
+                now = time.time()
+                self.log(f"⚡ {node.name}: dùng kết quả đã cache")
+                return NodeResult(node.name, STATUS_DONE, cached, started=now, finished=now, cached=True)
+
+        started = time.time()
+        self.log(f"🔄 {node.name}: đang chạy")
+        try:
+            output = node.func(**inputs, **node.params)
+            if output is None:
+                raise RuntimeError("không có kết quả")
+            if node.output_type and not isinstance(output, node.output_type):
+                raise PipelineError(
+                    f"kết quả kiểu {type(output).__name__}, cần {node.output_type.__name__}"
+                )
+        except Exception as e:
+            self.log(f"❌ {node.name}: {str(e)}")
+            return NodeResult(node.name, STATUS_FAILED, error=str(e), started=started, finished=time.time())
+
+        if key:
+            cache.put(key, output, ttl=node.cache_ttl)
+        self.log(f"✅ {node.name}: xong sau {time.time() - started:.1f}s")
+        return NodeResult(node.name, STATUS_DONE, output, started=started, finished=time.time())
+
+
+# ---------------- PIPELINE XU HƯỚNG -> NỘI DUNG ----------------
+# Nguồn xu hướng có thể lấy được (Facebook không còn mục xu hướng công khai)
+TREND_SOURCES = {"google": fetch_google_trends}
+
+def select_top_trend(**trend_lists):
+    """Gộp xu hướng các nguồn (bỏ trùng keyword), chọn xu hướng đầu tiên của nguồn có nhiều kết quả nhất"""
+    seen, merged = set(), []
+    ranked = sorted((topics or [] for topics in trend_lists.values()), key=len, reverse=True)
+    for topics in ranked:
+        for topic in topics:
+            if not isinstance(topic, dict):
+                continue
+            keyword = normalize_keyword(topic.get("keyword") or topic.get("title") or topic.get("text"))
+            if keyword and keyword not in seen:
+                seen.add(keyword)
+                merged.append(topic)
+    if not merged:
+        raise RuntimeError("Không có xu hướng nào từ các nguồn")
+    return merged[0]
+
+
+def trends_node(source, country="vietnam", category=None, timeframe="now 1-d", optional=False):
+    """Bước lấy xu hướng (HTTP, không mở trình duyệt)"""
+    if source not in TREND_SOURCES:
+        raise PipelineError(f"Không có nguồn xu hướng: {source}")
+    params = {"country": country, "category": category, "timeframe": timeframe}
+    return PipelineNode(f"{source}_trends", func=TREND_SOURCES[source], params=params,
+                        output_type=list, cache_ttl=PIPELINE_CACHE_TTL, optional=optional)
+
+
+def content_node(trend_source=None, content_type="article", word_count=500, trend=None):
+    """Bước tạo nội dung từ kết quả bước trend_source, hoặc từ xu hướng trend (dict) có sẵn"""
+    params = {"content_type": content_type, "word_count": word_count}
+    if trend_source is None:
+        params["trend"] = trend
+    return PipelineNode("content", func=generate_content,
+                        inputs={"trend": trend_source} if trend_source else None,
+                        params=params, output_type=dict, cache_ttl=PIPELINE_CACHE_TTL)
+
+
+def trend_content_pipeline(sources=("google",), country="vietnam", content_type="article", word_count=500):
+    """
+    Lấy xu hướng từ các nguồn song song -> chọn xu hướng -> tạo nội dung.
+    Một nguồn lỗi vẫn chạy tiếp với nguồn còn lại.
+    """
+    nodes = [trends_node(source, country, optional=len(sources) > 1) for source in sources]
+    nodes.append(PipelineNode("select_trend", func=select_top_trend,
+                              inputs={source: f"{source}_trends" for source in sources}, output_type=dict))
+    nodes.append(content_node("select_trend", content_type, word_count))
+    return Pipeline("trend_content", nodes)
+
+
+class PipelineThread(QThread):
+    """Chạy pipeline trong QThread; GUI chỉ nhận kết quả qua signal"""
+
+    log_signal = pyqtSignal(str)
+    node_signal = pyqtSignal(object)  # NodeResult
+    finished_signal = pyqtSignal(object)  # PipelineResult
+
+    def __init__(self, pipeline, max_workers=PIPELINE_MAX_WORKERS, parent=None):
+        super().__init__(parent)
+        self.pipeline = pipeline
+        self.runner = PipelineRunner(max_workers, log=self.log_signal.emit)
+
+    def run(self):
+        result = self.runner.run(self.pipeline, on_node=self.node_signal.emit)
+        self.finished_signal.emit(result)
+
+    def stop(self):
+        self.runner.stop()
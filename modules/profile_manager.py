@@ -0,0 +1,354 @@
+# modules/profile_manager.py
+
+"""
+Nhân bản profile Brave cho nhiều trình duyệt chạy song song.
+
+Chromium khoá thư mục "User Data" nên chỉ một trình duyệt được dùng profile
+thật tại một thời điểm. ProfileTemplateManager:
+  - chụp (snapshot) profile một lần vào data/profiles/<profile>/template, bỏ cache và file khoá
+  - tạo bản làm việc cho từng slot: file bất biến (LevelDB .ldb, Extensions...)
+    dùng hardlink, file thay đổi được (Cookies, Login Data...) dùng reflink (CoW)
+    nếu hệ thống file hỗ trợ, không thì copy
+  - dọn các slot không còn dùng
+Slot được khoá bằng file (slots/slot_<n>.lock) nên nhiều tiến trình (GUI,
+job_worker...) dùng chung một profile không cấp trùng hay xoá slot của nhau.
+Template cũng được khoá bằng file (template.lock): chụp lại giữ khoá độc quyền,
+tạo bản làm việc giữ khoá chia sẻ, nên không tiến trình nào đọc template đang bị thay.
+"""
+
+import os
+import sys
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+
+from .config import PROFILE_TEMPLATE_MAX_AGE
+
+PROFILES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "profiles"
+)
+
+# Thư mục cache: không cần cho đăng nhập, Chromium tự tạo lại
+SKIP_DIRS = {
+    "Cache", "Code Cache", "GPUCache", "DawnCache", "DawnGraphiteCache", "DawnWebGPUCache",
+    "GrShaderCache", "GraphiteDawnCache", "ShaderCache", "Media Cache", "CacheStorage",
+    "ScriptCache", "Crashpad", "Crash Reports", "blob_storage", "component_crx_cache",
+    "optimization_guide_model_store", "BrowserMetrics", "Safe Browsing"
+}
+
+# File khoá của Chromium / LevelDB
+SKIP_FILES = {"SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile", "LOCK", "LOG", "LOG.old"}
+
+# Thư mục chỉ chứa file không bao giờ bị ghi đè tại chỗ
+IMMUTABLE_DIRS = {"Extensions", "Dictionaries"}
+
+# File LevelDB đã đóng (.ldb/.sst) là bất biến
+IMMUTABLE_EXTENSIONS = {".ldb", ".sst"}
+
+FICLONE = 0x40049409  # ioctl reflink trên Linux (btrfs, xfs)
+
+
+def _reflink(src, dst):
+    """Tạo bản sao copy-on-write nếu hệ thống file hỗ trợ, trả về True nếu thành công"""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except (OSError, ImportError):
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _try_lock(path):
+    """Khoá độc quyền file khoá (không chờ); trả về file đang mở, None nếu nơi khác đang giữ"""
+    handle = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def _lock(path, shared=False):
+    """Khoá file (chờ tới khi được); shared=True cho phép nhiều bên đọc cùng lúc (Windows luôn độc quyền)"""
+    handle = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK chỉ thử lại khoảng 10 giây rồi báo lỗi
+                    time.sleep(0.1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    except BaseException:
+        handle.close()
+        raise
+    return handle
+
+
+def _unlock(handle):
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        pass
+    handle.close()
+
+
+def _is_immutable(rel_path):
+    parts = rel_path.replace("\\", "/").split("/")
+    if any(part in IMMUTABLE_DIRS for part in parts[:-1]):
+        return True
+    return os.path.splitext(rel_path)[1].lower() in IMMUTABLE_EXTENSIONS
+
+
+def _walk_profile(root):
+    """Duyệt cây thư mục, bỏ qua cache và file khoá; trả về đường dẫn tương đối"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            if name in SKIP_FILES:
+                continue
+            full = os.path.join(dirpath, name)
+            yield os.path.relpath(full, root)
+
+
+class ProfileTemplateManager:
+    """Quản lý profile mẫu và các bản làm việc theo slot"""
+
+    def __init__(self, user_data_dir, profile_directory="Default", root=None):
+        self.user_data_dir = user_data_dir
+        self.profile_directory = profile_directory
+        self.root = root or os.path.join(PROFILES_DIR, profile_directory)
+        self.template_dir = os.path.join(self.root, "template")
+        self.slots_dir = os.path.join(self.root, "slots")
+        self.template_lock_path = os.path.join(self.root, "template.lock")
+
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._active = {}  # slot -> file khoá đang giữ
+        self.last_stats = {}
+
+    # ---------------- TEMPLATE ----------------
+    @contextmanager
+    def template_lock(self, shared=False):
+        """Khoá template giữa các tiến trình: độc quyền khi chụp lại, chia sẻ khi đọc để nhân bản"""
+        os.makedirs(self.root, exist_ok=True)
+        handle = _lock(self.template_lock_path, shared=shared)
+        try:
+            yield
+        finally:
+            _unlock(handle)
+
+    def snapshot(self, force=False):
+        """
+        Chụp profile thật vào template (chỉ "Local State" và thư mục profile).
+        Bỏ qua nếu template còn mới (PROFILE_TEMPLATE_MAX_AGE) trừ khi force=True.
+        """
+        with self._snapshot_lock, self.template_lock():
+            # Kiểm tra lại sau khi có khoá: tiến trình khác có thể vừa chụp xong
+            marker = os.path.join(self.template_dir, ".snapshot")
+            if not force and os.path.exists(marker):
+                if time.time() - os.path.getmtime(marker) < PROFILE_TEMPLATE_MAX_AGE:
+                    return self.template_dir
+            return self._snapshot()
+
+    def _snapshot(self):
+        if not os.path.isdir(os.path.join(self.user_data_dir, self.profile_directory)):
+            raise FileNotFoundError(f"Không tìm thấy profile: {self.user_data_dir}/{self.profile_directory}")
+
+        started = time.time()
+        staging = f"{self.template_dir}.tmp{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        copied, skipped = 0, 0
+        sources = [("Local State", os.path.join(self.user_data_dir, "Local State"))]
+        profile_root = os.path.join(self.user_data_dir, self.profile_directory)
+        for rel in _walk_profile(profile_root):
+            sources.append((os.path.join(self.profile_directory, rel), os.path.join(profile_root, rel)))
+
+        for rel, src in sources:
+            dst = os.path.join(staging, rel)
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy2(src, dst)
+                copied += 1
+            except OSError:
+                # File đang bị trình duyệt khoá (Windows) hoặc đã bị xoá
+                skipped += 1
+
+        with open(os.path.join(staging, ".snapshot"), "w") as f:
+            f.write(str(started))
+
+        shutil.rmtree(self.template_dir, ignore_errors=True)
+        os.replace(staging, self.template_dir)
+        self.last_stats = {
+            "action": "snapshot",
+            "files": copied,
+            "skipped": skipped,
+            "seconds": round(time.time() - started, 3)
+        }
+        return self.template_dir
+
+    # ---------------- SLOTS ----------------
+    def acquire_slot(self):
+        """Cấp slot trống nhỏ nhất (không bị tiến trình nào khoá) và tạo bản làm việc cho slot đó"""
+        with self._lock:
+            os.makedirs(self.slots_dir, exist_ok=True)
+            slot = 0
+            while True:
+                handle = None if slot in self._active else _try_lock(self.lock_path(slot))
+                if handle:
+                    break
+                slot += 1
+            self._active[slot] = handle
+        try:
+            return slot, self.clone(slot)
+        except Exception:
+            self.release_slot(slot)
+            raise
+
+    def release_slot(self, slot, remove=True):
+        """Trả slot; mặc định xoá luôn bản làm việc (trước khi mở khoá để không xoá nhầm slot vừa được cấp lại)"""
+        with self._lock:
+            handle = self._active.pop(slot, None)
+        if handle is None:
+            return
+        if remove:
+            shutil.rmtree(self.slot_path(slot), ignore_errors=True)
+        _unlock(handle)
+
+    def slot_path(self, slot):
+        return os.path.join(self.slots_dir, f"slot_{slot}")
+
+    def lock_path(self, slot):
+        return os.path.join(self.slots_dir, f"slot_{slot}.lock")
+
+    def clone(self, slot):
+        """
+        Tạo bản làm việc cho slot từ template.
+        Trả về đường dẫn dùng cho --user-data-dir (profile nằm trong self.profile_directory).
+        """
+        self.snapshot()
+        started = time.time()
+        target = self.slot_path(slot)
+        shutil.rmtree(target, ignore_errors=True)
+
+        with self.template_lock(shared=True):
+            counts = self._clone_files(target)
+
+        counts.update({
+            "action": "clone",
+            "slot": slot,
+            "seconds": round(time.time() - started, 3)
+        })
+        self.last_stats = counts
+        return target
+
+    def _clone_files(self, target):
+        counts = {"linked": 0, "reflinked": 0, "copied": 0}
+        for rel in _walk_profile(self.template_dir):
+            if rel == ".snapshot":
+                continue
+            src = os.path.join(self.template_dir, rel)
+            dst = os.path.join(target, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+            if _is_immutable(rel):
+                try:
+                    os.link(src, dst)
+                    counts["linked"] += 1
+                    continue
+                except OSError:
+                    pass
+            if _reflink(src, dst):
+                counts["reflinked"] += 1
+            else:
+                shutil.copy2(src, dst)
+                counts["copied"] += 1
+        return counts
+
+    def garbage_collect(self):
+        """
+        Xoá các thư mục slot không còn được dùng (vd: sót lại sau khi ứng dụng bị tắt ngang).
+        Slot đang bị khoá (tiến trình này hoặc tiến trình khác đang chạy) được giữ nguyên.
+        """
+        removed = 0
+        if not os.path.isdir(self.slots_dir):
+            return removed
+        for name in os.listdir(self.slots_dir):
+            path = os.path.join(self.slots_dir, name)
+            if not name.startswith("slot_") or not name[5:].isdigit() or not os.path.isdir(path):
+                continue
+            slot = int(name[5:])
+            with self._lock:
+                if slot in self._active:
+                    continue
+                handle = _try_lock(self.lock_path(slot))
+            if handle is None:
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            finally:
+                _unlock(handle)
+        return removed
+
+
+def bind_profile_to_driver(driver, manager, slot):
+    """Trả slot profile khi driver.quit() (kể cả khi reaper đóng trình duyệt được giữ mở)"""
+    original_quit = driver.quit
+    released = []
+
+    def quit_and_release():
+        try:
+            original_quit()
+        finally:
+            if not released:
+                released.append(True)
+                manager.release_slot(slot)
+
+    driver.quit = quit_and_release
+    return driver
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_profile_manager(user_data_dir, profile_directory="Default"):
+    """Trả về ProfileTemplateManager dùng chung cho một profile thật"""
+    key = (os.path.normcase(os.path.abspath(user_data_dir)), profile_directory)
+    with _managers_lock:
+        if key not in _managers:
+            manager = ProfileTemplateManager(user_data_dir, profile_directory)
+            manager.garbage_collect()
+            _managers[key] = manager
+        return _managers[key]
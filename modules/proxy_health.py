@@ -0,0 +1,254 @@
+# modules/proxy_health.py
+
+"""
+Theo dõi sức khoẻ proxy liên tục ở nền với chu kỳ kiểm tra thích ứng.
+
+- Proxy ổn định được kiểm tra thưa (PROXY_HEALTH_HEALTHY_INTERVAL), proxy
+  chập chờn (đổi trạng thái nhiều lần gần đây) được kiểm tra dày, proxy chết
+  được kiểm tra lại với backoff luỹ thừa tới PROXY_HEALTH_DEAD_MAX
+- Lịch kiểm tra là một heap theo thời điểm đến hạn; số lần kiểm tra đồng thời
+  bị giới hạn (PROXY_HEALTH_CONCURRENCY)
+- Mỗi lần kiểm tra mở thử tunnel qua relay (hỗ trợ user:pass, SOCKS) và giữ
+  lịch sử độ trễ ngắn cho từng proxy
+- on_change(danh sách proxy hoạt động) chỉ được gọi khi tập proxy hoạt động thay đổi
+"""
+
+import time
+import heapq
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (
+    PROXY_HEALTH_CONCURRENCY, PROXY_HEALTH_TIMEOUT, PROXY_HEALTH_HEALTHY_INTERVAL,
+    PROXY_HEALTH_FLAPPING_INTERVAL, PROXY_HEALTH_DEAD_BASE, PROXY_HEALTH_DEAD_MAX,
+    PROXY_HEALTH_HISTORY, PROXY_HEALTH_STARTUP_SPREAD
+)
+from .proxy_store import get_proxy_store, STATUS_WORKING
+
+STATUS_DEAD = "Không hoạt động"
+# Đổi trạng thái từ FLAP_CHANGES lần trở lên trong FLAP_WINDOW giây => chập chờn
+FLAP_WINDOW = 1800
+FLAP_CHANGES = 2
+SYNC_INTERVAL = 10  # giây giữa các lần đối chiếu với danh sách proxy trong kho
+FLUSH_INTERVAL = 5  # giây giữa các lần ghi trạng thái xuống kho / phát on_change
+
+
+def relay_check(proxy, timeout=PROXY_HEALTH_TIMEOUT):
+    """Kiểm tra mặc định: mở tunnel tới google.com:443 qua proxy, trả về số giây"""
+    from .proxy_relay import get_proxy_relay
+    return get_proxy_relay().check(proxy, timeout=timeout)
+
+
+class ProxyHealth:
+    """Trạng thái theo dõi của một proxy"""
+
+    def __init__(self, proxy, working=None):
+        self.proxy = proxy
+        self.working = working  # None: chưa kiểm tra
+        self.failures = 0
+        self.latencies = deque(maxlen=PROXY_HEALTH_HISTORY)  # ms
+        self.changes = deque(maxlen=8)  # thời điểm đổi trạng thái
+        self.next_check = 0.0
+        self.checked_at = None
+        self.in_flight = False  # đang được kiểm tra ở thread pool
+
+    def flapping(self, now):
+        return sum(1 for t in self.changes if now - t < FLAP_WINDOW) >= FLAP_CHANGES
+
+    def interval(self, now):
+        """Số giây tới lần kiểm tra kế tiếp"""
+        if not self.working:
+            return min(PROXY_HEALTH_DEAD_MAX, PROXY_HEALTH_DEAD_BASE * 2 ** max(0, self.failures - 1))
+        if self.flapping(now):
+            return PROXY_HEALTH_FLAPPING_INTERVAL
+        return PROXY_HEALTH_HEALTHY_INTERVAL
+
+    def median_latency(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+
+class ProxyHealthMonitor:
+    """Thread nền lên lịch + chạy kiểm tra proxy trong kho"""
+
+    def __init__(self, store=None, check=None, max_concurrent=PROXY_HEALTH_CONCURRENCY, on_change=None):
+        self.store = store or get_proxy_store()
+        self.check = check or relay_check
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.on_change = on_change or (lambda proxies: None)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._records = {}
+        self._heap = []  # (next_check, proxy); mục cũ bị bỏ qua khi next_check không khớp
+        self._in_flight = 0
+        self._working_changed = False
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="ProxyHealth")
+        self._thread = None
+        self.stats = {"checks": 0, "failures": 0}
+
+    # ---------------- LỊCH KIỂM TRA ----------------
+    def _schedule(self, record, when):
+        record.next_check = when
+        heapq.heappush(self._heap, (when, record.proxy))
+
+    def _sync(self):
+        """Thêm proxy mới trong kho vào lịch (rải đều), bỏ proxy đã xoá"""
+        current = {row["proxy"]: row for row in list(self.store.rows)}
+        now = time.time()
+        with self._lock:
+            for proxy in list(self._records):
+                if proxy not in current:
+                    del self._records[proxy]
+            for proxy, row in current.items():
+                if proxy not in self._records:
+                    status = row.get("status")
+                    working = {STATUS_WORKING: True, STATUS_DEAD: False}.get(status)
+                    record = ProxyHealth(proxy, working)
+                    record.latencies.extend(row.get("latency_history") or [])
+                    self._records[proxy] = record
+                    self._schedule(record, now + random.uniform(0, PROXY_HEALTH_STARTUP_SPREAD))
+        self._wake.set()
+
+    def recheck_all(self):
+        """Đưa mọi proxy lên đầu lịch (nút "Kiểm tra tất cả"); proxy đang được kiểm tra thì giữ nguyên"""
+        now = time.time()
+        with self._lock:
+            for record in self._records.values():
+                if not record.in_flight:
+                    self._schedule(record, now)
+        self._wake.set()
+
+    # ---------------- CHẠY ----------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ProxyHealthMonitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        last_sync = last_flush = 0.0
+        while not self._stop.is_set():
+            now = time.time()
+            if now - last_sync >= SYNC_INTERVAL:
+                self._sync()
+                last_sync = now
+            if now - last_flush >= FLUSH_INTERVAL:
+                self._flush()
+                last_flush = now
+
+            wait = 1.0
+            with self._lock:
+                while self._heap and self._in_flight < self.max_concurrent:
+                    due, proxy = self._heap[0]
+                    if due > now:
+                        wait = min(wait, due - now)
+                        break
+                    heapq.heappop(self._heap)
+                    record = self._records.get(proxy)
+                    if record is None or record.next_check != due or record.in_flight:
+                        continue
+                    record.in_flight = True
+                    self._in_flight += 1
+                    self._pool.submit(self._check, record)
+            self._wake.wait(max(0.05, wait))
+            self._wake.clear()
+
+    def _check(self, record):
+        try:
+            seconds = self.check(record.proxy)
+            working = True
+        except Exception:
+            seconds, working = None, False
+        try:
+            self._record_result(record, working, seconds)
+        finally:
+            with self._lock:
+                record.in_flight = False
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _record_result(self, record, working, seconds):
+        now = time.time()
+        with self._lock:
+            self.stats["checks"] += 1
+            if record.working is not None and record.working != working:
+                record.changes.append(now)
+            if record.working != working:
+                self._working_changed = True
+            record.working = working
+            record.checked_at = now
+            if working:
+                record.failures = 0
+                record.latencies.append(round(seconds * 1000))
+            else:
+                record.failures += 1
+                self.stats["failures"] += 1
+            if self._records.get(record.proxy) is record:
+                self._schedule(record, now + record.interval(now))
+
+        self.store.update(
+            record.proxy,
+            status=STATUS_WORKING if working else STATUS_DEAD,
+            speed=str(record.median_latency()) if working else "-",
+            latency_history=list(record.latencies),
+            checked_at=now
+        )
+
+    def _flush(self):
+        """Ghi trạng thái xuống kho; báo on_change nếu tập proxy hoạt động đã đổi"""
+        self.store.flush()
+        with self._lock:
+            changed, self._working_changed = self._working_changed, False
+        if changed:
+            self.on_change(self.store.active())
+
+    def summary(self):
+        """Số proxy theo nhóm: hoạt động / chập chờn / chết / chưa kiểm tra"""
+        now = time.time()
+        counts = {"working": 0, "flapping": 0, "dead": 0, "unknown": 0}
+        with self._lock:
+            for record in self._records.values():
+                if record.working is None:
+                    counts["unknown"] += 1
+                elif not record.working:
+                    counts["dead"] += 1
+                elif record.flapping(now):
+                    counts["flapping"] += 1
+                else:
+                    counts["working"] += 1
+        return counts
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.store.flush()
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_proxy_health_monitor():
+    """Trả về ProxyHealthMonitor dùng chung (chưa chạy cho tới khi gọi start())"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = ProxyHealthMonitor()
+        return _monitor
+
+
+def shutdown_proxy_health_monitor():
+    """Dừng monitor nếu đã được khởi tạo"""
+    global _monitor
+    with _monitor_lock:
+        monitor, _monitor = _monitor, None
+    if monitor:
+        monitor.stop()
@@ -3,41 +3,129 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QLineEdit, QFileDialog, QMessageBox, QCheckBox,
-    QTableWidget, QTableWidgetItem, QHeaderView, QLabel
+    QTableView, QHeaderView, QLabel, QAbstractItemView, QApplication
 )
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QAbstractTableModel, QModelIndex, QTimer
 from PyQt5.QtGui import QFont
 
-import os
-import json
 import requests
 import threading
 import time
 from queue import Queue
 
+from .rate_limiter import get_rate_limiter
+from .proxy_store import get_proxy_store, proxy_url
+from .traffic_meter import get_traffic_meter, format_bytes
+from .proxy_health import get_proxy_health_monitor
+from .geoip import enrich_store
+from .config import PROXY_HEALTH_ENABLED
+
+
+class ProxyTableModel(QAbstractTableModel):
+    """
+    Model cho bảng proxy: đọc thẳng từ ProxyStore.rows, view chỉ lấy dữ liệu
+    các dòng đang hiển thị nên 100k proxy vẫn cuộn mượt.
+    """
+    COLUMNS = [
+        ("Proxy", "proxy", ""), ("Tình trạng", "status", "Chưa kiểm tra"), ("Tốc độ (ms)", "speed", "-"),
+        ("Lưu lượng (gửi / nhận)", "traffic", ""), ("Requests", "requests", "0"),
+        ("Quốc gia", "country", "-"), ("ASN", "asn", "-")
+    ]
+    # Cột lấy từ TrafficMeter (không lưu trong kho proxy)
+    TRAFFIC_COLUMNS = (3, 4)
+
+    def __init__(self, store, meter=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.meter = meter or get_traffic_meter()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+        _, key, default = self.COLUMNS[index.column()]
+        row = self.store.rows[index.row()]
+        if index.column() in self.TRAFFIC_COLUMNS:
+            bytes_up, bytes_down, requests = self.meter.totals(row["proxy"])
+            return f"{format_bytes(bytes_up)} / {format_bytes(bytes_down)}" if key == "traffic" else str(requests)
+        if role == Qt.ToolTipRole and key == "speed" and row.get("latency_history"):
+            return "Độ trễ gần đây (ms): " + ", ".join(str(ms) for ms in row["latency_history"])
+        if key == "asn" and row.get("asn"):
+            return f"AS{row['asn']} {row.get('as_name') or ''}".strip()
+        value = row.get(key)
+        return default if value in (None, "") else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return str(section + 1)
+
+    def proxy_at(self, row):
+        return self.store.rows[row]["proxy"]
+
+    def reload(self):
+        """Danh sách thay đổi (nhập / xoá): view đọc lại"""
+        self.beginResetModel()
+        self.endResetModel()
+
+    def refresh_traffic(self):
+        """Vẽ lại các cột lưu lượng (view chỉ đọc lại các dòng đang hiển thị)"""
+        if self.store.rows:
+            self.dataChanged.emit(
+                self.index(0, self.TRAFFIC_COLUMNS[0]),
+                self.index(len(self.store.rows) - 1, self.TRAFFIC_COLUMNS[-1])
+            )
+
+    def refresh_rows(self):
+        """Chỉ trạng thái thay đổi: vẽ lại, không dựng lại model"""
+        if self.store.rows:
+            self.dataChanged.emit(
+                self.index(0, 1),
+                self.index(len(self.store.rows) - 1, len(self.COLUMNS) - 1)
+            )
+
+
 class ProxyManagerWidget(QWidget):
     """
     Widget quản lý và kiểm tra Proxy:
       - Thêm/sửa/xóa proxy
       - Test proxy đa luồng
       - Hỗ trợ HTTP/HTTPS/SOCKS4/SOCKS5 (cần 'requests[socks]' nếu dùng SOCKS)
-      - Lưu/đọc proxy từ file JSON
+      - Nhập hàng loạt từ file .txt / .csv (chuẩn hoá + chống trùng)
+      - Lưu proxy trong SQLite (proxy_store.py)
+      - Tự kiểm tra lại proxy ở nền theo lịch thích ứng (proxy_health.py)
+      - Tra quốc gia / ASN từ cơ sở dữ liệu dải IP cục bộ (geoip.py)
       - Xuất danh sách proxy hoạt động ra file .txt
     """
     proxies_updated = pyqtSignal(list)  # Signal khi danh sách proxy được cập nhật
     log_signal = pyqtSignal(str)  # Signal để gửi thông báo log
+    # Monitor gọi từ thread nền; signal đưa về thread GUI
+    health_changed = pyqtSignal(list)
+    geo_changed = pyqtSignal(int)
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.proxies = []
-        # Đường dẫn lưu file JSON proxy
-        self.proxy_file = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "data",
-            "proxies.json"
-        )
+        self.store = get_proxy_store()
+        # Cùng list với store.rows (dict "proxy" / "status" / "speed")
+        self.proxies = self.store.rows
+        self.health_monitor = None
+        self._geo_thread = None
+        self._geo_pending = False
+        self.geo_changed.connect(self.on_geo_changed)
         self.init_ui()
         self.load_proxies()
+        if PROXY_HEALTH_ENABLED:
+            self.health_changed.connect(self.on_health_changed)
+            self.health_monitor = get_proxy_health_monitor()
+            self.health_monitor.on_change = self.health_changed.emit
+            self.health_monitor.start()
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -67,20 +155,44 @@ class ProxyManagerWidget(QWidget):
         self.proxy_input.setPlaceholderText(
             "Nhập proxy (vd: 171.224.79.180:20031 hoặc socks5://user:pass@ip:port)"
         )
+        self.proxy_input.returnPressed.connect(self.add_proxy)
         input_layout.addWidget(self.proxy_input)
 
         add_btn = QPushButton("Thêm")
         add_btn.clicked.connect(self.add_proxy)
         input_layout.addWidget(add_btn)
 
+        import_btn = QPushButton("Nhập từ file")
+        import_btn.clicked.connect(self.import_proxies)
+        input_layout.addWidget(import_btn)
+
         layout.addLayout(input_layout)
 
         # Bảng hiển thị proxy
-        self.proxy_table = QTableWidget(0, 3)
-        self.proxy_table.setHorizontalHeaderLabels(["Proxy", "Tình trạng", "Tốc độ (ms)"])
+        self.proxy_model = ProxyTableModel(self.store, parent=self)
+        self.proxy_table = QTableView()
+        self.proxy_table.setModel(self.proxy_model)
+        self.proxy_table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.proxy_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Chiều cao dòng cố định: view không phải đo từng dòng
+        self.proxy_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.proxy_table.verticalHeader().setDefaultSectionSize(24)
         layout.addWidget(self.proxy_table)
 
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
+        self.geo_label = QLabel()
+        layout.addWidget(self.geo_label)
+
+        # Lưu lượng theo task (cập nhật định kỳ cùng các cột lưu lượng)
+        self.traffic_label = QLabel()
+        self.traffic_label.setWordWrap(True)
+        layout.addWidget(self.traffic_label)
+        self.traffic_timer = QTimer(self)
+        self.traffic_timer.timeout.connect(self.update_traffic)
+        self.traffic_timer.timeout.connect(self.update_health)
+        self.traffic_timer.start(5000)
+
         # Nút điều khiển
         control_layout = QHBoxLayout()
 
@@ -113,26 +225,18 @@ class ProxyManagerWidget(QWidget):
 
     def load_proxies(self):
         """
-        Đọc danh sách proxy từ file JSON (nếu có).
+        Hiển thị danh sách proxy từ kho (proxies.json cũ đã được chuyển sang SQLite).
         """
-        try:
-            if os.path.exists(self.proxy_file):
-                with open(self.proxy_file, 'r', encoding='utf-8') as f:
-                    self.proxies = json.load(f)
-                self.update_table()
-                # Phát signal thông báo danh sách proxy hoạt động
-                self.proxies_updated.emit(self.get_active_proxies())
-        except Exception as e:
-            QMessageBox.warning(self, "Lỗi", f"Không thể tải danh sách proxy: {str(e)}")
+        self.update_table()
+        # Phát signal thông báo danh sách proxy hoạt động
+        self.proxies_updated.emit(self.get_active_proxies())
 
     def save_proxies(self):
         """
-        Lưu danh sách proxy vào file JSON.
+        Ghi các thay đổi trạng thái đang chờ xuống SQLite.
         """
         try:
-            os.makedirs(os.path.dirname(self.proxy_file), exist_ok=True)
-            with open(self.proxy_file, 'w', encoding='utf-8') as f:
-                json.dump(self.proxies, f, indent=2, ensure_ascii=False)
+            self.store.flush()
             # Phát signal thông báo danh sách proxy hoạt động
             self.proxies_updated.emit(self.get_active_proxies())
         except Exception as e:
@@ -140,17 +244,87 @@ class ProxyManagerWidget(QWidget):
 
     def update_table(self):
         """
-        Cập nhật nội dung bảng QTableWidget dựa vào self.proxies.
+        Báo cho bảng đọc lại danh sách proxy.
+        """
+        self.proxy_model.reload()
+        self.count_label.setText(f"Tổng: {len(self.store)} proxy | Hoạt động: {len(self.get_active_proxies())}")
+        self.update_geo_label()
+        self.enrich_geo()
+
+    def enrich_geo(self):
+        """
+        Tra quốc gia / ASN cho các proxy chưa tra ở thread nền.
+        """
+        if self._geo_thread is not None and self._geo_thread.is_alive():
+            # Thread đang chạy sẽ quét lại một lượt nữa
+            self._geo_pending = True
+            return
+
+        def worker():
+            while True:
+                self._geo_pending = False
+                updated = enrich_store(self.store)
+                if updated:
+                    self.geo_changed.emit(updated)
+                if not self._geo_pending:
+                    break
+
+        self._geo_thread = threading.Thread(target=worker, name="ProxyGeoIP", daemon=True)
+        self._geo_thread.start()
+
+    def on_geo_changed(self, updated):
+        """
+        Đã có quốc gia / ASN cho thêm proxy: vẽ lại bảng.
+        """
+        self.proxy_model.refresh_rows()
+        self.update_geo_label()
+        self.log_signal.emit(f"🌍 Đã tra quốc gia / ASN cho {updated} proxy")
+        # Danh sách quốc gia bên trang Automation cập nhật theo
+        self.proxies_updated.emit(self.get_active_proxies())
+
+    def update_geo_label(self):
+        """
+        Số proxy theo quốc gia (10 quốc gia nhiều proxy nhất).
         """
-        self.proxy_table.setRowCount(len(self.proxies))
-        for row, proxy_data in enumerate(self.proxies):
-            self.proxy_table.setItem(row, 0, QTableWidgetItem(proxy_data["proxy"]))
-            self.proxy_table.setItem(row, 1, QTableWidgetItem(proxy_data.get("status", "Chưa kiểm tra")))
-            self.proxy_table.setItem(row, 2, QTableWidgetItem(str(proxy_data.get("speed", "-"))))
+        countries = list(self.store.countries().items())
+        self.geo_label.setText("Theo quốc gia: " + (" | ".join(
+            f"{country} {count}" for country, count in countries[:10]
+        ) or "chưa có dữ liệu (đặt geoip.csv / GeoLite2-*.mmdb trong data/)"))
+
+    def update_traffic(self):
+        """
+        Cập nhật cột lưu lượng và tổng lưu lượng theo task.
+        """
+        self.proxy_model.refresh_traffic()
+        by_task = sorted(get_traffic_meter().by_task().items(), key=lambda item: -(item[1][0] + item[1][1]))
+        self.traffic_label.setText("Lưu lượng theo task: " + (", ".join(
+            f"{task or 'khác'} {format_bytes(up + down)} ({requests} req)"
+            for task, (up, down, requests) in by_task[:8]
+        ) or "chưa có"))
+
+    def update_health(self):
+        """
+        Vẽ lại trạng thái / độ trễ do monitor cập nhật và hiện số proxy theo nhóm.
+        """
+        if self.health_monitor is None:
+            return
+        self.proxy_model.refresh_rows()
+        counts = self.health_monitor.summary()
+        self.count_label.setText(
+            f"Tổng: {len(self.store)} proxy | Hoạt động: {counts['working'] + counts['flapping']}"
+            f" (chập chờn: {counts['flapping']}) | Lỗi: {counts['dead']} | Chưa kiểm tra: {counts['unknown']}"
+        )
+
+    def on_health_changed(self, active):
+        """
+        Tập proxy hoạt động thay đổi (monitor phát): cập nhật bảng và báo cho các worker.
+        """
+        self.update_health()
+        self.proxies_updated.emit(active)
 
     def add_proxy(self):
         """
-        Thêm một proxy mới vào danh sách.
+        Thêm proxy mới vào danh sách (có thể dán nhiều proxy cách nhau bởi khoảng trắng).
         Định dạng hỗ trợ:
           - ip:port
           - http://ip:port
@@ -162,22 +336,47 @@ class ProxyManagerWidget(QWidget):
         if not proxy_str:
             return
 
-        # Kiểm tra trùng lặp
-        if any(p["proxy"] == proxy_str for p in self.proxies):
-            QMessageBox.information(self, "Thông báo", "Proxy này đã tồn tại trong danh sách.")
+        added, duplicates, invalid = self.store.add_many(proxy_str.split())
+        if not added:
+            message = "Proxy này đã tồn tại trong danh sách." if duplicates else "Proxy không đúng định dạng."
+            QMessageBox.information(self, "Thông báo", message)
             return
 
-        # Bổ sung vào danh sách
-        new_proxy = {
-            "proxy": proxy_str,
-            "status": "Chưa kiểm tra",
-            "speed": "-"
-        }
-        self.proxies.append(new_proxy)
         self.update_table()
         self.proxy_input.clear()
         self.save_proxies()
 
+    def import_proxies(self):
+        """
+        Nhập hàng loạt từ file .txt / .csv (mỗi dòng một proxy).
+        """
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Nhập danh sách proxy", "", "Proxy list (*.txt *.csv);;All files (*)"
+        )
+        if not path:
+            return
+
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            started = time.time()
+            added, duplicates, invalid = self.store.import_file(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi", f"Không thể nhập file: {str(e)}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        self.update_table()
+        self.save_proxies()
+        self.log_signal.emit(
+            f"✅ Đã nhập {added} proxy ({duplicates} trùng, {invalid} không hợp lệ) trong {time.time() - started:.1f}s"
+        )
+        QMessageBox.information(
+            self,
+            "Nhập proxy",
+            f"Đã thêm {added} proxy.\nBỏ qua {duplicates} proxy trùng và {invalid} dòng không hợp lệ."
+        )
+
     def parse_proxy(self, proxy_str):
         """
         Phân tích proxy_str để trả về dict cho requests.
@@ -187,19 +386,18 @@ class ProxyManagerWidget(QWidget):
           - socks4://ip:port
           - socks5://ip:port
           - [user:pass@]ip:port
-        => Trả về { 'http': 'xxx', 'https': 'xxx' } (nếu parse thành công).
+          - ip:port:user:pass
+        => Trả về { 'http': 'xxx', 'https': 'xxx' } (nếu parse thành công, ngược lại None).
         """
-        # Kiểm tra xem user có nhập sẵn schema chưa
-        # vd: socks4://..., socks5://..., http://..., https://...
-        # Nếu không, mặc định là http://
-        if "://" not in proxy_str:
-            # user:pass@ip:port hay ip:port
-            # => Mặc định gắn http://
-            proxy_str = "http://" + proxy_str
+        # Chuẩn hoá về scheme://[user:pass@]ip:port (mặc định http://)
+        # Hỗ trợ thêm ip:port:username:password
+        url = proxy_url(proxy_str)
+        if url is None:
+            return None
 
         # Kết quả => 1 dict cho http & https
         # requests[socks] vẫn cho phép xài socks4, socks5
-        return {"http": proxy_str, "https": proxy_str}
+        return {"http": url, "https": url}
 
     def test_proxy(self, proxy):
         """Kiểm tra proxy có hoạt động không"""
@@ -211,10 +409,9 @@ class ProxyManagerWidget(QWidget):
             timeout = 8
             
             # Thiết lập proxy
-            proxies = {
-                "http": f"http://{proxy}",
-                "https": f"http://{proxy}"
-            }
+            proxies = self.parse_proxy(proxy)
+            if proxies is None:
+                return False, "Lỗi: Proxy không đúng định dạng"
             
             # Thử kết nối đến một trang web đơn giản
             try:
@@ -225,7 +422,9 @@ class ProxyManagerWidget(QWidget):
                     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
                 }
                 
-                # Thử kết nối đến Google
+                # Thử kết nối đến Google (chờ lượt theo giới hạn tốc độ của google.com và proxy)
+                limiter = get_rate_limiter()
+                limiter.acquire("https://www.google.com", proxy)
                 response = requests.get(
                     "https://www.google.com", 
                     proxies=proxies, 
@@ -233,6 +432,7 @@ class ProxyManagerWidget(QWidget):
                     headers=headers
                 )
                 
+                limiter.report("https://www.google.com", proxy, None if response.status_code == 200 else response.status_code)
                 if response.status_code == 200:
                     # Kiểm tra tốc độ phản hồi
                     speed = response.elapsed.total_seconds()
@@ -251,6 +451,12 @@ class ProxyManagerWidget(QWidget):
 
     def test_all_proxies(self):
         """Kiểm tra tất cả proxy trong danh sách"""
+        if self.health_monitor is not None:
+            # Monitor kiểm tra ở nền (giới hạn đồng thời), kết quả về qua on_health_changed
+            self.health_monitor.recheck_all()
+            self.log_signal.emit(f"🔄 Đã lên lịch kiểm tra lại {len(self.store)} proxy ở nền")
+            return
+
         self.log_signal.emit("🔄 Đang kiểm tra tất cả proxy...")
         
         # Tạo một hàng đợi để lưu kết quả
@@ -279,31 +485,28 @@ class ProxyManagerWidget(QWidget):
         for thread in threads:
             thread.join()
         
-        # Xử lý kết quả
+        # Xử lý kết quả (ghi xuống SQLite một lần)
         working_count = 0
         while not result_queue.empty():
             index, success, message = result_queue.get()
+            status = "Hoạt động" if success else "Không hoạt động"
+            self.store.update(self.proxies[index]["proxy"], status=status, speed=message)
             if success:
-                self.proxies[index]["status"] = "Hoạt động"
-                self.proxies[index]["speed"] = message
                 working_count += 1
-            else:
-                self.proxies[index]["status"] = "Không hoạt động"
-                self.proxies[index]["speed"] = message
         
         # Cập nhật UI
-        self.update_table()
+        self.proxy_model.refresh_rows()
+        self.count_label.setText(f"Tổng: {len(self.store)} proxy | Hoạt động: {working_count}")
         self.log_signal.emit(f"✅ Đã kiểm tra xong: {working_count}/{len(self.proxies)} proxy hoạt động")
         
-        # Phát tín hiệu cập nhật proxy
-        working_proxies = [p["proxy"] for p in self.proxies if p["status"] == "Hoạt động"]
-        self.proxies_updated.emit(working_proxies)
+        # Lưu + phát tín hiệu cập nhật proxy
+        self.save_proxies()
 
     def delete_selected(self):
         """
         Xóa các proxy được chọn trong bảng.
         """
-        selected_rows = set(item.row() for item in self.proxy_table.selectedItems())
+        selected_rows = {index.row() for index in self.proxy_table.selectionModel().selectedRows()}
         if not selected_rows:
             return
 
@@ -316,9 +519,7 @@ class ProxyManagerWidget(QWidget):
         if confirm == QMessageBox.No:
             return
 
-        for row in sorted(selected_rows, reverse=True):
-            if 0 <= row < len(self.proxies):
-                self.proxies.pop(row)
+        self.store.remove([self.proxy_model.proxy_at(row) for row in selected_rows if 0 <= row < len(self.proxies)])
 
         self.update_table()
         self.save_proxies()
@@ -362,11 +563,11 @@ class ProxyManagerWidget(QWidget):
         """
         Trả về list các proxy đang ở trạng thái 'Hoạt động'.
         """
-        return [p["proxy"] for p in self.proxies if p["status"] == "Hoạt động"]
+        return self.store.active()
         
     def refresh_proxies(self):
         """
-        Làm mới danh sách proxy từ file và cập nhật giao diện.
+        Làm mới danh sách proxy từ kho và cập nhật giao diện.
         """
         self.log_signal.emit("🔄 Đang làm mới danh sách proxy...")
         self.load_proxies()
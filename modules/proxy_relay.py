@@ -0,0 +1,437 @@
+# modules/proxy_relay.py
+
+"""
+Proxy chuyển tiếp cục bộ (asyncio) cho phép đổi proxy mà không khởi động lại trình duyệt.
+
+- Mỗi trình duyệt dùng một slot: một cổng lắng nghe trên 127.0.0.1, trình
+  duyệt chạy với --proxy-server=http://127.0.0.1:<cổng> suốt vòng đời
+- Slot chuyển tiếp tới upstream HTTP / HTTPS / SOCKS4 / SOCKS5, kể cả upstream
+  có user:pass (điều --proxy-server của Chrome không làm được)
+- Đổi upstream là một lệnh gửi vào event loop (vài ms): kết nối mới đi qua
+  upstream mới, tunnel cũ bị đóng để trình duyệt tự kết nối lại
+- Giữ sẵn vài kết nối TCP tới mỗi upstream (SOCKS5 đã xác thực xong) để tunnel
+  mới không phải chờ bắt tay với proxy
+"""
+
+import time
+import base64
+import socket
+import struct
+import asyncio
+import logging
+import threading
+import urllib.parse
+from collections import deque
+
+from .config import PROXY_RELAY_HOST, PROXY_RELAY_POOL_SIZE, PROXY_RELAY_POOL_IDLE
+from .proxy_store import parse_proxy_line
+from .traffic_meter import get_traffic_meter
+
+CONNECT_TIMEOUT = 15
+# Header chỉ dành cho proxy, không chuyển tiếp cho upstream / máy chủ đích
+HOP_HEADERS = (b"proxy-connection", b"proxy-authorization", b"connection", b"keep-alive")
+
+
+class RelayError(Exception):
+    """Upstream từ chối hoặc không kết nối được"""
+
+
+class Upstream:
+    """Proxy upstream đã phân tích (chuỗi ở mọi định dạng của ProxyManagerWidget)"""
+
+    def __init__(self, proxy):
+        parts = parse_proxy_line(proxy)
+        if parts is None:
+            raise ValueError(f"Proxy không hợp lệ: {proxy}")
+        self.proxy = proxy
+        self.scheme = parts["scheme"]
+        self.host = parts["host"]
+        self.port = parts["port"]
+        self.username = parts["username"]
+        self.password = parts["password"] or ""
+
+    @property
+    def key(self):
+        # Gồm cả mật khẩu: kết nối SOCKS5 trong pool đã xác thực bằng đúng cặp user/pass này
+        return f"{self.scheme}://{self.username or ''}:{self.password}@{self.host}:{self.port}"
+
+    def auth_header(self):
+        if not self.username:
+            return b""
+        token = base64.b64encode(f"{self.username}:{self.password}".encode("utf-8"))
+        return b"Proxy-Authorization: Basic " + token + b"\r\n"
+
+    def __repr__(self):
+        return f"Upstream({self.scheme}://{self.host}:{self.port})"
+
+
+# ---------------- BẮT TAY VỚI UPSTREAM ----------------
+async def _open_tcp(upstream):
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(upstream.host, upstream.port, ssl=True if upstream.scheme == "https" else None),
+        CONNECT_TIMEOUT
+    )
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if upstream.scheme == "socks5":
+        await _socks5_greet(reader, writer, upstream)
+    return reader, writer
+
+
+async def _socks5_greet(reader, writer, upstream):
+    """Chào + xác thực user/pass (RFC 1929); phần này làm trước được nên kết nối trong pool đã sẵn sàng"""
+    methods = b"\x00\x02" if upstream.username else b"\x00"
+    writer.write(b"\x05" + bytes([len(methods)]) + methods)
+    version, method = await reader.readexactly(2)
+    if version != 5 or method == 0xFF:
+        raise RelayError("SOCKS5 upstream từ chối phương thức xác thực")
+    if method == 2:
+        user = upstream.username.encode("utf-8")
+        password = upstream.password.encode("utf-8")
+        writer.write(b"\x01" + bytes([len(user)]) + user + bytes([len(password)]) + password)
+        _, status = await reader.readexactly(2)
+        if status != 0:
+            raise RelayError("SOCKS5 upstream: sai user/pass")
+
+
+async def _tunnel_via(upstream, reader, writer, host, port):
+    """Yêu cầu upstream mở tunnel tới host:port trên kết nối đã có"""
+    if upstream.scheme in ("http", "https"):
+        target = f"{host}:{port}".encode("idna")
+        writer.write(
+            b"CONNECT " + target + b" HTTP/1.1\r\nHost: " + target + b"\r\n" + upstream.auth_header() + b"\r\n"
+        )
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), CONNECT_TIMEOUT)
+        status = head.split(b" ", 2)[1] if head.count(b" ") >= 1 else b"?"
+        if status != b"200":
+            raise RelayError(f"HTTP upstream trả về {status.decode('latin-1')}")
+    elif upstream.scheme == "socks5":
+        name = host.encode("idna")
+        writer.write(b"\x05\x01\x00\x03" + bytes([len(name)]) + name + struct.pack(">H", port))
+        _, rep, _, atyp = await asyncio.wait_for(reader.readexactly(4), CONNECT_TIMEOUT)
+        if rep != 0:
+            raise RelayError(f"SOCKS5 upstream lỗi {rep}")
+        length = {1: 4, 4: 16}.get(atyp) or (await reader.readexactly(1))[0]
+        await reader.readexactly(length + 2)
+    elif upstream.scheme == "socks4":
+        # SOCKS4a: IP 0.0.0.1 + tên miền để upstream tự phân giải
+        user = (upstream.username or "").encode("utf-8")
+        writer.write(b"\x04\x01" + struct.pack(">H", port) + b"\x00\x00\x00\x01" + user + b"\x00"
+                     + host.encode("idna") + b"\x00")
+        reply = await asyncio.wait_for(reader.readexactly(8), CONNECT_TIMEOUT)
+        if reply[1] != 0x5A:
+            raise RelayError(f"SOCKS4 upstream lỗi {reply[1]}")
+    return reader, writer
+
+
+class _UpstreamPool:
+    """Kết nối dựng sẵn tới từng upstream (tối đa size, bỏ kết nối rảnh quá idle giây)"""
+
+    def __init__(self, size=PROXY_RELAY_POOL_SIZE, idle=PROXY_RELAY_POOL_IDLE):
+        self.size = size
+        self.idle = idle
+        self._idle = {}  # key -> deque[(created, reader, writer)]
+        self._filling = set()
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def take(self, upstream):
+        conns = self._idle.get(upstream.key)
+        while conns:
+            created, reader, writer = conns.popleft()
+            if time.monotonic() - created < self.idle and not writer.is_closing() and not reader.at_eof():
+                self.stats["hits"] += 1
+                self.refill(upstream)
+                return reader, writer
+            writer.close()
+        self.stats["misses"] += 1
+        self.refill(upstream)
+        return await _open_tcp(upstream)
+
+    def refill(self, upstream):
+        if self.size > 0 and upstream.key not in self._filling:
+            self._filling.add(upstream.key)
+            asyncio.ensure_future(self._fill(upstream))
+
+    async def _fill(self, upstream):
+        conns = self._idle.setdefault(upstream.key, deque())
+        try:
+            while len(conns) < self.size:
+                reader, writer = await _open_tcp(upstream)
+                conns.append((time.monotonic(), reader, writer))
+        except Exception as e:
+            logging.debug(f"Không dựng sẵn được kết nối tới {upstream}: {e}")
+        finally:
+            self._filling.discard(upstream.key)
+
+    def drop(self, upstream):
+        for _, _, writer in self._idle.pop(upstream.key, ()):
+            writer.close()
+
+    def close(self):
+        for conns in self._idle.values():
+            for _, _, writer in conns:
+                writer.close()
+        self._idle.clear()
+
+
+# ---------------- SLOT ----------------
+class RelaySlot:
+    """Một cổng lắng nghe cục bộ cho một trình duyệt"""
+
+    def __init__(self, relay, upstream=None, task=None):
+        self.relay = relay
+        self.upstream = upstream
+        self.task = task  # gắn vào bộ đếm lưu lượng
+        self.host = relay.host
+        self.port = None
+        self.closed = False
+        self._server = None
+        self._tunnels = set()
+        self.stats = {"connections": 0, "errors": 0, "switches": 0, "bytes_up": 0, "bytes_down": 0}
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def proxy_server(self):
+        """Giá trị cho --proxy-server"""
+        return f"http://{self.address}"
+
+    async def _start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.upstream:
+            self.relay.pool.refill(self.upstream)
+
+    async def _switch(self, upstream, drop_existing):
+        previous, self.upstream = self.upstream, upstream
+        self.stats["switches"] += 1
+        if upstream:
+            self.relay.pool.refill(upstream)
+        if previous and not any(s.upstream and s.upstream.key == previous.key for s in self.relay.slots()):
+            self.relay.pool.drop(previous)
+        if drop_existing:
+            for writer in list(self._tunnels):
+                writer.close()
+
+    def set_upstream(self, proxy, drop_existing=True, timeout=5):
+        """Đổi upstream (None: đi thẳng). Gọi được từ thread bất kỳ"""
+        upstream = Upstream(proxy) if proxy else None
+        self.relay.submit(self._switch(upstream, drop_existing)).result(timeout)
+
+    def close(self):
+        self.relay.close_slot(self)
+
+    async def _stop(self):
+        self.closed = True
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._tunnels):
+            writer.close()
+
+    # ---------------- XỬ LÝ KẾT NỐI TỪ TRÌNH DUYỆT ----------------
+    async def _handle(self, reader, writer):
+        self.stats["connections"] += 1
+        upstream = self.upstream
+        up_writer = None
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 60)
+            request_line, _, headers = head.partition(b"\r\n")
+            method, target, version = request_line.split(b" ", 2)
+
+            if method == b"CONNECT":
+                host, _, port = target.decode("latin-1").rpartition(":")
+                up_reader, up_writer = await self._open_tunnel(upstream, host.strip("[]"), int(port))
+                writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            else:
+                up_reader, up_writer, first = await self._forward_request(upstream, method, target, version, headers)
+                up_writer.write(first)
+        except Exception as e:
+            self.stats["errors"] += 1
+            if up_writer:
+                up_writer.close()
+            if not writer.is_closing():
+                message = str(e).encode("utf-8", "replace")[:200]
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: " + str(len(message)).encode()
+                             + b"\r\nConnection: close\r\n\r\n" + message)
+                writer.close()
+            return
+
+        self._tunnels.update((writer, up_writer))
+        if upstream:
+            get_traffic_meter().record(upstream.proxy, self.task, requests=1)
+        try:
+            await asyncio.gather(
+                self._pipe(reader, up_writer, "bytes_up", upstream),
+                self._pipe(up_reader, writer, "bytes_down", upstream)
+            )
+        finally:
+            self._tunnels.discard(writer)
+            self._tunnels.discard(up_writer)
+            writer.close()
+            up_writer.close()
+
+    async def _open_tunnel(self, upstream, host, port):
+        if upstream is None:
+            return await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+        reader, writer = await self.relay.pool.take(upstream)
+        try:
+            return await _tunnel_via(upstream, reader, writer, host, port)
+        except Exception:
+            writer.close()
+            raise
+
+    async def _forward_request(self, upstream, method, target, version, headers):
+        """HTTP thường (không CONNECT): một request mỗi kết nối (Connection: close)"""
+        kept = [
+            line for line in headers.split(b"\r\n")
+            if line and line.split(b":", 1)[0].strip().lower() not in HOP_HEADERS
+        ]
+        kept.append(b"Connection: close")
+
+        if upstream and upstream.scheme in ("http", "https"):
+            # Upstream HTTP nhận URL tuyệt đối + Proxy-Authorization
+            reader, writer = await self.relay.pool.take(upstream)
+            head = b" ".join((method, target, version)) + b"\r\n" + b"\r\n".join(kept) + b"\r\n"
+            return reader, writer, head + upstream.auth_header() + b"\r\n"
+
+        url = urllib.parse.urlsplit(target.decode("latin-1"))
+        if not url.hostname:
+            raise RelayError("Request không có URL tuyệt đối")
+        path = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        reader, writer = await self._open_tunnel(upstream, url.hostname, url.port or 80)
+        head = b" ".join((method, path.encode("latin-1"), version)) + b"\r\n" + b"\r\n".join(kept) + b"\r\n\r\n"
+        return reader, writer, head
+
+    async def _pipe(self, reader, writer, counter, upstream=None):
+        meter = get_traffic_meter() if upstream else None
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                self.stats[counter] += len(data)
+                if meter:
+                    meter.record(upstream.proxy, self.task, **{counter: len(data)})
+                writer.write(data)
+                await writer.drain()
+            # Bên đọc đã hết dữ liệu: chỉ đóng chiều ghi, chiều ngược lại vẫn chạy tiếp
+            if writer.can_write_eof():
+                writer.write_eof()
+            else:
+                writer.close()
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            writer.close()
+
+
+# ---------------- RELAY ----------------
+class ProxyRelay:
+    """Event loop nền chạy mọi slot relay của ứng dụng"""
+
+    def __init__(self, host=PROXY_RELAY_HOST, pool_size=PROXY_RELAY_POOL_SIZE, pool_idle=PROXY_RELAY_POOL_IDLE):
+        self.host = host
+        self.loop = asyncio.new_event_loop()
+        self.pool = _UpstreamPool(pool_size, pool_idle)
+        self._slots = set()
+        self._slots_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run_loop, name="ProxyRelay", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Gửi coroutine vào event loop, trả về concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def slots(self):
+        with self._slots_lock:
+            return list(self._slots)
+
+    def open_slot(self, proxy=None, task=None, timeout=10):
+        """Mở cổng mới chuyển tiếp tới proxy (None: đi thẳng); task dùng cho bộ đếm lưu lượng"""
+        slot = RelaySlot(self, Upstream(proxy) if proxy else None, task)
+        self.submit(slot._start()).result(timeout)
+        with self._slots_lock:
+            self._slots.add(slot)
+        return slot
+
+    def close_slot(self, slot, timeout=5):
+        if slot.closed:
+            return
+        with self._slots_lock:
+            self._slots.discard(slot)
+        try:
+            self.submit(slot._stop()).result(timeout)
+        except Exception as e:
+            logging.warning(f"Lỗi đóng relay slot {slot.address}: {e}")
+
+    def check(self, proxy, host="www.google.com", port=443, timeout=8):
+        """Mở thử tunnel tới host:port qua proxy; trả về số giây, lỗi thì raise"""
+        upstream = Upstream(proxy)
+
+        async def probe():
+            started = time.monotonic()
+            reader, writer = await _open_tcp(upstream)
+            try:
+                await _tunnel_via(upstream, reader, writer, host, port)
+            finally:
+                writer.close()
+            return time.monotonic() - started
+
+        return self.submit(asyncio.wait_for(probe(), timeout)).result(timeout + 1)
+
+    def stats(self):
+        return [
+            dict(slot.stats, address=slot.address, upstream=slot.upstream.proxy if slot.upstream else None)
+            for slot in self.slots()
+        ]
+
+    def shutdown(self, timeout=5):
+        """Đóng mọi slot và dừng event loop"""
+        for slot in self.slots():
+            self.close_slot(slot, timeout)
+        self.loop.call_soon_threadsafe(self.pool.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+
+def bind_slot_to_driver(driver, slot):
+    """Đóng slot khi driver.quit() (kể cả khi reaper đóng trình duyệt)"""
+    original_quit = driver.quit
+
+    def quit_and_close():
+        try:
+            original_quit()
+        finally:
+            slot.close()
+
+    driver.quit = quit_and_close
+    driver.relay_slot = slot
+    return driver
+
+
+_relay = None
+_relay_lock = threading.Lock()
+
+
+def get_proxy_relay():
+    """Trả về ProxyRelay dùng chung (khởi tạo khi cần)"""
+    global _relay
+    with _relay_lock:
+        if _relay is None:
+            _relay = ProxyRelay()
+        return _relay
+
+
+def shutdown_proxy_relay():
+    """Dừng ProxyRelay nếu đã được khởi tạo"""
+    global _relay
+    with _relay_lock:
+        relay, _relay = _relay, None
+    if relay:
+        relay.shutdown()
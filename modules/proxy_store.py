@@ -0,0 +1,343 @@
+# modules/proxy_store.py
+
+"""
+Kho proxy có chỉ mục cho danh sách lớn (hàng chục nghìn proxy thương mại).
+
+- Chuẩn hoá mọi định dạng về một chuỗi duy nhất: ip:port, scheme://ip:port,
+  user:pass@ip:port, ip:port:user:pass, user:pass:ip:port, dòng CSV
+  (host,port[,user,pass] hoặc cột đầu là proxy)
+- Chống trùng bằng dict theo khoá (scheme, host, port, user) thay vì duyệt danh sách
+- Lưu trong SQLite (WAL), nhập hàng loạt theo lô bằng executemany; cập nhật
+  trạng thái được gom lại và ghi một lần bằng flush()
+- Tự chuyển dữ liệu từ data/proxies.json ở lần mở đầu tiên
+- Chỉ mục theo quốc gia (trường country do geoip.py ghi) để lấy nhanh "proxy ở VN"
+"""
+
+import os
+import csv
+import json
+import time
+import sqlite3
+import threading
+
+from .config import PROXY_IMPORT_BATCH_SIZE
+
+DEFAULT_PROXY_DB = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "proxies.db"
+)
+
+SCHEMES = ("http", "https", "socks4", "socks5")
+STATUS_UNCHECKED = "Chưa kiểm tra"
+STATUS_WORKING = "Hoạt động"
+
+# Trường của proxy lưu thành cột riêng; trường khác lưu trong cột data (JSON)
+CORE_FIELDS = ("proxy", "status", "speed")
+
+
+def _valid_port(value):
+    return value.isdigit() and 0 < int(value) < 65536
+
+
+def parse_proxy_line(line):
+    """
+    Phân tích một dòng proxy thành dict (scheme, host, port, username, password),
+    None nếu không hợp lệ.
+    """
+    line = (line or "").strip().lstrip("\ufeff")
+    if not line or line.startswith("#"):
+        return None
+
+    # Dòng CSV / TSV
+    if any(sep in line for sep in ",;\t"):
+        fields = [f.strip() for f in next(csv.reader([line.replace(";", ",").replace("\t", ",")]))]
+        fields = [f for f in fields if f]
+        if not fields:
+            return None
+        if ":" in fields[0]:
+            line = fields[0]
+        else:
+            line = ":".join(fields[:4])
+
+    scheme = "http"
+    if "://" in line:
+        scheme, line = line.split("://", 1)
+        scheme = scheme.lower()
+        if scheme not in SCHEMES:
+            return None
+    line = line.rstrip("/")
+
+    username = password = None
+    if "@" in line:
+        auth, line = line.rsplit("@", 1)
+        username, _, password = auth.partition(":")
+        parts = line.split(":")
+        if len(parts) != 2:
+            return None
+        host, port = parts
+    else:
+        parts = line.split(":")
+        if len(parts) == 2:
+            host, port = parts
+        elif len(parts) == 4 and _valid_port(parts[1]):
+            host, port, username, password = parts
+        elif len(parts) == 4 and _valid_port(parts[3]):
+            username, password, host, port = parts
+        else:
+            return None
+
+    host = host.strip().lower()
+    port = port.strip()
+    if not host or not _valid_port(port):
+        return None
+    return {
+        "scheme": scheme,
+        "host": host,
+        "port": int(port),
+        "username": username or None,
+        "password": password or None,
+    }
+
+
+def format_proxy(parts):
+    """Chuỗi chuẩn: ip:port cho http không xác thực, [scheme://][user:pass@]ip:port cho các loại khác"""
+    auth = f"{parts['username']}:{parts['password'] or ''}@" if parts.get("username") else ""
+    prefix = "" if parts["scheme"] == "http" else f"{parts['scheme']}://"
+    return f"{prefix}{auth}{parts['host']}:{parts['port']}"
+
+
+def proxy_url(proxy):
+    """URL đầy đủ scheme://[user:pass@]host:port cho requests / relay; None nếu không hợp lệ"""
+    parts = parse_proxy_line(proxy)
+    if parts is None:
+        return None
+    auth = f"{parts['username']}:{parts['password'] or ''}@" if parts["username"] else ""
+    return f"{parts['scheme']}://{auth}{parts['host']}:{parts['port']}"
+
+
+def proxy_key(parts):
+    """Khoá chống trùng: cùng endpoint + cùng user là một proxy"""
+    return f"{parts['scheme']}://{parts['username'] or ''}@{parts['host']}:{parts['port']}"
+
+
+class ProxyStore:
+    """
+    Danh sách proxy trong bộ nhớ (list theo thứ tự thêm + dict chỉ mục theo khoá),
+    đồng bộ xuống SQLite. An toàn khi gọi từ nhiều thread.
+    """
+
+    def __init__(self, db_path=None, batch_size=PROXY_IMPORT_BATCH_SIZE):
+        self.db_path = db_path or DEFAULT_PROXY_DB
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._conn = None
+        self.rows = []  # [{"proxy", "status", "speed", ...}] theo thứ tự thêm
+        self.index = {}  # khoá -> row
+        self._by_proxy = {}  # chuỗi proxy -> row
+        self._by_country = {}  # mã quốc gia -> {chuỗi proxy: row}
+        self._dirty = set()
+        self._load()
+
+    # ---------------- SQLITE ----------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS proxies ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " key TEXT NOT NULL UNIQUE,"
+                " proxy TEXT NOT NULL,"
+                " status TEXT,"
+                " speed TEXT,"
+                " added_at REAL NOT NULL,"
+                " data TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_proxies_proxy ON proxies (proxy);"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load(self):
+        with self._lock:
+            cursor = self._connection().execute("SELECT key, proxy, status, speed, data FROM proxies ORDER BY id")
+            for key, proxy, status, speed, data in cursor:
+                row = json.loads(data) if data else {}
+                row.update(proxy=proxy, status=status or STATUS_UNCHECKED, speed=speed or "-")
+                self._remember(key, row)
+
+    def _remember(self, key, row):
+        self.rows.append(row)
+        self.index[key] = row
+        self._by_proxy[row["proxy"]] = row
+        if row.get("country"):
+            self._by_country.setdefault(row["country"], {})[row["proxy"]] = row
+
+    @staticmethod
+    def _extra(row):
+        extra = {k: v for k, v in row.items() if k not in CORE_FIELDS}
+        return json.dumps(extra, ensure_ascii=False) if extra else None
+
+    # ---------------- THÊM ----------------
+    def add_many(self, lines):
+        """
+        Chuẩn hoá + chống trùng rồi ghi theo lô.
+        Trả về (số đã thêm, số trùng, số không hợp lệ).
+        """
+        added = duplicates = invalid = 0
+        batch = []
+        with self._lock:
+            for line in lines:
+                parts = parse_proxy_line(line)
+                if parts is None:
+                    # Dòng trống / chú thích không tính là lỗi
+                    if line and line.strip() and not line.strip().startswith("#"):
+                        invalid += 1
+                    continue
+                key = proxy_key(parts)
+                if key in self.index:
+                    duplicates += 1
+                    continue
+                row = {"proxy": format_proxy(parts), "status": STATUS_UNCHECKED, "speed": "-"}
+                self._remember(key, row)
+                batch.append((key, row["proxy"], row["status"], row["speed"], time.time()))
+                added += 1
+                if len(batch) >= self.batch_size:
+                    self._insert(batch)
+                    batch = []
+            if batch:
+                self._insert(batch)
+        return added, duplicates, invalid
+
+    def _insert(self, batch):
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR IGNORE INTO proxies (key, proxy, status, speed, added_at) VALUES (?, ?, ?, ?, ?)",
+            batch
+        )
+        conn.commit()
+
+    def import_file(self, path):
+        """Nhập từ file .txt / .csv (mỗi dòng một proxy; dòng tiêu đề CSV tự bị bỏ qua)"""
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            lines = f.read().splitlines()
+        if lines and parse_proxy_line(lines[0]) is None and any(c.isalpha() for c in lines[0].split(",")[0]):
+            lines = lines[1:]
+        return self.add_many(lines)
+
+    def migrate_from_json(self, json_path):
+        """
+        Nhập proxy (kèm trạng thái) từ proxies.json nếu kho còn trống.
+        File cũ được đổi tên thành .migrated. Trả về số proxy đã nhập.
+        """
+        if self.rows or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        entries = [p for p in loaded if isinstance(p, dict) and p.get("proxy")]
+        added, _, _ = self.add_many(p["proxy"] for p in entries)
+        for entry in entries:
+            row = self.get(entry["proxy"])
+            if row and entry.get("status"):
+                self.update(row["proxy"], status=entry["status"], speed=entry.get("speed", "-"))
+        self.flush()
+        os.replace(json_path, json_path + ".migrated")
+        return added
+
+    # ---------------- TRA CỨU / CẬP NHẬT ----------------
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, proxy):
+        """Row của proxy (chuỗi ở bất kỳ định dạng nào), None nếu không có"""
+        row = self._by_proxy.get(proxy)
+        if row is None:
+            parts = parse_proxy_line(proxy)
+            row = self.index.get(proxy_key(parts)) if parts else None
+        return row
+
+    def update(self, proxy, **fields):
+        """Cập nhật trong bộ nhớ; ghi xuống đĩa ở lần flush() kế tiếp"""
+        with self._lock:
+            row = self.get(proxy)
+            if row is None:
+                return False
+            if "country" in fields and fields["country"] != row.get("country"):
+                self._by_country.get(row.get("country"), {}).pop(row["proxy"], None)
+                if fields["country"]:
+                    self._by_country.setdefault(fields["country"], {})[row["proxy"]] = row
+            row.update(fields)
+            self._dirty.add(row["proxy"])
+            return True
+
+    def flush(self):
+        """Ghi mọi thay đổi đang chờ trong một transaction. Trả về số dòng đã ghi"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            params = []
+            for proxy in self._dirty:
+                row = self._by_proxy.get(proxy)
+                if row is not None:
+                    params.append((row["status"], str(row.get("speed", "-")), self._extra(row), proxy))
+            self._dirty.clear()
+            conn = self._connection()
+            conn.executemany("UPDATE proxies SET status = ?, speed = ?, data = ? WHERE proxy = ?", params)
+            conn.commit()
+            return len(params)
+
+    def remove(self, proxies):
+        """Xoá danh sách proxy, trả về số đã xoá"""
+        with self._lock:
+            targets = {row["proxy"] for row in (self.get(p) for p in proxies) if row is not None}
+            if not targets:
+                return 0
+            self.rows[:] = [row for row in self.rows if row["proxy"] not in targets]
+            self.index = {key: row for key, row in self.index.items() if row["proxy"] not in targets}
+            for proxy in targets:
+                self._by_proxy.pop(proxy, None)
+                for rows in self._by_country.values():
+                    rows.pop(proxy, None)
+                self._dirty.discard(proxy)
+            conn = self._connection()
+            conn.executemany("DELETE FROM proxies WHERE proxy = ?", [(p,) for p in targets])
+            conn.commit()
+            return len(targets)
+
+    def active(self, country=None):
+        """Các proxy đang ở trạng thái 'Hoạt động' (chỉ trong một quốc gia nếu truyền country)"""
+        rows = self.rows if country is None else list(self._by_country.get(country.upper(), {}).values())
+        return [row["proxy"] for row in rows if row.get("status") == STATUS_WORKING]
+
+    def countries(self):
+        """{mã quốc gia: số proxy} sắp theo số proxy giảm dần"""
+        with self._lock:
+            counts = {country: len(rows) for country, rows in self._by_country.items() if rows}
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_proxy_store():
+    """Trả về ProxyStore dùng chung (tự chuyển data/proxies.json cũ ở lần đầu)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProxyStore()
+            _store.migrate_from_json(os.path.join(os.path.dirname(DEFAULT_PROXY_DB), "proxies.json"))
+        return _store
@@ -0,0 +1,191 @@
+# modules/rate_limiter.py
+
+"""
+Giới hạn tốc độ truy cập theo domain và theo proxy (token bucket).
+
+- Mỗi domain (google.com, shopee.vn...) và mỗi proxy có một bucket riêng:
+  rate yêu cầu/giây, cho phép dồn tối đa burst yêu cầu
+- acquire() giữ chỗ ngay (tokens có thể âm) rồi chờ tới lượt, nên các worker
+  được phục vụ theo thứ tự gọi thay vì tranh nhau
+- Thích ứng: gặp captcha / 429 / 403 thì nhân đôi hệ số phạt (chậm lại),
+  mỗi lần thành công thì giảm dần về 1
+- Mặc định dùng chung trong tiến trình; đặt RATE_LIMIT_SHARED_DB để các tiến
+  trình (job_worker.py) dùng chung trạng thái bucket qua SQLite
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import urllib.parse
+
+from .config import (
+    RATE_LIMITS, RATE_LIMIT_DEFAULT, RATE_LIMIT_PER_PROXY,
+    RATE_LIMIT_MAX_PENALTY, RATE_LIMIT_SHARED_DB
+)
+
+# Hậu tố 2 cấp phổ biến (shopee.com.vn, example.co.uk)
+SECOND_LEVEL = {"com", "net", "org", "gov", "edu", "co", "ac"}
+
+# Lỗi khiến domain/proxy bị phạt (chậm lại)
+PENALTY_KINDS = {"captcha"}
+PENALTY_STATUS = {403, 429}
+
+
+def domain_of(url):
+    """Domain đăng ký của url: https://www.google.com.vn/search -> google.com.vn"""
+    host = urllib.parse.urlsplit(url if "//" in url else f"//{url}").hostname or ""
+    parts = host.lower().strip(".").split(".")
+    if len(parts) >= 3 and len(parts[-1]) == 2 and parts[-2] in SECOND_LEVEL:
+        return ".".join(parts[-3:])
+    return ".".join(parts[-2:])
+
+
+class _MemoryBackend:
+    """Trạng thái bucket trong bộ nhớ tiến trình"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {}  # key -> [tokens, updated_at, penalty]
+
+    def update(self, key, burst, fn):
+        with self._lock:
+            state = self._state.setdefault(key, [float(burst), time.time(), 1.0])
+            return fn(state)
+
+
+class _SQLiteBackend:
+    """Trạng thái bucket trong SQLite (WAL), dùng chung giữa các tiến trình"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " key TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " penalty REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def update(self, key, burst, fn):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at, penalty FROM buckets WHERE key = ?", (key,)).fetchone()
+            state = list(row) if row else [float(burst), time.time(), 1.0]
+            value = fn(state)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at, penalty) VALUES (?, ?, ?, ?)",
+                (key, state[0], state[1], state[2])
+            )
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimiter:
+    """Token bucket theo domain + proxy, có hệ số phạt thích ứng"""
+
+    def __init__(self, limits=None, default=RATE_LIMIT_DEFAULT, per_proxy=RATE_LIMIT_PER_PROXY,
+                 max_penalty=RATE_LIMIT_MAX_PENALTY, shared_db=RATE_LIMIT_SHARED_DB):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.default = default
+        self.per_proxy = per_proxy
+        self.max_penalty = max_penalty
+        self.backend = _SQLiteBackend(shared_db) if shared_db else _MemoryBackend()
+        self.stats = {"acquired": 0, "waited": 0.0, "penalties": 0}
+        self._stats_lock = threading.Lock()
+
+    def _keys(self, url, proxy):
+        domain = domain_of(url)
+        rate, burst = self.limits.get(domain, self.default)
+        keys = [(f"domain:{domain}", rate, burst)]
+        if proxy and self.per_proxy:
+            keys.append((f"proxy:{proxy}", self.per_proxy[0], self.per_proxy[1]))
+        return keys
+
+    def reserve(self, url, proxy=None):
+        """Giữ chỗ 1 yêu cầu, trả về số giây phải chờ (không chặn)"""
+        wait = 0.0
+        for key, rate, burst in self._keys(url, proxy):
+            def take(state, rate=rate, burst=burst):
+                now = time.time()
+                tokens, updated_at, penalty = state
+                effective = rate / penalty
+                tokens = min(float(burst), tokens + (now - updated_at) * effective) - 1
+                state[0], state[1] = tokens, now
+                return max(0.0, -tokens / effective)
+            wait = max(wait, self.backend.update(key, burst, take))
+        with self._stats_lock:
+            self.stats["acquired"] += 1
+            self.stats["waited"] = round(self.stats["waited"] + wait, 3)
+        return wait
+
+    def acquire(self, url, proxy=None, should_continue=None, log=None):
+        """Chờ tới lượt truy cập url (qua proxy). False nếu bị dừng giữa chừng"""
+        wait = self.reserve(url, proxy)
+        if wait > 1 and log:
+            log(f"⏳ Giới hạn tốc độ {domain_of(url)}: chờ {wait:.1f}s")
+        deadline = time.time() + wait
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return True
+            if should_continue and not should_continue():
+                return False
+            time.sleep(min(remaining, 0.5))
+
+    def report(self, url, proxy=None, failure=None):
+        """
+        Cập nhật hệ số phạt sau một yêu cầu.
+        failure: None (thành công) hoặc retry_policy.Failure / chuỗi loại lỗi / mã HTTP
+        """
+        kind = getattr(failure, "kind", failure)
+        status = getattr(failure, "status", failure if isinstance(failure, int) else None)
+        penalize = kind in PENALTY_KINDS or status in PENALTY_STATUS
+        if failure is not None and not penalize:
+            return
+
+        for key, _, burst in self._keys(url, proxy):
+            def adjust(state):
+                if penalize:
+                    state[2] = min(self.max_penalty, state[2] * 2)
+                else:
+                    state[2] = max(1.0, state[2] * 0.9)
+                return state[2]
+            self.backend.update(key, burst, adjust)
+        if penalize:
+            with self._stats_lock:
+                self.stats["penalties"] += 1
+
+    def penalty(self, url, proxy=None):
+        """Hệ số phạt hiện tại (lớn nhất giữa domain và proxy)"""
+        return max(
+            self.backend.update(key, burst, lambda state: state[2])
+            for key, _, burst in self._keys(url, proxy)
+        )
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Trả về RateLimiter dùng chung cho toàn tiến trình"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,225 @@
+# modules/resource_monitor.py
+
+"""
+Lấy mẫu tài nguyên (CPU / RSS / handle) của ứng dụng và các trình duyệt ở thread nền.
+
+- Mỗi RESOURCE_SAMPLE_INTERVAL giây đọc: tiến trình ứng dụng, từng cây
+  chromedriver + Brave do BrowserReaper theo dõi, các tiến trình con còn lại
+  (chromedriver chưa đăng ký, tiến trình phụ...) và CPU / RAM của cả máy
+- Mẫu được ghi vào ring buffer NumPy kích thước cố định (RESOURCE_HISTORY mẫu)
+  nên bộ nhớ không tăng theo thời gian chạy
+- Dashboard chỉ đọc snapshot() / history() (sao chép mảng dưới khoá, không gọi
+  psutil) nên thread GUI không bị chặn bởi việc đọc thông tin tiến trình
+- CPU tính theo % của cả máy (tổng mọi nhân = 100%)
+"""
+
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+import psutil
+
+from .config import RESOURCE_SAMPLE_INTERVAL, RESOURCE_HISTORY
+from .browser_reaper import get_browser_reaper
+
+PROCESS_FIELDS = ("time", "cpu", "rss_mb", "handles", "procs")
+HOST_FIELDS = ("time", "cpu", "memory")
+
+# Nhóm tiến trình luôn có
+GROUP_APP = "app"
+GROUP_BROWSERS = "browsers"
+GROUP_OTHER = "other"
+
+
+class RingBuffer:
+    """Mảng NumPy (capacity x số trường) ghi vòng; đọc ra theo thứ tự cũ -> mới"""
+
+    def __init__(self, capacity, fields):
+        self.fields = fields
+        self.capacity = capacity
+        self._columns = {name: i for i, name in enumerate(fields)}
+        self._data = np.zeros((capacity, len(fields)), dtype=np.float64)
+        self._next = 0
+        self.count = 0
+
+    def append(self, values):
+        self._data[self._next] = values
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        """{trường: giá trị} của mẫu mới nhất, None nếu chưa có mẫu"""
+        if not self.count:
+            return None
+        row = self._data[self._next - 1]
+        return {name: float(row[i]) for name, i in self._columns.items()}
+
+    def column(self, field):
+        """Bản sao một trường theo thứ tự thời gian"""
+        i = self._columns[field]
+        if self.count < self.capacity:
+            return self._data[:self.count, i].copy()
+        return np.concatenate((self._data[self._next:, i], self._data[:self._next, i]))
+
+
+def _process_tree(proc):
+    try:
+        return [proc] + proc.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+class ResourceMonitor:
+    """Thread nền lấy mẫu tài nguyên, lưu vào ring buffer theo nhóm và theo trình duyệt"""
+
+    def __init__(self, interval=RESOURCE_SAMPLE_INTERVAL, history=RESOURCE_HISTORY, reaper=None):
+        self.interval = interval
+        self.history_size = history
+        self.reaper = reaper or get_browser_reaper()
+        self._app = psutil.Process(os.getpid())
+        self._cpu_count = psutil.cpu_count() or 1
+        self._procs = {}  # pid -> psutil.Process (giữ lại để cpu_percent() tính theo khoảng giữa hai mẫu)
+        self._host = RingBuffer(history, HOST_FIELDS)
+        self._groups = {name: RingBuffer(history, PROCESS_FIELDS) for name in (GROUP_APP, GROUP_BROWSERS, GROUP_OTHER)}
+        self._browsers = {}  # pid chromedriver -> RingBuffer
+        self._owners = {}  # pid chromedriver -> task
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------------- THREAD NỀN ----------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        psutil.cpu_percent(None)  # mồi cho lần đọc đầu tiên
+        self._thread = threading.Thread(target=self._run, name="ResourceMonitor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logging.error(f"Lỗi ResourceMonitor: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------------- LẤY MẪU ----------------
+    def _cached(self, proc):
+        """Dùng lại đối tượng Process cũ cùng pid (nếu vẫn là tiến trình đó) để cpu_percent() có mốc so sánh"""
+        cached = self._procs.get(proc.pid)
+        if cached is not None and cached.is_running():
+            return cached
+        self._procs[proc.pid] = proc
+        return proc
+
+    def _read(self, procs, seen):
+        """[cpu %, rss MB, handle, số tiến trình] cộng dồn cho một nhóm tiến trình"""
+        cpu = rss = handles = count = 0
+        for proc in procs:
+            if proc.pid in seen:
+                continue
+            seen.add(proc.pid)
+            proc = self._cached(proc)
+            try:
+                with proc.oneshot():
+                    cpu += proc.cpu_percent(None)
+                    rss += proc.memory_info().rss
+                    handles += proc.num_handles() if psutil.WINDOWS else proc.num_fds()
+                count += 1
+            except psutil.Error:
+                continue
+        return [cpu / self._cpu_count, rss / 1024 / 1024, handles, count]
+
+    def sample(self):
+        """Đọc một mẫu (chạy ở thread nền; gọi trực tiếp được khi cần đo ngay)"""
+        now = time.time()
+        host = [now, psutil.cpu_percent(None), psutil.virtual_memory().percent]
+
+        seen = set()
+        app = self._read([self._app], seen)
+        browsers = {}
+        owners = self.reaper.tracked()
+        for pid in owners:
+            try:
+                root = psutil.Process(pid)
+            except psutil.Error:
+                continue
+            browsers[pid] = self._read(_process_tree(root), seen)
+        other = self._read(_process_tree(self._app)[1:], seen)
+        browsers_total = [sum(values) for values in zip(*browsers.values())] or [0, 0, 0, 0]
+
+        # Bỏ Process của các tiến trình đã kết thúc
+        for pid in list(self._procs):
+            if pid not in seen:
+                del self._procs[pid]
+
+        with self._lock:
+            self._host.append(host)
+            self._groups[GROUP_APP].append([now] + app)
+            self._groups[GROUP_BROWSERS].append([now] + browsers_total)
+            self._groups[GROUP_OTHER].append([now] + other)
+            for pid in list(self._browsers):
+                if pid not in browsers:
+                    del self._browsers[pid]
+            for pid, values in browsers.items():
+                if pid not in self._browsers:
+                    self._browsers[pid] = RingBuffer(self.history_size, PROCESS_FIELDS)
+                self._browsers[pid].append([now] + values)
+            self._owners = {pid: owners[pid] for pid in browsers}
+
+    # ---------------- ĐỌC (thread GUI) ----------------
+    def snapshot(self):
+        """Mẫu mới nhất: {"host", "groups": {nhóm: {...}}, "browsers": [{pid, owner, cpu, rss_mb, ...}]}"""
+        with self._lock:
+            return {
+                "host": self._host.latest(),
+                "groups": {name: buffer.latest() for name, buffer in self._groups.items()},
+                "browsers": sorted(
+                    (
+                        dict(buffer.latest(), pid=pid, owner=self._owners.get(pid, ""))
+                        for pid, buffer in self._browsers.items() if buffer.count
+                    ),
+                    key=lambda b: -b["rss_mb"]
+                ),
+            }
+
+    def history(self, group, field):
+        """Chuỗi giá trị của một trường theo thời gian (cho sparkline); group là tên nhóm, "host" hoặc pid trình duyệt"""
+        with self._lock:
+            if group == "host":
+                buffer = self._host
+            elif group in self._groups:
+                buffer = self._groups[group]
+            else:
+                buffer = self._browsers.get(group)
+            return buffer.column(field) if buffer is not None else np.zeros(0)
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_resource_monitor():
+    """Trả về ResourceMonitor dùng chung (tự chạy thread nền ở lần gọi đầu)"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = ResourceMonitor()
+            _monitor.start()
+        return _monitor
+
+
+def shutdown_resource_monitor():
+    """Dừng thread lấy mẫu nếu đã được khởi tạo"""
+    global _monitor
+    with _monitor_lock:
+        monitor, _monitor = _monitor, None
+    if monitor:
+        monitor.stop()
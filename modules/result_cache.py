@@ -0,0 +1,203 @@
+# modules/result_cache.py
+
+"""
+Cache kết quả tìm kiếm (Google / Shopee / Trends) có TTL.
+
+Hai tầng:
+  - Tầng bộ nhớ: LRU (OrderedDict) giới hạn số phần tử
+  - Tầng đĩa: SQLite (data/result_cache.db) để dùng lại giữa các lần chạy
+
+Khoá cache = (loại task, từ khoá đã chuẩn hoá, locale, max_results, vùng proxy).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from .config import RESULT_CACHE_TTL, RESULT_CACHE_MEMORY_SIZE
+
+# Các task có thể dùng cache (kết quả chỉ phụ thuộc vào tham số tìm kiếm)
+CACHEABLE_TASKS = ("google", "shopee", "google_trends", "facebook_trends")
+
+DEFAULT_CACHE_DB = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "result_cache.db"
+)
+
+
+def normalize_keyword(keyword):
+    """Chuẩn hoá từ khoá: NFC, chữ thường, gộp khoảng trắng"""
+    if not keyword:
+        return ""
+    keyword = unicodedata.normalize("NFC", str(keyword))
+    return " ".join(keyword.lower().split())
+
+
+def make_cache_key(task, keyword="", locale="", max_results=0, proxy_region=""):
+    """Tạo khoá cache dạng chuỗi từ các tham số tìm kiếm"""
+    parts = [
+        str(task or ""),
+        normalize_keyword(keyword),
+        str(locale or "").lower(),
+        str(int(max_results or 0)),
+        str(proxy_region or "").lower()
+    ]
+    return "|".join(parts)
+
+
+class ResultCache:
+    """
+    Cache kết quả 2 tầng (LRU trong bộ nhớ + SQLite trên đĩa) với TTL.
+    An toàn khi gọi từ nhiều worker thread.
+    """
+
+    def __init__(self, db_path=None, ttl=RESULT_CACHE_TTL, memory_size=RESULT_CACHE_MEMORY_SIZE):
+        self.db_path = db_path or DEFAULT_CACHE_DB
+        self.ttl = ttl
+        self.memory_size = memory_size
+
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0
+        }
+
+    # ---------------- SQLITE ----------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_expires ON results (expires_at)")
+            self._conn.commit()
+        return self._conn
+
+    # ---------------- API ----------------
+    def get(self, key):
+        """Trả về kết quả còn hạn hoặc None nếu không có / đã hết hạn"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            try:
+                row = self._connection().execute(
+                    "SELECT value, expires_at FROM results WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.stats["disk_hits"] += 1
+            return value
+
+    def put(self, key, value, ttl=None):
+        """Lưu kết quả vào cả 2 tầng"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, expires_at)
+                )
+                conn.commit()
+            except sqlite3.Error:
+                # Tầng đĩa lỗi thì vẫn giữ tầng bộ nhớ
+                pass
+            self.stats["stores"] += 1
+
+    def invalidate(self, key):
+        """Xoá một khoá khỏi cache"""
+        with self._lock:
+            self._memory.pop(key, None)
+            try:
+                conn = self._connection()
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def purge_expired(self):
+        """Xoá các mục đã hết hạn trên đĩa, trả về số dòng đã xoá"""
+        with self._lock:
+            now = time.time()
+            for key in [k for k, (exp, _) in self._memory.items() if exp <= now]:
+                del self._memory[key]
+            try:
+                conn = self._connection()
+                cursor = conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+                conn.commit()
+                return cursor.rowcount
+            except sqlite3.Error:
+                return 0
+
+    def clear(self):
+        """Xoá toàn bộ cache"""
+        with self._lock:
+            self._memory.clear()
+            try:
+                conn = self._connection()
+                conn.execute("DELETE FROM results")
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def get_stats(self):
+        """Trả về bản sao thống kê hit/miss"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total * 100, 1) if total else 0.0
+        return stats
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Trả về instance ResultCache dùng chung cho toàn ứng dụng"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache()
+        return _shared_cache
@@ -0,0 +1,279 @@
+# modules/retry_policy.py
+
+"""
+Chính sách thử lại (retry) có phân loại lỗi cho các lần tải trang.
+
+- Phân loại lỗi: proxy, DNS, timeout, HTTP status, captcha, trình duyệt bị treo/đóng
+- Kiểm tra trang bằng một đoạn JS nhỏ thay vì tải toàn bộ page_source
+- HTTP status của document chính đọc từ CDP Network.responseReceived (performance log)
+- Mỗi loại lỗi có backoff luỹ thừa + jitter và ngân sách số lần thử riêng
+- Quyết định: thử lại tại chỗ, đổi proxy, hoặc khởi tạo lại driver
+- Trang captcha: cho worker thử giải trước (on_captcha), không được mới đổi proxy;
+  mỗi lần tải được ghi vào CaptchaStats (tỷ lệ captcha theo domain / proxy)
+"""
+
+import json
+import time
+import random
+
+from .rate_limiter import get_rate_limiter
+from .captcha_probe import CAPTCHA_DETECT_JS, get_captcha_stats
+
+# Loại lỗi
+FAIL_PROXY = "proxy"
+FAIL_DNS = "dns"
+FAIL_TIMEOUT = "timeout"
+FAIL_HTTP = "http"
+FAIL_CAPTCHA = "captcha"
+FAIL_DRIVER = "driver"
+FAIL_UNKNOWN = "unknown"
+
+# Hành động
+ACTION_RETRY = "retry"
+ACTION_ROTATE_PROXY = "rotate_proxy"
+ACTION_RECYCLE_DRIVER = "recycle_driver"
+ACTION_GIVE_UP = "give_up"
+
+# Quy tắc mặc định cho từng loại lỗi
+DEFAULT_RULES = {
+    FAIL_PROXY: {"action": ACTION_ROTATE_PROXY, "base_delay": 0.5, "max_delay": 5, "budget": 3},
+    FAIL_DNS: {"action": ACTION_RETRY, "base_delay": 2.0, "max_delay": 15, "budget": 2},
+    FAIL_TIMEOUT: {"action": ACTION_RETRY, "base_delay": 1.0, "max_delay": 10, "budget": 3},
+    FAIL_HTTP: {"action": ACTION_RETRY, "base_delay": 3.0, "max_delay": 30, "budget": 3},
+    FAIL_CAPTCHA: {"action": ACTION_ROTATE_PROXY, "base_delay": 2.0, "max_delay": 20, "budget": 2},
+    FAIL_DRIVER: {"action": ACTION_RECYCLE_DRIVER, "base_delay": 1.0, "max_delay": 5, "budget": 1},
+    FAIL_UNKNOWN: {"action": ACTION_RETRY, "base_delay": 1.0, "max_delay": 8, "budget": 2},
+}
+
+# Mã lỗi mạng của Chromium -> loại lỗi
+NET_ERROR_CLASSES = {
+    "ERR_PROXY_CONNECTION_FAILED": FAIL_PROXY,
+    "ERR_TUNNEL_CONNECTION_FAILED": FAIL_PROXY,
+    "ERR_PROXY_AUTH_UNSUPPORTED": FAIL_PROXY,
+    "ERR_PROXY_CERTIFICATE_INVALID": FAIL_PROXY,
+    "ERR_SOCKS_CONNECTION_FAILED": FAIL_PROXY,
+    "ERR_NAME_NOT_RESOLVED": FAIL_DNS,
+    "ERR_NAME_RESOLUTION_FAILED": FAIL_DNS,
+    "ERR_TIMED_OUT": FAIL_TIMEOUT,
+    "ERR_CONNECTION_TIMED_OUT": FAIL_TIMEOUT,
+}
+
+# Đoạn JS kiểm tra trang: chỉ trả về vài trường nhỏ thay vì cả DOM
+PROBE_SCRIPT = CAPTCHA_DETECT_JS + """
+var body = document.body;
+var code = null;
+if (body && body.classList.contains('neterror')) {
+    var el = document.querySelector('.error-code');
+    code = el ? el.textContent.trim() : 'ERR_UNKNOWN';
+}
+var nav = (performance.getEntriesByType('navigation') || [])[0];
+return {
+    url: location.href,
+    ready: document.readyState,
+    error_code: code,
+    status: nav && nav.responseStatus ? nav.responseStatus : null,
+    captcha: detectCaptcha()
+};
+"""
+
+
+class Failure:
+    """Một lỗi đã được phân loại"""
+
+    def __init__(self, kind, detail="", status=None, info=None):
+        self.kind = kind
+        self.detail = detail
+        self.status = status
+        self.info = info or {}  # captcha: {"kind", "sitekey", "url"}
+
+    def __repr__(self):
+        status = f" {self.status}" if self.status else ""
+        return f"<Failure {self.kind}{status}: {self.detail}>"
+
+
+def classify_error_text(text):
+    """Phân loại lỗi dựa trên thông báo lỗi/mã lỗi của Chromium"""
+    text = str(text or "")
+    for code, kind in NET_ERROR_CLASSES.items():
+        if code in text:
+            return kind
+    lowered = text.lower()
+    if "proxy" in lowered:
+        return FAIL_PROXY
+    if "timeout" in lowered or "timed out" in lowered:
+        return FAIL_TIMEOUT
+    if ("invalid session id" in lowered or "disconnected" in lowered
+            or "chrome not reachable" in lowered or "no such window" in lowered):
+        return FAIL_DRIVER
+    return FAIL_UNKNOWN
+
+
+def classify_exception(exc):
+    """Phân loại exception ném ra từ driver.get()"""
+    if type(exc).__name__ == "TimeoutException":
+        return Failure(FAIL_TIMEOUT, str(exc).strip()[:200])
+    return Failure(classify_error_text(exc), str(exc).strip()[:200])
+
+
+def read_document_status(driver):
+    """
+    Đọc HTTP status của document chính từ CDP Network.responseReceived
+    (cần bật goog:loggingPrefs performance). Log được xả sau mỗi lần đọc.
+    Trả về None nếu không có.
+    """
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return None
+
+    status = None
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError, TypeError):
+            continue
+        if message.get("method") != "Network.responseReceived":
+            continue
+        params = message.get("params", {})
+        if params.get("type") != "Document":
+            continue
+        # Lấy response Document cuối cùng (sau các lần redirect)
+        status = params.get("response", {}).get("status") or status
+    return int(status) if status else None
+
+
+def probe_page(driver):
+    """
+    Kiểm tra trang sau khi tải. Trả về Failure nếu có lỗi, None nếu trang ổn.
+    """
+    try:
+        info = driver.execute_script(PROBE_SCRIPT) or {}
+    except Exception as e:
+        return classify_exception(e)
+
+    if info.get("error_code"):
+        return Failure(classify_error_text(info["error_code"]), info["error_code"])
+
+    if info.get("captcha"):
+        captcha = info["captcha"]
+        return Failure(FAIL_CAPTCHA, f"{captcha.get('kind')} {info.get('url', '')}", info=captcha)
+
+    status = read_document_status(driver) or info.get("status")
+    if status and status >= 400:
+        return Failure(FAIL_HTTP, info.get("url", ""), status=int(status))
+
+    return None
+
+
+class RetryPolicy:
+    """
+    Quyết định cách xử lý từng lỗi và thực thi vòng thử lại.
+
+    rules: dict loại lỗi -> {"action", "base_delay", "max_delay", "budget"}
+    max_attempts: tổng số lần thử tối đa (mọi loại lỗi)
+    """
+
+    def __init__(self, rules=None, max_attempts=5, jitter=0.5):
+        self.rules = {kind: dict(rule) for kind, rule in DEFAULT_RULES.items()}
+        for kind, rule in (rules or {}).items():
+            self.rules.setdefault(kind, {}).update(rule)
+        self.max_attempts = max_attempts
+        self.jitter = jitter
+
+    def backoff(self, kind, attempt):
+        """Backoff luỹ thừa có jitter cho lần thử thứ attempt (bắt đầu từ 1)"""
+        rule = self.rules.get(kind, self.rules[FAIL_UNKNOWN])
+        delay = min(rule["max_delay"], rule["base_delay"] * (2 ** (attempt - 1)))
+        return delay * (1 - self.jitter + random.random() * self.jitter * 2) if self.jitter else delay
+
+    def decide(self, failure, counts):
+        """Chọn hành động cho lỗi dựa trên loại lỗi và số lần đã gặp loại đó"""
+        rule = self.rules.get(failure.kind, self.rules[FAIL_UNKNOWN])
+        if counts.get(failure.kind, 0) > rule["budget"]:
+            return ACTION_GIVE_UP
+
+        if failure.kind == FAIL_HTTP:
+            if failure.status in (403, 407):
+                return ACTION_ROTATE_PROXY
+            if failure.status not in (408, 425, 429) and failure.status < 500:
+                # 404, 410... thử lại cũng không có ích
+                return ACTION_GIVE_UP
+        return rule["action"]
+
+    def run(self, attempt, actions=None, should_continue=None, log=None):
+        """
+        Thực thi attempt() cho tới khi thành công hoặc hết ngân sách.
+
+        attempt: hàm trả về None khi thành công, Failure khi lỗi
+        actions: dict ACTION_ROTATE_PROXY / ACTION_RECYCLE_DRIVER -> hàm trả về bool
+        should_continue: hàm trả về False khi worker đã bị dừng
+        """
+        actions = actions or {}
+        log = log or (lambda message: None)
+        counts = {}
+
+        for number in range(1, self.max_attempts + 1):
+            failure = attempt()
+            if failure is None:
+                return True
+
+            counts[failure.kind] = counts.get(failure.kind, 0) + 1
+            action = self.decide(failure, counts)
+            log(f"⚠️ Lỗi tải trang [{failure.kind}] (lần {number}/{self.max_attempts}): {failure.detail}")
+
+            if action == ACTION_GIVE_UP or number == self.max_attempts:
+                break
+            if should_continue and not should_continue():
+                return False
+
+            if action in (ACTION_ROTATE_PROXY, ACTION_RECYCLE_DRIVER):
+                handler = actions.get(action)
+                if handler is None or not handler():
+                    # Không đổi được proxy / driver: thử lại tại chỗ
+                    if action == ACTION_RECYCLE_DRIVER:
+                        break
+                    action = ACTION_RETRY
+
+            delay = self.backoff(failure.kind, counts[failure.kind])
+            log(f"🔄 {action}: chờ {delay:.1f}s trước khi thử lại")
+            time.sleep(delay)
+
+        return False
+
+
+def load_with_policy(driver_getter, url, policy, actions=None, should_continue=None, log=None,
+                     proxy_getter=None, limiter=None, on_captcha=None):
+    """
+    Tải url bằng driver hiện tại (driver_getter() để lấy driver mới sau khi recycle)
+    theo RetryPolicy. Trả về True nếu tải thành công.
+    Mỗi lần tải chờ RateLimiter theo domain + proxy hiện tại (proxy_getter()).
+    on_captcha(info): thử giải captcha vừa gặp, True nếu đã qua được trang captcha.
+    """
+    limiter = limiter or get_rate_limiter()
+    stats = get_captcha_stats()
+
+    def attempt():
+        driver = driver_getter()
+        if driver is None:
+            return Failure(FAIL_DRIVER, "driver is None")
+        proxy = proxy_getter() if proxy_getter else None
+        if not limiter.acquire(url, proxy, should_continue, log):
+            return Failure(FAIL_UNKNOWN, "đã dừng khi chờ giới hạn tốc độ")
+        # Xả performance log cũ để chỉ đọc response của lần tải này
+        read_document_status(driver)
+        try:
+            driver.get(url)
+            failure = probe_page(driver)
+        except Exception as e:
+            failure = classify_exception(e)
+        if failure is None or failure.kind in (FAIL_CAPTCHA, FAIL_HTTP):
+            stats.record(url, proxy, failure.info.get("kind") if failure and failure.kind == FAIL_CAPTCHA else None)
+        # Captcha / 429 làm chậm domain + proxy này cho mọi worker
+        limiter.report(url, proxy, failure)
+        if failure is not None and failure.kind == FAIL_CAPTCHA and on_captcha and on_captcha(failure.info):
+            if log:
+                log("✅ Đã vượt captcha")
+            return None
+        return failure
+
+    return policy.run(attempt, actions=actions, should_continue=should_continue, log=log)
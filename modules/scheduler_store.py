@@ -0,0 +1,312 @@
+# modules/scheduler_store.py
+
+"""
+Lưu trữ lịch chạy task (TaskSchedulerWidget) trong SQLite.
+
+- Bảng tasks: mỗi task một dòng, chỉ mục (enabled, next_run) nên tìm task
+  đến hạn là một truy vấn khoảng trên chỉ mục thay vì duyệt toàn bộ danh sách
+- Bảng runs: lịch sử mỗi lần chạy (bắt đầu, kết thúc, thời lượng, trạng thái, lỗi)
+- Cập nhật từng dòng (không ghi lại toàn bộ file như scheduled_tasks.json)
+- Tự chuyển dữ liệu từ data/scheduled_tasks.json ở lần mở đầu tiên
+"""
+
+import os
+import json
+import time
+import sqlite3
+import calendar
+import datetime
+import threading
+
+DEFAULT_SCHEDULER_DB = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "scheduler.db"
+)
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Các cột riêng của bảng tasks; trường khác của task lưu trong cột data (JSON)
+TASK_COLUMNS = ("id", "name", "script", "run_time", "enabled", "repeat", "repeat_interval", "status", "last_run")
+
+UPSERT_TASK_SQL = (
+    "INSERT OR REPLACE INTO tasks (id, name, script, run_time, next_run, enabled, repeat,"
+    " repeat_interval, status, last_run, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Chu kỳ lặp: tên hiển thị (form chính) và mã (TaskDialog)
+INTERVALS = {
+    "Hàng giờ": "hourly", "hourly": "hourly",
+    "Hàng ngày": "daily", "daily": "daily",
+    "Hàng tuần": "weekly", "weekly": "weekly",
+    "Hàng tháng": "monthly", "monthly": "monthly",
+}
+
+
+def parse_run_time(value):
+    """Chuyển chuỗi thời gian đã lưu (có hoặc không có giây) thành datetime, None nếu không hợp lệ"""
+    if not value:
+        return None
+    for fmt in (TIME_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.datetime.strptime(str(value).strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _add_month(dt):
+    """Cộng 1 tháng, giữ ngày trong giới hạn của tháng mới (31/01 -> 28 hoặc 29/02)"""
+    year, month = (dt.year + 1, 1) if dt.month == 12 else (dt.year, dt.month + 1)
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(run_time, interval):
+    """Thời điểm chạy kế tiếp của task lặp lại, None nếu không lặp"""
+    code = INTERVALS.get(interval)
+    if code == "hourly":
+        return run_time + datetime.timedelta(hours=1)
+    if code == "daily":
+        return run_time + datetime.timedelta(days=1)
+    if code == "weekly":
+        return run_time + datetime.timedelta(days=7)
+    if code == "monthly":
+        return _add_month(run_time)
+    return None
+
+
+def _is_repeating(task):
+    return bool(task.get("repeat") or task.get("recurring"))
+
+
+def _interval_of(task):
+    return task.get("repeat_interval") if task.get("repeat") else task.get("recurring")
+
+
+class SchedulerStore:
+    """Kho task + lịch sử chạy trên SQLite, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_SCHEDULER_DB
+        self._lock = threading.Lock()
+        self._conn = None
+
+    # ---------------- SQLITE ----------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " script TEXT NOT NULL,"
+                " run_time TEXT,"
+                " next_run REAL,"
+                " enabled INTEGER NOT NULL DEFAULT 1,"
+                " repeat INTEGER NOT NULL DEFAULT 0,"
+                " repeat_interval TEXT,"
+                " status TEXT,"
+                " last_run TEXT,"
+                " data TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (enabled, next_run);"
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " task_id TEXT NOT NULL,"
+                " started_at REAL NOT NULL,"
+                " ended_at REAL,"
+                " duration REAL,"
+                " status TEXT NOT NULL,"
+                " error TEXT);"
+                "CREATE INDEX IF NOT EXISTS idx_runs_task ON runs (task_id, started_at);"
+                "CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _row_to_task(row):
+        task = json.loads(row["data"] or "{}")
+        for column in TASK_COLUMNS:
+            task[column] = row[column]
+        task["enabled"] = bool(task["enabled"])
+        task["repeat"] = bool(task["repeat"])
+        return task
+
+    @staticmethod
+    def _task_params(task):
+        """Giá trị cột cho một task; next_run NULL khi task không lặp lại đã được chạy"""
+        run_time = parse_run_time(task.get("run_time"))
+        done = not _is_repeating(task) and (task.get("status") == "Completed" or bool(task.get("last_run")))
+        next_run = run_time.timestamp() if run_time and not done else None
+        extra = {k: v for k, v in task.items() if k not in TASK_COLUMNS}
+        return (
+            task["id"], task.get("name", ""), task.get("script", ""), task.get("run_time"), next_run,
+            int(task.get("enabled", True)), int(bool(task.get("repeat"))), task.get("repeat_interval"),
+            task.get("status", "Chưa chạy"), task.get("last_run"), json.dumps(extra, ensure_ascii=False)
+        )
+
+    # ---------------- TASKS ----------------
+    def all_tasks(self):
+        """Mọi task theo thứ tự tạo"""
+        return [self._row_to_task(row) for row in self._query("SELECT * FROM tasks ORDER BY rowid")]
+
+    def get(self, task_id):
+        rows = self._query("SELECT * FROM tasks WHERE id = ?", (task_id,))
+        return self._row_to_task(rows[0]) if rows else None
+
+    def upsert(self, task):
+        """Thêm hoặc thay thế một task"""
+        self._execute(UPSERT_TASK_SQL, self._task_params(task))
+
+    def update(self, task_id, **fields):
+        """Cập nhật vài trường của một task (đọc - sửa - ghi trong một lock)"""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return None
+            task = self._row_to_task(row)
+            task.update(fields)
+            conn.execute(UPSERT_TASK_SQL, self._task_params(task))
+            conn.commit()
+            return task
+
+    def delete(self, task_id):
+        self._execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def set_enabled_all(self, enabled):
+        self._execute("UPDATE tasks SET enabled = ?", (int(enabled),))
+
+    def due_tasks(self, now=None):
+        """Task đang bật có next_run <= now (truy vấn khoảng trên idx_tasks_due)"""
+        now = time.time() if now is None else now
+        rows = self._query(
+            "SELECT * FROM tasks WHERE enabled = 1 AND next_run <= ? ORDER BY next_run",
+            (now,)
+        )
+        return [self._row_to_task(row) for row in rows]
+
+    def mark_triggered(self, task, when=None):
+        """
+        Ghi nhận task vừa được kích hoạt: cập nhật last_run, trạng thái và
+        run_time kế tiếp (task lặp lại) trong một lần ghi
+        """
+        when = when or datetime.datetime.now()
+        fields = {"last_run": when.strftime(TIME_FORMAT), "status": "Running"}
+        run_time = parse_run_time(task.get("run_time"))
+        if run_time and _is_repeating(task):
+            following = next_occurrence(run_time, _interval_of(task))
+            # Bỏ qua các lần đã lỡ (ứng dụng tắt lâu) thay vì chạy dồn
+            while following and following <= when:
+                following = next_occurrence(following, _interval_of(task))
+            if following:
+                fields["run_time"] = following.strftime(TIME_FORMAT)
+        return self.update(task["id"], **fields)
+
+    # ---------------- RUNS ----------------
+    def start_run(self, task_id):
+        """Bắt đầu một lần chạy, trả về run_id"""
+        return self._execute(
+            "INSERT INTO runs (task_id, started_at, status) VALUES (?, ?, ?)",
+            (task_id, time.time(), "Running")
+        ).lastrowid
+
+    def finish_run(self, run_id, status="Completed", error=None):
+        """Kết thúc lần chạy; task không lặp lại nhận trạng thái cuối cùng"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT task_id, started_at FROM runs WHERE id = ?", (run_id,)).fetchone()
+            if row is None:
+                return
+            conn.execute(
+                "UPDATE runs SET ended_at = ?, duration = ?, status = ?, error = ? WHERE id = ?",
+                (now, now - row["started_at"], status, error, run_id)
+            )
+            task = conn.execute("SELECT * FROM tasks WHERE id = ?", (row["task_id"],)).fetchone()
+            # Chỉ cập nhật trạng thái task khi lần chạy do lịch kích hoạt (không phải "Chạy ngay")
+            if task is not None and task["status"] == "Running":
+                task = self._row_to_task(task)
+                task["status"] = status if not _is_repeating(task) or status == "Failed" else "Scheduled"
+                conn.execute(UPSERT_TASK_SQL, self._task_params(task))
+            conn.commit()
+
+    def recent_runs(self, task_id=None, limit=50):
+        """Các lần chạy gần nhất (kèm tên task)"""
+        sql = (
+            "SELECT runs.*, tasks.name AS task_name FROM runs"
+            " LEFT JOIN tasks ON tasks.id = runs.task_id"
+        )
+        params = []
+        if task_id:
+            sql += " WHERE runs.task_id = ?"
+            params.append(task_id)
+        sql += " ORDER BY runs.started_at DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._query(sql, params)]
+
+    def duration_stats(self, since=None):
+        """Số lần chạy, thời lượng trung bình / lớn nhất và số lần lỗi theo task"""
+        since = since or time.time() - 30 * 24 * 3600
+        rows = self._query(
+            "SELECT runs.task_id, tasks.name AS task_name, COUNT(*) AS run_count,"
+            " AVG(runs.duration) AS avg_duration, MAX(runs.duration) AS max_duration,"
+            " SUM(runs.status = 'Failed') AS failures"
+            " FROM runs LEFT JOIN tasks ON tasks.id = runs.task_id"
+            " WHERE runs.started_at >= ? GROUP BY runs.task_id ORDER BY run_count DESC",
+            (since,)
+        )
+        return [dict(row) for row in rows]
+
+    # ---------------- MIGRATION ----------------
+    def migrate_from_json(self, json_path):
+        """
+        Nhập task từ scheduled_tasks.json nếu bảng tasks còn trống.
+        File cũ được đổi tên thành .migrated. Trả về số task đã nhập.
+        """
+        if not os.path.exists(json_path) or self._query("SELECT 1 FROM tasks LIMIT 1"):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        tasks = [t for t in loaded if isinstance(t, dict) and {"id", "name", "script"} <= t.keys()]
+        with self._lock:
+            conn = self._connection()
+            for task in tasks:
+                task.setdefault("run_time", datetime.datetime.now().strftime(TIME_FORMAT))
+                task.setdefault("status", "Chưa chạy")
+                task.setdefault("enabled", True)
+                conn.execute(UPSERT_TASK_SQL, self._task_params(task))
+            conn.commit()
+        os.replace(json_path, json_path + ".migrated")
+        return len(tasks)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_scheduler_store():
+    """Trả về SchedulerStore dùng chung cho toàn ứng dụng"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SchedulerStore()
+        return _store
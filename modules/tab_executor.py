@@ -0,0 +1,208 @@
+# modules/tab_executor.py
+
+"""
+Chạy nhiều tác vụ nhẹ (vd: tìm kiếm Google) trong nhiều tab của một trình duyệt.
+
+Mỗi tab là một máy trạng thái: điều hướng -> chờ -> trích xuất. Lệnh điều hướng
+được gửi bằng window.location (trả về ngay, không chờ tải xong) nên các tab tải
+song song; executor chỉ chuyển sang tab khi tới lượt kiểm tra (backoff theo tab)
+và chỉ trích xuất khi document.readyState đã sẵn sàng. Giới hạn tốc độ được giữ
+chỗ khi giao tác vụ và chờ riêng ở từng tab, các tab khác vẫn chạy trong lúc chờ.
+"""
+
+import time
+import urllib.parse
+
+from .config import TABS_PER_BROWSER
+from .rate_limiter import domain_of, get_rate_limiter
+
+# Trích xuất kết quả Google bằng 1 lệnh JS thay vì nhiều find_element
+GOOGLE_RESULTS_JS = """
+var rows = [];
+document.querySelectorAll('div.g, div[data-hveid] > div > div[data-snc]').forEach(function (el) {
+    var h3 = el.querySelector('h3');
+    var a = el.querySelector('a[href]');
+    if (!h3 || !a) { return; }
+    var desc = el.querySelector("div[data-sncf], div[style*='-webkit-line-clamp'], div.VwiC3b");
+    rows.push({"Tiêu đề": h3.innerText, "URL": a.href, "Mô tả": desc ? desc.innerText : ""});
+});
+return rows.slice(0, arguments[0]);
+"""
+
+
+class TabTask:
+    """
+    Một tác vụ trong tab: mở url, khi trang sẵn sàng thì gọi extract(driver).
+    extract trả về kết quả, hoặc TabTask tiếp theo để chạy tiếp trong cùng tab.
+    """
+
+    def __init__(self, key, url, extract, timeout=20, ready_states=("complete",)):
+        self.key = key
+        self.url = url
+        self.extract = extract
+        self.timeout = timeout
+        self.ready_states = ready_states
+
+
+def google_search_task(keyword, max_results=10):
+    """Tạo TabTask tìm kiếm Google trực tiếp qua URL /search"""
+    url = "https://www.google.com/search?" + urllib.parse.urlencode({"q": keyword, "num": max_results})
+    return TabTask(
+        keyword,
+        url,
+        lambda driver: driver.execute_script(GOOGLE_RESULTS_JS, max_results) or [],
+        ready_states=("interactive", "complete")
+    )
+
+
+class _Tab:
+    def __init__(self, handle):
+        self.handle = handle
+        self.task = None
+        self.navigated = False
+        self.started = 0.0
+        self.next_check = 0.0
+        self.checks = 0
+
+
+class TabExecutor:
+    """
+    Chạy danh sách TabTask trên một driver với tối đa tabs_per_browser tab.
+    run() trả về dict key -> kết quả (hoặc Exception nếu tác vụ lỗi / quá thời gian).
+    """
+
+    def __init__(self, driver, tabs_per_browser=TABS_PER_BROWSER, poll_interval=0.2,
+                 max_poll_interval=2.0, log=None, should_continue=None, proxy=None):
+        self.driver = driver
+        self.proxy = proxy
+        self.limiter = get_rate_limiter()
+        self.tabs_per_browser = max(1, int(tabs_per_browser))
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.log = log or (lambda message: None)
+        self.should_continue = should_continue or (lambda: True)
+        self.stats = {"tasks": 0, "switches": 0, "seconds": 0.0}
+
+    def run(self, tasks):
+        started = time.time()
+        pending = list(tasks)
+        results = {}
+        tabs = self._open_tabs(min(self.tabs_per_browser, len(pending)))
+        current = self.driver.current_window_handle
+
+        try:
+            while (pending or any(tab.task for tab in tabs)) and self.should_continue():
+                now = time.time()
+
+                # Giao tác vụ cho tab rảnh
+                for tab in tabs:
+                    if tab.task is None and pending:
+                        if self._start(tab, pending.pop(0)):
+                            current = self._switch(tab, current)
+                            self._navigate(tab)
+
+                # Kiểm tra các tab đã tới lượt
+                next_wakeup = now + self.max_poll_interval
+                for tab in tabs:
+                    if tab.task is None:
+                        continue
+                    if tab.next_check > now:
+                        next_wakeup = min(next_wakeup, tab.next_check)
+                        continue
+
+                    current = self._switch(tab, current)
+                    self._poll(tab, results)
+                    if tab.task is not None:
+                        next_wakeup = min(next_wakeup, tab.next_check)
+
+                if not pending and not any(tab.task for tab in tabs):
+                    break
+                if pending and any(tab.task is None for tab in tabs):
+                    continue
+                delay = next_wakeup - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            self._close_tabs(tabs)
+
+        self.stats["tasks"] += len(results)
+        self.stats["seconds"] = round(self.stats["seconds"] + time.time() - started, 3)
+        return results
+
+    # ---------------- NỘI BỘ ----------------
+    def _open_tabs(self, count):
+        tabs = [_Tab(self.driver.current_window_handle)]
+        for _ in range(count - 1):
+            self.driver.switch_to.new_window("tab")
+            tabs.append(_Tab(self.driver.current_window_handle))
+        return tabs
+
+    def _close_tabs(self, tabs):
+        for tab in tabs[1:]:
+            try:
+                self.driver.switch_to.window(tab.handle)
+                self.driver.close()
+            except Exception:
+                pass
+        try:
+            self.driver.switch_to.window(tabs[0].handle)
+        except Exception:
+            pass
+
+    def _switch(self, tab, current):
+        if tab.handle != current:
+            self.driver.switch_to.window(tab.handle)
+            self.stats["switches"] += 1
+        return tab.handle
+
+    def _start(self, tab, task):
+        """Giao tác vụ cho tab và giữ chỗ giới hạn tốc độ. True nếu điều hướng được ngay"""
+        wait = self.limiter.reserve(task.url, self.proxy)
+        if wait > 1:
+            self.log(f"⏳ Giới hạn tốc độ {domain_of(task.url)}: tab [{task.key}] chờ {wait:.1f}s")
+        tab.task = task
+        tab.navigated = False
+        tab.checks = 0
+        # Tab chờ tới lượt như chờ trang tải: vòng lặp kiểm tra các tab khác trong lúc đó
+        tab.next_check = time.time() + wait
+        return wait <= 0
+
+    def _navigate(self, tab):
+        task = tab.task
+        tab.navigated = True
+        tab.started = time.time()
+        tab.next_check = tab.started + self.poll_interval
+        # Gán location trả về ngay, không chờ trang tải như driver.get().
+        # Đánh dấu document cũ để không trích xuất nhầm trang trước khi trang mới thay thế
+        self.driver.execute_script(
+            "window.__tabExecutorStale = true; window.location.href = arguments[0];", task.url
+        )
+
+    def _poll(self, tab, results):
+        task = tab.task
+        try:
+            if not tab.navigated:
+                self._navigate(tab)
+                return
+            state = self.driver.execute_script(
+                "return window.__tabExecutorStale ? 'loading' : document.readyState;"
+            )
+            if state in task.ready_states:
+                outcome = task.extract(self.driver)
+                if isinstance(outcome, TabTask):
+                    if self._start(tab, outcome):
+                        self._navigate(tab)
+                    return
+                results[task.key] = outcome
+                tab.task = None
+                return
+            if time.time() - tab.started > task.timeout:
+                raise TimeoutError(f"Tab quá thời gian: {task.url}")
+        except Exception as e:
+            self.log(f"⚠️ Lỗi tab [{task.key}]: {str(e)}")
+            results[task.key] = e
+            tab.task = None
+            return
+
+        tab.checks += 1
+        tab.next_check = time.time() + min(self.max_poll_interval, self.poll_interval * (2 ** tab.checks))
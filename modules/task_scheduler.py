@@ -1,6 +1,5 @@
 import sys
 import os
-import json
 import datetime
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                            QListWidget, QLabel, QDateTimeEdit, QComboBox,
@@ -13,6 +12,9 @@ from PyQt5.QtWidgets import QLineEdit
 
 import time
 
+from .scheduler_store import get_scheduler_store, parse_run_time
+from .metrics import SCHEDULER_LAG
+
 class TaskSchedulerWidget(QWidget):
     task_scheduled = pyqtSignal(dict)  # Signal khi task được lên lịch
     task_ready = pyqtSignal(str, str)  # task_id, script_path - khi đến thời gian chạy task
@@ -22,7 +24,9 @@ class TaskSchedulerWidget(QWidget):
         super().__init__(parent)
         self.tasks = []
         self.running_tasks = {}  # Dictionary of task_id: timer
+        # File JSON cũ, chỉ dùng để chuyển dữ liệu sang SQLite ở lần chạy đầu
         self.task_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "scheduled_tasks.json")
+        self.store = get_scheduler_store()
         self.init_ui()
         self.load_tasks()
         
@@ -121,88 +125,34 @@ class TaskSchedulerWidget(QWidget):
         self.setLayout(layout)
     
     def load_tasks(self):
-        """Tải danh sách task từ file JSON"""
+        """Tải danh sách task từ SchedulerStore (tự chuyển từ file JSON cũ ở lần đầu)"""
         try:
-            if os.path.exists(self.task_file):
-                with open(self.task_file, 'r', encoding='utf-8') as f:
-                    loaded_tasks = json.load(f)
-                    
-                    # Kiểm tra và chuẩn hóa dữ liệu
-                    valid_tasks = []
-                    for task in loaded_tasks:
-                        # Đảm bảo task có các trường cần thiết
-                        if not isinstance(task, dict):
-                            continue
-                            
-                        if 'id' not in task or 'name' not in task or 'script' not in task:
-                            continue
-                            
-                        # Đảm bảo task có trường run_time
-                        if 'run_time' not in task:
-                            task['run_time'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            
-                        # Đảm bảo task có trường status
-                        if 'status' not in task:
-                            task['status'] = 'Chưa chạy'
-                            
-                        # Đảm bảo task có trường enabled
-                        if 'enabled' not in task:
-                            task['enabled'] = True
-                            
-                        valid_tasks.append(task)
-                        
-                    self.tasks = valid_tasks
-                    
-                    # Phát signal thông báo
-                    if hasattr(self, 'task_log'):
-                        self.task_log.emit(f"Đã tải {len(self.tasks)} task từ file")
-                        
-                    self.update_table()
-            else:
-                # Tạo file mới nếu chưa tồn tại
-                self.tasks = []
-                self.save_tasks()
+            migrated = self.store.migrate_from_json(self.task_file)
+            if migrated and hasattr(self, 'task_log'):
+                self.task_log.emit(f"Đã chuyển {migrated} task từ {os.path.basename(self.task_file)} sang SQLite")
                 
-                # Phát signal thông báo
-                if hasattr(self, 'task_log'):
-                    self.task_log.emit("Đã tạo file task mới")
-        except Exception as e:
-            error_msg = f"Không thể tải danh sách task: {str(e)}"
-            QMessageBox.warning(self, "Lỗi", error_msg)
+            self.tasks = self.store.all_tasks()
             
-            # Phát signal thông báo lỗi
-            if hasattr(self, 'task_log'):
-                self.task_log.emit(f"Lỗi: {error_msg}")
-                
-            # Tạo danh sách task trống
-            self.tasks = []
-    
-    def save_tasks(self):
-        """Lưu danh sách task vào file JSON"""
-        try:
-            # Tạo thư mục nếu chưa tồn tại
-            os.makedirs(os.path.dirname(self.task_file), exist_ok=True)
-            
-            # Lưu danh sách task vào file
-            with open(self.task_file, 'w', encoding='utf-8') as f:
-                json.dump(self.tasks, f, indent=2, ensure_ascii=False)
-                
             # Phát signal thông báo
             if hasattr(self, 'task_log'):
-                self.task_log.emit(f"Đã lưu {len(self.tasks)} task vào file")
+                self.task_log.emit(f"Đã tải {len(self.tasks)} task")
                 
+            self.update_table()
         except Exception as e:
-            error_msg = f"Không thể lưu danh sách task: {str(e)}"
+            error_msg = f"Không thể tải danh sách task: {str(e)}"
             QMessageBox.warning(self, "Lỗi", error_msg)
             
             # Phát signal thông báo lỗi
             if hasattr(self, 'task_log'):
                 self.task_log.emit(f"Lỗi: {error_msg}")
                 
-            # Ghi log lỗi
-            import traceback
-            print(f"Lỗi khi lưu task: {str(e)}")
-            print(traceback.format_exc())
+            # Tạo danh sách task trống
+            self.tasks = []
+    
+    def reload_tasks(self):
+        """Đọc lại danh sách task từ store sau khi thay đổi và cập nhật giao diện"""
+        self.tasks = self.store.all_tasks()
+        self.update_table()
     
     def update_table(self):
         """Cập nhật danh sách task trên giao diện"""
@@ -352,12 +302,9 @@ class TaskSchedulerWidget(QWidget):
             "status": "Scheduled"
         }
         
-        # Add to list and update UI
-        self.tasks.append(task)
-        self.update_table()
-        
-        # Save tasks
-        self.save_tasks()
+        # Lưu task và cập nhật UI
+        self.store.upsert(task)
+        self.reload_tasks()
         
         # Clear form
         self.task_name.clear()
@@ -370,12 +317,11 @@ class TaskSchedulerWidget(QWidget):
             task = self.tasks[selected]
             dlg = TaskDialog(self, task, is_new=False)
             if dlg.exec_() == QDialog.Accepted:
-                self.tasks[selected] = dlg.get_task_data()
+                updated = dlg.get_task_data()
                 # Giữ lại ID gốc
-                if 'id' in task:
-                    self.tasks[selected]['id'] = task['id']
-                self.update_table()
-                self.save_tasks()
+                updated['id'] = task['id']
+                self.store.upsert(updated)
+                self.reload_tasks()
     
     def remove_task(self):
         selected = self.task_list.currentRow()
@@ -384,9 +330,8 @@ class TaskSchedulerWidget(QWidget):
                                       f"Xóa task '{self.tasks[selected]['name']}'?",
                                       QMessageBox.Yes | QMessageBox.No)
             if reply == QMessageBox.Yes:
-                del self.tasks[selected]
-                self.update_table()
-                self.save_tasks()
+                self.store.delete(self.tasks[selected]['id'])
+                self.reload_tasks()
     
     def run_selected_task(self):
         selected = self.task_list.currentRow()
@@ -411,117 +356,38 @@ class TaskSchedulerWidget(QWidget):
             self.task_ready.emit(task_id, script_path)
     
     def toggle_all_tasks(self, state):
-        enabled = state == Qt.Checked
-        for task in self.tasks:
-            task['enabled'] = enabled
-        self.update_table()
-        self.save_tasks()
+        self.store.set_enabled_all(state == Qt.Checked)
+        self.reload_tasks()
     
     def check_scheduled_tasks(self):
-        """Kiểm tra xem có task nào cần chạy không"""
+        """Kiểm tra xem có task nào cần chạy không (truy vấn chỉ mục enabled, next_run)"""
         current_time = datetime.datetime.now()
+        triggered = {}
         
-        for task in self.tasks:
+        for task in self.store.due_tasks(current_time.timestamp()):
             # Bỏ qua nếu task đã đang chạy
             if task["id"] in self.running_tasks:
                 continue
                 
-            # Bỏ qua nếu task đã hoàn thành và không lặp lại
-            if task["status"] == "Completed" and not task.get("repeat", False):
-                continue
-                
-            # Bỏ qua nếu task bị vô hiệu hóa
-            if not task.get("enabled", True):
-                continue
-                
-            # Kiểm tra xem đã đến thời gian chạy chưa
             try:
-                # Xử lý định dạng thời gian
-                try:
-                    run_time = datetime.datetime.strptime(task["run_time"], "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    try:
-                        run_time = datetime.datetime.strptime(task["run_time"], "yyyy-MM-dd hh:mm:ss")
-                    except ValueError:
-                        # Thử chuyển đổi từ QDateTime string
-                        date_parts = task["run_time"].split(" ")
-                        if len(date_parts) >= 2:
-                            date_str = date_parts[0]
-                            time_str = date_parts[1]
-                            
-                            # Xử lý date
-                            date_parts = date_str.split("-")
-                            if len(date_parts) == 3:
-                                year = int(date_parts[0])
-                                month = int(date_parts[1])
-                                day = int(date_parts[2])
-                                
-                                # Xử lý time
-                                time_parts = time_str.split(":")
-                                if len(time_parts) >= 2:
-                                    hour = int(time_parts[0])
-                                    minute = int(time_parts[1])
-                                    second = int(time_parts[2]) if len(time_parts) > 2 else 0
-                                    
-                                    run_time = datetime.datetime(year, month, day, hour, minute, second)
-                                else:
-                                    continue
-                            else:
-                                continue
-                        else:
-                            continue
-                
-                if current_time >= run_time:
-                    # Chạy task
-                    self.run_task(task)
-                    
-                    # Cập nhật trạng thái - kiểm tra xem 'repeat' có tồn tại không
-                    if "repeat" in task and task["repeat"]:
-                        task["status"] = "Running"
-                    else:
-                        task["status"] = "Completed"
-                    task["last_run"] = current_time.strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # Tính thời gian chạy tiếp theo nếu lặp lại
-                    if "repeat" in task and task["repeat"]:
-                        if task["repeat_interval"] == "Hàng ngày":
-                            new_run_time = run_time + datetime.timedelta(days=1)
-                        elif task["repeat_interval"] == "Hàng tuần":
-                            new_run_time = run_time + datetime.timedelta(days=7)
-                        elif task["repeat_interval"] == "Hàng tháng":
-                            # Xử lý tháng
-                            new_month = run_time.month + 1
-                            new_year = run_time.year
-                            if new_month > 12:
-                                new_month = 1
-                                new_year += 1
-                            
-                            # Xử lý ngày cuối tháng
-                            last_day = 28
-                            if new_month in [1, 3, 5, 7, 8, 10, 12]:
-                                last_day = 31
-                            elif new_month in [4, 6, 9, 11]:
-                                last_day = 30
-                            elif new_month == 2:
-                                # Xử lý năm nhuận
-                                if (new_year % 4 == 0 and new_year % 100 != 0) or (new_year % 400 == 0):
-                                    last_day = 29
-                                else:
-                                    last_day = 28
-                            
-                            new_day = min(run_time.day, last_day)
-                            new_run_time = datetime.datetime(new_year, new_month, new_day, 
-                                                           run_time.hour, run_time.minute, run_time.second)
-                        
-                        task["run_time"] = new_run_time.strftime("%Y-%m-%d %H:%M:%S")
+                # Độ trễ so với giờ hẹn (timer kiểm tra định kỳ, ứng dụng bận / vừa mở lại...)
+                scheduled = parse_run_time(task.get("run_time"))
+                if scheduled:
+                    SCHEDULER_LAG.observe(max(0.0, (current_time - scheduled).total_seconds()))
+                # Ghi last_run, trạng thái và run_time kế tiếp (task lặp lại) trước khi chạy
+                updated = self.store.mark_triggered(task, current_time)
+                if updated:
+                    triggered[updated["id"]] = updated
+                self.run_task(task)
             except Exception as e:
                 print(f"Lỗi khi kiểm tra task {task.get('name', 'unknown')}: {str(e)}")
                 import traceback
                 print(traceback.format_exc())
                 
-        # Cập nhật bảng với trạng thái mới
-        self.update_table()
-        self.save_tasks()
+        # Chỉ vẽ lại danh sách khi có task vừa được kích hoạt (không đọc lại cả bảng mỗi phút)
+        if triggered:
+            self.tasks = [triggered.get(task["id"], task) for task in self.tasks]
+            self.update_table()
 
     def run_task(self, task):
         """Chạy một task đã lên lịch"""
@@ -530,26 +396,20 @@ class TaskSchedulerWidget(QWidget):
         # Kiểm tra xem script có tồn tại không
         if not os.path.exists(script_path):
             print(f"Lỗi: Script không tồn tại: {script_path}")
-            task["status"] = "Failed"
-            self.update_table()
-            self.save_tasks()
+            self.store.finish_run(self.store.start_run(task["id"]), "Failed", f"Script không tồn tại: {script_path}")
+            self.reload_tasks()
             return
             
         # Phát signal để chạy task
         task_id = task["id"]
         print(f"Đang chạy task: {task.get('name', task_id)} với script: {task['script']}")
         
-        # Phát signal để main_window xử lý
+        # Phát signal để main_window xử lý (main_window ghi lịch sử chạy vào store)
         self.task_ready.emit(task_id, script_path)
         
         # Phát signal task_log nếu có
         if hasattr(self, 'task_log'):
             self.task_log.emit(f"Task {task.get('name', task_id)} đã được kích hoạt")
-            
-        # Cập nhật trạng thái
-        task["status"] = "Running"
-        self.update_table()
-        self.save_tasks()
 
     def update_script_list(self):
         """Update the list of available scripts"""
@@ -571,7 +431,7 @@ class TaskSchedulerWidget(QWidget):
         if not selected_rows:
             return
             
-        # Remove tasks (in reverse order to avoid index issues)
+        # Remove tasks
         for row in sorted(selected_rows, reverse=True):
             if 0 <= row < len(self.tasks):
                 task_id = self.tasks[row]["id"]
@@ -580,10 +440,9 @@ class TaskSchedulerWidget(QWidget):
                     self.running_tasks[task_id].stop()
                     del self.running_tasks[task_id]
                     
-                self.tasks.pop(row)
+                self.store.delete(task_id)
                 
-        self.update_table()
-        self.save_tasks()
+        self.reload_tasks()
 
     def refresh_tasks(self):
         """Làm mới danh sách task và trạng thái"""
@@ -595,7 +454,7 @@ class TaskSchedulerWidget(QWidget):
             # Cập nhật danh sách script
             self.update_script_list()
             
-            # Tải lại danh sách task từ file
+            # Tải lại danh sách task từ store
             self.load_tasks()
             
             # Cập nhật giao diện
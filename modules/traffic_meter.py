@@ -0,0 +1,187 @@
+# modules/traffic_meter.py
+
+"""
+Đếm lưu lượng (byte gửi / nhận) và số request theo proxy và theo task.
+
+- Nguồn số liệu: relay proxy cục bộ (byte thực đi qua tunnel) và engine CDP
+  (encodedDataLength của Network.loadingFinished)
+- record() chỉ cộng vào dict trong bộ nhớ (gọi được từ hot path); thread nền
+  ghi phần tăng thêm xuống SQLite mỗi TRAFFIC_FLUSH_INTERVAL giây (UPSERT cộng dồn theo ngày)
+- least_used() cho chính sách chọn proxy: ưu tiên proxy đã dùng ít byte nhất
+"""
+
+import os
+import sqlite3
+import datetime
+import threading
+
+from .config import TRAFFIC_FLUSH_INTERVAL
+
+DEFAULT_TRAFFIC_DB = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "traffic.db"
+)
+
+UPSERT_SQL = (
+    "INSERT INTO traffic (proxy, task, day, bytes_up, bytes_down, requests) VALUES (?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT (proxy, task, day) DO UPDATE SET"
+    " bytes_up = bytes_up + excluded.bytes_up,"
+    " bytes_down = bytes_down + excluded.bytes_down,"
+    " requests = requests + excluded.requests"
+)
+
+
+def format_bytes(value):
+    """1536 -> '1.5 KB'"""
+    value = float(value or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+
+
+class TrafficMeter:
+    """Bộ đếm trong bộ nhớ + ghi định kỳ xuống SQLite, an toàn khi gọi từ nhiều thread"""
+
+    def __init__(self, db_path=None, flush_interval=TRAFFIC_FLUSH_INTERVAL):
+        self.db_path = db_path or DEFAULT_TRAFFIC_DB
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self._pending = {}  # (proxy, task, day) -> [up, down, requests] chưa ghi
+        self._totals = {}  # proxy -> [up, down, requests] (đã ghi + chưa ghi)
+        self._tasks = {}  # task -> [up, down, requests]
+        self._load_totals()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name="TrafficMeter", daemon=True)
+        self._thread.start()
+
+    # ---------------- SQLITE ----------------
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS traffic ("
+                " proxy TEXT NOT NULL,"
+                " task TEXT NOT NULL,"
+                " day TEXT NOT NULL,"
+                " bytes_up INTEGER NOT NULL DEFAULT 0,"
+                " bytes_down INTEGER NOT NULL DEFAULT 0,"
+                " requests INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (proxy, task, day))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load_totals(self):
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT proxy, task, SUM(bytes_up), SUM(bytes_down), SUM(requests) FROM traffic GROUP BY proxy, task"
+            ).fetchall()
+        for proxy, task, up, down, requests in rows:
+            for table, key in ((self._totals, proxy), (self._tasks, task)):
+                counter = table.setdefault(key, [0, 0, 0])
+                counter[0] += up
+                counter[1] += down
+                counter[2] += requests
+
+    # ---------------- GHI NHẬN ----------------
+    def record(self, proxy, task=None, bytes_up=0, bytes_down=0, requests=0):
+        """Cộng lưu lượng cho proxy (và task). Chỉ thao tác dict trong bộ nhớ"""
+        if not proxy:
+            return
+        task = task or ""
+        key = (proxy, task, datetime.date.today().isoformat())
+        with self._lock:
+            for counter in (
+                self._pending.setdefault(key, [0, 0, 0]),
+                self._totals.setdefault(proxy, [0, 0, 0]),
+                self._tasks.setdefault(task, [0, 0, 0]),
+            ):
+                counter[0] += bytes_up
+                counter[1] += bytes_down
+                counter[2] += requests
+
+    def flush(self):
+        """Ghi phần tăng thêm xuống SQLite trong một transaction. Trả về số dòng đã ghi (lỗi thì giữ lại và raise)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        params = [(proxy, task, day, up, down, requests) for (proxy, task, day), (up, down, requests) in pending.items()]
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                try:
+                    conn.executemany(UPSERT_SQL, params)
+                    conn.commit()
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+        except sqlite3.Error:
+            # Ghi lỗi (đĩa đầy, database bị khoá...): trả phần chưa ghi về để lần sau ghi lại
+            with self._lock:
+                for key, counts in pending.items():
+                    counter = self._pending.setdefault(key, [0, 0, 0])
+                    for i, value in enumerate(counts):
+                        counter[i] += value
+            raise
+        return len(params)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                continue
+
+    # ---------------- TRA CỨU ----------------
+    def totals(self, proxy):
+        """(bytes_up, bytes_down, requests) của proxy"""
+        with self._lock:
+            return tuple(self._totals.get(proxy, (0, 0, 0)))
+
+    def bytes_used(self, proxy):
+        up, down, _ = self.totals(proxy)
+        return up + down
+
+    def by_task(self):
+        """{task: (bytes_up, bytes_down, requests)}"""
+        with self._lock:
+            return {task: tuple(counter) for task, counter in self._tasks.items()}
+
+    def least_used(self, proxies):
+        """Sắp xếp proxy theo số byte đã dùng tăng dần (giữ nguyên thứ tự khi bằng nhau)"""
+        with self._lock:
+            return sorted(proxies, key=lambda p: sum(self._totals.get(p, (0, 0))[:2]))
+
+    def daily(self, days=30):
+        """Lưu lượng theo ngày (đã ghi xuống đĩa) cho N ngày gần nhất"""
+        since = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+        self.flush()
+        with self._db_lock:
+            return self._connection().execute(
+                "SELECT day, SUM(bytes_up), SUM(bytes_down), SUM(requests) FROM traffic"
+                " WHERE day >= ? GROUP BY day ORDER BY day", (since,)
+            ).fetchall()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+_meter = None
+_meter_lock = threading.Lock()
+
+
+def get_traffic_meter():
+    """Trả về TrafficMeter dùng chung cho toàn tiến trình"""
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            _meter = TrafficMeter()
+        return _meter
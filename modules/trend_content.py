@@ -0,0 +1,154 @@
+# modules/trend_content.py
+
+"""
+Xu hướng Google Trends và tạo nội dung từ xu hướng, không cần trình duyệt.
+
+- fetch_google_trends(): đọc RSS xu hướng tìm kiếm của Google Trends theo quốc gia
+  (HTTP thường, đi qua RateLimiter như các truy cập khác tới google.com)
+- generate_content(): dựng bài viết / bài đăng từ một xu hướng theo mẫu, trả về
+  dict cùng định dạng ContentWidget.display_content() hiển thị
+- Facebook đã bỏ mục xu hướng công khai nên không có nguồn xu hướng Facebook
+"""
+
+import re
+import datetime
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+
+from .rate_limiter import get_rate_limiter
+
+GOOGLE_TRENDS_RSS = "https://trends.google.com/trending/rss"
+
+# Tên quốc gia dùng trong giao diện -> mã geo của Google Trends
+COUNTRY_CODES = {
+    "vietnam": "VN", "viet nam": "VN", "việt nam": "VN",
+    "united states": "US", "usa": "US", "us": "US",
+    "japan": "JP", "korea": "KR", "south korea": "KR",
+    "thailand": "TH", "singapore": "SG", "indonesia": "ID",
+}
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36"
+
+
+def country_code(country):
+    """'vietnam' -> 'VN'; mã 2 ký tự được giữ nguyên"""
+    value = (country or "VN").strip()
+    if len(value) == 2:
+        return value.upper()
+    return COUNTRY_CODES.get(value.lower(), "VN")
+
+
+def _local(tag):
+    """Bỏ namespace: '{https://trends.google.com/...}approx_traffic' -> 'approx_traffic'"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element, name):
+    for child in element:
+        if _local(child.tag) == name:
+            return (child.text or "").strip()
+    return ""
+
+
+def parse_trends_rss(xml_text, limit=20):
+    """Danh sách xu hướng (dict) từ nội dung RSS của Google Trends"""
+    root = ET.fromstring(xml_text)
+    topics = []
+    for item in root.iter("item"):
+        title = _child_text(item, "title")
+        if not title:
+            continue
+        news = [
+            {
+                "title": _child_text(news_item, "news_item_title"),
+                "url": _child_text(news_item, "news_item_url"),
+                "source": _child_text(news_item, "news_item_source"),
+            }
+            for news_item in item if _local(news_item.tag) == "news_item"
+        ]
+        topics.append({
+            "id": len(topics) + 1,
+            "keyword": title,
+            "title": title,
+            "traffic": _child_text(item, "approx_traffic") or "Unknown",
+            "published": _child_text(item, "pubDate"),
+            "url": f"https://www.google.com/search?{urllib.parse.urlencode({'q': title})}",
+            "news": [entry for entry in news if entry["title"]],
+            "source": "Google Trends",
+        })
+        if len(topics) >= limit:
+            break
+    return topics
+
+
+def fetch_google_trends(country="vietnam", category=None, timeframe="now 1-d", limit=20, timeout=15):
+    """
+    Xu hướng tìm kiếm hiện tại của một quốc gia.
+    RSS chỉ có xu hướng ~24 giờ gần nhất cho mọi danh mục nên category / timeframe
+    được giữ trong chữ ký để tương thích với task google_trends nhưng không lọc thêm.
+    """
+    url = f"{GOOGLE_TRENDS_RSS}?{urllib.parse.urlencode({'geo': country_code(country)})}"
+    get_rate_limiter().acquire(url)
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return parse_trends_rss(response.read().decode("utf-8", "replace"), limit)
+
+
+def make_hashtags(keyword, extra=("xuhuong", "trending")):
+    """'Giá vàng hôm nay' -> ['#giávànghômnay', '#xuhuong', '#trending'] (giữ dấu tiếng Việt)"""
+    tag = re.sub(r"[^\w]", "", (keyword or "").lower())
+    tags = [f"#{tag}"] if tag else []
+    return tags + [f"#{value}" for value in extra]
+
+
+def generate_content(trend, content_type="article", word_count=500):
+    """
+    Dựng nội dung từ một xu hướng (dict có keyword/title, tuỳ chọn news, traffic).
+    content_type: "article" (bài viết nhiều đoạn, tối đa ~word_count từ) hoặc "post"
+    (bài đăng ngắn). Trả về dict title / content / hashtags / source_trend / created_time.
+    """
+    if not isinstance(trend, dict):
+        raise ValueError("Cần dữ liệu xu hướng dạng dict")
+    keyword = (trend.get("keyword") or trend.get("title") or trend.get("text") or "").strip()
+    if not keyword:
+        raise ValueError("Xu hướng không có từ khoá")
+
+    news = [entry for entry in trend.get("news") or [] if entry.get("title")]
+    traffic = trend.get("traffic")
+    interest = f" với khoảng {traffic} lượt tìm kiếm" if traffic and traffic != "Unknown" else ""
+
+    if content_type == "post":
+        title = f"🔥 {keyword} đang là xu hướng"
+        lines = [f"{keyword} đang được quan tâm{interest}."]
+        if news:
+            lines.append(f"📰 {news[0]['title']}" + (f" ({news[0]['source']})" if news[0].get("source") else ""))
+        lines.append("Bạn nghĩ sao về chủ đề này? Để lại bình luận nhé! 👇")
+        body = "\n\n".join(lines)
+    else:
+        title = f"{keyword}: những điều cần biết"
+        paragraphs = [
+            f"{keyword} đang là một trong những chủ đề được tìm kiếm nhiều nhất{interest}. "
+            f"Dưới đây là tổng hợp nhanh các thông tin đáng chú ý xoay quanh {keyword}."
+        ]
+        for entry in news:
+            source = f" Theo {entry['source']}." if entry.get("source") else ""
+            paragraphs.append(f"{entry['title']}.{source}")
+        paragraphs.append(
+            f"Chủ đề {keyword} được dự đoán sẽ còn thu hút sự quan tâm trong thời gian tới. "
+            f"Hãy theo dõi để cập nhật những diễn biến mới nhất."
+        )
+        # Giữ trong giới hạn word_count (bỏ bớt đoạn tin tức ở giữa, luôn giữ mở bài và kết bài)
+        while len(paragraphs) > 2 and sum(len(p.split()) for p in paragraphs) > word_count:
+            paragraphs.pop(-2)
+        body = "\n\n".join(paragraphs)
+
+    return {
+        "title": title,
+        "content": body,
+        "hashtags": make_hashtags(keyword),
+        "content_type": content_type,
+        "source_trend": f"{keyword} ({trend.get('source', 'Không rõ')})",
+        "sources": [entry["url"] for entry in news if entry.get("url")],
+        "created_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
@@ -0,0 +1,212 @@
+# modules/url_index.py
+
+"""
+Chỉ mục URL đã thấy (seen-URL index) dùng lại giữa các lần chạy.
+
+- Chuẩn hoá URL (bỏ tham số tracking, fragment, link chuyển hướng của Google,
+  gom link sản phẩm Shopee về dạng shop_id/item_id)
+- Lưu dạng băm 64-bit: url_hash -> fingerprint nội dung (cũng 64-bit)
+- Ghi xuống file nhị phân gọn (data/url_index/<namespace>.bin)
+"""
+
+import os
+import re
+import threading
+import hashlib
+from array import array
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+URL_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "data",
+    "url_index"
+)
+
+# Tham số chỉ dùng để theo dõi, không làm thay đổi nội dung trang
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "ved", "ei", "sa", "usg", "srsltid", "sca_esv",
+    "sp_atk", "xptdk", "mmp_pid", "uls_trackid", "utm_id"
+}
+
+SHOPEE_ITEM_RE = re.compile(r"-i\.(\d+)\.(\d+)")
+
+STATUS_NEW = "new"
+STATUS_CHANGED = "changed"
+STATUS_SEEN = "seen"
+
+
+def canonicalize_url(url):
+    """Đưa URL về dạng chuẩn để so sánh giữa các lần chạy"""
+    if not url:
+        return ""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    # Link chuyển hướng của Google: /url?q=<đích>
+    if host.startswith("google.") and parts.path == "/url":
+        target = dict(query).get("q") or dict(query).get("url")
+        if target and target != url:
+            return canonicalize_url(target)
+
+    # Link sản phẩm Shopee: ...-i.<shop_id>.<item_id>
+    if host.endswith("shopee.vn"):
+        match = SHOPEE_ITEM_RE.search(parts.path)
+        if match:
+            return f"https://shopee.vn/product/{match.group(1)}/{match.group(2)}"
+
+    port = parts.port
+    netloc = host
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        netloc = f"{host}:{port}"
+
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+
+    query = sorted(
+        (k, v) for k, v in query
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith("utm_")
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def hash64(text):
+    """Băm chuỗi thành số nguyên 64-bit"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def content_fingerprint(*fields):
+    """Fingerprint nội dung của một dòng kết quả (tiêu đề, giá...)"""
+    return hash64("\x1f".join(" ".join(str(f or "").split()) for f in fields))
+
+
+class RunStats:
+    """Thống kê của một lần chạy (mỗi worker một đối tượng riêng, chỉ mục thì dùng chung)"""
+
+    def __init__(self):
+        self.counts = {"total": 0, STATUS_NEW: 0, STATUS_CHANGED: 0, STATUS_SEEN: 0}
+
+    def record(self, status):
+        self.counts["total"] += 1
+        self.counts[status] += 1
+
+    def as_dict(self):
+        """Số URL theo trạng thái kèm tỷ lệ mới (novelty ratio)"""
+        stats = dict(self.counts)
+        fresh = stats[STATUS_NEW] + stats[STATUS_CHANGED]
+        stats["novelty_ratio"] = round(fresh / stats["total"], 3) if stats["total"] else 0.0
+        return stats
+
+
+class SeenUrlIndex:
+    """
+    Tập URL đã thấy cho một namespace (vd: "google", "shopee").
+    check() cho biết URL là mới / đã đổi nội dung / đã thấy.
+    """
+
+    def __init__(self, namespace, index_dir=None):
+        self.namespace = namespace
+        self.index_dir = index_dir or URL_INDEX_DIR
+        self.path = os.path.join(self.index_dir, f"{namespace}.bin")
+        self._entries = None  # url_hash -> fingerprint (0 = chưa có fingerprint)
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.path):
+            return
+        data = array("Q")
+        try:
+            with open(self.path, "rb") as f:
+                data.frombytes(f.read())
+        except (OSError, ValueError):
+            return
+        # File lưu xen kẽ: url_hash, fingerprint, url_hash, fingerprint, ...
+        self._entries = dict(zip(data[0::2], data[1::2]))
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def check(self, url, fingerprint=None):
+        """
+        Kiểm tra URL (không ghi nhận).
+        Trả về STATUS_NEW, STATUS_CHANGED (fingerprint khác lần trước) hoặc STATUS_SEEN.
+        """
+        key = hash64(canonicalize_url(url))
+        with self._lock:
+            self._load()
+            previous = self._entries.get(key)
+        if previous is None:
+            return STATUS_NEW
+        if fingerprint is not None and previous and previous != fingerprint:
+            return STATUS_CHANGED
+        return STATUS_SEEN
+
+    def add(self, url, fingerprint=None, run=None):
+        """
+        Ghi nhận URL (và fingerprint nội dung nếu có), trả về trạng thái trước khi ghi.
+        run: RunStats của lần chạy hiện tại (từ begin_run()) để đếm mới / đổi / đã thấy.
+        """
+        key = hash64(canonicalize_url(url))
+        with self._lock:
+            self._load()
+            previous = self._entries.get(key)
+            if previous is None:
+                status = STATUS_NEW
+            elif fingerprint is not None and previous and previous != fingerprint:
+                status = STATUS_CHANGED
+            else:
+                status = STATUS_SEEN
+            if status != STATUS_SEEN or (fingerprint and not previous):
+                self._entries[key] = fingerprint or previous or 0
+                self._dirty = True
+        if run is not None:
+            run.record(status)
+        return status
+
+    def begin_run(self):
+        """Thống kê cho một lần chạy mới (truyền vào add(..., run=...))"""
+        return RunStats()
+
+    def save(self):
+        """Ghi chỉ mục xuống đĩa (ghi file tạm rồi thay thế để tránh hỏng file)"""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            data = array("Q")
+            for key, fingerprint in self._entries.items():
+                data.append(key)
+                data.append(fingerprint)
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data.tobytes())
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_url_index(namespace):
+    """Trả về SeenUrlIndex dùng chung cho namespace"""
+    with _indexes_lock:
+        if namespace not in _indexes:
+            _indexes[namespace] = SeenUrlIndex(namespace)
+        return _indexes[namespace]
@@ -16,11 +16,14 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 
+from modules.browser_identity import get_browser_identity
+from modules.profile_manager import get_profile_manager
+
 # Đường dẫn mặc định của Brave
 DEFAULT_BRAVE_PATH = r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe"
 DEFAULT_PROFILE_PATH = r"C:\Users\admin\AppData\Local\BraveSoftware\Brave-Browser\User Data\Default"
 
-def run_brave_automation(task="google", keyword=None, headless=False, keep_open=False):
+def run_brave_automation(task="google", keyword=None, headless=False, keep_open=False, clone_profile=False):
     """
     Chạy tác vụ tự động hóa với Brave Browser
     
@@ -29,6 +32,7 @@ def run_brave_automation(task="google", keyword=None, headless=False, keep_open=
         keyword (str): Từ khóa tìm kiếm (nếu cần)
         headless (bool): Chạy ở chế độ headless không hiển thị giao diện
         keep_open (bool): Giữ trình duyệt mở sau khi hoàn thành
+        clone_profile (bool): Dùng bản sao profile (chạy được nhiều trình duyệt cùng lúc)
     """
     print(f"=== CHẠY TÁC VỤ TỰ ĐỘNG HÓA: {task.upper()} ===")
     
@@ -51,6 +55,13 @@ def run_brave_automation(task="google", keyword=None, headless=False, keep_open=
             print("❌ Không thể tìm thấy Brave. Vui lòng cài đặt Brave và thử lại.")
             return
     
+    # Xác nhận trình duyệt (kết quả được cache, không cần mở chrome://version)
+    identity = get_browser_identity(brave_path, print)
+    if identity and identity["product"] == "Brave":
+        print(f"✅ Xác nhận đang sử dụng Brave Browser {identity['version']}")
+    else:
+        print("⚠️ Có thể không sử dụng Brave Browser!")
+    
     # Thiết lập ChromeDriver
     print("Đang thiết lập ChromeDriver...")
     chromedriver_path = ChromeDriverManager().install()
@@ -83,9 +94,16 @@ def run_brave_automation(task="google", keyword=None, headless=False, keep_open=
     
     # Thiết lập profile
     profile_path = DEFAULT_PROFILE_PATH
+    profile_slot = None
     if os.path.exists(os.path.dirname(profile_path)):
+        user_data_dir = os.path.dirname(profile_path)
+        if clone_profile:
+            manager = get_profile_manager(user_data_dir, os.path.basename(profile_path))
+            slot, user_data_dir = manager.acquire_slot()
+            profile_slot = (manager, slot)
+            print(f"✅ Bản sao profile (slot {slot}): {manager.last_stats}")
         print(f"✅ Sử dụng profile: {profile_path}")
-        options.add_argument(f"--user-data-dir={os.path.dirname(profile_path)}")
+        options.add_argument(f"--user-data-dir={user_data_dir}")
         options.add_argument(f"--profile-directory={os.path.basename(profile_path)}")
     else:
         print("⚠️ Không tìm thấy profile mặc định, sẽ sử dụng profile tạm")
@@ -108,16 +126,6 @@ def run_brave_automation(task="google", keyword=None, headless=False, keep_open=
     })
     
     try:
-        # Xác nhận trình duyệt
-        driver.get("chrome://version")
-        time.sleep(1)
-        page_source = driver.page_source.lower()
-        
-        if "brave" in page_source:
-            print("✅ Xác nhận đang sử dụng Brave Browser!")
-        else:
-            print("⚠️ Có thể không sử dụng Brave Browser!")
-        
         # Thực hiện tác vụ
         if task == "google":
             if not keyword:
@@ -147,6 +155,8 @@ def run_brave_automation(task="google", keyword=None, headless=False, keep_open=
         if not keep_open:
             print("Đóng trình duyệt...")
             driver.quit()
+            if profile_slot:
+                profile_slot[0].release_slot(profile_slot[1])
         
     print("=== HOÀN THÀNH ===")
 
@@ -275,6 +285,10 @@ def parse_arguments():
     parser.add_argument("--keep-open", "-o",
                         action="store_true",
                         help="Giữ trình duyệt mở sau khi hoàn thành")
+                        
+    parser.add_argument("--clone-profile", "-c",
+                        action="store_true",
+                        help="Dùng bản sao profile để chạy nhiều trình duyệt cùng lúc")
     
     return parser.parse_args()
 
@@ -285,5 +299,6 @@ if __name__ == "__main__":
         task=args.task,
         keyword=args.keyword,
         headless=args.headless,
-        keep_open=args.keep_open
+        keep_open=args.keep_open,
+        clone_profile=args.clone_profile
     ) 
\ No newline at end of file
@@ -0,0 +1,99 @@
+import os
+import time
+import threading
+from io import BytesIO
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from modules.artifact_store import ArtifactStore
+
+
+def png(size=(64, 32), color=(200, 30, 30)):
+    out = BytesIO()
+    Image.new("RGB", size, color).save(out, format="PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArtifactStore(str(tmp_path / "shots"), fmt="webp", max_dimension=40)
+    yield store
+    store.close()
+
+
+def test_images_are_encoded_resized_and_deduplicated(store):
+    path = store.submit_image("google", png()).result(5)
+    assert path.endswith(".webp") and os.path.basename(path).startswith("google_")
+    with Image.open(path) as image:
+        assert image.size == (40, 20)
+
+    # Cùng nội dung: dùng lại file đã ghi
+    assert store.submit_image("google", png()).result(5) == path
+    kept = store.submit_image("captcha", png(color=(0, 0, 255)), fmt="png").result(5)
+    assert kept.endswith(".png")
+    html = store.submit_text("dom", "<html>xin chào</html>").result(5)
+    with open(html, encoding="utf-8") as f:
+        assert f.read() == "<html>xin chào</html>"
+    assert store.get_stats() == {"written": 3, "deduplicated": 1, "dropped": 0, "removed": 0}
+
+
+def test_full_queue_drops_without_blocking(tmp_path):
+    store = ArtifactStore(str(tmp_path / "shots"), max_queue=1)
+    started, release = threading.Event(), threading.Event()
+    write = store._write
+
+    def slow_write(*job):
+        started.set()
+        release.wait(5)
+        return write(*job)
+
+    store._write = slow_write
+    first = store.submit_text("a", "first")
+    assert started.wait(5)
+    queued = store.submit_text("b", "second")
+
+    # Thread ghi đang bận, hàng đợi đầy: mọi lần gửi thêm từ nhiều thread đều bị bỏ ngay
+    def spam():
+        for i in range(200):
+            assert store.submit_text("c", f"spam {i}").result(0) is None
+
+    threads = [threading.Thread(target=spam) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get_stats()["dropped"] == 1600
+
+    release.set()
+    store.flush(timeout=5)
+    assert store._queue.unfinished_tasks == 0
+    assert first.done() and queued.done()
+    assert os.path.exists(queued.result())
+    store.close()
+    assert store._thread is None
+
+
+def test_close_writes_pending_items(tmp_path):
+    store = ArtifactStore(str(tmp_path / "shots"))
+    futures = [store.submit_text("dom", f"page {i}") for i in range(5)]
+    store.close()
+    assert all(future.done() and os.path.exists(future.result()) for future in futures)
+    assert store.get_stats()["written"] == 5
+
+
+def test_retention_removes_old_then_oldest(tmp_path):
+    directory = tmp_path / "shots"
+    directory.mkdir()
+    now = time.time()
+    for name, age in (("old.txt", 30 * 86400), ("a.txt", 300), ("b.txt", 200), ("c.txt", 100)):
+        path = directory / name
+        path.write_bytes(b"x" * 1024)
+        os.utime(path, (now - age, now - age))
+
+    store = ArtifactStore(str(directory), max_total_mb=2.5 / 1024, max_age_days=14)
+    store.enforce_retention()
+    # Quá tuổi bị xoá, sau đó xoá cái cũ nhất cho tới khi dưới 2.5 KB
+    assert sorted(os.listdir(directory)) == ["b.txt", "c.txt"]
+    assert store.get_stats()["removed"] == 2
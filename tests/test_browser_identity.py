@@ -0,0 +1,122 @@
+import os
+import stat
+from types import SimpleNamespace
+
+import pytest
+
+from modules import browser_identity
+from modules.browser_identity import (
+    _detect_version, _folder_version, _parse_identity, get_browser_identity, update_identity_from_driver
+)
+
+
+@pytest.fixture
+def identity_file(tmp_path, monkeypatch):
+    path = tmp_path / "data" / "browser_identity.json"
+    monkeypatch.setattr(browser_identity, "IDENTITY_FILE", str(path))
+    return path
+
+
+def make_binary(folder, name="brave", output="Brave Browser 134.1.76.74"):
+    """Binary giả: script in chuỗi phiên bản khi chạy --version"""
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / name
+    path.write_text(f"#!/bin/sh\necho '{output}'\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.mark.parametrize("output, expected", [
+    ("Brave Browser 134.1.76.74", ("Brave", "134.1.76.74", "", "134")),
+    ("Brave Browser 1.76.74 Chromium: 134.0.6998.89", ("Brave", "1.76.74", "134.0.6998.89", "134")),
+    ("Google Chrome 120.0.6099.109 ", ("Chrome", "120.0.6099.109", "120.0.6099.109", "120")),
+    ("Chromium 119.0.6045.159 built on Debian", ("Chromium", "119.0.6045.159", "119.0.6045.159", "119")),
+    ("", ("Chrome", "", "", "")),
+])
+def test_parse_version_strings(output, expected):
+    identity = _parse_identity("/usr/bin/google-chrome", output)
+    assert (identity["product"], identity["version"], identity["chromium_version"], identity["major"]) == expected
+
+
+def test_parse_uses_binary_path_for_product():
+    # Windows: chỉ có tên thư mục phiên bản, sản phẩm nhận theo đường dẫn
+    identity = _parse_identity(r"C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe", "134.1.76.74")
+    assert identity["product"] == "Brave" and identity["major"] == "134"
+
+
+def test_folder_version_picks_highest_numeric(tmp_path):
+    application = tmp_path / "Application"
+    for name in ("134.1.76.74", "134.1.9.1", "134.1.100.3", "SetupMetrics", "Dictionaries"):
+        (application / name).mkdir(parents=True)
+    binary = application / "brave.exe"
+    binary.write_bytes(b"")
+    # So sánh theo số, không theo chuỗi ("100" > "76" > "9")
+    assert _folder_version(str(binary)) == "134.1.100.3"
+    assert _folder_version(str(tmp_path / "missing" / "brave.exe")) == ""
+    (tmp_path / "empty").mkdir()
+    assert _folder_version(str(tmp_path / "empty" / "brave.exe")) == ""
+
+
+def test_windows_reads_folder_without_running_binary(tmp_path, monkeypatch):
+    application = tmp_path / "Application"
+    (application / "134.1.76.74").mkdir(parents=True)
+    binary = application / "brave.exe"
+    binary.write_bytes(b"")
+
+    def run(*args, **kwargs):
+        raise AssertionError("không được chạy brave.exe --version trên Windows")
+
+    monkeypatch.setattr(browser_identity.subprocess, "run", run)
+    monkeypatch.setattr(browser_identity.os, "name", "nt")
+    assert _detect_version(str(binary)) == "134.1.76.74"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="binary giả là shell script")
+def test_detect_version_falls_back_to_folder(tmp_path):
+    assert _detect_version(make_binary(tmp_path / "ok")) == "Brave Browser 134.1.76.74"
+
+    # --version không in phiên bản -> đọc thư mục cạnh binary
+    binary = make_binary(tmp_path / "silent", output="")
+    (tmp_path / "silent" / "120.0.1.2").mkdir()
+    assert _detect_version(binary) == "120.0.1.2"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="binary giả là shell script")
+def test_identity_cached_until_binary_changes(tmp_path, identity_file, monkeypatch):
+    binary = make_binary(tmp_path / "bin")
+    calls = []
+    detect = browser_identity._detect_version
+    monkeypatch.setattr(browser_identity, "_detect_version", lambda path: calls.append(path) or detect(path))
+
+    logs = []
+    first = get_browser_identity(binary, logs.append)
+    assert (first["product"], first["version"], first["path"]) == ("Brave", "134.1.76.74", binary)
+    assert identity_file.exists() and len(logs) == 1
+
+    # Lần sau đọc từ file cache, không chạy lại --version
+    assert get_browser_identity(binary) == first
+    assert len(calls) == 1
+
+    # Binary được cập nhật (mtime / size đổi) -> nhận diện lại
+    make_binary(tmp_path / "bin", output="Brave Browser 135.1.77.100")
+    os.utime(binary, (first["mtime"] + 10, first["mtime"] + 10))
+    assert get_browser_identity(binary)["version"] == "135.1.77.100"
+    assert len(calls) == 2
+
+    assert get_browser_identity(str(tmp_path / "missing")) is None
+    assert get_browser_identity("") is None
+
+
+@pytest.mark.skipif(os.name == "nt", reason="binary giả là shell script")
+def test_update_identity_from_driver_capabilities(tmp_path, identity_file):
+    binary = make_binary(tmp_path / "bin")
+    get_browser_identity(binary)
+    driver = SimpleNamespace(capabilities={"browserVersion": "134.0.6998.89"})
+
+    identity = update_identity_from_driver(binary, driver)
+    assert (identity["chromium_version"], identity["major"]) == ("134.0.6998.89", "134")
+    assert get_browser_identity(binary)["chromium_version"] == "134.0.6998.89"
+
+    # Đã có phiên bản Chromium: không ghi đè
+    other = SimpleNamespace(capabilities={"browserVersion": "999.0.0.1"})
+    assert update_identity_from_driver(binary, other)["chromium_version"] == "134.0.6998.89"
@@ -0,0 +1,191 @@
+import json
+import os
+
+import pytest
+
+psutil = pytest.importorskip("psutil")
+
+from modules import browser_reaper
+from modules.browser_reaper import BrowserReaper, kill_tree
+
+MB = 1024 * 1024
+
+
+class FakeProc:
+    def __init__(self, table, pid, create_time=1000.0, rss=0, children=(), stubborn=False):
+        self.table = table
+        self.pid = pid
+        self._create_time = create_time
+        self.rss = rss
+        self.child_pids = list(children)
+        self.stubborn = stubborn  # bỏ qua terminate(), phải kill()
+        self.signals = []
+
+    def create_time(self):
+        return self._create_time
+
+    def children(self, recursive=False):
+        result = []
+        for pid in self.child_pids:
+            child = self.table.procs.get(pid)
+            if child:
+                result.append(child)
+                if recursive:
+                    result.extend(child.children(recursive=True))
+        return result
+
+    def memory_info(self):
+        return type("MemoryInfo", (), {"rss": self.rss})()
+
+    def terminate(self):
+        self.signals.append("terminate")
+        if not self.stubborn:
+            self.table.procs.pop(self.pid, None)
+
+    def kill(self):
+        self.signals.append("kill")
+        self.table.procs.pop(self.pid, None)
+
+
+class FakeSystem:
+    """Bảng tiến trình giả thay cho psutil.Process / pid_exists / wait_procs"""
+
+    def __init__(self, monkeypatch):
+        self.procs = {}
+        self.add(os.getpid())
+        monkeypatch.setattr(browser_reaper.psutil, "Process", self.process)
+        monkeypatch.setattr(browser_reaper.psutil, "pid_exists", lambda pid: pid in self.procs)
+        monkeypatch.setattr(browser_reaper.psutil, "wait_procs", self.wait_procs)
+
+    def add(self, pid, **kwargs):
+        proc = self.procs[pid] = FakeProc(self, pid, **kwargs)
+        return proc
+
+    def process(self, pid=None):
+        pid = os.getpid() if pid is None else pid
+        if pid not in self.procs:
+            raise psutil.NoSuchProcess(pid)
+        return self.procs[pid]
+
+    def wait_procs(self, procs, timeout=None):
+        gone = [proc for proc in procs if proc.pid not in self.procs or self.procs[proc.pid] is not proc]
+        return gone, [proc for proc in procs if proc not in gone]
+
+
+class FakeDriver:
+    def __init__(self, system, pid):
+        self.system = system
+        self.service = type("Service", (), {})()
+        self.service.process = type("Popen", (), {"pid": pid, "poll": lambda self: None})()
+        self.quit_called = False
+
+    def quit(self):
+        # chromedriver thoát nhưng để lại tiến trình trình duyệt con
+        self.quit_called = True
+        self.system.procs.pop(self.service.process.pid, None)
+
+
+@pytest.fixture
+def system(monkeypatch):
+    return FakeSystem(monkeypatch)
+
+
+def make_browser(system, pid, rss=0):
+    system.add(pid, children=[pid + 1, pid + 2], rss=rss)
+    system.add(pid + 1, rss=rss, children=[pid + 3])
+    system.add(pid + 2)
+    system.add(pid + 3)
+    return FakeDriver(system, pid)
+
+
+def test_kill_tree_terminates_then_kills(system):
+    system.add(100, children=[101])
+    system.add(101, stubborn=True)
+    assert kill_tree(100) == 2
+    assert system.procs.keys() == {os.getpid()}
+    assert system.procs.get(101) is None
+
+    # PID đã bị dùng lại (create_time khác): không đụng tới
+    reused = system.add(200, create_time=5000.0, children=[201])
+    system.add(201)
+    assert kill_tree(200, create_time=1000.0) == 0
+    assert reused.signals == [] and 201 in system.procs
+
+
+def test_quit_kills_children_collected_before_driver_quit(system, tmp_path):
+    reaper = BrowserReaper(pid_dir=str(tmp_path))
+    driver = make_browser(system, 100)
+    reaper.register(driver, owner="test")
+
+    reaper.quit(driver)
+    assert driver.quit_called
+    assert not {101, 102, 103} & system.procs.keys()
+    assert reaper.tracked() == {}
+
+
+def test_quit_does_not_kill_reused_pid(system, tmp_path):
+    reaper = BrowserReaper(pid_dir=str(tmp_path))
+    driver = make_browser(system, 100)
+    reaper.register(driver)
+
+    # chromedriver đã chết, PID được tiến trình không liên quan dùng lại
+    for pid in (100, 101, 102, 103):
+        system.procs.pop(pid)
+    stranger = system.add(100, create_time=9999.0, children=[150])
+    child = system.add(150)
+    reaper.quit(driver)
+    assert stranger.signals == [] and child.signals == []
+
+
+def test_enforce_budget(system, tmp_path):
+    reaper = BrowserReaper(max_rss_mb=100, max_idle=1, pid_dir=str(tmp_path))
+    heavy_busy = make_browser(system, 100, rss=80 * MB)
+    heavy_idle = make_browser(system, 200, rss=80 * MB)
+    idle_old = make_browser(system, 300)
+    idle_new = make_browser(system, 400)
+    dead = make_browser(system, 500)
+    for driver in (heavy_busy, heavy_idle, idle_old, idle_new, dead):
+        reaper.register(driver)
+    reaper._update(heavy_idle, busy=False, last_used=1)
+    reaper._update(idle_old, busy=False, last_used=2)
+    reaper._update(idle_new, busy=False, last_used=3)
+    system.procs.pop(500)
+
+    assert reaper.enforce() == 2
+    # Đang chạy task: chỉ đánh dấu tạo lại; đang rảnh: đóng; quá số rảnh: đóng cái cũ nhất
+    assert reaper.should_recycle(heavy_busy) and heavy_busy.quit_called is False
+    assert heavy_idle.quit_called and idle_old.quit_called and not idle_new.quit_called
+    assert set(reaper.tracked()) == {100, 400}
+
+
+def test_reap_orphans(system, tmp_path):
+    reaper = BrowserReaper(pid_dir=str(tmp_path))
+    orphan = system.add(300, children=[301])
+    system.add(301)
+    system.add(400, create_time=7777.0)  # PID dùng lại sau khi trình duyệt cũ chết
+    live_browser = system.add(600)
+    system.add(50, create_time=42.0)  # tiến trình chủ khác vẫn sống
+
+    def write(name, owner, owner_create_time, browsers):
+        (tmp_path / name).write_text(json.dumps({
+            "owner": owner, "owner_create_time": owner_create_time,
+            "browsers": [{"pid": pid, "create_time": 1000.0} for pid in browsers], "remote": []
+        }), encoding="utf-8")
+
+    write("999999.json", 999999, 1.0, [300, 400])
+    write("50.json", 50, 42.0, [600])
+
+    # Trình duyệt của chính tiến trình này nhưng không còn được theo dõi
+    tracked = make_browser(system, 700)
+    reaper.register(tracked)
+    untracked = system.add(800)
+    write(f"{os.getpid()}.json", os.getpid(), 0, [700, 800])
+
+    assert reaper.reap_orphans() == 3
+    assert orphan.signals == ["terminate"] and 301 not in system.procs and 800 not in system.procs
+    assert 400 in system.procs and live_browser.signals == [] and 700 in system.procs
+    assert untracked.signals == ["terminate"]
+    assert not (tmp_path / "999999.json").exists()
+    assert (tmp_path / "50.json").exists()
+    data = json.loads((tmp_path / f"{os.getpid()}.json").read_text(encoding="utf-8"))
+    assert [record["pid"] for record in data["browsers"]] == [700]
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from modules import captcha_client
+from modules.captcha_client import CaptchaError, MockTwoCaptchaServer, TwoCaptchaClient
+
+
+@pytest.fixture
+def server():
+    server = MockTwoCaptchaServer(solve_delay=0.3)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(server, monkeypatch):
+    monkeypatch.setattr(captcha_client, "CAPTCHA_FIRST_POLL_RECAPTCHA", 0.2)
+    monkeypatch.setattr(captcha_client, "CAPTCHA_FIRST_POLL_IMAGE", 0.2)
+    client = TwoCaptchaClient("test-key", base_url=server.base_url, poll_interval=0.2)
+    yield client
+    client.shutdown()
+
+
+def test_parallel_solves_share_connections_and_polls(server, client):
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        futures = [
+            pool.submit(client.solve_recaptcha, f"site{i}", "https://www.google.com/sorry/", timeout=10)
+            for i in range(20)
+        ]
+        answers = [future.result() for future in futures]
+
+    assert answers == [f"TOKEN-site{i}" for i in range(20)]
+    assert len({answer.captcha_id for answer in answers}) == 20
+    # Kết nối keep-alive dùng lại qua pool, polling theo lô thay vì mỗi captcha một vòng
+    assert client.http.stats["connections"] <= captcha_client.CAPTCHA_POOL_SIZE
+    assert client.stats["submitted"] == client.stats["solved"] == 20
+    assert client.stats["polls"] < 10
+    assert client.pending_count() == 0
+
+    polls = [params for path, params in server.requests if path == "/res.php"]
+    assert max(len(params["ids"].split(",")) for params in polls) > 1
+    assert all(params["key"] == "test-key" for _, params in server.requests)
+
+
+def test_image_answer_and_report(server, client):
+    server.answer = lambda params: "abc123" if params.get("method") == "base64" else "TOKEN"
+    answer = client.solve_image("aW1hZ2U=", timeout=10)
+    assert answer == "abc123"
+
+    client.report_sync(answer.captcha_id, good=False)
+    path, params = server.requests[-1]
+    assert (path, params["action"], params["id"]) == ("/res.php", "reportbad", answer.captcha_id)
+
+
+def test_error_answer_raises(server, client):
+    server.answer = lambda params: "ERROR_CAPTCHA_UNSOLVABLE"
+    with pytest.raises(CaptchaError, match="UNSOLVABLE"):
+        client.solve_recaptcha("site", "https://example.com", timeout=10)
+    assert client.stats["failed"] == 1
+
+
+def test_timeout_raises(server, client):
+    server.solve_delay = 60
+    with pytest.raises(CaptchaError):
+        client.solve_recaptcha("site", "https://example.com", timeout=0.5)
+    assert client.pending_count() == 0
+
+
+def test_unexpected_poll_error_keeps_polling(server, client):
+    original_call = client._call
+    failures = []
+
+    async def flaky_call(method, path, params):
+        if path == "/res.php" and not failures:
+            failures.append(path)
+            raise ValueError("malformed HTTP response")
+        return await original_call(method, path, params)
+
+    client._call = flaky_call
+    # Lô đầu lỗi ngoài dự kiến: coi như chưa xong, lần poll sau vẫn nhận được kết quả
+    assert client.solve_recaptcha("site", "https://example.com", timeout=10) == "TOKEN-site"
+    assert failures == ["/res.php"]
+    assert client.pending_count() == 0
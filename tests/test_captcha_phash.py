@@ -0,0 +1,101 @@
+import time
+import sqlite3
+
+from modules.captcha_phash import BKTree, CachedAnswer, PhashAnswerCache, hamming
+
+SITE = "example.vn"
+HASH = 0xF0F0_0F0F_AAAA_5555
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(HASH, HASH ^ 0b111) == 3
+
+
+def test_bktree_search_within_distance():
+    tree = BKTree()
+    items = {}
+    for image_hash in (HASH, HASH ^ 0b1, HASH ^ 0b11111111, HASH ^ (0xFFFF << 40)):
+        items[image_hash] = CachedAnswer(None, SITE, image_hash, str(image_hash))
+        tree.add(image_hash, items[image_hash])
+
+    found = sorted(distance for distance, _ in tree.search(HASH, 8))
+    assert found == [0, 1, 8]
+    assert [item.hash for _, item in tree.search(HASH ^ 0b1, 0)] == [HASH ^ 0b1]
+
+    items[HASH].evicted = True
+    assert sorted(distance for distance, _ in tree.search(HASH, 8)) == [1, 8]
+    assert len(list(tree.items())) == 3
+
+
+def test_answer_lifecycle(tmp_path):
+    db = str(tmp_path / "answers.db")
+    cache = PhashAnswerCache(db, max_distance=4)
+
+    entry = cache.remember(SITE, HASH, "x7k2")
+    # Đáp án chưa xác nhận thì không được trả lại
+    assert cache.lookup(SITE, HASH) == (None, None)
+    assert cache.remember(SITE, HASH, "x7k2") is entry
+
+    cache.feedback(entry, True)
+    # Ảnh lệch vài bit (nén / co giãn) vẫn khớp; domain khác thì không
+    item, distance = cache.lookup(SITE, HASH ^ 0b101)
+    assert (item.answer, distance) == ("x7k2", 2)
+    assert cache.lookup(SITE, HASH ^ 0xFFFF) == (None, None)
+    assert cache.lookup("other.vn", HASH) == (None, None)
+    assert cache.stats["hits"] == 1
+
+    # Trạng thái được lưu xuống SQLite
+    cache.close()
+    cache = PhashAnswerCache(db, max_distance=4)
+    item, _ = cache.lookup(SITE, HASH)
+    assert (item.answer, item.successes) == ("x7k2", 1)
+
+    cache.feedback(item, False)
+    assert cache.lookup(SITE, HASH)[0] is None  # 1 đúng / 1 sai: chưa đủ tin cậy
+    cache.feedback(item, False)
+    assert item.evicted and cache.stats["evicted"] == 1
+    cache.feedback(item, True)  # đã loại thì bỏ qua
+    assert item.successes == 1
+    cache.close()
+
+    assert PhashAnswerCache(db).lookup(SITE, HASH) == (None, None)
+
+
+def test_compact_rebuilds_tree(tmp_path):
+    cache = PhashAnswerCache(str(tmp_path / "answers.db"))
+    entries = [cache.remember(SITE, HASH ^ (1 << bit), f"a{bit}") for bit in range(4)]
+    for entry in entries[:3]:
+        cache.feedback(entry, False)
+    tree = cache._trees[SITE]
+    assert (tree.size, tree.evicted) == (1, 0)
+    assert [item.answer for item in tree.items()] == ["a3"]
+
+
+def test_unconfirmed_answers_expire_and_are_capped(tmp_path):
+    db = str(tmp_path / "answers.db")
+    cache = PhashAnswerCache(db, pending_ttl=3600, pending_max=2)
+    old = cache.remember(SITE, HASH, "old")
+    confirmed = cache.remember(SITE, HASH ^ 0b1, "good")
+    cache.feedback(confirmed, True)
+    old.created_at = confirmed.created_at = time.time() - 7200
+
+    # Mục chưa xác nhận quá hạn bị xoá khi ghi mục mới; mục đã xác nhận thì giữ
+    first = cache.remember(SITE, HASH ^ 0b11, "a")
+    assert old.evicted and not confirmed.evicted
+    second = cache.remember(SITE, HASH ^ 0b111, "b")
+    # Đủ pending_max: bỏ mục chưa xác nhận cũ nhất
+    third = cache.remember(SITE, HASH ^ 0b1111, "c")
+    assert first.evicted and not second.evicted and not third.evicted
+    assert cache.stats["evicted"] == 2
+    # Domain khác có giới hạn riêng
+    assert not cache.remember("other.vn", HASH, "x").evicted
+    cache.close()
+
+    with sqlite3.connect(db) as conn:
+        conn.execute("UPDATE answers SET created_at = 0 WHERE answer IN ('b', 'good')")
+    reloaded = PhashAnswerCache(db, pending_ttl=3600, pending_max=2)
+    # Khi nạp lại, mục chưa xác nhận quá hạn bị xoá khỏi SQLite
+    assert sorted(item.answer for item in reloaded._trees[SITE].items()) == ["c", "good"]
+    reloaded.close()
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from modules import captcha_prefetch
+from modules.captcha_client import MockTwoCaptchaServer, TwoCaptchaClient
+from modules.captcha_prefetch import TokenPrefetchPool, _Entry, pool_key
+
+PAGE = "https://www.google.com/sorry/index?continue=x#frag"
+
+
+def idle_pool(**kwargs):
+    """Kho không có thread bổ sung (chỉ thử phần tính toán / lấy token)"""
+    pool = TokenPrefetchPool(None, **kwargs)
+    pool.close()
+    return pool
+
+
+def test_pool_key_drops_query():
+    assert pool_key("site", PAGE) == ("site", "https://www.google.com/sorry/index")
+    assert pool_key("site", None) == ("site", "")
+
+
+def test_target_follows_demand():
+    pool = idle_pool(ttl=110, max_size=5, window=100)
+    entry = _Entry()
+    assert pool.target(entry) == 0
+
+    now = time.time()
+    entry.demand.extend([now] * 10)  # 0.1 captcha/giây, giải mất 30 giây
+    assert pool.target(entry) == 4
+    entry.demand.extend([now] * 90)
+    assert pool.target(entry) == 5  # không vượt max_size
+
+    # Captcha quá thưa: token giải sẵn sẽ hết hạn trước khi dùng
+    sparse = _Entry()
+    sparse.demand.append(now)
+    assert idle_pool(ttl=110, window=1000).target(sparse) == 0
+
+
+def test_take_hit_miss_and_expiry():
+    pool = idle_pool(ttl=100)
+    assert pool.take("site", PAGE) is None
+    assert pool.stats["misses"] == 1
+
+    entry = pool._entries[pool_key("site", PAGE)]
+    now = time.time()
+    entry.tokens.extend([(now - 200, "old"), (now - 5, "fresh"), (now, "newest")])
+    assert pool.ready("site", "https://www.google.com/sorry/index") == 2
+    assert pool.stats["expired"] == 1
+    # Token cũ nhất (còn hạn) được dùng trước
+    assert pool.take("site", PAGE) == "fresh"
+    assert pool.stats["hits"] == 1
+    assert pool.ready("other", PAGE) == 0
+
+
+def test_observe_smooths_solve_time():
+    pool = idle_pool()
+    pool.observe(pool.solve_time + 10)
+    assert pool.solve_time == pytest.approx(captcha_prefetch.DEFAULT_SOLVE_TIME + 2)
+
+
+def test_refill_prefetches_from_client(monkeypatch):
+    monkeypatch.setattr(captcha_prefetch, "REFILL_INTERVAL", 0.1)
+    monkeypatch.setattr(captcha_prefetch, "CAPTCHA_FIRST_POLL_RECAPTCHA", 0.1)
+    server = MockTwoCaptchaServer(solve_delay=0.1)
+    client = TwoCaptchaClient("test-key", base_url=server.base_url, poll_interval=0.1)
+    pool = TokenPrefetchPool(client, ttl=110, max_size=3, window=10)
+    try:
+        for _ in range(5):
+            assert pool.take("site", PAGE) is None
+        deadline = time.time() + 5
+        while pool.ready("site", PAGE) < 3 and time.time() < deadline:
+            time.sleep(0.05)
+        assert pool.ready("site", PAGE) == 3
+        assert pool.take("site", PAGE) == "TOKEN-site"
+        assert pool.stats["prefetched"] >= 3
+        assert all(
+            params["pageurl"] == "https://www.google.com/sorry/index"
+            for path, params in server.requests if path == "/in.php"
+        )
+    finally:
+        pool.close()
+        client.shutdown()
+        server.close()
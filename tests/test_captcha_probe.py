@@ -0,0 +1,114 @@
+from modules import captcha_probe
+from modules.captcha_probe import (
+    ANSWER_SELECTOR, CAPTCHA_MARK_SCRIPT, CAPTCHA_RECHECK_SCRIPT, IMAGE_SELECTOR, KIND_CLOUDFLARE,
+    KIND_IMAGE, KIND_RECAPTCHA, RECAPTCHA_RESPONSE_SELECTOR, SUBMIT_ANSWER_SCRIPT,
+    solve_detected_captcha, wait_captcha_cleared
+)
+
+
+class FakeDriver:
+    """
+    Trả lần lượt các trạng thái của CAPTCHA_RECHECK_SCRIPT (trạng thái cuối được giữ);
+    after_submit: các trạng thái thay thế sau khi form được submit
+    """
+
+    def __init__(self, states, after_submit=None, has_form=True):
+        self.states = list(states)
+        self.after_submit = after_submit
+        self.has_form = has_form
+        self.marked = False
+        self.submitted = []
+
+    def execute_script(self, script, *args):
+        if script == CAPTCHA_MARK_SCRIPT:
+            self.marked = True
+            return None
+        if script == SUBMIT_ANSWER_SCRIPT:
+            if not self.has_form:
+                return False
+            self.submitted.append(args)
+            if self.after_submit is not None:
+                self.states = list(self.after_submit)
+            return True
+        if script == CAPTCHA_RECHECK_SCRIPT:
+            state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+            if isinstance(state, Exception):
+                raise state
+            return state
+        raise AssertionError("script không mong đợi")
+
+
+class FakeResolver:
+    def __init__(self, answer="x7k2"):
+        self.answer = answer
+        self.reports = []
+
+    def resolve_image_captcha(self, driver, element_selector):
+        assert element_selector == IMAGE_SELECTOR
+        return self.answer
+
+    def report_image_result(self, ok):
+        self.reports.append(ok)
+
+    def resolve_recaptcha(self, driver, sitekey=None):
+        assert driver.marked and sitekey == "site-key"
+        return bool(self.answer)
+
+
+IMAGE_INFO = {"kind": KIND_IMAGE, "sitekey": None, "url": "https://example.vn/login"}
+RECAPTCHA_INFO = {"kind": KIND_RECAPTCHA, "sitekey": "site-key", "url": "https://example.vn/login"}
+CAPTCHA = {"kind": KIND_IMAGE}
+WIDGET = {"navigated": False, "captcha": {"kind": KIND_RECAPTCHA}}
+
+
+def test_wait_captcha_cleared():
+    # Trang cũ vẫn còn captcha -> đang tải -> trang mới không còn captcha
+    driver = FakeDriver([{"navigated": False, "captcha": CAPTCHA}, RuntimeError("navigating"),
+                         {"loading": True}, {"navigated": True, "captcha": None}])
+    assert wait_captcha_cleared(driver, timeout=5, poll=0) is True
+    assert wait_captcha_cleared(FakeDriver([{"navigated": True, "captcha": CAPTCHA}]), timeout=5, poll=0) is False
+    assert wait_captcha_cleared(FakeDriver([{"navigated": False, "captcha": CAPTCHA}]), timeout=0.05, poll=0) is None
+
+
+def test_image_captcha_answer_is_submitted_and_reported():
+    driver = FakeDriver([{"navigated": True, "captcha": None}])
+    resolver = FakeResolver()
+    assert solve_detected_captcha(driver, IMAGE_INFO, resolver)
+    assert driver.submitted == [(ANSWER_SELECTOR, "x7k2")]
+    assert resolver.reports == [True]
+
+    # Trang mới vẫn là captcha: đáp án sai
+    resolver = FakeResolver()
+    assert not solve_detected_captcha(FakeDriver([{"navigated": True, "captcha": CAPTCHA}]), IMAGE_INFO, resolver)
+    assert resolver.reports == [False]
+
+
+def test_unsolvable_captcha_is_not_sent():
+    driver = FakeDriver([{"navigated": True, "captcha": None}])
+    resolver = FakeResolver(answer=None)
+    assert not solve_detected_captcha(driver, IMAGE_INFO, resolver)
+    assert driver.submitted == [] and resolver.reports == []
+    assert not solve_detected_captcha(driver, {"kind": KIND_CLOUDFLARE}, resolver)
+    assert not solve_detected_captcha(driver, IMAGE_INFO, None)
+
+
+def test_recaptcha_callback_submits_page(monkeypatch):
+    monkeypatch.setattr(captcha_probe, "CAPTCHA_CALLBACK_WAIT", 2)
+    driver = FakeDriver([WIDGET, {"loading": True}, {"navigated": True, "captcha": None}])
+    assert solve_detected_captcha(driver, RECAPTCHA_INFO, FakeResolver())
+    assert driver.submitted == []
+
+
+def test_recaptcha_form_submitted_when_widget_stays(monkeypatch):
+    monkeypatch.setattr(captcha_probe, "CAPTCHA_CALLBACK_WAIT", 0.05)
+    driver = FakeDriver([WIDGET], after_submit=[{"navigated": True, "captcha": None}])
+    assert solve_detected_captcha(driver, RECAPTCHA_INFO, FakeResolver())
+    assert driver.submitted == [(RECAPTCHA_RESPONSE_SELECTOR, None)]
+
+    # Token bị từ chối: trang mới vẫn có reCAPTCHA
+    driver = FakeDriver([WIDGET], after_submit=[{"navigated": True, "captcha": {"kind": KIND_RECAPTCHA}}])
+    assert not solve_detected_captcha(driver, RECAPTCHA_INFO, FakeResolver())
+
+    # Không có form để gửi: token đã điền coi như giải xong
+    assert solve_detected_captcha(FakeDriver([WIDGET], has_form=False), RECAPTCHA_INFO, FakeResolver())
+    assert not solve_detected_captcha(FakeDriver([WIDGET]), RECAPTCHA_INFO, FakeResolver(answer=None))
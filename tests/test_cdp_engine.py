@@ -0,0 +1,196 @@
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip("psutil")  # cdp_engine -> browser_reaper
+
+from modules.cdp_engine import CDPConnection, CDPError, WebSocket
+
+
+def frame(payload, opcode=0x1, fin=True, mask=None):
+    """Frame phía máy chủ (mặc định không mask)"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    header = bytearray([(0x80 if fin else 0) | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 65536:
+        header.append(mask_bit | 126)
+        header += length.to_bytes(2, "big")
+    else:
+        header.append(mask_bit | 127)
+        header += length.to_bytes(8, "big")
+    if mask:
+        header += mask
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bytes(header) + payload
+
+
+async def read_frame(reader):
+    """Đọc một frame từ client; trả về (opcode, độ dài khai báo dạng 7 bit, payload đã bỏ mask)"""
+    head = await reader.readexactly(2)
+    assert head[1] & 0x80, "frame từ client phải có mask"
+    length = short = head[1] & 0x7F
+    if short == 126:
+        length = int.from_bytes(await reader.readexactly(2), "big")
+    elif short == 127:
+        length = int.from_bytes(await reader.readexactly(8), "big")
+    mask = await reader.readexactly(4)
+    data = await reader.readexactly(length)
+    return head[0] & 0x0F, short, bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+class FakeWebSocketServer:
+    """Máy chủ websocket cục bộ: bắt tay 101 rồi giao kết nối cho handler(reader, writer)"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"ws://127.0.0.1:{self._server.sockets[0].getsockname()[1]}/devtools/browser/abc"
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.requests.append(await reader.readuntil(b"\r\n\r\n"))
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n\r\n")
+        try:
+            await self.handler(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def test_frames_use_mask_and_extended_lengths():
+    async def echo(reader, writer):
+        while True:
+            opcode, short, data = await read_frame(reader)
+            if opcode == 0x8:
+                return
+            received.append((short, data))
+            writer.write(frame(data))
+
+    async def main():
+        async with FakeWebSocketServer(echo) as server:
+            ws = await WebSocket.connect(server.url)
+            for text in messages:
+                await ws.send(text)
+                assert await ws.recv() == text
+            await ws.close()
+        assert server.requests[0].startswith(b"GET /devtools/browser/abc HTTP/1.1\r\n")
+        assert b"Sec-WebSocket-Version: 13" in server.requests[0]
+
+    received = []
+    messages = ["hi", "á" * 100, "x" * 70000, ""]
+    asyncio.run(main())
+    # < 126 byte: độ dài 7 bit; < 64 KB: mã 126 + 2 byte; lớn hơn: mã 127 + 8 byte
+    assert [short for short, _ in received] == [2, 126, 127, 0]
+    assert [data.decode("utf-8") for _, data in received] == messages
+
+
+def test_recv_joins_fragments_and_answers_ping():
+    async def handler(reader, writer):
+        writer.write(frame(b"are you there", opcode=0x9))
+        pongs.append(await read_frame(reader))
+        writer.write(frame("frag", fin=False))
+        writer.write(frame(b"", opcode=0xA))  # pong giữa các mảnh: bỏ qua
+        writer.write(frame("men", opcode=0x0, fin=False))
+        writer.write(frame("ted", opcode=0x0, mask=b"\x01\x02\x03\x04"))
+        writer.write(frame(b"", opcode=0x8))
+        await writer.drain()
+
+    async def main():
+        async with FakeWebSocketServer(handler) as server:
+            ws = await WebSocket.connect(server.url)
+            assert await ws.recv() == "fragmented"
+            assert await ws.recv() is None
+            ws.writer.close()
+
+    pongs = []
+    asyncio.run(main())
+    assert pongs == [(0xA, 13, b"are you there")]
+
+
+def test_handshake_rejected():
+    async def main():
+        async def handle(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 404 Not Found\r\n\r\n")
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            with pytest.raises(CDPError):
+                await WebSocket.connect(f"ws://127.0.0.1:{port}/x")
+        finally:
+            server.close()
+
+    asyncio.run(main())
+
+
+def test_connection_matches_ids_and_dispatches_events():
+    async def browser(reader, writer):
+        first = json.loads((await read_frame(reader))[2])
+        second = json.loads((await read_frame(reader))[2])
+        third = json.loads((await read_frame(reader))[2])
+        sent.extend([first, second, third])
+        # Sự kiện tới trước phản hồi; phản hồi trả về không theo thứ tự gửi
+        writer.write(frame(json.dumps({"method": "Page.loadEventFired", "sessionId": "other", "params": {"n": 0}})))
+        writer.write(frame(json.dumps({"method": "Network.loadingFinished", "sessionId": "S1", "params": {"n": 1}})))
+        writer.write(frame(json.dumps({"method": "Page.loadEventFired", "sessionId": "S1", "params": {"n": 2}})))
+        writer.write(frame(json.dumps({"id": third["id"], "error": {"message": "No target"}})))
+        writer.write(frame(json.dumps({"id": second["id"], "result": {"value": "second"}})))
+        writer.write(frame(json.dumps({"id": first["id"], "result": {"value": "first"}})))
+        await reader.read()
+
+    async def main():
+        async with FakeWebSocketServer(browser) as server:
+            conn = await CDPConnection.connect(server.url)
+            events = []
+            conn.on("Network.loadingFinished", "S1", events.append)
+            loaded = conn.wait_for_event("Page.loadEventFired", "S1")
+            first = asyncio.ensure_future(conn.send("Runtime.evaluate", {"expression": "1"}, "S1", timeout=5))
+            second = asyncio.ensure_future(conn.send("Page.navigate", {"url": "about:blank"}, "S1", timeout=5))
+            third = asyncio.ensure_future(conn.send("Target.closeTarget", {"targetId": "T"}, timeout=5))
+            assert await first == {"value": "first"}
+            assert await second == {"value": "second"}
+            with pytest.raises(CDPError, match="No target"):
+                await third
+            # Sự kiện của session khác không đánh thức waiter của S1
+            assert await asyncio.wait_for(loaded, 5) == {"n": 2}
+            assert events == [{"n": 1}]
+            await conn.close()
+
+    sent = []
+    asyncio.run(main())
+    assert [message["id"] for message in sent] == [1, 2, 3]
+    assert sent[0]["sessionId"] == "S1" and "sessionId" not in sent[2]
+
+
+def test_pending_commands_fail_when_connection_closes():
+    async def browser(reader, writer):
+        await read_frame(reader)
+        writer.write(frame(b"", opcode=0x8))
+        await writer.drain()
+
+    async def main():
+        async with FakeWebSocketServer(browser) as server:
+            conn = await CDPConnection.connect(server.url)
+            waiter = conn.wait_for_event("Page.loadEventFired", "S1")
+            with pytest.raises(CDPError):
+                await conn.send("Page.navigate", {"url": "about:blank"}, "S1", timeout=5)
+            with pytest.raises(CDPError):
+                await waiter
+            await conn.close()
+
+    asyncio.run(main())
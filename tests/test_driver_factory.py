@@ -0,0 +1,132 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from selenium.webdriver import ChromeOptions
+
+from modules import driver_factory
+from modules.driver_factory import DriverFactory, WebDriverNode
+
+
+def make_node(name, latency=0.1, max_sessions=1, **kwargs):
+    node = WebDriverNode(f"http://{name}:4444/", max_sessions=max_sessions, name=name, **kwargs)
+    node.latency = latency
+    node.checked_at = time.time()  # không probe mạng trong test
+    return node
+
+
+def make_factory(nodes, **kwargs):
+    return DriverFactory(nodes=nodes, probe_interval=3600, **kwargs)
+
+
+class FakeRemote:
+    fail = False
+
+    def __init__(self, command_executor, options):
+        if FakeRemote.fail:
+            raise ConnectionError("node down")
+        self.command_executor = command_executor
+        self.options = options
+        self.quits = 0
+
+    def quit(self):
+        self.quits += 1
+
+
+@pytest.fixture
+def fake_webdriver(monkeypatch):
+    FakeRemote.fail = False
+    monkeypatch.setattr(driver_factory, "webdriver", SimpleNamespace(Remote=FakeRemote))
+
+
+def test_score_prefers_fast_idle_healthy_nodes():
+    fast = make_node("fast", latency=0.1, max_sessions=2)
+    slow = make_node("slow", latency=0.3, max_sessions=2)
+    unknown = make_node("unknown", latency=None)
+    assert fast.score() < slow.score() < unknown.score()
+
+    # Đang chạy đủ phiên hoặc vừa lỗi thì bị đẩy xuống sau
+    fast.active = 2
+    assert fast.score() == pytest.approx(0.2)
+    fast.failures = 1
+    assert fast.score() > slow.score()
+
+
+def test_acquire_node_respects_capacity_and_timeout():
+    first, second = make_node("a", latency=0.1), make_node("b", latency=0.2)
+    factory = make_factory([first, second])
+    assert factory.acquire_node(timeout=0) is first
+    assert factory.acquire_node(timeout=0) is second
+
+    started = time.time()
+    assert factory.acquire_node(timeout=0.2) is None
+    assert time.time() - started >= 0.2
+
+    # Node không sẵn sàng không được chọn dù còn chỗ
+    factory.release_node(first)
+    first.ready = False
+    assert factory.acquire_node(timeout=0) is None
+    first.ready = True
+
+    # Phiên được trả từ thread khác đánh thức người đang chờ
+    threading.Timer(0.1, factory.release_node, (second,)).start()
+    assert factory.acquire_node(timeout=5) is first
+    assert factory.acquire_node(timeout=5) is second
+    assert (first.active, second.active) == (1, 1)
+
+    factory.release_node(first)
+    factory.release_node(first)
+    assert first.active == 0
+
+
+def test_to_options_strips_local_paths():
+    options = ChromeOptions()
+    options.binary_location = r"C:\Program Files\BraveSoftware\brave.exe"
+    for arg in ("--user-data-dir=C:\\Users\\admin\\User Data", "--profile-directory=Profile 1", "--headless=new"):
+        options.add_argument(arg)
+
+    node = make_node("n", binary="/usr/bin/brave-browser", user_data_dir="/srv/brave")
+    mapped = node.to_options(options)
+    assert mapped.binary_location == "/usr/bin/brave-browser"
+    assert mapped.arguments == ["--headless=new", "--user-data-dir=/srv/brave", "--profile-directory=Profile 1"]
+    # Options gốc của máy GUI không bị sửa
+    assert options.arguments[0].startswith("--user-data-dir=C:")
+
+    bare = make_node("bare").to_options(options)
+    assert bare.arguments == ["--headless=new"]
+    assert bare.binary_location == ""
+
+
+def test_remote_quit_releases_node_once(fake_webdriver):
+    node = make_node("n", max_sessions=2)
+    factory = make_factory([node], local_fallback=False)
+    first = factory.create(ChromeOptions(), stealth=False)
+    second = factory.create(ChromeOptions(), stealth=False)
+    assert first.webdriver_node is node and node.active == 2
+    assert first.command_executor == "http://n:4444"
+
+    # Reaper và worker đều có thể gọi quit(): chỉ trả chỗ một lần
+    first.quit()
+    first.quit()
+    assert node.active == 1
+    assert first.webdriver_node is None
+    second.quit()
+    assert node.active == 0
+
+
+def test_remote_failure_falls_back_to_local(fake_webdriver):
+    FakeRemote.fail = True
+    node = make_node("n")
+    local = SimpleNamespace(quit=lambda: None)
+    factory = make_factory([node], node_wait=0)
+    driver = factory.create(ChromeOptions(), local_factory=lambda options: local, stealth=False)
+    assert driver is local and driver.webdriver_node is None
+    assert node.active == 0 and node.failures == 1 and node.checked_at == 0.0
+
+    strict = make_factory([make_node("m")], local_fallback=False, node_wait=0)
+    with pytest.raises(RuntimeError):
+        strict.create(ChromeOptions(), stealth=False)
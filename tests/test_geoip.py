@@ -0,0 +1,86 @@
+import ipaddress
+
+import pytest
+
+from modules.geoip import GeoIP, GeoIPError, RangeDatabase, build_database, enrich_store
+from modules.proxy_store import ProxyStore
+
+CSV_ROWS = """start,end,country,asn,as_name
+1.0.0.0,1.0.0.255,VN,AS7552,Viettel
+2.0.0.0,2.0.0.255,ZZ,0,-
+16843008,16843263,US,15169,Google
+3.0.0.0/24,JP,2516,KDDI
+"""
+
+ASN_TSV = "1.0.0.0\t1.0.0.255\t7552\tVN\tViettel Group\n5.0.0.0\t5.0.0.255\t1234\tDE\tExample\n"
+
+
+@pytest.fixture
+def ranges_csv(tmp_path):
+    path = tmp_path / "ranges.csv"
+    path.write_text(CSV_ROWS, encoding="utf-8")
+    return str(path)
+
+
+def test_build_and_lookup(ranges_csv):
+    path, count = build_database(ranges_csv)
+    # Dòng tiêu đề và dải không có quốc gia / ASN bị bỏ
+    assert count == 3
+    assert path.endswith(".bin")
+
+    database = RangeDatabase(path)
+
+    def lookup(ip):
+        return database.lookup(int(ipaddress.IPv4Address(ip)))
+
+    assert lookup("1.0.0.7") == {"country": "VN", "asn": 7552, "as_name": "Viettel"}
+    assert lookup("1.1.1.1") == {"country": "US", "asn": 15169, "as_name": "Google"}
+    assert lookup("3.0.0.255")["country"] == "JP"
+    assert lookup("0.0.0.1") is None
+    assert lookup("2.0.0.1") is None
+    database.close()
+
+
+def test_invalid_bin(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(b"not a geoip database at all")
+    with pytest.raises(GeoIPError):
+        RangeDatabase(str(path))
+
+
+def test_geoip_merges_sources_and_caches(tmp_path, ranges_csv):
+    asn_path = tmp_path / "asn.tsv"
+    asn_path.write_text(ASN_TSV, encoding="utf-8")
+    geo = GeoIP([ranges_csv, str(asn_path), str(tmp_path / "missing.csv")])
+    # CSV được biên dịch tự động; file không tồn tại bị bỏ qua
+    assert len(geo.databases) == 2
+    assert (tmp_path / "ranges.bin").exists()
+
+    assert geo.lookup("1.0.0.1") == {"country": "VN", "asn": 7552, "as_name": "Viettel"}
+    # Nguồn đầu không có dải này -> lấy từ nguồn sau
+    assert geo.lookup("5.0.0.1") == {"country": "DE", "asn": 1234, "as_name": "Example"}
+    assert geo.lookup("9.9.9.9") is None
+    assert geo.lookup("not-an-ip") is None
+    assert "1.0.0.1" in geo._cache
+
+    assert geo.lookup_proxy("http://u:p@1.0.0.1:8080")["country"] == "VN"
+    assert geo.lookup_proxy("garbage") is None
+    geo.close()
+    assert not geo.available
+
+
+def test_enrich_store(tmp_path, ranges_csv):
+    geo = GeoIP([ranges_csv])
+    store = ProxyStore(str(tmp_path / "proxies.db"))
+    store.add_many(["1.0.0.1:8080", "9.9.9.9:3128"])
+
+    assert enrich_store(store, geo) == 2
+    assert store.get("1.0.0.1:8080")["country"] == "VN"
+    assert store.get("1.0.0.1:8080")["asn"] == 7552
+    # Không tìm thấy -> country rỗng để lần sau không tra lại
+    assert store.get("9.9.9.9:3128")["country"] == ""
+    assert enrich_store(store, geo) == 0
+    assert enrich_store(store, geo, force=True) == 2
+
+    assert enrich_store(store, GeoIP([])) == 0
+    geo.close()
@@ -0,0 +1,168 @@
+import time
+
+import pytest
+
+from modules import job_queue
+from modules.job_queue import (
+    JobQueue, LeaseKeeper, STATUS_DEAD, STATUS_DONE, STATUS_LEASED, STATUS_QUEUED
+)
+
+
+def make_queue(tmp_path, **kwargs):
+    kwargs.setdefault("retry_delay", 0)
+    return JobQueue(str(tmp_path / "jobs.db"), **kwargs)
+
+
+def test_lease_ack(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("google", {"keyword": "brave"})
+
+    job = queue.lease("worker-1")
+    assert job.id == job_id
+    assert job.payload == {"keyword": "brave"}
+    assert job.attempts == 1
+    assert queue.lease("worker-2") is None
+    assert queue.stats()[STATUS_LEASED] == 1
+
+    assert queue.ack(job, [["title", "url"]])
+    assert queue.result(job_id) == {
+        "status": STATUS_DONE, "result": [["title", "url"]], "last_error": None, "attempts": 1
+    }
+
+
+def test_priority_and_task_filter(tmp_path):
+    queue = make_queue(tmp_path)
+    low = queue.enqueue("google", priority=0)
+    high = queue.enqueue("google", priority=5)
+    shopee = queue.enqueue("shopee")
+
+    assert queue.lease("w", tasks=["shopee"]).id == shopee
+    assert queue.lease("w").id == high
+    assert queue.lease("w").id == low
+
+
+def test_fail_retries_then_dead_letter(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2)
+    job_id = queue.enqueue("google")
+
+    assert queue.fail(queue.lease("w"), "Driver setup error") == STATUS_QUEUED
+    assert queue.fail(queue.lease("w"), "Driver setup error") == STATUS_DEAD
+    assert queue.lease("w") is None
+    assert [job["id"] for job in queue.dead_letters()] == [job_id]
+
+    assert queue.requeue_dead() == 1
+    assert queue.lease("w").attempts == 1
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("google")
+    first = queue.lease("worker-1", lease_seconds=0.05)
+    time.sleep(0.1)
+
+    second = queue.lease("worker-2")
+    assert second.id == first.id
+    assert second.attempts == 2
+    # Worker cũ đã mất lease: không ack / heartbeat được nữa
+    assert not queue.heartbeat(first)
+    assert not queue.ack(first)
+    assert queue.ack(second)
+
+
+def test_lease_keeper_reports_lost_lease(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue("google")
+    job = queue.lease("worker-1", lease_seconds=0.05)
+    time.sleep(0.1)
+    queue.lease("worker-2")
+
+    lost = []
+    with LeaseKeeper(queue, job, on_lost=lambda: lost.append(True), interval=0.01) as keeper:
+        deadline = time.time() + 2
+        while not lost and time.time() < deadline:
+            time.sleep(0.01)
+    assert keeper.lost and lost
+
+
+def test_journal_mode_by_path(tmp_path, monkeypatch):
+    assert job_queue.journal_mode(str(tmp_path / "jobs.db")) == "WAL"
+    # Thư mục mạng: WAL không dùng được (cần bộ nhớ chia sẻ) -> rollback journal
+    assert job_queue.is_network_path("//server/share/jobs.db")
+    assert job_queue.journal_mode("//server/share/jobs.db") == "DELETE"
+    monkeypatch.setattr(job_queue, "JOB_QUEUE_JOURNAL_MODE", "delete")
+    assert job_queue.journal_mode(str(tmp_path / "jobs.db")) == "DELETE"
+
+    queue = make_queue(tmp_path)
+    queue.enqueue("google")
+    assert queue._connection().execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+
+class FakeSignal:
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, value):
+        for slot in self.slots:
+            slot(value)
+
+
+class FakeWorker:
+    """Thay EnhancedAutomationWorker: run() gọi hành vi do test đặt"""
+    behaviour = None
+
+    def __init__(self, task, **kwargs):
+        self.task = task
+        self.failed = False
+        self.log_signal, self.result_signal, self.error_signal = FakeSignal(), FakeSignal(), FakeSignal()
+
+    def run(self):
+        FakeWorker.behaviour(self)
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def job_worker(monkeypatch):
+    pytest.importorskip("PyQt5")
+    pytest.importorskip("webdriver_manager")
+    import job_worker
+    monkeypatch.setattr(job_worker, "EnhancedAutomationWorker", FakeWorker)
+    return job_worker
+
+
+def test_run_job_ack_after_lost_lease_is_not_success(tmp_path, job_worker):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue("google")
+
+    FakeWorker.behaviour = lambda worker: worker.result_signal.emit(["https://a"])
+    assert job_worker.run_job(queue, queue.lease("worker-1")) == STATUS_DONE
+    assert queue.result(first)["status"] == STATUS_DONE
+
+    # Lease hết hạn ngay trước khi báo kết quả (heartbeat chưa kịp phát hiện): worker khác đã lấy job
+    def finish_late(worker):
+        time.sleep(0.1)
+        taken.append(queue.lease("worker-2"))
+        worker.result_signal.emit(["https://b"])
+
+    taken = []
+    second = queue.enqueue("google")
+    FakeWorker.behaviour = finish_late
+    assert job_worker.run_job(queue, queue.lease("worker-1", lease_seconds=0.05)) is None
+    assert taken[0].id == second
+    assert queue.result(second)["status"] == STATUS_LEASED
+
+    # Lỗi sau khi mất lease cũng không ghi đè job của worker kia
+    def fail_late(worker):
+        time.sleep(0.1)
+        taken.append(queue.lease("worker-3"))
+        worker.error_signal.emit("boom")
+
+    third = queue.enqueue("google")
+    FakeWorker.behaviour = fail_late
+    assert job_worker.run_job(queue, queue.lease("worker-1", lease_seconds=0.05)) is None
+    assert taken[1].id == third
+    assert queue.result(third) == {"status": STATUS_LEASED, "result": None, "last_error": None, "attempts": 2}
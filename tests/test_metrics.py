@@ -0,0 +1,121 @@
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from modules import browser_reaper, proxy_health
+from modules.metrics import (
+    MetricsRegistry, MetricsServer, _active_browsers, _proxy_checks, _proxy_health, _queue_jobs
+)
+
+
+def test_counter_sums_thread_cells():
+    registry = MetricsRegistry(prefix="t_")
+    counter = registry.counter("jobs", "Jobs", ("task",))
+    assert registry.counter("jobs", "Jobs", ("task",)) is counter
+
+    def work():
+        for _ in range(1000):
+            counter.labels("google").inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.labels("shopee").inc(2.5)
+
+    assert counter.labels("google").value == 4000
+    text = registry.render()
+    assert "# HELP t_jobs_total Jobs" in text
+    assert "# TYPE t_jobs_total counter" in text
+    assert "# TYPE t_jobs counter" not in text
+    assert 't_jobs_total{task="google"} 4000' in text
+    assert 't_jobs_total{task="shopee"} 2.5' in text
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+def test_gauge_and_label_escaping():
+    registry = MetricsRegistry(prefix="t_")
+    gauge = registry.gauge("workers", "Workers")
+    gauge.set(3)
+    gauge.inc()
+    gauge.dec(2)
+    registry.gauge("state", "State", ("name",)).labels('say "hi"\n').set(1)
+    text = registry.render()
+    assert "t_workers 2\n" in text
+    assert 't_state{name="say \\"hi\\"\\n"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry(prefix="t_")
+    histogram = registry.histogram("seconds", "Seconds", ("phase",), buckets=(1, 0.5, 5))
+    for value in (0.2, 0.5, 3, 10):
+        histogram.labels("load").observe(value)
+    with histogram.labels("load").time():
+        pass
+
+    text = registry.render()
+    assert 't_seconds_bucket{phase="load",le="0.5"} 3' in text
+    assert 't_seconds_bucket{phase="load",le="1"} 3' in text
+    assert 't_seconds_bucket{phase="load",le="5"} 4' in text
+    assert 't_seconds_bucket{phase="load",le="+Inf"} 5' in text
+    assert 't_seconds_count{phase="load"} 5' in text
+
+
+def test_callback_metrics_and_failures():
+    registry = MetricsRegistry(prefix="t_")
+    registry.callback("rate", "Rate", "gauge", lambda: 0.25)
+    registry.callback("by_kind", "By kind", "counter", lambda: {("recaptcha",): 3}, ("kind",))
+    registry.callback("missing", "Missing", "gauge", lambda: None)
+    registry.callback("broken", "Broken", "gauge", lambda: 1 / 0)
+
+    text = registry.render()
+    assert "t_rate 0.25" in text
+    assert 't_by_kind_total{kind="recaptcha"} 3' in text
+    # Không có số liệu: chỉ có HELP / TYPE; callback lỗi bị bỏ qua
+    assert "# TYPE t_missing gauge" in text
+    assert "t_broken" not in text
+
+
+def test_queue_jobs_does_not_create_db(tmp_path):
+    db = tmp_path / "queue.db"
+    assert _queue_jobs(str(db)) is None
+    assert not db.exists()
+
+
+def test_callbacks_do_not_create_singletons(monkeypatch):
+    monkeypatch.setattr(browser_reaper, "_reaper", None)
+    monkeypatch.setattr(proxy_health, "_monitor", None)
+    assert _active_browsers() is None
+    assert _proxy_health() is None
+    assert _proxy_checks() is None
+    assert browser_reaper._reaper is None and proxy_health._monitor is None
+
+    class Reaper:
+        def tracked(self):
+            return {101: {}, 202: {}}
+
+        def remote_count(self):
+            return 1
+
+    monkeypatch.setattr(browser_reaper, "_reaper", Reaper())
+    assert _active_browsers() == 3
+
+
+def test_http_endpoint():
+    registry = MetricsRegistry(prefix="t_")
+    registry.counter("hits", "Hits").inc()
+    server = MetricsServer(registry, host="127.0.0.1", port=0)
+    try:
+        base = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(base + "/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            assert "t_hits_total 1" in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(base + "/other", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
@@ -0,0 +1,137 @@
+import time
+import threading
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from modules.pipeline import (
+    STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED, NodeResult, Pipeline, PipelineError, PipelineNode,
+    PipelineResult, PipelineRunner
+)
+from modules.result_cache import ResultCache
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return PipelineRunner(max_workers=4, cache=ResultCache(str(tmp_path / "cache.db")))
+
+
+def test_pipeline_validation():
+    node = PipelineNode("a", func=list)
+    with pytest.raises(PipelineError, match="trùng"):
+        Pipeline("p", [node, PipelineNode("a", func=list)])
+    with pytest.raises(PipelineError, match="không tồn tại"):
+        Pipeline("p", [PipelineNode("b", func=list, inputs={"x": "missing"})])
+    with pytest.raises(PipelineError, match="chu trình"):
+        Pipeline("p", [
+            PipelineNode("a", func=list, inputs={"x": "b"}),
+            PipelineNode("b", func=list, inputs={"x": "a"}),
+        ])
+    with pytest.raises(PipelineError):
+        PipelineNode("c", func=None)
+
+    pipeline = Pipeline("p", [
+        PipelineNode("join", func=list, inputs={"x": "left", "y": "right"}),
+        PipelineNode("right", func=list),
+        PipelineNode("left", func=list),
+    ])
+    assert pipeline.order == ["left", "right", "join"]
+
+
+def test_independent_branches_run_in_parallel(runner):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def branch(value):
+        def run():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.3)
+            with lock:
+                running[0] -= 1
+            return [value]
+        return run
+
+    pipeline = Pipeline("p", [
+        PipelineNode("left", func=branch("l")),
+        PipelineNode("right", func=branch("r")),
+        PipelineNode("join", func=lambda a, b, sep: sep.join(a + b), inputs={"a": "left", "b": "right"},
+                     params={"sep": "+"}),
+    ])
+    seen = []
+    result = runner.run(pipeline, on_node=lambda node_result: seen.append(node_result.name))
+    assert result.ok
+    assert result.outputs["join"] == "l+r"
+    assert peak[0] == 2
+    assert result.wall_time < 0.55
+    assert seen[-1] == "join"
+
+
+def test_intermediate_results_are_cached(runner):
+    calls = []
+
+    def fetch(country):
+        calls.append(country)
+        return [{"keyword": country}]
+
+    def build():
+        return Pipeline("p", [
+            PipelineNode("trends", func=fetch, params={"country": "vietnam"}, output_type=list, cache_ttl=60),
+            PipelineNode("pick", func=lambda topics: topics[0], inputs={"topics": "trends"}),
+        ])
+
+    first = runner.run(build())
+    second = runner.run(build())
+    assert calls == ["vietnam"]
+    assert not first.results["trends"].cached and second.results["trends"].cached
+    assert second.outputs["pick"] == {"keyword": "vietnam"}
+
+    # Tham số khác => khoá cache khác
+    node = PipelineNode("trends", func=fetch, params={"country": "us"}, cache_ttl=60)
+    assert node.cache_key({}) != build().nodes["trends"].cache_key({})
+
+
+def test_failures_skip_dependents_unless_optional(runner):
+    def broken():
+        raise RuntimeError("down")
+
+    pipeline = Pipeline("p", [
+        PipelineNode("required", func=broken),
+        PipelineNode("extra", func=broken, optional=True),
+        PipelineNode("typed", func=lambda: "text", output_type=list, optional=True),
+        PipelineNode("after_required", func=lambda x: x, inputs={"x": "required"}),
+        PipelineNode("after_extra", func=lambda x: "ok" if x is None else x, inputs={"x": "extra"}),
+    ])
+    result = runner.run(pipeline)
+    statuses = {name: node_result.status for name, node_result in result.results.items()}
+    assert statuses == {
+        "required": STATUS_FAILED, "extra": STATUS_FAILED, "typed": STATUS_FAILED,
+        "after_required": STATUS_SKIPPED, "after_extra": STATUS_DONE,
+    }
+    assert "list" in result.results["typed"].error
+    assert result.outputs["after_extra"] == "ok"
+    assert not result.ok
+
+
+def test_critical_path_report():
+    pipeline = Pipeline("p", [
+        PipelineNode("fast", func=list),
+        PipelineNode("slow", func=list),
+        PipelineNode("middle", func=list, inputs={"x": "fast"}),
+        PipelineNode("end", func=list, inputs={"a": "middle", "b": "slow"}),
+    ])
+    durations = {"fast": 1.0, "slow": 2.5, "middle": 2.0, "end": 0.5}
+    results = {
+        name: NodeResult(name, STATUS_DONE, [], started=100.0, finished=100.0 + seconds)
+        for name, seconds in durations.items()
+    }
+    result = PipelineResult(pipeline, results, wall_time=4.0)
+    # fast + middle (3.0s) dài hơn slow (2.5s)
+    assert result.critical_path == ["fast", "middle", "end"]
+    assert result.critical_time == pytest.approx(3.5)
+
+    lines = result.summary()
+    assert "Critical path: fast -> middle -> end (3.5s)" in lines[-1]
+    assert "tổng thời gian các bước 6.0s" in lines[-1]
@@ -0,0 +1,79 @@
+import os
+import threading
+
+from modules.profile_manager import ProfileTemplateManager, bind_profile_to_driver
+
+
+def make_profile(tmp_path):
+    user_data = tmp_path / "User Data"
+    (user_data / "Default" / "Cache").mkdir(parents=True)
+    (user_data / "Default" / "Cookies").write_bytes(b"cookies")
+    (user_data / "Default" / "Cache" / "data_0").write_bytes(b"cache")
+    (user_data / "Local State").write_text("{}")
+    return str(user_data)
+
+
+def test_clone_skips_cache(tmp_path):
+    manager = ProfileTemplateManager(make_profile(tmp_path), root=str(tmp_path / "profiles"))
+    slot, path = manager.acquire_slot()
+    assert slot == 0
+    assert os.path.exists(os.path.join(path, "Default", "Cookies"))
+    assert not os.path.exists(os.path.join(path, "Default", "Cache"))
+    manager.release_slot(slot)
+    assert not os.path.exists(path)
+
+
+def test_slots_are_exclusive_across_managers(tmp_path):
+    # Hai manager cùng thư mục mô phỏng hai tiến trình (GUI + job_worker)
+    user_data, root = make_profile(tmp_path), str(tmp_path / "profiles")
+    first = ProfileTemplateManager(user_data, root=root)
+    second = ProfileTemplateManager(user_data, root=root)
+
+    slot_a, path_a = first.acquire_slot()
+    slot_b, _ = second.acquire_slot()
+    assert slot_a != slot_b
+
+    # Slot đang bị khoá ở "tiến trình" khác không bị dọn
+    assert second.garbage_collect() == 0
+    assert os.path.exists(path_a)
+
+    first.release_slot(slot_a, remove=False)
+    assert second.garbage_collect() == 1
+    assert not os.path.exists(path_a)
+
+
+def test_driver_quit_releases_slot_once(tmp_path):
+    manager = ProfileTemplateManager(make_profile(tmp_path), root=str(tmp_path / "profiles"))
+    slot, path = manager.acquire_slot()
+
+    class Driver:
+        quits = 0
+
+        def quit(self):
+            Driver.quits += 1
+
+    driver = bind_profile_to_driver(Driver(), manager, slot)
+    driver.quit()
+    driver.quit()
+    assert Driver.quits == 2
+    assert not os.path.exists(path)
+    assert manager.acquire_slot()[0] == slot
+
+
+def test_snapshot_waits_for_clone_in_other_process(tmp_path):
+    user_data, root = make_profile(tmp_path), str(tmp_path / "profiles")
+    reader = ProfileTemplateManager(user_data, root=root)
+    writer = ProfileTemplateManager(user_data, root=root)
+    reader.snapshot()
+
+    done = threading.Event()
+    worker = threading.Thread(target=lambda: (writer.snapshot(force=True), done.set()))
+    # "Tiến trình" kia đang đọc template để nhân bản -> chụp lại phải chờ
+    with reader.template_lock(shared=True):
+        worker.start()
+        assert not done.wait(0.3)
+        assert os.path.exists(os.path.join(reader.template_dir, "Default", "Cookies"))
+    worker.join(5)
+    assert done.is_set()
+    assert writer.last_stats["action"] == "snapshot"
+    assert not [name for name in os.listdir(root) if ".tmp" in name]
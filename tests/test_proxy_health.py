@@ -0,0 +1,119 @@
+import time
+import threading
+
+import pytest
+
+from modules import proxy_health
+from modules.config import (
+    PROXY_HEALTH_DEAD_BASE, PROXY_HEALTH_DEAD_MAX, PROXY_HEALTH_FLAPPING_INTERVAL, PROXY_HEALTH_HEALTHY_INTERVAL
+)
+from modules.proxy_health import STATUS_DEAD, ProxyHealth, ProxyHealthMonitor
+from modules.proxy_store import STATUS_WORKING, ProxyStore
+
+
+def test_interval_by_state():
+    now = time.time()
+    record = ProxyHealth("1.2.3.4:80", working=True)
+    assert record.interval(now) == PROXY_HEALTH_HEALTHY_INTERVAL
+
+    # Chưa kiểm tra hoặc chết: backoff luỹ thừa theo số lần lỗi liên tiếp, có trần
+    assert ProxyHealth("x").interval(now) == PROXY_HEALTH_DEAD_BASE
+    dead = ProxyHealth("x", working=False)
+    intervals = []
+    for failures in (1, 2, 3, 30):
+        dead.failures = failures
+        intervals.append(dead.interval(now))
+    assert intervals == [PROXY_HEALTH_DEAD_BASE, PROXY_HEALTH_DEAD_BASE * 2, PROXY_HEALTH_DEAD_BASE * 4,
+                         PROXY_HEALTH_DEAD_MAX]
+
+
+def test_flapping_window():
+    now = time.time()
+    record = ProxyHealth("x", working=True)
+    record.changes.append(now - 10)
+    assert not record.flapping(now)
+    record.changes.append(now - 5)
+    assert record.flapping(now)
+    assert record.interval(now) == PROXY_HEALTH_FLAPPING_INTERVAL
+    # Đổi trạng thái đã lâu (ngoài cửa sổ) không tính
+    assert not record.flapping(now + proxy_health.FLAP_WINDOW)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProxyStore(str(tmp_path / "proxies.db"))
+    store.add_many(["1.2.3.4:80", "5.6.7.8:80"])
+    yield store
+    store.close()
+
+
+def test_check_results_update_records_and_store(store):
+    results = {"1.2.3.4:80": [0.2, None, 0.1], "5.6.7.8:80": [None, None]}
+
+    def check(proxy):
+        seconds = results[proxy].pop(0)
+        if seconds is None:
+            raise ConnectionError("down")
+        return seconds
+
+    changes = []
+    monitor = ProxyHealthMonitor(store=store, check=check, max_concurrent=2, on_change=changes.append)
+    monitor._sync()
+    good, bad = monitor._records["1.2.3.4:80"], monitor._records["5.6.7.8:80"]
+
+    for _ in range(3):
+        monitor._check(good)
+    # Sống -> chết -> sống: 2 lần đổi trạng thái => chập chờn, kiểm tra dày hơn
+    assert good.working and good.flapping(time.time())
+    assert good.next_check - time.time() == pytest.approx(PROXY_HEALTH_FLAPPING_INTERVAL, abs=1)
+    assert list(good.latencies) == [200, 100]
+
+    monitor._check(bad)
+    monitor._check(bad)
+    assert bad.failures == 2
+    assert bad.next_check - time.time() == pytest.approx(PROXY_HEALTH_DEAD_BASE * 2, abs=1)
+
+    assert monitor.summary() == {"working": 0, "flapping": 1, "dead": 1, "unknown": 0}
+    assert monitor.stats == {"checks": 5, "failures": 3}
+    assert store.get("1.2.3.4:80")["status"] == STATUS_WORKING
+    assert store.get("5.6.7.8:80")["status"] == STATUS_DEAD
+
+    monitor._flush()
+    assert changes == [["1.2.3.4:80"]]
+    monitor._flush()
+    assert len(changes) == 1
+    monitor.stop()
+
+
+def test_recheck_all_skips_in_flight(store, monkeypatch):
+    monkeypatch.setattr(proxy_health, "PROXY_HEALTH_STARTUP_SPREAD", 0)
+    release = threading.Event()
+    calls = []
+
+    def check(proxy):
+        calls.append(proxy)
+        if proxy == "1.2.3.4:80":
+            release.wait(5)
+        return 0.05
+
+    monitor = ProxyHealthMonitor(store=store, check=check, max_concurrent=4).start()
+    try:
+        deadline = time.time() + 5
+        while len(calls) < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        slow = monitor._records["1.2.3.4:80"]
+        assert slow.in_flight
+
+        # Proxy đang kiểm tra không bị đưa lên lịch lần nữa (không chạy 2 lần song song)
+        monitor.recheck_all()
+        time.sleep(0.3)
+        assert calls.count("1.2.3.4:80") == 1
+        assert calls.count("5.6.7.8:80") == 2
+
+        release.set()
+        while slow.in_flight and time.time() < deadline:
+            time.sleep(0.02)
+        assert slow.working and calls.count("1.2.3.4:80") == 1
+    finally:
+        release.set()
+        monitor.stop()
@@ -0,0 +1,69 @@
+import pytest
+
+from modules.rate_limiter import RateLimiter, domain_of
+
+
+LIMITS = {"google.com": (1.0, 2)}
+
+
+@pytest.mark.parametrize("url, domain", [
+    ("https://www.google.com/search?q=a", "google.com"),
+    ("https://shopee.vn/search", "shopee.vn"),
+    ("https://www.shop.com.vn/x", "shop.com.vn"),
+    ("news.example.co.uk", "example.co.uk"),
+])
+def test_domain_of(url, domain):
+    assert domain_of(url) == domain
+
+
+def test_burst_then_wait():
+    limiter = RateLimiter(limits=LIMITS, default=(10.0, 10), per_proxy=None, shared_db=None)
+    url = "https://www.google.com/search"
+    assert limiter.reserve(url) == 0
+    assert limiter.reserve(url) == 0
+    # Hết burst: yêu cầu thứ 3 phải chờ ~1s (1 yêu cầu/giây)
+    assert limiter.reserve(url) == pytest.approx(1.0, abs=0.05)
+    # Domain khác có bucket riêng
+    assert limiter.reserve("https://shopee.vn") == 0
+
+
+def test_per_proxy_bucket():
+    limiter = RateLimiter(limits={}, default=(100.0, 100), per_proxy=(1.0, 1), shared_db=None)
+    assert limiter.reserve("https://a.com", proxy="p1") == 0
+    assert limiter.reserve("https://b.com", proxy="p1") == pytest.approx(1.0, abs=0.05)
+    assert limiter.reserve("https://b.com", proxy="p2") == 0
+
+
+def test_penalty_slows_down_and_recovers():
+    limiter = RateLimiter(limits=LIMITS, per_proxy=None, max_penalty=4, shared_db=None)
+    url = "https://www.google.com"
+    limiter.report(url, failure="captcha")
+    limiter.report(url, failure=429)
+    limiter.report(url, failure=403)
+    assert limiter.penalty(url) == 4
+    assert limiter.stats["penalties"] == 3
+
+    # Lỗi khác (timeout...) không phạt
+    limiter.report(url, failure="timeout")
+    assert limiter.penalty(url) == 4
+
+    limiter.report(url)
+    assert limiter.penalty(url) == pytest.approx(3.6)
+
+
+def test_acquire_stops_when_cancelled():
+    limiter = RateLimiter(limits={"google.com": (0.1, 1)}, per_proxy=None, shared_db=None)
+    url = "https://www.google.com"
+    assert limiter.acquire(url)
+    assert limiter.acquire(url, should_continue=lambda: False) is False
+
+
+def test_shared_db_backend(tmp_path):
+    db = str(tmp_path / "buckets.db")
+    first = RateLimiter(limits=LIMITS, per_proxy=None, shared_db=db)
+    second = RateLimiter(limits=LIMITS, per_proxy=None, shared_db=db)
+    url = "https://www.google.com"
+    assert first.reserve(url) == 0
+    assert second.reserve(url) == 0
+    # Hai tiến trình (mô phỏng) dùng chung bucket trong SQLite
+    assert first.reserve(url) > 0.9
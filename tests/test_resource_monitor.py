@@ -0,0 +1,75 @@
+import sys
+import subprocess
+
+import pytest
+
+np = pytest.importorskip("numpy")
+psutil = pytest.importorskip("psutil")
+
+from modules.resource_monitor import GROUP_APP, GROUP_BROWSERS, GROUP_OTHER, ResourceMonitor, RingBuffer
+
+
+def test_ring_buffer_wraps_in_time_order():
+    buffer = RingBuffer(3, ("time", "value"))
+    assert buffer.latest() is None
+    assert buffer.column("value").tolist() == []
+
+    buffer.append([1, 10])
+    buffer.append([2, 20])
+    assert buffer.column("time").tolist() == [1, 2]
+    assert buffer.latest() == {"time": 2.0, "value": 20.0}
+
+    for t in (3, 4, 5):
+        buffer.append([t, t * 10])
+    # Chỉ giữ capacity mẫu mới nhất, đọc theo thứ tự cũ -> mới
+    assert buffer.count == 3
+    assert buffer.column("time").tolist() == [3, 4, 5]
+    assert buffer.column("value").tolist() == [30, 40, 50]
+    assert buffer.latest() == {"time": 5.0, "value": 50.0}
+
+    # column() là bản sao: sửa không ảnh hưởng buffer
+    column = buffer.column("value")
+    column[:] = 0
+    assert buffer.column("value").tolist() == [30, 40, 50]
+
+
+class FakeReaper:
+    def __init__(self, browsers):
+        self.browsers = browsers
+
+    def tracked(self):
+        return dict(self.browsers)
+
+
+def test_sample_groups_browsers_and_other_children():
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        missing = 2 ** 22 + 12345  # PID không tồn tại: bỏ qua
+        reaper = FakeReaper({child.pid: "google", missing: "dead"})
+        monitor = ResourceMonitor(interval=60, history=4, reaper=reaper)
+        others = len(psutil.Process().children(recursive=True)) - 1
+
+        monitor.sample()
+        snapshot = monitor.snapshot()
+        assert snapshot["host"]["memory"] > 0
+        assert snapshot["groups"][GROUP_APP]["procs"] == 1
+        assert snapshot["groups"][GROUP_APP]["rss_mb"] > 0
+        assert snapshot["groups"][GROUP_BROWSERS]["procs"] == 1
+        # Tiến trình trình duyệt không bị đếm lại trong nhóm "other"
+        assert snapshot["groups"][GROUP_OTHER]["procs"] == others
+        assert [(b["pid"], b["owner"], b["procs"]) for b in snapshot["browsers"]] == [(child.pid, "google", 1)]
+
+        monitor.sample()
+        assert len(monitor.history(GROUP_APP, "rss_mb")) == 2
+        assert len(monitor.history(child.pid, "cpu")) == 2
+        assert len(monitor.history("host", "cpu")) == 2
+        assert monitor.history(missing, "cpu").size == 0
+    finally:
+        child.kill()
+        child.wait()
+
+    # Trình duyệt đã thoát: bỏ buffer riêng của nó
+    monitor.sample()
+    assert monitor.snapshot()["browsers"] == []
+    assert monitor.snapshot()["groups"][GROUP_BROWSERS]["procs"] == 0
+    assert monitor.history(child.pid, "cpu").size == 0
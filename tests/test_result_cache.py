@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from modules.result_cache import ResultCache, make_cache_key, normalize_keyword
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache.db"), ttl=60, memory_size=2)
+
+
+def test_make_cache_key_normalizes():
+    assert normalize_keyword("  Giá  VÀNG ") == "giá vàng"
+    assert make_cache_key("google", " Giá VÀNG", "vi-VN", 10, "VN") == "google|giá vàng|vi-vn|10|vn"
+    # Cùng từ khoá nhưng khác vùng proxy là khoá khác
+    assert make_cache_key("google", "x", "vi-VN", 10, "VN") != make_cache_key("google", "x", "vi-VN", 10, "US")
+
+
+def test_lru_eviction_falls_back_to_disk(cache):
+    cache.put("a", [1])
+    cache.put("b", [2])
+    assert cache.get("a") == [1]  # "a" mới dùng -> "b" là cũ nhất
+    cache.put("c", [3])
+    assert list(cache._memory) == ["a", "c"]
+
+    # "b" bị đẩy khỏi bộ nhớ nhưng vẫn đọc được từ SQLite
+    assert cache.get("b") == [2]
+    assert cache.stats["disk_hits"] == 1
+    assert list(cache._memory) == ["c", "b"]
+
+
+def test_ttl_expiry(cache):
+    cache.put("old", {"rows": 1}, ttl=-1)
+    cache.put("new", {"rows": 2})
+    assert cache.get("old") is None
+    assert cache.get("new") == {"rows": 2}
+    assert cache.get_stats()["misses"] == 1
+
+    assert cache.purge_expired() == 1
+    assert cache.get("new") == {"rows": 2}
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db = str(tmp_path / "cache.db")
+    ResultCache(db, ttl=60).put("google|x|vi-vn|10|vn", ["https://a", "https://ạ"])
+
+    reloaded = ResultCache(db, ttl=60)
+    assert reloaded.get("google|x|vi-vn|10|vn") == ["https://a", "https://ạ"]
+    stats = reloaded.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["hit_rate"]) == (1, 0, 100.0)
+
+    reloaded.invalidate("google|x|vi-vn|10|vn")
+    assert ResultCache(db).get("google|x|vi-vn|10|vn") is None
+
+
+def test_clear(cache):
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache._memory == {}
+
+
+def test_worker_cache_key_bypass_and_region(monkeypatch):
+    pytest.importorskip("PyQt5")
+    pytest.importorskip("webdriver_manager")
+    from modules import automation_worker_fixed
+
+    worker = automation_worker_fixed.EnhancedAutomationWorker(
+        "google", keyword="giá vàng", proxy="1.2.3.4:80", max_results=5
+    )
+    monkeypatch.setattr(
+        automation_worker_fixed, "get_proxy_store",
+        lambda: type("Store", (), {"get": lambda self, proxy: {"country": "VN"}})()
+    )
+    assert worker.get_cache_key() == f"google|giá vàng|{worker.locale.lower()}|5|vn"
+
+    # Vùng đã chọn ở giao diện được ưu tiên hơn quốc gia trong kho
+    worker.proxy_region = "US"
+    assert worker.get_cache_key().endswith("|us")
+
+    # Bỏ qua cache / chỉ lấy kết quả mới / task không cache được -> không có khoá
+    worker.use_cache = False
+    assert worker.get_cache_key() is None
+    worker.use_cache = True
+    worker.only_new_results = True
+    assert worker.get_cache_key() is None
+    worker.only_new_results = False
+    worker.task = "facebook"
+    assert worker.get_cache_key() is None
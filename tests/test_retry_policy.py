@@ -0,0 +1,68 @@
+from modules.retry_policy import (
+    ACTION_GIVE_UP, ACTION_RETRY, ACTION_ROTATE_PROXY, DEFAULT_RULES, FAIL_CAPTCHA, FAIL_DNS,
+    FAIL_DRIVER, FAIL_HTTP, FAIL_PROXY, FAIL_TIMEOUT, Failure, RetryPolicy, classify_error_text,
+    probe_page
+)
+
+# Không chờ giữa các lần thử trong test
+NO_DELAY = {kind: {"base_delay": 0, "max_delay": 0} for kind in DEFAULT_RULES}
+
+
+class FakeDriver:
+    def __init__(self, info, logs=()):
+        self.info = info
+        self.logs = list(logs)
+
+    def execute_script(self, script):
+        return self.info
+
+    def get_log(self, kind):
+        logs, self.logs = self.logs, []
+        return logs
+
+
+def test_classify_error_text():
+    assert classify_error_text("net::ERR_PROXY_CONNECTION_FAILED") == FAIL_PROXY
+    assert classify_error_text("net::ERR_NAME_NOT_RESOLVED") == FAIL_DNS
+    assert classify_error_text("timed out receiving message") == FAIL_TIMEOUT
+    assert classify_error_text("invalid session id") == FAIL_DRIVER
+
+
+def test_decide_by_http_status():
+    policy = RetryPolicy()
+    assert policy.decide(Failure(FAIL_HTTP, status=403), {FAIL_HTTP: 1}) == ACTION_ROTATE_PROXY
+    assert policy.decide(Failure(FAIL_HTTP, status=404), {FAIL_HTTP: 1}) == ACTION_GIVE_UP
+    assert policy.decide(Failure(FAIL_HTTP, status=503), {FAIL_HTTP: 1}) == ACTION_RETRY
+    assert policy.decide(Failure(FAIL_HTTP, status=503), {FAIL_HTTP: 4}) == ACTION_GIVE_UP
+
+
+def test_backoff_is_exponential_and_capped():
+    policy = RetryPolicy(jitter=0)
+    assert [policy.backoff(FAIL_TIMEOUT, n) for n in (1, 2, 3, 10)] == [1.0, 2.0, 4.0, 10]
+
+
+def test_run_rotates_proxy_then_succeeds():
+    outcomes = [Failure(FAIL_PROXY, "refused"), None]
+    rotated = []
+    policy = RetryPolicy(rules=NO_DELAY, jitter=0)
+    ok = policy.run(lambda: outcomes.pop(0), actions={ACTION_ROTATE_PROXY: lambda: rotated.append(1) or True})
+    assert ok and rotated == [1]
+
+
+def test_run_gives_up_when_budget_spent():
+    calls = []
+    policy = RetryPolicy(rules=NO_DELAY, max_attempts=10, jitter=0)
+    ok = policy.run(lambda: calls.append(1) or Failure(FAIL_DNS, "nxdomain"))
+    assert not ok
+    assert len(calls) == DEFAULT_RULES[FAIL_DNS]["budget"] + 1
+
+
+def test_probe_page_classifies_captcha_and_http_status():
+    captcha = {"kind": "recaptcha", "sitekey": "k", "url": "https://example.com/"}
+    failure = probe_page(FakeDriver({"url": "https://example.com/", "captcha": captcha}))
+    assert failure.kind == FAIL_CAPTCHA and failure.info == captcha
+
+    failure = probe_page(FakeDriver({"url": "https://example.com/", "status": 429}))
+    assert failure.kind == FAIL_HTTP and failure.status == 429
+
+    assert probe_page(FakeDriver({"url": "https://example.com/", "status": 200})) is None
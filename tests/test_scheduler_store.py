@@ -0,0 +1,124 @@
+import json
+import time
+import datetime
+from types import SimpleNamespace
+
+from modules import scheduler_store
+from modules.scheduler_store import SchedulerStore, TIME_FORMAT
+
+
+def make_task(task_id, run_time, **fields):
+    task = {"id": task_id, "name": task_id, "script": f"{task_id}.py", "run_time": run_time.strftime(TIME_FORMAT)}
+    task.update(fields)
+    return task
+
+
+def test_due_tasks_and_mark_triggered(tmp_path):
+    store = SchedulerStore(str(tmp_path / "scheduler.db"))
+    now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    store.upsert(make_task("once", now - datetime.timedelta(minutes=5)))
+    store.upsert(make_task("daily", now - datetime.timedelta(days=2, minutes=1), repeat=True, repeat_interval="daily"))
+    store.upsert(make_task("later", now + datetime.timedelta(hours=1)))
+    store.upsert(make_task("off", now - datetime.timedelta(minutes=1), enabled=False))
+
+    due = store.due_tasks(now.timestamp())
+    assert [task["id"] for task in due] == ["daily", "once"]
+
+    for task in due:
+        assert store.mark_triggered(task, now)["status"] == "Running"
+
+    # Task một lần không còn đến hạn; task lặp lại bỏ qua các lần đã lỡ
+    assert store.due_tasks(now.timestamp()) == []
+    assert store.get("daily")["run_time"] == "2026-01-02 11:59:00"
+    assert store.mark_triggered({"id": "missing"}, now) is None
+
+
+def test_finish_run_records_duration_and_status(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(scheduler_store, "time", SimpleNamespace(time=lambda: clock[0]))
+    store = SchedulerStore(str(tmp_path / "scheduler.db"))
+    now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    store.upsert(make_task("once", now))
+    store.upsert(make_task("fail", now))
+    store.upsert(make_task("daily", now, repeat=True, repeat_interval="Hàng ngày"))
+    store.upsert(make_task("manual", now, status="Scheduled"))
+
+    def run(task_id, seconds, status="Completed", error=None):
+        run_id = store.start_run(task_id)
+        clock[0] += seconds
+        store.finish_run(run_id, status, error)
+        return run_id
+
+    for task_id in ("once", "fail", "daily"):
+        store.mark_triggered(store.get(task_id), now)
+    run("once", 12.5)
+    run("fail", 3, "Failed", "Traceback: boom")
+    run("daily", 7)
+
+    # Task một lần giữ trạng thái cuối và không đến hạn nữa; task lặp lại quay về "Scheduled"
+    assert store.get("once")["status"] == "Completed"
+    assert store.get("fail")["status"] == "Failed"
+    assert store.get("daily")["status"] == "Scheduled"
+    assert [task["id"] for task in store.due_tasks(now.timestamp() + 7 * 24 * 3600)] == ["manual", "daily"]
+
+    # Lần chạy lặp lại bị lỗi thì báo "Failed"
+    store.mark_triggered(store.get("daily"), now)
+    run("daily", 1, "Failed", "timeout")
+    assert store.get("daily")["status"] == "Failed"
+
+    # "Chạy ngay" (task không ở trạng thái Running) không đổi trạng thái task
+    run("manual", 2, "Failed")
+    assert store.get("manual")["status"] == "Scheduled"
+
+    runs = store.recent_runs("once")
+    assert len(runs) == 1
+    assert (runs[0]["started_at"], runs[0]["ended_at"], runs[0]["duration"]) == (1000.0, 1012.5, 12.5)
+    assert (runs[0]["status"], runs[0]["task_name"], runs[0]["error"]) == ("Completed", "once", None)
+    assert store.recent_runs("fail")[0]["error"] == "Traceback: boom"
+
+    stats = {row["task_id"]: row for row in store.duration_stats(since=0)}
+    assert (stats["daily"]["run_count"], stats["daily"]["avg_duration"], stats["daily"]["max_duration"],
+            stats["daily"]["failures"]) == (2, 4.0, 7.0, 1)
+
+    store.finish_run(9999)  # run không tồn tại: bỏ qua
+
+
+def test_migrate_from_json(tmp_path):
+    json_path = tmp_path / "scheduled_tasks.json"
+    legacy = [
+        make_task("keep", datetime.datetime(2026, 1, 1, 8, 0), repeat=True, repeat_interval="daily",
+                  params={"keyword": "giá vàng"}),
+        {"id": "done", "name": "done", "script": "done.py", "run_time": "2025-12-31 08:00:00",
+         "status": "Completed", "last_run": "2025-12-31 08:00:01"},
+        {"id": "bare", "name": "bare", "script": "bare.py"},
+        {"id": "broken", "name": "no script"},
+        "not a task",
+    ]
+    json_path.write_text(json.dumps(legacy, ensure_ascii=False), encoding="utf-8")
+
+    store = SchedulerStore(str(tmp_path / "scheduler.db"))
+    assert store.migrate_from_json(str(json_path)) == 3
+    assert not json_path.exists() and (tmp_path / "scheduled_tasks.json.migrated").exists()
+
+    tasks = {task["id"]: task for task in store.all_tasks()}
+    assert list(tasks) == ["keep", "done", "bare"]
+    # Trường ngoài các cột chính được giữ nguyên trong cột data
+    assert tasks["keep"]["params"] == {"keyword": "giá vàng"} and tasks["keep"]["repeat"] is True
+    assert (tasks["bare"]["status"], tasks["bare"]["enabled"]) == ("Chưa chạy", True)
+    assert tasks["bare"]["run_time"]
+    # Task một lần đã chạy xong không bị kích hoạt lại
+    assert [task["id"] for task in store.due_tasks(time.time() + 60)] == ["keep", "bare"]
+
+    # Bảng đã có dữ liệu: không nhập lại
+    json_path.write_text(json.dumps([make_task("new", datetime.datetime(2026, 1, 1))]), encoding="utf-8")
+    assert store.migrate_from_json(str(json_path)) == 0
+    assert json_path.exists() and store.get("new") is None
+
+
+def test_migrate_skips_missing_or_corrupt_file(tmp_path):
+    store = SchedulerStore(str(tmp_path / "scheduler.db"))
+    assert store.migrate_from_json(str(tmp_path / "missing.json")) == 0
+    corrupt = tmp_path / "scheduled_tasks.json"
+    corrupt.write_text("[{", encoding="utf-8")
+    assert store.migrate_from_json(str(corrupt)) == 0
+    assert corrupt.exists() and store.all_tasks() == []
@@ -0,0 +1,142 @@
+import time
+
+import pytest
+
+from modules import tab_executor
+from modules.tab_executor import TabExecutor, TabTask, google_search_task
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.opened += 1
+        handle = f"tab{self.driver.opened}"
+        self.driver.handles.append(handle)
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        assert handle in self.driver.handles
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """Trình duyệt giả: mỗi url tải xong sau load_delay giây kể từ lúc gán location"""
+
+    def __init__(self, load_delay=0.1, delays=None):
+        self.load_delay = load_delay
+        self.delays = delays or {}
+        self.handles = ["main"]
+        self.opened = 0
+        self.current_window_handle = "main"
+        self.switch_to = FakeSwitch(self)
+        self.pages = {}
+        self.navigations = []
+
+    def execute_script(self, script, *args):
+        handle = self.current_window_handle
+        if "window.location.href" in script:
+            self.navigations.append((args[0], time.time()))
+            self.pages[handle] = (args[0], time.time() + self.delays.get(args[0], self.load_delay))
+            return None
+        url, ready_at = self.pages[handle]
+        return "complete" if time.time() >= ready_at else "loading"
+
+    def current_url(self):
+        return self.pages[self.current_window_handle][0]
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+
+class FakeLimiter:
+    def __init__(self, waits=None):
+        self.waits = waits or {}
+        self.reserved = []
+
+    def reserve(self, url, proxy=None):
+        self.reserved.append((url, proxy))
+        return self.waits.get(url, 0.0)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = FakeLimiter()
+    monkeypatch.setattr(tab_executor, "get_rate_limiter", lambda: limiter)
+    return limiter
+
+
+def task(key, **kwargs):
+    return TabTask(key, f"https://example.com/{key}", lambda driver: driver.current_url(), **kwargs)
+
+
+def test_tasks_load_in_parallel_tabs(limiter):
+    driver = FakeDriver(load_delay=0.3)
+    executor = TabExecutor(driver, tabs_per_browser=3, poll_interval=0.05, proxy="1.2.3.4:80")
+    started = time.time()
+    results = executor.run([task(key) for key in "abcdef"])
+
+    assert results == {key: f"https://example.com/{key}" for key in "abcdef"}
+    # 6 trang / 3 tab tải song song: khoảng 2 lượt tải chứ không phải 6
+    assert time.time() - started < 1.2
+    assert driver.handles == ["main"] and driver.current_window_handle == "main"
+    assert executor.stats["tasks"] == 6 and executor.stats["switches"] > 0
+    assert limiter.reserved[0] == ("https://example.com/a", "1.2.3.4:80")
+
+
+def test_extract_can_chain_next_task_in_same_tab(limiter):
+    driver = FakeDriver(load_delay=0.05)
+    follow = task("page2")
+    first = TabTask("page1", "https://example.com/page1", lambda d: TabTask("page1", follow.url, follow.extract))
+    results = TabExecutor(driver, tabs_per_browser=2, poll_interval=0.02).run([first])
+    assert results == {"page1": "https://example.com/page2"}
+    assert [url for url, _ in driver.navigations] == ["https://example.com/page1", "https://example.com/page2"]
+    assert len(limiter.reserved) == 2
+
+
+def test_rate_limit_wait_does_not_block_other_tabs(limiter):
+    slow = "https://example.com/slow"
+    limiter.waits = {slow: 0.5}
+    driver = FakeDriver(load_delay=0.05)
+    logs = []
+    executor = TabExecutor(driver, tabs_per_browser=2, poll_interval=0.02, log=logs.append)
+    started = time.time()
+    results = executor.run([task("slow"), task("a"), task("b"), task("c")])
+
+    assert set(results) == {"slow", "a", "b", "c"}
+    navigated = {url.rsplit("/", 1)[1]: at - started for url, at in driver.navigations}
+    # Tab chờ giới hạn tốc độ không giữ vòng lặp: tab kia chạy hết a, b, c trước khi "slow" điều hướng
+    assert navigated["slow"] >= 0.45
+    assert max(navigated["a"], navigated["b"], navigated["c"]) < navigated["slow"]
+    assert time.time() - started < 1.0
+    assert logs == []  # chờ < 1s thì không log
+
+
+def test_timeout_and_extract_errors_are_reported_per_task(limiter):
+    driver = FakeDriver(load_delay=0.05, delays={"https://example.com/hang": 60})
+    failing = TabTask("boom", "https://example.com/boom", lambda d: 1 / 0)
+    logs = []
+    results = TabExecutor(driver, tabs_per_browser=3, poll_interval=0.02, max_poll_interval=0.05,
+                          log=logs.append).run([task("hang", timeout=0.3), failing, task("ok")])
+
+    assert isinstance(results["hang"], TimeoutError)
+    assert isinstance(results["boom"], ZeroDivisionError)
+    assert results["ok"] == "https://example.com/ok"
+    assert len(logs) == 2
+
+
+def test_should_continue_stops_and_closes_tabs(limiter):
+    driver = FakeDriver(load_delay=60)
+    calls = []
+    executor = TabExecutor(driver, tabs_per_browser=2, poll_interval=0.02,
+                           should_continue=lambda: calls.append(1) or len(calls) < 3)
+    assert executor.run([task("a"), task("b"), task("c")]) == {}
+    assert driver.handles == ["main"]
+
+
+def test_google_search_task_url():
+    search = google_search_task("giá vàng hôm nay", max_results=20)
+    assert search.key == "giá vàng hôm nay"
+    assert search.url == "https://www.google.com/search?q=gi%C3%A1+v%C3%A0ng+h%C3%B4m+nay&num=20"
+    assert search.ready_states == ("interactive", "complete")
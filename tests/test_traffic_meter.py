@@ -0,0 +1,83 @@
+import sqlite3
+import datetime
+
+import pytest
+
+from modules.traffic_meter import TrafficMeter, format_bytes
+
+
+@pytest.mark.parametrize("value, text", [
+    (0, "0 B"),
+    (None, "0 B"),
+    (512, "512 B"),
+    (1536, "1.5 KB"),
+    (5 * 1024 ** 2, "5.0 MB"),
+    (3 * 1024 ** 4, "3072.0 GB"),
+])
+def test_format_bytes(value, text):
+    assert format_bytes(value) == text
+
+
+def test_record_totals_and_least_used(tmp_path):
+    meter = TrafficMeter(str(tmp_path / "traffic.db"), flush_interval=3600)
+    meter.record("p1", "search", bytes_up=100, bytes_down=900, requests=2)
+    meter.record("p1", "shop", bytes_up=50, bytes_down=50, requests=1)
+    meter.record("p2", "search", bytes_down=10, requests=1)
+    # Không có proxy thì bỏ qua
+    meter.record("", "search", bytes_down=10_000)
+
+    assert meter.totals("p1") == (150, 950, 3)
+    assert meter.bytes_used("p1") == 1100
+    assert meter.totals("unknown") == (0, 0, 0)
+    assert meter.by_task() == {"search": (100, 910, 3), "shop": (50, 50, 1)}
+    assert meter.least_used(["p1", "p3", "p2"]) == ["p3", "p2", "p1"]
+    meter.close()
+
+
+def test_flush_accumulates_and_reloads(tmp_path):
+    db = str(tmp_path / "traffic.db")
+    meter = TrafficMeter(db, flush_interval=3600)
+    meter.record("p1", "search", bytes_up=10, bytes_down=20, requests=1)
+    assert meter.flush() == 1
+    assert meter.flush() == 0
+
+    # Lần ghi sau cộng dồn vào cùng dòng (proxy, task, ngày)
+    meter.record("p1", "search", bytes_up=5, bytes_down=5, requests=1)
+    meter.record("p2", bytes_down=100)
+    today = datetime.date.today().isoformat()
+    assert meter.daily() == [(today, 15, 125, 2)]
+    meter.close()
+
+    reloaded = TrafficMeter(db, flush_interval=3600)
+    assert reloaded.totals("p1") == (15, 25, 2)
+    assert reloaded.totals("p2") == (0, 100, 0)
+    assert reloaded.by_task() == {"search": (15, 25, 2), "": (0, 100, 0)}
+    reloaded.close()
+
+
+def test_failed_flush_keeps_pending(tmp_path):
+    db = str(tmp_path / "traffic.db")
+    meter = TrafficMeter(db, flush_interval=3600)
+    meter.record("p1", "search", bytes_up=10, bytes_down=20, requests=1)
+
+    class BrokenConnection:
+        def executemany(self, sql, params):
+            raise sqlite3.OperationalError("database is locked")
+
+        def rollback(self):
+            pass
+
+    real_connection = meter._connection
+    meter._connection = lambda: BrokenConnection()
+    with pytest.raises(sqlite3.OperationalError):
+        meter.flush()
+
+    # Phần chưa ghi được giữ lại và cộng dồn với số liệu mới
+    meter.record("p1", "search", bytes_up=1, bytes_down=1, requests=1)
+    meter._connection = real_connection
+    assert meter.flush() == 1
+    meter.close()
+
+    reloaded = TrafficMeter(db, flush_interval=3600)
+    assert reloaded.totals("p1") == (11, 21, 2)
+    reloaded.close()
@@ -0,0 +1,75 @@
+import pytest
+
+from modules.trend_content import country_code, generate_content, make_hashtags, parse_trends_rss
+
+RSS = """<?xml version="1.0" encoding="UTF-8"?>
+<rss xmlns:ht="https://trends.google.com/trending/rss" version="2.0">
+  <channel>
+    <title>Daily Search Trends</title>
+    <item>
+      <title>Giá vàng hôm nay</title>
+      <ht:approx_traffic>20000+</ht:approx_traffic>
+      <pubDate>Mon, 19 Oct 2026 08:00:00 +0700</pubDate>
+      <ht:news_item>
+        <ht:news_item_title>Giá vàng tăng mạnh</ht:news_item_title>
+        <ht:news_item_url>https://example.vn/gia-vang</ht:news_item_url>
+        <ht:news_item_source>Example</ht:news_item_source>
+      </ht:news_item>
+    </item>
+    <item>
+      <title>Thời tiết Hà Nội</title>
+      <ht:approx_traffic>5000+</ht:approx_traffic>
+    </item>
+  </channel>
+</rss>
+"""
+
+
+def test_parse_trends_rss():
+    topics = parse_trends_rss(RSS)
+    assert [topic["keyword"] for topic in topics] == ["Giá vàng hôm nay", "Thời tiết Hà Nội"]
+    first = topics[0]
+    assert first["id"] == 1
+    assert first["traffic"] == "20000+"
+    assert first["source"] == "Google Trends"
+    assert first["news"] == [
+        {"title": "Giá vàng tăng mạnh", "url": "https://example.vn/gia-vang", "source": "Example"}
+    ]
+    assert topics[1]["news"] == []
+    assert len(parse_trends_rss(RSS, limit=1)) == 1
+
+
+def test_country_code():
+    assert country_code("vietnam") == "VN"
+    assert country_code("us") == "US"
+    assert country_code("Japan") == "JP"
+    assert country_code(None) == "VN"
+
+
+def test_generate_article_and_post():
+    trend = parse_trends_rss(RSS)[0]
+    article = generate_content(trend, "article", 500)
+    assert "Giá vàng hôm nay" in article["title"]
+    assert "Giá vàng tăng mạnh" in article["content"]
+    assert article["hashtags"][0] == "#giávànghômnay"
+    assert article["sources"] == ["https://example.vn/gia-vang"]
+
+    # Giới hạn số từ bỏ bớt đoạn tin tức nhưng giữ mở bài và kết bài
+    short = generate_content(trend, "article", 10)
+    assert "Giá vàng tăng mạnh" not in short["content"]
+    assert short["content"].count("\n\n") == 1
+
+    post = generate_content(trend, "post")
+    assert post["content_type"] == "post"
+    assert "20000+" in post["content"]
+
+
+@pytest.mark.parametrize("trend", [None, {}, {"keyword": "  "}])
+def test_generate_requires_keyword(trend):
+    with pytest.raises(ValueError):
+        generate_content(trend)
+
+
+def test_make_hashtags():
+    assert make_hashtags("iPhone 17!", extra=()) == ["#iphone17"]
+    assert make_hashtags("Giá vàng hôm nay") == ["#giávànghômnay", "#xuhuong", "#trending"]
@@ -0,0 +1,37 @@
+from modules.url_index import (
+    STATUS_CHANGED, STATUS_NEW, STATUS_SEEN, SeenUrlIndex, canonicalize_url, content_fingerprint
+)
+
+
+def test_canonicalize_strips_tracking_and_redirects():
+    assert canonicalize_url("https://www.Example.com/a/?utm_source=x&b=2&a=1#top") == "https://example.com/a?a=1&b=2"
+    assert canonicalize_url("https://www.google.com/url?q=https://example.com/&sa=U") == "https://example.com/"
+    assert canonicalize_url("https://shopee.vn/Ao-thun-i.123.456?sp_atk=1") == "https://shopee.vn/product/123/456"
+
+
+def test_add_reports_new_changed_seen(tmp_path):
+    index = SeenUrlIndex("google", index_dir=str(tmp_path))
+    assert index.add("https://example.com/a", content_fingerprint("A")) == STATUS_NEW
+    assert index.add("https://example.com/a?utm_source=x", content_fingerprint("A")) == STATUS_SEEN
+    assert index.add("https://example.com/a", content_fingerprint("A2")) == STATUS_CHANGED
+    assert index.check("https://example.com/b") == STATUS_NEW
+
+
+def test_save_and_reload(tmp_path):
+    index = SeenUrlIndex("shopee", index_dir=str(tmp_path))
+    index.add("https://example.com/a", content_fingerprint("A"))
+    index.save()
+    reloaded = SeenUrlIndex("shopee", index_dir=str(tmp_path))
+    assert len(reloaded) == 1
+    assert reloaded.check("https://example.com/a", content_fingerprint("A")) == STATUS_SEEN
+
+
+def test_run_stats_are_per_run(tmp_path):
+    index = SeenUrlIndex("google", index_dir=str(tmp_path))
+    first, second = index.begin_run(), index.begin_run()
+    index.add("https://example.com/1", run=first)
+    index.add("https://example.com/2", run=second)
+    index.add("https://example.com/1", run=second)
+
+    assert first.as_dict() == {"total": 1, "new": 1, "changed": 0, "seen": 0, "novelty_ratio": 1.0}
+    assert second.as_dict() == {"total": 2, "new": 1, "changed": 0, "seen": 1, "novelty_ratio": 0.5}